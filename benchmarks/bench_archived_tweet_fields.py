@@ -0,0 +1,99 @@
+"""ArchivedTweet.to_row のフィールド抽出のベンチマーク
+
+tests/cache/archived_tweets_sample.json の各エントリについて、
+find_values でフィールドごとに探索していた旧実装と、ArchivedTweetFields で1回だけ走査する現実装の
+1エントリあたりの処理時間を計測する
+
+Usage:
+    python ./benchmarks/bench_archived_tweet_fields.py
+"""
+
+import re
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import orjson
+
+from personal_twilog.load_twitter_archive import ArchivedTweet, ArchivedTweetFields
+from personal_twilog.util import find_values
+
+SAMPLE_PATH = Path("./tests/cache/archived_tweets_sample.json")
+REPEAT_NUM = 20_000
+
+
+def legacy_to_row(entry: dict) -> tuple:
+    """find_values でフィールドごとに探索していた旧実装（registered_at を除く）"""
+    tweet_dict = find_values(entry, "tweet", True, [""], [])
+    tweet_id = find_values(tweet_dict, "id_str", True, [""], [])
+    tweet_text = find_values(tweet_dict, "full_text", True, [""], [])
+    source = find_values(tweet_dict, "source", True, [""], [])
+    tweet_via = re.findall(r"<[^>]+>(.*?)<\/[^<]+>", source)[0]
+    user_id = "175674367"
+    user_name = "shift@ヽ(・ω・)ノ"
+    screen_name = "_shift4869"
+    tweet_url = f"https://twitter.com/{screen_name}/status/{tweet_id}"
+    created_at_str = find_values(tweet_dict, "created_at", True, [""], [])
+    gmt = datetime.strptime(created_at_str, "%a %b %d %H:%M:%S %z %Y")
+    created_at = (gmt + timedelta(hours=9)).isoformat().replace("+00:00", "")
+    appeared_at = created_at
+    is_retweet = re.findall(r"^RT @(.*)", tweet_text) != []
+    source_status_ids = find_values(tweet_dict, "source_status_id_str", False, [], [])
+    retweet_tweet_id = source_status_ids[0] if len(source_status_ids) > 0 and is_retweet else ""
+    expanded_urls = find_values(tweet_dict, "expanded_url", False, [], [])
+    is_quote = any([(re.findall(r"^https://twitter.com/(.*)/status/(\d*)$", url) != []) for url in expanded_urls])
+    quote_tweet_id = ""
+    if is_quote:
+        for url in expanded_urls:
+            if m := re.findall(r"^https://twitter.com/(.*)/status/(\d*)$", url):
+                quote_tweet_id = m[0][1]
+    has_media = find_values(tweet_dict, "media", False, [], []) != []
+    entities = find_values(tweet_dict, "entities", False, [], [])
+    has_external_link = find_values(entities, "expanded_url", False, [], []) != []
+    return (
+        tweet_id,
+        tweet_text,
+        tweet_via,
+        tweet_url,
+        user_id,
+        user_name,
+        screen_name,
+        is_retweet,
+        retweet_tweet_id,
+        is_quote,
+        quote_tweet_id,
+        has_media,
+        has_external_link,
+        created_at,
+        appeared_at,
+    )
+
+
+def measure(func: Callable[[dict], object], entry_list: list[dict]) -> float:
+    """REPEAT_NUM 回繰り返したときの1エントリあたりの処理時間 [us]"""
+    start = time.perf_counter()
+    for _ in range(REPEAT_NUM):
+        for entry in entry_list:
+            func(entry)
+    return (time.perf_counter() - start) / (REPEAT_NUM * len(entry_list)) * 1e6
+
+
+def main() -> None:
+    sample_str = SAMPLE_PATH.read_text("utf8").replace("window.YTD.tweets.part0 = ", "")
+    entry_list = orjson.loads(sample_str.encode())
+    for entry in entry_list:
+        assert legacy_to_row(entry) == ArchivedTweet.to_row(entry)[:-1]
+
+    print(f"{'target':>28} | {'[us/entry]':>10}")
+    legacy_elapsed = measure(legacy_to_row, entry_list)
+    print(f"{'legacy to_row (find_values)':>28} | {legacy_elapsed:>10.2f}")
+    elapsed = measure(ArchivedTweet.to_row, entry_list)
+    print(f"{'to_row':>28} | {elapsed:>10.2f}")
+    extract_elapsed = measure(ArchivedTweetFields.extract, entry_list)
+    print(f"{'ArchivedTweetFields.extract':>28} | {extract_elapsed:>10.2f}")
+    print(f"speedup: x{legacy_elapsed / elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""クロールの各段のベンチマーク
+
+synthetic_timeline で合成した TL, Likes のレスポンスに対して、以下の処理ごとの処理時間とピークメモリを計測する
+    extract: TweetResultsExtractor.iter_tweet_results
+    flatten: ParserBase._flatten
+    parse: 各パーサの parse（TimelineCrawler と同じく、flatten 済のリストを共有する）
+    upsert: 各DBの upsert（空のDBへの書き込み）
+    stats: TimelineStats の集計
+MediaParser のファイルサイズは、合成したメディアのサイズを保存済のキャッシュから取得する（HEAD リクエストは送らない）
+
+処理時間は REPEAT_NUM 回実行したうちの最短時間, ピークメモリは tracemalloc を有効にして別に1回実行して計測する
+tracemalloc は Python のオブジェクトの確保のみを対象とするため、SQLite 内部で確保したメモリは含まない
+
+結果はコミット間で比較できるよう、コミットハッシュと合成の条件を含めた JSON として標準出力に書き出す
+表形式の結果は標準エラー出力に書き出し、--compare で以前の JSON を指定した場合は処理時間の比も表示する
+
+Usage:
+    python ./benchmarks/bench_crawl.py [--tweet-num 10000] [--retweet-ratio 0.2] [--quote-ratio 0.1]
+        [--tombstone-ratio 0.01] [--media-ratio 0.3] [--media-num 2] [--link-ratio 0.2] [--link-num 1]
+        [--seed 0] [--compare ./bench_base.json] > ./bench_result.json
+"""
+
+import argparse
+import dataclasses
+import itertools
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import orjson
+from synthetic_timeline import PayloadShape, SyntheticTimeline
+
+from personal_twilog.db.engine_registry import EngineRegistry
+from personal_twilog.db.external_link_db import ExternalLinkDB
+from personal_twilog.db.likes_db import LikesDB
+from personal_twilog.db.media_db import MediaDB
+from personal_twilog.db.metric_db import MetricDB
+from personal_twilog.db.tweet_db import TweetDB
+from personal_twilog.parser.external_link_parser import ExternalLinkParser
+from personal_twilog.parser.likes_parser import LikesParser
+from personal_twilog.parser.media_parser import MediaParser
+from personal_twilog.parser.media_size_fetcher import MediaSizeFetcher
+from personal_twilog.parser.metric_parser import MetricParser
+from personal_twilog.parser.parser_base import FlattenedTweetList, ParserBase
+from personal_twilog.parser.tweet_parser import TweetParser
+from personal_twilog.stats.timeline_stats import TimelineStats
+from personal_twilog.webapi.tweet_results_extractor import TweetResultsExtractor
+
+REPEAT_NUM = 3
+SCREEN_NAME = "screen_name_1"
+MEDIA_SIZE = 1024
+
+
+@dataclasses.dataclass
+class BenchResult:
+    """1つの処理の計測結果
+
+    Args:
+        payload (str): 入力としたレスポンス, "timeline" または "likes"
+        stage (str): 処理の段, "extract", "flatten", "parse", "upsert", "stats" のいずれか
+        target (str): 計測対象のクラス名
+        tweet_num (int): 入力としたレスポンスのツイート数
+        record_num (int): 処理したレコード数（upsert は書き込んだレコード数, それ以外は出力したレコード数）
+        elapsed_sec (float): 処理時間 [s]
+        tweets_per_sec (float): 1秒あたりに処理したレスポンスのツイート数
+        peak_memory_kib (float): 処理中のピークメモリ [KiB]
+    """
+
+    payload: str
+    stage: str
+    target: str
+    tweet_num: int
+    record_num: int
+    elapsed_sec: float
+    tweets_per_sec: float
+    peak_memory_kib: float
+
+    @property
+    def key(self) -> str:
+        """以前の結果と照合するためのキー"""
+        return f"{self.payload}/{self.stage}/{self.target}"
+
+
+class CrawlBench:
+    """合成したレスポンスに対して、クロールの各段を計測する
+
+    upsert は計測ごとに新しいDBファイルを作成し、常に空のDBへの書き込みを計測する
+    DBファイルの作成とスキーマ作成は計測に含めない
+    """
+
+    def __init__(self, shape: PayloadShape, temp_dir: Path, repeat_num: int = REPEAT_NUM) -> None:
+        self.shape = shape
+        self.temp_dir = temp_dir
+        self.repeat_num = repeat_num
+        self.registered_at = datetime.now().replace(microsecond=0).isoformat()
+        self.result_list: list[BenchResult] = []
+        self._db_counter = itertools.count()
+
+        synthetic_timeline = SyntheticTimeline(shape, SCREEN_NAME)
+        self.page_dict = {
+            "timeline": synthetic_timeline.make_pages(),
+            "likes": synthetic_timeline.make_pages(is_likes=True),
+        }
+
+    def measure(self, func: Callable[[Any], Any], setup: Callable[[], Any] = lambda: None) -> tuple[float, int, Any]:
+        """setup の返り値を引数に func を実行し、処理時間とピークメモリを計測する
+
+        setup は func の実行ごとに呼び出し、計測には含めない
+
+        Returns:
+            tuple[float, int, Any]: (repeat_num 回のうち最短の処理時間 [s], ピークメモリ [byte], func の返り値)
+        """
+        elapsed_list = []
+        for _ in range(self.repeat_num):
+            arg = setup()
+            start = time.perf_counter()
+            func(arg)
+            elapsed_list.append(time.perf_counter() - start)
+
+        arg = setup()
+        tracemalloc.start()
+        try:
+            result = func(arg)
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return min(elapsed_list), peak_memory, result
+
+    def run_stage(
+        self,
+        payload: str,
+        stage: str,
+        target: str,
+        func: Callable[[Any], Any],
+        setup: Callable[[], Any] = lambda: None,
+        record_num: int | None = None,
+    ) -> Any:
+        """1つの処理を計測して結果を追加し、func の返り値を返す
+
+        record_num が None の場合は func の返り値の件数とする
+        """
+        elapsed, peak_memory, result = self.measure(func, setup)
+        tweet_num = self.shape.tweet_num
+        self.result_list.append(
+            BenchResult(
+                payload=payload,
+                stage=stage,
+                target=target,
+                tweet_num=tweet_num,
+                record_num=len(result) if record_num is None else record_num,
+                elapsed_sec=elapsed,
+                tweets_per_sec=tweet_num / elapsed if elapsed > 0 else 0.0,
+                peak_memory_kib=peak_memory / 1024,
+            )
+        )
+        return result
+
+    def make_db_setup(self, db_class: type, record_list: list[dict]) -> Callable[[], tuple[Any, list[dict]]]:
+        """計測ごとに新しいDBファイルを作成する setup を返す"""
+
+        def setup() -> tuple[Any, list[dict]]:
+            db_path = self.temp_dir / f"bench_{next(self._db_counter)}.db"
+            return (db_class(str(db_path)), record_list)
+
+        return setup
+
+    def make_media_size_fetcher(self, tweet_list: FlattenedTweetList) -> MediaSizeFetcher:
+        """tweet_list に含まれるメディアのサイズを保存済の MediaSizeFetcher を返す"""
+        parser = ParserBase([], self.registered_at)
+        media_size_fetcher = MediaSizeFetcher(self.temp_dir / "media_size.json")
+        for tweet in tweet_list:
+            for media in tweet["legacy"].get("extended_entities", {}).get("media", []):
+                if media_dict := parser._match_media(media):
+                    media_size_fetcher.cache[media_dict["media_url"]] = MEDIA_SIZE
+        return media_size_fetcher
+
+    def run_upsert(self, payload: str, db_class: type, record_list: list[dict]) -> None:
+        """db_class の upsert を計測する"""
+        self.run_stage(
+            payload,
+            "upsert",
+            db_class.__name__,
+            lambda args: args[0].upsert(args[1]),
+            self.make_db_setup(db_class, record_list),
+            len(record_list),
+        )
+
+    def run_flatten(self, payload: str) -> FlattenedTweetList:
+        """extract, flatten を計測し、flatten 済のリストを返す"""
+        page_list = self.page_dict[payload]
+        tweet_list = self.run_stage(
+            payload,
+            "extract",
+            "TweetResultsExtractor",
+            lambda _: list(TweetResultsExtractor.iter_tweet_results(page_list)),
+        )
+
+        # _flatten は tweet 辞書に appeared_at を書き込むため、計測ごとに複製したものを渡す
+        tweet_bytes = orjson.dumps(tweet_list)
+        return self.run_stage(
+            payload,
+            "flatten",
+            "ParserBase",
+            lambda tweet_list: ParserBase(tweet_list, self.registered_at)._flatten(tweet_list),
+            lambda: orjson.loads(tweet_bytes),
+        )
+
+    def run_media_link_parse(self, payload: str, tweet_list: FlattenedTweetList) -> tuple[list[dict], list[dict]]:
+        """TL, Likes に共通する MediaParser, ExternalLinkParser を計測し、それぞれのレコードを返す"""
+        media_size_fetcher = self.make_media_size_fetcher(tweet_list)
+        media_list = self.run_stage(
+            payload,
+            "parse",
+            "MediaParser",
+            lambda _: MediaParser(tweet_list, self.registered_at, media_size_fetcher).parse(),
+        )
+        external_link_list = self.run_stage(
+            payload,
+            "parse",
+            "ExternalLinkParser",
+            lambda _: ExternalLinkParser(tweet_list, self.registered_at).parse(),
+        )
+        return media_list, external_link_list
+
+    def run_timeline(self) -> None:
+        """TL の取り出しから Metric の書き込みまでを、TimelineCrawler と同じ順に計測する"""
+        flattened_tweet_list = self.run_flatten("timeline")
+        tweet_list = self.run_stage(
+            "timeline",
+            "parse",
+            "TweetParser",
+            lambda _: TweetParser(flattened_tweet_list, self.registered_at).parse(),
+        )
+        media_list, external_link_list = self.run_media_link_parse("timeline", flattened_tweet_list)
+        metric_list = self.run_stage(
+            "timeline",
+            "parse",
+            "MetricParser",
+            lambda _: MetricParser(flattened_tweet_list, self.registered_at, SCREEN_NAME).parse(),
+        )
+
+        self.run_upsert("timeline", TweetDB, tweet_list)
+        self.run_upsert("timeline", MediaDB, media_list)
+        self.run_upsert("timeline", ExternalLinkDB, external_link_list)
+        if not metric_list:
+            # 対象ユーザのツイートが無い場合（すべて削除済など）は集計できない
+            return
+
+        tweet_db = TweetDB(str(self.temp_dir / "bench_stats.db"))
+        tweet_db.upsert(tweet_list)
+        metric_dict = self.run_stage(
+            "timeline",
+            "stats",
+            "TimelineStats",
+            lambda _: TimelineStats(metric_list[0], tweet_db).to_dict(),
+            record_num=1,
+        )
+        self.run_upsert("timeline", MetricDB, [metric_dict])
+
+    def run_likes(self) -> None:
+        """Likes の取り出しから書き込みまでを、TimelineCrawler と同じ順に計測する"""
+        flattened_tweet_list = self.run_flatten("likes")
+        likes_list = self.run_stage(
+            "likes",
+            "parse",
+            "LikesParser",
+            lambda _: LikesParser(
+                flattened_tweet_list, self.registered_at, "10011", "user_name_0", SCREEN_NAME
+            ).parse(),
+        )
+        media_list, external_link_list = self.run_media_link_parse("likes", flattened_tweet_list)
+
+        self.run_upsert("likes", LikesDB, likes_list)
+        self.run_upsert("likes", MediaDB, media_list)
+        self.run_upsert("likes", ExternalLinkDB, external_link_list)
+
+    def run(self) -> list[BenchResult]:
+        """TL, Likes の順にすべての処理を計測する"""
+        try:
+            self.run_timeline()
+            self.run_likes()
+        finally:
+            EngineRegistry.dispose()
+        return self.result_list
+
+
+def get_commit() -> str:
+    """現在のコミットハッシュを返す, 取得できなければ空文字列"""
+    try:
+        process = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return process.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def print_table(result_list: list[BenchResult], base_dict: dict[str, dict]) -> None:
+    """結果を表形式で標準エラー出力に書き出す, base_dict があれば処理時間の比（今回 / 以前）も表示する"""
+    header = f"{'payload':>8} | {'stage':>7} | {'target':>21} | {'records':>7} | {'elapsed [ms]':>12} | "
+    header += f"{'tweets/s':>10} | {'peak [KiB]':>10}"
+    if base_dict:
+        header += f" | {'ratio':>6}"
+    print(header, file=sys.stderr)
+    for result in result_list:
+        line = f"{result.payload:>8} | {result.stage:>7} | {result.target:>21} | {result.record_num:>7} | "
+        line += (
+            f"{result.elapsed_sec * 1000:>12.2f} | {result.tweets_per_sec:>10.0f} | {result.peak_memory_kib:>10.0f}"
+        )
+        if base_dict:
+            base = base_dict.get(result.key, {})
+            ratio = f"{result.elapsed_sec / base['elapsed_sec']:.2f}" if base.get("elapsed_sec") else "-"
+            line += f" | {ratio:>6}"
+        print(line, file=sys.stderr)
+
+
+def main() -> None:
+    default = PayloadShape()
+    arg_parser = argparse.ArgumentParser(description="Benchmark each crawl stage on synthetic responses.")
+    for field in dataclasses.fields(PayloadShape):
+        arg_parser.add_argument(
+            f"--{field.name.replace('_', '-')}", type=field.type, default=getattr(default, field.name)
+        )
+    arg_parser.add_argument("--repeat-num", type=int, default=REPEAT_NUM)
+    arg_parser.add_argument("--compare", type=Path, default=None, help="previous result JSON to compare with")
+    args = arg_parser.parse_args()
+
+    try:
+        shape = PayloadShape(**{field.name: getattr(args, field.name) for field in dataclasses.fields(PayloadShape)})
+    except ValueError as e:
+        arg_parser.error(str(e))
+    base_dict = {}
+    if args.compare:
+        base_json: dict = orjson.loads(args.compare.read_bytes())
+        base_dict = {f"{r['payload']}/{r['stage']}/{r['target']}": r for r in base_json["result_list"]}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        start = time.perf_counter()
+        bench = CrawlBench(shape, Path(temp_dir), args.repeat_num)
+        print(f"make synthetic responses: {time.perf_counter() - start:.1f} [s]", file=sys.stderr)
+        result_list = bench.run()
+
+    print_table(result_list, base_dict)
+    output_dict = {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "created_at": datetime.now().replace(microsecond=0).isoformat(),
+        "repeat_num": args.repeat_num,
+        "shape": dataclasses.asdict(shape),
+        "result_list": [dataclasses.asdict(result) for result in result_list],
+    }
+    sys.stdout.buffer.write(orjson.dumps(output_dict, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
+
+
+if __name__ == "__main__":
+    main()
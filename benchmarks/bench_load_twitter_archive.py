@@ -0,0 +1,63 @@
+"""load_twitter_archive の取り込みモードごとのベンチマーク
+
+tests/cache/archived_tweets_sample.json のエントリを複製して tweets.js と tweets-part*.js を作成し、
+ストリーミングモードと並列モード（ワーカープロセス数を変えて）の取り込み時間を計測する
+並列モードは .js ファイル単位で分散するため、ファイル数以上のワーカーは効果がない
+
+Usage:
+    python ./benchmarks/bench_load_twitter_archive.py
+"""
+
+import os
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import orjson
+from sqlalchemy import create_engine
+
+from personal_twilog.load_twitter_archive import ArchivedTweet, insert_parallel, insert_streaming
+
+SAMPLE_PATH = Path("./tests/cache/archived_tweets_sample.json")
+PART_NUM = 4
+ENTRY_NUM_PER_PART = 20_000
+
+
+def make_archive(json_dir: Path) -> list[Path]:
+    """PART_NUM 個の .js ファイルを作成する"""
+    sample_str = SAMPLE_PATH.read_text("utf8").replace("window.YTD.tweets.part0 = ", "")
+    entry_list = orjson.loads(sample_str.encode())
+    json_path_list = []
+    for i in range(PART_NUM):
+        json_path = json_dir / ("tweets.js" if i == 0 else f"tweets-part{i}.js")
+        body = b",\n".join(orjson.dumps(entry_list[j % len(entry_list)]) for j in range(ENTRY_NUM_PER_PART))
+        json_path.write_bytes(f"window.YTD.tweets.part{i} = [\n".encode() + body + b"\n]")
+        json_path_list.append(json_path)
+    return json_path_list
+
+
+def measure(func: Callable[[], int]) -> tuple[float, int]:
+    start = time.perf_counter()
+    count = func()
+    return time.perf_counter() - start, count
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as temp_dir:
+        json_path_list = make_archive(Path(temp_dir))
+        engine = create_engine(f"sqlite:///{Path(temp_dir) / 'bench.db'}")
+        ArchivedTweet.metadata.create_all(engine)
+
+        print(f"{PART_NUM} files x {ENTRY_NUM_PER_PART} entries, cpu_count={os.cpu_count()}")
+        print(f"{'mode':>12} | {'elapsed [s]':>11} | {'records':>8}")
+        elapsed, count = measure(lambda: insert_streaming(engine, json_path_list))
+        print(f"{'streaming':>12} | {elapsed:>11.3f} | {count:>8}")
+        for max_workers in [1, 2, PART_NUM]:
+            elapsed, count = measure(lambda: insert_parallel(engine, json_path_list, max_workers))
+            print(f"{f'parallel({max_workers})':>12} | {elapsed:>11.3f} | {count:>8}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""util.remove_duplicates のベンチマーク
+
+重複を含む辞書リストを件数を変えて生成し、1件あたりの処理時間が件数によらず一定（線形）であることを確認する
+比較のため、既出IDを list で管理していた旧実装も小さい件数でのみ計測する（二乗オーダーのため）
+
+Usage:
+    python ./benchmarks/bench_remove_duplicates.py
+"""
+
+import time
+from collections.abc import Callable
+
+from personal_twilog.util import remove_duplicates
+
+RECORD_NUM_LIST = [1_000, 10_000, 100_000, 1_000_000]
+LEGACY_MAX_RECORD_NUM = 10_000
+DUPLICATE_RATIO = 0.25
+
+
+def legacy_remove_duplicates(dict_list: list[dict]) -> list[dict]:
+    """既出IDを list で管理していた旧実装"""
+    seen = []
+    return [
+        d
+        for d in dict_list
+        if (tweet_id := d.get("tweet_id", "")) != "" and (tweet_id not in seen) and (not seen.append(tweet_id))
+    ]
+
+
+def make_dict_list(record_num: int) -> list[dict]:
+    """先頭 DUPLICATE_RATIO 分の要素が末尾に再度現れる辞書リストを作成する"""
+    unique_num = int(record_num * (1.0 - DUPLICATE_RATIO))
+    dict_list = [{"tweet_id": f"{1880000000000000000 + i}", "media_filename": f"{i}.jpg"} for i in range(unique_num)]
+    return dict_list + dict_list[: record_num - unique_num]
+
+
+def measure(func: Callable[[list[dict]], list[dict]], dict_list: list[dict]) -> float:
+    start = time.perf_counter()
+    func(dict_list)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    print(f"{'records':>10} | {'set [s]':>10} | {'set [us/rec]':>12} | {'legacy [s]':>10} | {'legacy [us/rec]':>15}")
+    for record_num in RECORD_NUM_LIST:
+        dict_list = make_dict_list(record_num)
+        elapsed = measure(remove_duplicates, dict_list)
+        line = f"{record_num:>10} | {elapsed:>10.4f} | {elapsed / record_num * 1e6:>12.3f}"
+        if record_num <= LEGACY_MAX_RECORD_NUM:
+            legacy_elapsed = measure(legacy_remove_duplicates, dict_list)
+            line += f" | {legacy_elapsed:>10.4f} | {legacy_elapsed / record_num * 1e6:>15.3f}"
+        else:
+            line += f" | {'-':>10} | {'-':>15}"
+        print(line)
+
+    record_num = RECORD_NUM_LIST[-1]
+    dict_list = make_dict_list(record_num)
+    elapsed = measure(lambda d: remove_duplicates(d, ("tweet_id", "media_filename")), dict_list)
+    print(f"key_tuple=(tweet_id, media_filename), {record_num} records: {elapsed:.4f} [s]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""TimelineStats の集計方式ごとのベンチマーク
+
+合成した Tweet テーブル（既定で100万件）に対して、以下の3方式の集計時間を計測する
+    legacy: Tweet に対して6つの SQL 文を順に実行していた旧実装
+    one-scan: Tweet を1回走査して、1つの SQL 文で集計する（get_stats(is_from_tweet=True)）
+    daily: 日ごとの集計テーブル DailyActivity から集計する（get_stats()）
+あわせて、全期間の日ごとの Metric を作成する MetricBackfill.make_snapshots の時間も計測する
+
+Usage:
+    python ./benchmarks/bench_timeline_stats.py [record_num]
+"""
+
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import text
+
+from personal_twilog.db.metric_db import MetricDB
+from personal_twilog.db.model import DailyActivity
+from personal_twilog.db.tweet_db import TweetDB
+from personal_twilog.stats.metric_backfill import MetricBackfill
+from personal_twilog.stats.timeline_stats import TimelineStats
+
+RECORD_NUM = 1_000_000
+SCREEN_NAME_NUM = 4
+INSERT_BATCH_SIZE = 10_000
+REPEAT_NUM = 3
+
+INSERT_SQL = """
+    INSERT INTO Tweet (
+        tweet_id, tweet_id_num, tweet_text, tweet_via, tweet_url, user_id, user_name, screen_name,
+        is_retweet, retweet_tweet_id, is_quote, quote_tweet_id, has_media, has_external_link,
+        created_at, appeared_at, registered_at
+    ) VALUES (
+        :tweet_id, :tweet_id_num, :tweet_text, 'tweet_via', 'tweet_url', 'user_id', 'user_name', :screen_name,
+        0, '', 0, '', 0, 0, :appeared_at, :appeared_at, :appeared_at
+    )
+"""
+TEXT_LIST = ["text", "@user reply", "long text " * 10, "", "@user"]
+
+
+def make_tweet_table(tweet_db: TweetDB, record_num: int) -> None:
+    """record_num 件の Tweet と、その DailyActivity を作成する"""
+    base_at = datetime(2015, 1, 1)
+    with tweet_db.engine.begin() as conn:
+        for start in range(0, record_num, INSERT_BATCH_SIZE):
+            params_list = []
+            for i in range(start, min(start + INSERT_BATCH_SIZE, record_num)):
+                appeared_at = base_at + timedelta(minutes=(i // SCREEN_NAME_NUM) * 7 + i % 5)
+                params_list.append({
+                    "tweet_id": str(i),
+                    "tweet_id_num": i,
+                    "tweet_text": TEXT_LIST[i % len(TEXT_LIST)],
+                    "screen_name": f"screen_name_{i % SCREEN_NAME_NUM}",
+                    "appeared_at": appeared_at.isoformat(),
+                })
+            conn.execute(text(INSERT_SQL), params_list)
+        conn.execute(text("DELETE FROM DailyActivity"))
+        conn.execute(text(DailyActivity.AGGREGATE_INSERT_SQL.format(where="")))
+
+
+def legacy_get_stats(tweet_db: TweetDB, screen_name: str) -> tuple:
+    """Tweet に対して6つの SQL 文を順に実行していた旧実装（f-string の埋め込みも旧実装のまま）"""
+    with tweet_db.engine.connect() as conn:
+        where = f"WHERE screen_name = '{screen_name}'"
+        min_appeared_at = conn.execute(text(f"SELECT min(appeared_at) FROM Tweet {where};")).one()[0]
+        max_appeared_at = conn.execute(text(f"SELECT max(appeared_at) FROM Tweet {where};")).one()[0]
+        count_all = conn.execute(text(f"SELECT count(*) FROM Tweet {where};")).one()[0]
+        days_result = conn.execute(
+            text(f"""
+            SELECT count(appeared_days), avg(appeared_count), max(appeared_count), appeared_days
+            FROM (
+                SELECT strftime('%Y-%m-%d', appeared_at) AS appeared_days, count(appeared_at) AS appeared_count
+                FROM Tweet {where} GROUP BY strftime('%Y-%m-%d', appeared_at)
+            );
+        """)
+        ).one()
+        tweet_length_sum = conn.execute(
+            text(f"SELECT sum(string_length) FROM (SELECT length(tweet_text) AS string_length FROM Tweet {where});")
+        ).one()[0]
+        communication_num = conn.execute(
+            text(f"SELECT count(tweet_text) FROM Tweet {where} AND tweet_text LIKE '%@%'")
+        ).one()[0]
+    return (min_appeared_at, max_appeared_at, count_all, *days_result, tweet_length_sum, communication_num)
+
+
+def measure(func: Callable[[], object]) -> float:
+    """REPEAT_NUM 回実行したうちの最短時間を返す"""
+    elapsed_list = []
+    for _ in range(REPEAT_NUM):
+        start = time.perf_counter()
+        func()
+        elapsed_list.append(time.perf_counter() - start)
+    return min(elapsed_list)
+
+
+def main() -> None:
+    record_num = int(sys.argv[1]) if len(sys.argv) > 1 else RECORD_NUM
+    with tempfile.TemporaryDirectory() as temp_dir:
+        tweet_db = TweetDB(str(Path(temp_dir) / "bench.db"))
+        start = time.perf_counter()
+        make_tweet_table(tweet_db, record_num)
+        print(f"make {record_num} records: {time.perf_counter() - start:.1f} [s]")
+
+        screen_name = "screen_name_0"
+        metric_parsed_dict = {
+            "screen_name": screen_name,
+            "status_count": record_num,
+            "favorite_count": 0,
+            "media_count": 0,
+            "following_count": 100,
+            "followers_count": 100,
+            "registered_at": datetime.now().replace(microsecond=0).isoformat(),
+        }
+        instance = TimelineStats(metric_parsed_dict, tweet_db)
+        with tweet_db.engine.connect() as conn:
+            day_num = conn.execute(
+                text("SELECT count(*) FROM DailyActivity WHERE screen_name = :screen_name"),
+                {"screen_name": screen_name},
+            ).scalar()
+        if instance.get_stats(is_from_tweet=True) != instance.get_stats():
+            raise ValueError("one-scan and daily results differ.")
+
+        print(f"target: {screen_name}, {record_num // SCREEN_NAME_NUM} tweets, {day_num} days")
+        print(f"{'method':>10} | {'elapsed [ms]':>12}")
+        elapsed = measure(lambda: legacy_get_stats(tweet_db, screen_name))
+        print(f"{'legacy':>10} | {elapsed * 1000:>12.2f}")
+        elapsed = measure(lambda: instance.get_stats(is_from_tweet=True))
+        print(f"{'one-scan':>10} | {elapsed * 1000:>12.2f}")
+        elapsed = measure(lambda: instance.get_stats())
+        print(f"{'daily':>10} | {elapsed * 1000:>12.2f}")
+
+        metric_db = MetricDB(tweet_db.db_path)
+        metric_db.upsert([instance.to_dict()])
+        metric_backfill = MetricBackfill(screen_name, tweet_db, metric_db)
+        start = time.perf_counter()
+        snapshot_list = metric_backfill.make_snapshots()
+        print(f"backfill {len(snapshot_list)} days: {time.perf_counter() - start:.3f} [s]")
+        tweet_db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""ベンチマーク用の合成 TL, Likes レスポンスの生成
+
+tests/cache/timeline_sample.json のツイート, メディア, 外部リンク, entry をひな形として、
+件数と構成（RT/QT の割合, メディア数, 外部リンク数, 削除済ツイートの割合）を指定した GraphQL レスポンスを生成する
+同じ PayloadShape からは毎回同じレスポンスを生成する（乱数は seed で固定する）
+
+Usage:
+    python ./benchmarks/synthetic_timeline.py [tweet_num]
+"""
+
+import random
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import orjson
+
+from personal_twilog.webapi.tweet_results_extractor import TweetResultsExtractor
+
+SAMPLE_PATH = Path("./tests/cache/timeline_sample.json")
+PAGE_SIZE = 20
+OTHER_USER_NUM = 50
+TWEET_INTERVAL = timedelta(minutes=53)
+LINK_URL_LIST = [
+    "https://www.pixiv.net/artworks/{}",
+    "https://skeb.jp/@synthetic_user/works/{}",
+    "https://example.com/articles/{}",
+]
+
+
+@dataclass(frozen=True)
+class PayloadShape:
+    """合成するレスポンスの件数と構成
+
+    各 ratio は TL のツイートのうち、その種類とするものの割合
+    RT, QT は対象ユーザのツイートで、RT先, QT先は他のユーザのツイートとする
+
+    Args:
+        tweet_num (int): TL のツイート数（削除済ツイートを含む, RT先, QT先は含まない）
+        retweet_ratio (float): RT の割合
+        quote_ratio (float): QT の割合
+        tombstone_ratio (float): 削除済ツイート（TweetTombstone）の割合
+        media_ratio (float): メディアを持つツイートの割合（RT先, QT先を含む）
+        media_num (int): メディアを持つツイートのメディア数, 写真と動画を交互に持つ
+        link_ratio (float): 外部リンクを持つツイートの割合（RT先, QT先を含む）
+        link_num (int): 外部リンクを持つツイートの外部リンク数
+        seed (int): 乱数のシード
+    """
+
+    tweet_num: int = 10_000
+    retweet_ratio: float = 0.2
+    quote_ratio: float = 0.1
+    tombstone_ratio: float = 0.01
+    media_ratio: float = 0.3
+    media_num: int = 2
+    link_ratio: float = 0.2
+    link_num: int = 1
+    seed: int = 0
+
+    def __post_init__(self) -> None:
+        if self.tweet_num < 1:
+            raise ValueError("tweet_num must be positive.")
+        ratio_list = [self.retweet_ratio, self.quote_ratio, self.tombstone_ratio, self.media_ratio, self.link_ratio]
+        if not all(0.0 <= ratio <= 1.0 for ratio in ratio_list):
+            raise ValueError("ratio must be in [0, 1].")
+        if self.retweet_ratio + self.quote_ratio + self.tombstone_ratio > 1.0:
+            raise ValueError("sum of retweet_ratio, quote_ratio and tombstone_ratio must be 1 or less.")
+        if self.media_num < 0 or self.link_num < 0:
+            raise ValueError("media_num and link_num must be 0 or more.")
+
+
+class SyntheticTimeline:
+    """PayloadShape に従って、TL と Likes の GraphQL レスポンスを生成する
+
+    ひな形は SAMPLE_PATH から読み込み、ツイートごとに orjson で複製して
+    ID, 日時, ユーザ, メディア, 外部リンクを差し替える
+    ツイートは新しいものから順に並べ、ID と created_at は後ろほど小さく（古く）なる
+    """
+
+    def __init__(self, shape: PayloadShape, screen_name: str = "screen_name_1", sample_path: Path = SAMPLE_PATH):
+        self.shape = shape
+        self.screen_name = screen_name
+
+        sample_dict: dict = orjson.loads(Path(sample_path).read_bytes())
+        tweet_list = [tweet["result"] for tweet in TweetResultsExtractor.iter_tweet_results(sample_dict)]
+        media_list = [
+            media for tweet in tweet_list for media in tweet["legacy"].get("extended_entities", {}).get("media", [])
+        ]
+
+        # RT, QT, メディア, 外部リンクを持たないツイートをひな形とする
+        self._tweet_bytes = orjson.dumps(
+            next(
+                tweet
+                for tweet in tweet_list
+                if "retweeted_status_result" not in tweet["legacy"]
+                and "quoted_status_result" not in tweet
+                and "extended_entities" not in tweet["legacy"]
+            )
+        )
+        self._photo_bytes = orjson.dumps(next(media for media in media_list if media["type"] == "photo"))
+        self._video_bytes = orjson.dumps(next(media for media in media_list if media["type"] == "video"))
+
+        # レスポンス全体と entry のひな形, entries は生成したものに差し替える
+        instructions_path = TweetResultsExtractor.INSTRUCTIONS_PATH_LIST[0]
+        entry: dict = instructions_path.get(sample_dict)[0]["entries"][0]
+        entry["content"]["itemContent"]["tweet_results"] = {}
+        self._entry_bytes = orjson.dumps(entry)
+        instructions_path.get(sample_dict)[0]["entries"] = []
+        self._page_bytes = orjson.dumps(sample_dict)
+
+    def _make_user(self, user_index: int) -> dict:
+        """user_index のユーザ情報を作成する, 0 は対象ユーザ"""
+        screen_name = self.screen_name if user_index == 0 else f"synthetic_user_{user_index}"
+        user_name = f"user_name_{user_index}"
+        return {
+            "rest_id": str(10011 + user_index),
+            "core": {"name": user_name, "screen_name": screen_name},
+            "legacy": {
+                "name": user_name,
+                "screen_name": screen_name,
+                "statuses_count": self.shape.tweet_num * 2,
+                "favourites_count": self.shape.tweet_num,
+                "media_count": self.shape.tweet_num // 2,
+                "friends_count": 100 + user_index,
+                "followers_count": 200 + user_index,
+            },
+        }
+
+    def _make_media(self, tweet_id: int, media_index: int) -> dict:
+        """tweet_id のツイートの media_index 番目のメディアを作成する, 写真と動画を交互に返す"""
+        media_key = f"{tweet_id}_{media_index}"
+        if media_index % 2 == 0:
+            media: dict = orjson.loads(self._photo_bytes)
+            media["media_url_https"] = f"https://pbs.twimg.com/media/{media_key}.jpg"
+            return media
+        media = orjson.loads(self._video_bytes)
+        media["media_url_https"] = f"https://pbs.twimg.com/ext_tw_video_thumb/{media_key}/pu/img/thumb.jpg"
+        for variant_index, variant in enumerate(media["video_info"]["variants"]):
+            variant["url"] = f"https://video.twimg.com/ext_tw_video/{media_key}/pu/vid/{variant_index}.mp4?tag=12"
+        return media
+
+    def _make_tweet(self, rng: random.Random, tweet_id: int, created_at: datetime, user_index: int) -> dict:
+        """RT, QT を持たないツイートを作成する, メディアと外部リンクは PayloadShape の割合で付与する"""
+        tweet: dict = orjson.loads(self._tweet_bytes)
+        tweet["rest_id"] = str(tweet_id)
+        tweet["core"]["user_results"]["result"] = self._make_user(user_index)
+        legacy: dict = tweet["legacy"]
+        legacy["id_str"] = str(tweet_id)
+        legacy["created_at"] = created_at.strftime("%a %b %d %H:%M:%S +0000 %Y")
+        legacy["full_text"] = f"synthetic tweet {tweet_id}"
+        if rng.random() < self.shape.media_ratio and self.shape.media_num > 0:
+            legacy["extended_entities"] = {
+                "media": [self._make_media(tweet_id, i) for i in range(self.shape.media_num)],
+            }
+        if rng.random() < self.shape.link_ratio and self.shape.link_num > 0:
+            legacy["entities"]["urls"] = [
+                {
+                    "display_url": "display_url",
+                    "expanded_url": LINK_URL_LIST[i % len(LINK_URL_LIST)].format(f"{tweet_id}{i}"),
+                    "url": "url",
+                    "indices": [0, 23],
+                }
+                for i in range(self.shape.link_num)
+            ]
+        return tweet
+
+    def make_tweet_results(self, is_likes: bool = False) -> list[dict]:
+        """tweet_results のリストを作成する
+
+        Args:
+            is_likes (bool): True なら Likes として、すべて他のユーザのツイートとする（RT は含まない）
+
+        Returns:
+            list[dict]: {"result": ツイート} のリスト, TweetResultsExtractor.iter_tweet_results が返すものと同じ形式
+        """
+        shape = self.shape
+        rng = random.Random(shape.seed + int(is_likes))
+        base_id = 1_700_000_000_000_000_000
+        base_at = datetime(2023, 8, 7, 1, 0, 0)
+
+        tweet_results_list = []
+        for i in range(shape.tweet_num):
+            # RT先, QT先の ID は次のツイートの ID との間に取る
+            tweet_id = base_id - i * 1_000
+            created_at = base_at - TWEET_INTERVAL * i
+            user_index = 1 + i % OTHER_USER_NUM if is_likes else 0
+            other_index = 1 + (i * 7) % OTHER_USER_NUM
+
+            threshold = rng.random()
+            if threshold < shape.tombstone_ratio:
+                tweet_results_list.append({"result": {"__typename": "TweetTombstone", "tombstone": {}}})
+                continue
+            threshold -= shape.tombstone_ratio
+            if threshold < shape.retweet_ratio and not is_likes:
+                retweet = self._make_tweet(rng, tweet_id - 1, created_at - TWEET_INTERVAL / 2, other_index)
+                tweet = self._make_tweet(rng, tweet_id, created_at, user_index)
+                tweet["legacy"]["full_text"] = f"RT @synthetic_user_{other_index}: {retweet['legacy']['full_text']}"
+                tweet["legacy"]["retweeted_status_result"] = {"result": retweet}
+            elif threshold - shape.retweet_ratio < shape.quote_ratio:
+                quote = self._make_tweet(rng, tweet_id - 2, created_at - TWEET_INTERVAL / 2, other_index)
+                tweet = self._make_tweet(rng, tweet_id, created_at, user_index)
+                tweet["quoted_status_result"] = {"result": quote}
+            else:
+                tweet = self._make_tweet(rng, tweet_id, created_at, user_index)
+            tweet_results_list.append({"result": tweet})
+        return tweet_results_list
+
+    def make_pages(self, is_likes: bool = False) -> list[dict]:
+        """tweet_results を PAGE_SIZE 件ずつ entry に格納した、GraphQL レスポンスのリストを作成する
+
+        Args:
+            is_likes (bool): True なら Likes のレスポンスとする
+
+        Returns:
+            list[dict]: 1ページ分のレスポンスのリスト
+        """
+        instructions_path = TweetResultsExtractor.INSTRUCTIONS_PATH_LIST[0]
+        tweet_results_list = self.make_tweet_results(is_likes)
+        page_list = []
+        for start in range(0, len(tweet_results_list), PAGE_SIZE):
+            entry_list = []
+            for tweet_results in tweet_results_list[start : start + PAGE_SIZE]:
+                entry: dict = orjson.loads(self._entry_bytes)
+                entry["entryId"] = f"tweet-{tweet_results['result'].get('rest_id', 'tombstone')}"
+                entry["content"]["itemContent"]["tweet_results"] = tweet_results
+                entry_list.append(entry)
+            page: dict = orjson.loads(self._page_bytes)
+            instructions_path.get(page)[0]["entries"] = entry_list
+            page_list.append(page)
+        return page_list
+
+
+if __name__ == "__main__":
+    tweet_num = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    synthetic_timeline = SyntheticTimeline(PayloadShape(tweet_num=tweet_num))
+    page_list = synthetic_timeline.make_pages()
+    tweet_results_list = list(TweetResultsExtractor.iter_tweet_results(page_list))
+    print(f"{len(page_list)} pages, {len(tweet_results_list)} tweet_results, {len(orjson.dumps(page_list))} bytes")
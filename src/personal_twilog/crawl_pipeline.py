@@ -0,0 +1,185 @@
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from logging import INFO, getLogger
+from queue import Empty, Full, Queue
+from typing import Any
+
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+@dataclass
+class StageTimings:
+    """パイプラインの各段の処理時間
+
+    各段の時間はキューの待ち時間を含まない、その段の処理自体にかかった時間の合計
+    total が最も遅い段の時間に近いほど、段の間で処理が重なっている
+
+    Args:
+        fetch (float): 取得にかかった時間 [s]
+        parse (float): パースにかかった時間 [s]
+        write (float): 書き込みにかかった時間 [s]
+        total (float): パイプライン全体の経過時間 [s]
+        page_num (int): 処理したページ数
+    """
+
+    fetch: float = 0.0
+    parse: float = 0.0
+    write: float = 0.0
+    total: float = 0.0
+    page_num: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"fetch {self.fetch:.3f}s, parse {self.parse:.3f}s, write {self.write:.3f}s, "
+            f"total {self.total:.3f}s, {self.page_num} pages"
+        )
+
+
+class _Failure:
+    """上流の段で発生した例外を下流に伝える"""
+
+    def __init__(self, exception: BaseException) -> None:
+        self.exception = exception
+
+
+_END = object()
+
+
+class CrawlPipeline:
+    """fetch → parse → write の3段のパイプライン
+
+    fetch（ページのイテラブルの消費）と parse はそれぞれ専用のスレッドで、write は run の呼び出し元スレッドで実行する
+    段の間は queue_size 件までの有界キューでつなぎ、ページ N のパースとページ N+1 の取得、
+    パース結果の書き込みと次のページのパースを重ねて実行する
+    DB への書き込みは呼び出し元スレッドのみで行うため、write は呼び出し元の session をそのまま使える
+
+    いずれかの段で例外が発生した場合は、他の段を止めてから run の呼び出し元に例外を送出する
+
+    Attributes:
+        POLL_INTERVAL (float): 停止確認のためにキューの待ちを中断する間隔 [s]
+    """
+
+    POLL_INTERVAL = 0.1
+
+    def __init__(
+        self,
+        fetch: Iterable[Any],
+        parse: Callable[[Any], Any],
+        write: Callable[[Any], None],
+        queue_size: int = 2,
+    ) -> None:
+        if queue_size < 1:
+            raise ValueError("queue_size must be positive.")
+        self.fetch = fetch
+        self.parse = parse
+        self.write = write
+        self.queue_size = queue_size
+
+    def _put(self, queue: Queue, item: Any, stop_event: threading.Event) -> bool:
+        """stop_event が設定されるまで queue に item を入れようとする, 入れられたら True"""
+        while not stop_event.is_set():
+            try:
+                queue.put(item, timeout=self.POLL_INTERVAL)
+                return True
+            except Full:
+                continue
+        return False
+
+    def _get(self, queue: Queue, stop_event: threading.Event) -> Any:
+        """stop_event が設定されるまで queue から取り出す, 停止時は _END"""
+        while not stop_event.is_set():
+            try:
+                return queue.get(timeout=self.POLL_INTERVAL)
+            except Empty:
+                continue
+        return _END
+
+    def _fetch_stage(self, out_queue: Queue, stop_event: threading.Event, timings: StageTimings) -> None:
+        try:
+            iterator = iter(self.fetch)
+            while True:
+                start = time.perf_counter()
+                try:
+                    page = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    timings.fetch += time.perf_counter() - start
+                if not self._put(out_queue, page, stop_event):
+                    return
+            self._put(out_queue, _END, stop_event)
+        except BaseException as e:
+            self._put(out_queue, _Failure(e), stop_event)
+
+    def _parse_stage(
+        self, in_queue: Queue, out_queue: Queue, stop_event: threading.Event, timings: StageTimings
+    ) -> None:
+        try:
+            while True:
+                item = self._get(in_queue, stop_event)
+                if item is _END or isinstance(item, _Failure):
+                    self._put(out_queue, item, stop_event)
+                    return
+                start = time.perf_counter()
+                parsed = self.parse(item)
+                timings.parse += time.perf_counter() - start
+                if not self._put(out_queue, parsed, stop_event):
+                    return
+        except BaseException as e:
+            self._put(out_queue, _Failure(e), stop_event)
+
+    def run(self) -> StageTimings:
+        """パイプラインを実行する
+
+        Returns:
+            StageTimings: 各段の処理時間
+        """
+        timings = StageTimings()
+        start = time.perf_counter()
+        fetch_queue: Queue = Queue(maxsize=self.queue_size)
+        parse_queue: Queue = Queue(maxsize=self.queue_size)
+        stop_event = threading.Event()
+        thread_list = [
+            threading.Thread(target=self._fetch_stage, args=(fetch_queue, stop_event, timings), daemon=True),
+            threading.Thread(
+                target=self._parse_stage, args=(fetch_queue, parse_queue, stop_event, timings), daemon=True
+            ),
+        ]
+        for thread in thread_list:
+            thread.start()
+
+        try:
+            while True:
+                item = parse_queue.get()
+                if item is _END:
+                    break
+                if isinstance(item, _Failure):
+                    raise item.exception
+                write_start = time.perf_counter()
+                self.write(item)
+                timings.write += time.perf_counter() - write_start
+                timings.page_num += 1
+        finally:
+            stop_event.set()
+            for thread in thread_list:
+                thread.join()
+        timings.total = time.perf_counter() - start
+        return timings
+
+
+if __name__ == "__main__":
+
+    def slow_fetch():
+        for i in range(5):
+            time.sleep(0.1)
+            yield i
+
+    def slow_parse(page: int) -> int:
+        time.sleep(0.1)
+        return page * 10
+
+    timings = CrawlPipeline(slow_fetch(), slow_parse, lambda parsed: time.sleep(0.1)).run()
+    print(timings)
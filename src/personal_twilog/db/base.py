@@ -1,37 +1,133 @@
 from abc import ABCMeta, abstractmethod
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
 from logging import INFO, getLogger
 from typing import Any
 
-from sqlalchemy import create_engine
-from sqlalchemy.pool import StaticPool
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session, sessionmaker
 
-from personal_twilog.db.model import Base as ModelBase
+from personal_twilog.db.engine_registry import EngineRegistry
 from personal_twilog.util import Result
 
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+@dataclass(frozen=True)
+class UpsertCount:
+    """upsert 1回分の処理件数
+
+    Args:
+        inserted (int): INSERT されたレコード数
+        updated (int): UPDATE されたレコード数
+    """
+
+    inserted: int = 0
+    updated: int = 0
+
 
 class Base(metaclass=ABCMeta):
+    # 1回の executemany で投入するレコード数
+    UPSERT_BATCH_SIZE = 500
+    # UPDATE 時に更新しないカラム（idと日付関係）
+    UPSERT_PRESERVE_COLUMNS = ("id", "created_at", "appeared_at", "registered_at")
+
     def __init__(self, db_path: str = "timeline.db") -> None:
         self.db_path = db_path
         self.db_url = f"sqlite:///{self.db_path}"
 
-        self.engine = create_engine(
-            self.db_url,
-            echo=False,
-            poolclass=StaticPool,
-            # pool_recycle=5,
-            connect_args={
-                "timeout": 30,
-                "check_same_thread": False,
-            },
-        )
-        ModelBase.metadata.create_all(self.engine)
+        # 同じ db_path を指す DB クラス間で engine を共有する
+        self.engine = EngineRegistry.get_engine(self.db_path)
+        self.Session = sessionmaker(bind=self.engine, autoflush=False)
+
+    @contextmanager
+    def _session_scope(self, session: Session | None = None) -> Iterator[Session]:
+        """DB操作に使う session を返す
+
+        session が指定された場合はそのまま使い、commit/rollback/close は呼び出し元（UnitOfWork）に任せる
+        指定されなかった場合は新しく session を作成し、正常終了なら commit, 例外なら rollback して close する
+
+        Args:
+            session (Session | None): 呼び出し元のトランザクションに参加する場合の session
+        """
+        if session is not None:
+            yield session
+            return
+
+        session = self.Session()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _bulk_upsert(
+        self, model: type, record: list[dict], conflict_key: str, session: Session | None = None
+    ) -> UpsertCount:
+        """INSERT ... ON CONFLICT DO UPDATE でまとめて upsert する
+
+        record を UPSERT_BATCH_SIZE ごとに executemany で投入する
+        conflict_key が既存レコードと衝突した場合は UPSERT_PRESERVE_COLUMNS 以外を更新する
+        INSERT と UPDATE の件数は、バッチごとに conflict_key の既存値を1回 SELECT して判定する
+
+        Args:
+            model (type): 対象テーブルのモデルクラス
+            record (list[dict]): レコード辞書のリスト
+            conflict_key (str): 一意制約を持つカラム名
+            session (Session | None): 指定時はその session 上で実行し、commit しない
+
+        Raises:
+            ValueError: record が list[dict] でない, またはモデルに変換できない場合
+
+        Returns:
+            UpsertCount: INSERT, UPDATE それぞれの件数
+        """
+        if not isinstance(record, list):
+            raise ValueError("Argument record is not list.")
+        if not all([isinstance(r, dict) for r in record]):
+            raise ValueError("Argument record is not list[dict].")
+        if record == []:
+            return UpsertCount()
+
+        table = model.__table__
+        column_names = [c.name for c in table.columns if c.name != "id"]
+        row_list = [{name: getattr(r, name) for name in column_names} for r in [model.create(d) for d in record]]
+
+        stmt = insert(table)
+        update_columns = {
+            name: stmt.excluded[name] for name in column_names if name not in self.UPSERT_PRESERVE_COLUMNS
+        }
+        stmt = stmt.on_conflict_do_update(index_elements=[conflict_key], set_=update_columns)
+        key_column = table.c[conflict_key]
+
+        inserted, updated = 0, 0
+        with self._session_scope(session) as session:
+            for i in range(0, len(row_list), self.UPSERT_BATCH_SIZE):
+                batch = row_list[i : i + self.UPSERT_BATCH_SIZE]
+                key_set = {r[conflict_key] for r in batch}
+                exist_key_set = set(session.execute(select(key_column).where(key_column.in_(key_set))).scalars())
+                for r in batch:
+                    if r[conflict_key] in exist_key_set:
+                        updated += 1
+                    else:
+                        # 同一バッチ内で後から現れた同じキーは UPDATE 扱い
+                        inserted += 1
+                        exist_key_set.add(r[conflict_key])
+                session.execute(stmt, batch)
+        return UpsertCount(inserted, updated)
 
     @abstractmethod
     def select(self) -> list[Any]:
         raise NotImplementedError
 
     @abstractmethod
-    def upsert(self, record: list[dict]) -> Result:
+    def upsert(self, record: list[dict], session: Session | None = None) -> Result:
         raise NotImplementedError
 
 
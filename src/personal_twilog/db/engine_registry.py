@@ -0,0 +1,135 @@
+import threading
+from logging import INFO, getLogger
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.pool import StaticPool
+
+from personal_twilog.db.migration import Migration
+from personal_twilog.db.model import Base as ModelBase
+
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+class EngineRegistry:
+    """db_path ごとの engine をプロセス内で共有するレジストリ
+
+    同じ db_path を指す DB クラスはすべて同じ engine（= 同じ接続）を使う
+    スキーマ作成（create_all）と既存DBのマイグレーションは engine 生成時の1回のみ行う
+    ":memory:" は接続ごとに別のDBとなるため共有せず、毎回新しい engine を生成する
+    enable_wal で指定された db_path は接続時に WAL/synchronous=NORMAL を設定する（オプトイン）
+
+    Attributes:
+        IN_MEMORY_DB_PATH (str): インメモリDBを表す db_path
+    """
+
+    IN_MEMORY_DB_PATH = ":memory:"
+
+    _engine_dict: dict[str, Engine] = {}
+    _wal_key_set: set[str] = set()
+    _lock = threading.Lock()
+
+    @classmethod
+    def _get_key(cls, db_path: str) -> str:
+        """同じファイルを指す db_path を同一視するためのキー"""
+        return str(Path(db_path).resolve())
+
+    @classmethod
+    def _set_wal_pragma(cls, dbapi_connection: Any, connection_record: Any = None) -> None:
+        """接続に WAL/synchronous=NORMAL の PRAGMA を設定する
+
+        WAL ではクロール中の書き込みが読み込み側（TimelineStats 等）をブロックしない
+        synchronous=NORMAL ではチェックポイント時以外の fsync を省略する
+        """
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    @classmethod
+    def _create_engine(cls, db_path: str) -> Engine:
+        engine = create_engine(
+            f"sqlite:///{db_path}",
+            echo=False,
+            poolclass=StaticPool,
+            # pool_recycle=5,
+            connect_args={
+                "timeout": 30,
+                "check_same_thread": False,
+            },
+        )
+        if db_path != cls.IN_MEMORY_DB_PATH and cls._get_key(db_path) in cls._wal_key_set:
+            event.listen(engine, "connect", cls._set_wal_pragma)
+        ModelBase.metadata.create_all(engine)
+        Migration(engine).run()
+        return engine
+
+    @classmethod
+    def get_engine(cls, db_path: str = "timeline.db") -> Engine:
+        """db_path に対応する engine を返す
+
+        初回呼び出し時のみ engine を生成してスキーマを作成する
+
+        Args:
+            db_path (str): DBファイルパス
+
+        Returns:
+            Engine: db_path に対応する共有 engine
+        """
+        if db_path == cls.IN_MEMORY_DB_PATH:
+            return cls._create_engine(db_path)
+
+        key = cls._get_key(db_path)
+        with cls._lock:
+            if key not in cls._engine_dict:
+                logger.info(f"Create engine for '{db_path}'.")
+                cls._engine_dict[key] = cls._create_engine(db_path)
+            return cls._engine_dict[key]
+
+    @classmethod
+    def enable_wal(cls, db_path: str = "timeline.db") -> None:
+        """db_path の engine で WAL/synchronous=NORMAL を有効にする
+
+        engine 生成前なら接続時に設定し、生成済なら既存の接続に直ちに設定する
+        インメモリDBは WAL に対応していないため何もしない
+
+        Args:
+            db_path (str): DBファイルパス
+        """
+        if db_path == cls.IN_MEMORY_DB_PATH:
+            logger.info("In-memory DB does not support WAL -> skip")
+            return
+
+        key = cls._get_key(db_path)
+        with cls._lock:
+            if key in cls._wal_key_set:
+                return
+            cls._wal_key_set.add(key)
+            engine = cls._engine_dict.get(key)
+        if engine:
+            # StaticPool のため既存の接続は connect イベントが発火しない
+            event.listen(engine, "connect", cls._set_wal_pragma)
+            with engine.connect() as conn:
+                cls._set_wal_pragma(conn.connection.dbapi_connection)
+        logger.info(f"Enable WAL for '{db_path}'.")
+
+    @classmethod
+    def dispose(cls, db_path: str | None = None) -> None:
+        """共有している engine を破棄する
+
+        Args:
+            db_path (str | None): 破棄対象のDBファイルパス, None ならすべて破棄する
+        """
+        with cls._lock:
+            key_list = list(cls._engine_dict.keys()) if db_path is None else [cls._get_key(db_path)]
+            for key in key_list:
+                if engine := cls._engine_dict.pop(key, None):
+                    engine.dispose()
+
+
+if __name__ == "__main__":
+    engine = EngineRegistry.get_engine("timeline.db")
+    print(engine is EngineRegistry.get_engine("./timeline.db"))
+    EngineRegistry.dispose()
@@ -1,25 +1,30 @@
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.orm.exc import NoResultFound
+from logging import INFO, getLogger
 
-from personal_twilog.db.base import Base
+from sqlalchemy.orm import Session
+
+from personal_twilog.db.base import Base, UpsertCount
 from personal_twilog.db.model import Likes
 from personal_twilog.util import Result
 
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
 
 class LikesDB(Base):
+    # select_recent_tweet_ids で取得する件数の既定値
+    RECENT_TWEET_ID_NUM = 1000
+
     def __init__(self, db_path: str = "timeline.db") -> None:
         super().__init__(db_path)
 
     def select(self) -> list[dict]:
-        Session = sessionmaker(bind=self.engine, autoflush=False)
-        session = Session()
+        session = self.Session()
         result = session.query(Likes).all()
         session.close()
         return result
 
     def select_for_max_id(self, screen_name: str) -> int:
-        Session = sessionmaker(bind=self.engine, autoflush=False)
-        session = Session()
+        session = self.Session()
         r = session.query(Likes).filter(Likes.screen_name == screen_name).order_by(Likes.id.desc()).first()
         session.close()
         if not r:
@@ -27,59 +32,60 @@ class LikesDB(Base):
         result = r.tweet_id
         return int(result)
 
-    def upsert(self, record: list[dict]) -> Result:
+    def select_recent_tweet_ids(self, screen_name: str, limit: int = RECENT_TWEET_ID_NUM) -> set[str]:
+        """直近に登録した Likes の tweet_id を最大 limit 件取得する
+
+        Likes は tweet_id の順に並ばないため、取得の打ち切りには単一の tweet_id ではなくこの集合を使う
+
+        Args:
+            screen_name (str): 対象の screen_name
+            limit (int): 取得する最大件数
+
+        Returns:
+            set[str]: tweet_id の集合, 登録が無い場合は空集合
+        """
+        session = self.Session()
+        rows = (
+            session
+            .query(Likes.tweet_id)
+            .filter(Likes.screen_name == screen_name)
+            .order_by(Likes.id.desc())
+            .limit(limit)
+            .all()
+        )
+        session.close()
+        return {row.tweet_id for row in rows}
+
+    def bulk_upsert(self, record: list[dict], session: Session | None = None) -> UpsertCount:
+        """INSERT ... ON CONFLICT(tweet_id) DO UPDATE でまとめて upsert する
+
+        既存レコードはidと日付関係以外を更新する
+
+        Args:
+            record (list[dict]): レコード辞書のリスト
+            session (Session | None): 指定時はその session のトランザクションに参加し、commit しない
+
+        Raises:
+            ValueError: record が list[dict] でない, またはレコードとして解釈できない場合
+
+        Returns:
+            UpsertCount: INSERT, UPDATE それぞれの件数
+        """
+        return self._bulk_upsert(Likes, record, "tweet_id", session)
+
+    def upsert(self, record: list[dict], session: Session | None = None) -> Result:
         """upsert
 
         Args:
             record (list[dict]): レコード辞書のリスト
+            session (Session | None): 指定時はその session のトランザクションに参加し、commit しない
 
         Returns:
             Result: upsert に成功したなら Result.success, そうでないなら Result.failed
         """
-        if not isinstance(record, list):
-            return Result.failed
-        if record == []:
-            # 空リストは0レコードupsert完了とみなして正常終了扱い
-            return Result.success
-
-        all_dict_flag = all([isinstance(r, dict) for r in record])
-        if not all_dict_flag:
+        try:
+            upsert_count = self.bulk_upsert(record, session)
+        except ValueError:
             return Result.failed
-
-        record_list: list[Likes] = [Likes.create(r) for r in record]
-
-        Session = sessionmaker(bind=self.engine, autoflush=False)
-        session = Session()
-
-        for r in record_list:
-            try:
-                q = session.query(Likes).filter(Likes.tweet_id == r.tweet_id).with_for_update()
-                p = q.one()
-            except NoResultFound:
-                # INSERT
-                session.add(r)
-            else:
-                # UPDATE
-                # idと日付関係以外を更新する
-                p.tweet_id = r.tweet_id
-                p.tweet_text = r.tweet_text
-                p.tweet_via = r.tweet_via
-                p.tweet_url = r.tweet_url
-                p.tweet_user_id = r.tweet_user_id
-                p.tweet_user_name = r.tweet_user_name
-                p.tweet_screen_name = r.tweet_screen_name
-                p.user_id = r.user_id
-                p.user_name = r.user_name
-                p.screen_name = r.screen_name
-                p.is_retweet = r.is_retweet
-                p.retweet_tweet_id = r.retweet_tweet_id
-                p.is_quote = r.is_quote
-                p.quote_tweet_id = r.quote_tweet_id
-                p.has_media = r.has_media
-                # p.created_at = r.created_at
-                # p.appeared_at = r.appeared_at
-                # p.registered_at = r.registered_at
-
-        session.commit()
-        session.close()
+        logger.info(f"Likes upsert: inserted {upsert_count.inserted}, updated {upsert_count.updated}.")
         return Result.success
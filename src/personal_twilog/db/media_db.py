@@ -1,74 +1,55 @@
-from sqlalchemy import and_
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.orm.exc import NoResultFound
+from logging import INFO, getLogger
 
-from personal_twilog.db.base import Base
+from sqlalchemy.orm import Session
+
+from personal_twilog.db.base import Base, UpsertCount
 from personal_twilog.db.model import Media
 from personal_twilog.util import Result
 
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
 
 class MediaDB(Base):
     def __init__(self, db_path: str = "timeline.db"):
         super().__init__(db_path)
 
     def select(self) -> list[dict]:
-        Session = sessionmaker(bind=self.engine, autoflush=False)
-        session = Session()
+        session = self.Session()
         result = session.query(Media).all()
         session.close()
         return result
 
-    def upsert(self, record: list[dict]) -> Result:
-        """upsert
+    def bulk_upsert(self, record: list[dict], session: Session | None = None) -> UpsertCount:
+        """INSERT ... ON CONFLICT(tweet_id) DO UPDATE でまとめて upsert する
+
+        既存レコードはidと日付関係以外を更新する
 
         Args:
             record (list[dict]): レコード辞書のリスト
+            session (Session | None): 指定時はその session のトランザクションに参加し、commit しない
+
+        Raises:
+            ValueError: record が list[dict] でない, またはレコードとして解釈できない場合
 
         Returns:
-            Result: upsert に成功したなら Result.success, そうでないなら Result.failed
+            UpsertCount: INSERT, UPDATE それぞれの件数
         """
-        if not isinstance(record, list):
-            return Result.failed
-        if record == []:
-            # 空リストは0レコードupsert完了とみなして正常終了扱い
-            return Result.success
-
-        all_dict_flag = all([isinstance(r, dict) for r in record])
-        if not all_dict_flag:
-            return Result.failed
+        return self._bulk_upsert(Media, record, "tweet_id", session)
 
-        record_list: list[Media] = [Media.create(r) for r in record]
-
-        Session = sessionmaker(bind=self.engine, autoflush=False)
-        session = Session()
+    def upsert(self, record: list[dict], session: Session | None = None) -> Result:
+        """upsert
 
-        for r in record_list:
-            try:
-                q = (
-                    session.query(Media)
-                    .filter(and_(Media.tweet_id == r.tweet_id, Media.registered_at == r.registered_at))
-                    .with_for_update()
-                )
-                p = q.one()
-            except NoResultFound:
-                # INSERT
-                session.add(r)
-            else:
-                # UPDATE
-                # idと日付関係以外を更新する
-                p.tweet_id = r.tweet_id
-                p.tweet_text = r.tweet_text
-                p.tweet_via = r.tweet_via
-                p.tweet_url = r.tweet_url
-                p.media_filename = r.media_filename
-                p.media_url = r.media_url
-                p.media_thumbnail_url = r.media_thumbnail_url
-                p.media_type = r.media_type
-                p.media_size = r.media_size
-                # p.created_at = r.created_at
-                # p.appeared_at = r.appeared_at
-                # p.registered_at = r.registered_at
+        Args:
+            record (list[dict]): レコード辞書のリスト
+            session (Session | None): 指定時はその session のトランザクションに参加し、commit しない
 
-        session.commit()
-        session.close()
+        Returns:
+            Result: upsert に成功したなら Result.success, そうでないなら Result.failed
+        """
+        try:
+            upsert_count = self.bulk_upsert(record, session)
+        except ValueError:
+            return Result.failed
+        logger.info(f"Media upsert: inserted {upsert_count.inserted}, updated {upsert_count.updated}.")
         return Result.success
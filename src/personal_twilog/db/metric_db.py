@@ -1,5 +1,5 @@
 from sqlalchemy import and_
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session
 from sqlalchemy.orm.exc import NoResultFound
 
 from personal_twilog.db.base import Base
@@ -12,17 +12,17 @@ class MetricDB(Base):
         super().__init__(db_path)
 
     def select(self) -> list[dict]:
-        Session = sessionmaker(bind=self.engine, autoflush=False)
-        session = Session()
+        session = self.Session()
         result = session.query(Metric).all()
         session.close()
         return result
 
-    def upsert(self, record: list[dict]) -> Result:
+    def upsert(self, record: list[dict], session: Session | None = None) -> Result:
         """upsert
 
         Args:
             record (list[dict]): レコード辞書のリスト
+            session (Session | None): 指定時はその session のトランザクションに参加し、commit しない
 
         Returns:
             Result: upsert に成功したなら Result.success, そうでないなら Result.failed
@@ -39,50 +39,46 @@ class MetricDB(Base):
 
         record_list: list[Metric] = [Metric.create(r) for r in record]
 
-        Session = sessionmaker(bind=self.engine, autoflush=False)
-        session = Session()
+        with self._session_scope(session) as session:
+            for r in record_list:
+                try:
+                    q = (
+                        session.query(Metric)
+                        .filter(and_(Metric.registered_at == r.registered_at, Metric.screen_name == r.screen_name))
+                        .with_for_update()
+                    )
+                    p = q.one()
+                except NoResultFound:
+                    # INSERT
+                    session.add(r)
+                else:
+                    # UPDATE
+                    # idと日付関係以外を更新する
+                    p.screen_name = r.screen_name
+                    p.status_count = r.status_count
+                    p.favorite_count = r.favorite_count
+                    p.media_count = r.media_count
+                    p.following_count = r.following_count
+                    p.followers_count = r.followers_count
+                    p.min_appeared_at = r.min_appeared_at
+                    p.max_appeared_at = r.max_appeared_at
+                    p.duration_days = r.duration_days
+                    p.count_all = r.count_all
+                    p.appeared_days = r.appeared_days
+                    p.non_appeared_days = r.non_appeared_days
+                    p.average_tweet_by_day = r.average_tweet_by_day
+                    p.max_tweet_num_by_day = r.max_tweet_num_by_day
+                    p.max_tweet_day_by_day = r.max_tweet_day_by_day
+                    p.tweet_length_sum = r.tweet_length_sum
+                    p.tweet_length_by_count = r.tweet_length_by_count
+                    p.tweet_length_by_day = r.tweet_length_by_day
+                    p.communication_ratio = r.communication_ratio
+                    p.increase_following_by_day = r.increase_following_by_day
+                    p.increase_followers_by_day = r.increase_followers_by_day
+                    p.ff_ratio = r.ff_ratio
+                    p.ff_ratio_inverse = r.ff_ratio_inverse
+                    p.available_following = r.available_following
+                    p.rest_available_following = r.rest_available_following
+                    # p.registered_at = r.registered_at
 
-        for r in record_list:
-            try:
-                q = (
-                    session.query(Metric)
-                    .filter(and_(Metric.registered_at == r.registered_at, Metric.screen_name == r.screen_name))
-                    .with_for_update()
-                )
-                p = q.one()
-            except NoResultFound:
-                # INSERT
-                session.add(r)
-            else:
-                # UPDATE
-                # idと日付関係以外を更新する
-                p.screen_name = r.screen_name
-                p.status_count = r.status_count
-                p.favorite_count = r.favorite_count
-                p.media_count = r.media_count
-                p.following_count = r.following_count
-                p.followers_count = r.followers_count
-                p.min_appeared_at = r.min_appeared_at
-                p.max_appeared_at = r.max_appeared_at
-                p.duration_days = r.duration_days
-                p.count_all = r.count_all
-                p.appeared_days = r.appeared_days
-                p.non_appeared_days = r.non_appeared_days
-                p.average_tweet_by_day = r.average_tweet_by_day
-                p.max_tweet_num_by_day = r.max_tweet_num_by_day
-                p.max_tweet_day_by_day = r.max_tweet_day_by_day
-                p.tweet_length_sum = r.tweet_length_sum
-                p.tweet_length_by_count = r.tweet_length_by_count
-                p.tweet_length_by_day = r.tweet_length_by_day
-                p.communication_ratio = r.communication_ratio
-                p.increase_following_by_day = r.increase_following_by_day
-                p.increase_followers_by_day = r.increase_followers_by_day
-                p.ff_ratio = r.ff_ratio
-                p.ff_ratio_inverse = r.ff_ratio_inverse
-                p.available_following = r.available_following
-                p.rest_available_following = r.rest_available_following
-                # p.registered_at = r.registered_at
-
-        session.commit()
-        session.close()
         return Result.success
@@ -0,0 +1,153 @@
+from logging import INFO, getLogger
+
+from sqlalchemy import Connection, Engine, inspect, text
+
+from personal_twilog.db.model import Base as ModelBase
+from personal_twilog.db.model import DailyActivity
+
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+class Migration:
+    """既存DBのスキーマを現在のモデル定義に追従させる
+
+    create_all は既存テーブルに対しては何もしないため、
+    テーブル作成後にモデルへ追加したカラム, インデックス等はここで作成する
+    各ステップは冪等であり、適用済のDBに対して実行しても何もしない
+
+    Attributes:
+        OBSOLETE_INDEX_NAMES (tuple[str]): モデルから削除済で、DBからも削除するインデックス名
+        BACKFILL_SQL_DICT (dict[tuple[str, str], str]): カラム追加時に既存レコードを埋める SQL
+        FILL_TABLE_SQL_DICT (dict[str, str]): 集計テーブルが空のときに他のテーブルから埋める SQL
+    """
+
+    OBSOLETE_INDEX_NAMES = ("ix_Tweet_screen_name_tweet_id",)
+    BACKFILL_SQL_DICT = {
+        # 数値として解釈できる tweet_id のみ変換する
+        ("Tweet", "tweet_id_num"): """
+            UPDATE Tweet SET tweet_id_num = CAST(tweet_id AS INTEGER)
+            WHERE tweet_id_num IS NULL AND tweet_id <> '' AND tweet_id NOT GLOB '*[^0-9]*';
+        """,
+    }
+
+    FILL_TABLE_SQL_DICT = {
+        "DailyActivity": DailyActivity.AGGREGATE_INSERT_SQL.format(where=""),
+    }
+
+    def __init__(self, engine: Engine) -> None:
+        self.engine = engine
+
+    def _add_columns(self, conn: Connection) -> list[str]:
+        """モデルに定義されていて、DBに存在しないカラムを追加する
+
+        追加したカラムに BACKFILL_SQL_DICT の SQL があれば、既存レコードをその SQL で埋める
+
+        Args:
+            conn (Connection): 接続
+
+        Returns:
+            list[str]: 追加したカラム名（"テーブル名.カラム名"）のリスト
+        """
+        added_list = []
+        inspector = inspect(conn)
+        for table in ModelBase.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            exist_column_names = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in exist_column_names:
+                    continue
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+                if backfill_sql := self.BACKFILL_SQL_DICT.get((table.name, column.name)):
+                    conn.execute(text(backfill_sql))
+                added_list.append(f"{table.name}.{column.name}")
+        return added_list
+
+    def _drop_indexes(self, conn: Connection) -> list[str]:
+        """OBSOLETE_INDEX_NAMES のインデックスがDBに存在すれば削除する
+
+        Args:
+            conn (Connection): 接続
+
+        Returns:
+            list[str]: 削除したインデックス名のリスト
+        """
+        dropped_list = []
+        for index_name in self.OBSOLETE_INDEX_NAMES:
+            r = conn.execute(
+                text("SELECT name FROM sqlite_master WHERE type = 'index' AND name = :name"), {"name": index_name}
+            ).one_or_none()
+            if r is None:
+                continue
+            conn.execute(text(f'DROP INDEX "{index_name}"'))
+            dropped_list.append(index_name)
+        return dropped_list
+
+    def _create_indexes(self, conn: Connection) -> list[str]:
+        """モデルに定義されていて、DBに存在しないインデックスを作成する
+
+        Args:
+            conn (Connection): 接続
+
+        Returns:
+            list[str]: 作成したインデックス名のリスト
+        """
+        created_list = []
+        inspector = inspect(conn)
+        for table in ModelBase.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            exist_index_names = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in exist_index_names:
+                    continue
+                index.create(bind=conn)
+                created_list.append(index.name)
+        return created_list
+
+    def _fill_tables(self, conn: Connection) -> list[str]:
+        """FILL_TABLE_SQL_DICT のテーブルが空なら、その SQL で埋める
+
+        集計テーブルを追加する前から存在するDBに対して、既存レコードの集計結果を作成する
+
+        Args:
+            conn (Connection): 接続
+
+        Returns:
+            list[str]: レコードを埋めたテーブル名のリスト
+        """
+        filled_list = []
+        inspector = inspect(conn)
+        for table_name, fill_sql in self.FILL_TABLE_SQL_DICT.items():
+            if not inspector.has_table(table_name):
+                continue
+            if conn.execute(text(f'SELECT 1 FROM "{table_name}" LIMIT 1')).one_or_none() is not None:
+                continue
+            if conn.execute(text(fill_sql)).rowcount > 0:
+                filled_list.append(table_name)
+        return filled_list
+
+    def run(self) -> None:
+        """マイグレーションを実行する"""
+        with self.engine.begin() as conn:
+            added_list = self._add_columns(conn)
+            dropped_list = self._drop_indexes(conn)
+            created_list = self._create_indexes(conn)
+            filled_list = self._fill_tables(conn)
+        for column_name in added_list:
+            logger.info(f"Migration: add column '{column_name}'.")
+        for index_name in dropped_list:
+            logger.info(f"Migration: drop index '{index_name}'.")
+        for index_name in created_list:
+            logger.info(f"Migration: create index '{index_name}'.")
+        for table_name in filled_list:
+            logger.info(f"Migration: fill table '{table_name}'.")
+
+
+if __name__ == "__main__":
+    from sqlalchemy import create_engine
+
+    engine = create_engine("sqlite:///timeline.db")
+    Migration(engine).run()
@@ -2,7 +2,7 @@ from datetime import datetime
 from pathlib import Path
 from typing import Self
 
-from sqlalchemy import Boolean, Column, Integer, Numeric, String, create_engine
+from sqlalchemy import Boolean, Column, Index, Integer, Numeric, String, create_engine
 from sqlalchemy.orm import Session, declarative_base
 
 Base = declarative_base()
@@ -12,6 +12,7 @@ class Tweet(Base):
     """ツイートモデル
     [id] INTEGER NOT NULL UNIQUE,
     [tweet_id] TEXT NOT NULL,
+    [tweet_id_num] INTEGER,
     [tweet_text] TEXT,
     [tweet_via] TEXT,
     [tweet_url] TEXT NOT NULL,
@@ -31,9 +32,17 @@ class Tweet(Base):
     """
 
     __tablename__ = "Tweet"
+    __table_args__ = (
+        # TimelineStats の screen_name ごとの集計（min/max/日別 group by）用
+        Index("ix_Tweet_screen_name_appeared_at", "screen_name", "appeared_at"),
+        # TweetDB.select_for_max_id, select_for_range 用
+        Index("ix_Tweet_screen_name_tweet_id_num", "screen_name", "tweet_id_num"),
+    )
 
     id = Column(Integer, primary_key=True)
     tweet_id = Column(String(256), nullable=False, unique=True)
+    # tweet_id の数値表現（文字列の max() は桁数が異なると辞書順になるため、比較はこちらで行う）
+    tweet_id_num = Column(Integer)
     tweet_text = Column(String(256))
     tweet_via = Column(String(256))
     tweet_url = Column(String(256), nullable=False)
@@ -71,6 +80,7 @@ class Tweet(Base):
     ):
         # self.id = id
         self.tweet_id = tweet_id
+        self.tweet_id_num = Tweet.to_tweet_id_num(tweet_id)
         self.tweet_text = tweet_text
         self.tweet_via = tweet_via
         self.tweet_url = tweet_url
@@ -87,6 +97,12 @@ class Tweet(Base):
         self.appeared_at = appeared_at
         self.registered_at = registered_at
 
+    @staticmethod
+    def to_tweet_id_num(tweet_id: str) -> int | None:
+        """tweet_id 文字列を数値に変換する, 数値として解釈できない場合は None"""
+        tweet_id = str(tweet_id)
+        return int(tweet_id) if tweet_id.isdecimal() else None
+
     @classmethod
     def create(self, args_dict: dict) -> Self:
         match args_dict:
@@ -182,6 +198,10 @@ class Likes(Base):
     """
 
     __tablename__ = "Likes"
+    __table_args__ = (
+        # LikesDB.select_for_max_id, select_recent_tweet_ids 用
+        Index("ix_Likes_screen_name_id", "screen_name", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     tweet_id = Column(String(256), nullable=False, unique=True)
@@ -580,6 +600,10 @@ class Metric(Base):
     """
 
     __tablename__ = "Metric"
+    __table_args__ = (
+        # MetricDB.upsert の既存レコード検索用
+        Index("ix_Metric_screen_name_registered_at", "screen_name", "registered_at"),
+    )
 
     id = Column(Integer, primary_key=True)
     screen_name = Column(String(256), nullable=False)
@@ -769,6 +793,114 @@ class Metric(Base):
         }
 
 
+class DailyActivity(Base):
+    """screen_name, 日ごとのツイート集計モデル
+    [id] INTEGER NOT NULL UNIQUE,
+    [screen_name] TEXT NOT NULL,
+    [day] TEXT NOT NULL, appeared_at の日付部分（%Y-%m-%d）
+    [tweet_count] INTEGER NOT NULL,
+    [tweet_length_sum] INTEGER NOT NULL,
+    [communication_count] INTEGER NOT NULL, 本文に "@" を含むツイート数
+    [min_appeared_at] TEXT NOT NULL,
+    [max_appeared_at] TEXT NOT NULL,
+    PRIMARY KEY([id])
+
+    Tweet から集計した値を保持し、TweetDB.upsert のたびに影響のある日のみ再集計する
+    ツイートが1件も無い日のレコードは持たない
+    """
+
+    __tablename__ = "DailyActivity"
+    __table_args__ = (Index("ix_DailyActivity_screen_name_day", "screen_name", "day", unique=True),)
+
+    # Tweet から集計して INSERT する SQL, {where} に絞り込み条件を入れて使う
+    AGGREGATE_INSERT_SQL = """
+        INSERT INTO DailyActivity (
+            screen_name, day, tweet_count, tweet_length_sum, communication_count, min_appeared_at, max_appeared_at
+        )
+        SELECT
+            screen_name,
+            date(appeared_at) AS day,
+            count(*),
+            coalesce(sum(length(tweet_text)), 0),
+            count(CASE WHEN instr(tweet_text, '@') > 0 THEN 1 END),
+            min(appeared_at),
+            max(appeared_at)
+        FROM Tweet
+        {where}
+        GROUP BY screen_name, day
+        HAVING day IS NOT NULL;
+    """
+
+    id = Column(Integer, primary_key=True)
+    screen_name = Column(String(256), nullable=False)
+    day = Column(String(256), nullable=False)
+    tweet_count = Column(Integer, nullable=False)
+    tweet_length_sum = Column(Integer, nullable=False)
+    communication_count = Column(Integer, nullable=False)
+    min_appeared_at = Column(String(256), nullable=False)
+    max_appeared_at = Column(String(256), nullable=False)
+
+    def __init__(
+        self,
+        screen_name: str,
+        day: str,
+        tweet_count: int,
+        tweet_length_sum: int,
+        communication_count: int,
+        min_appeared_at: str,
+        max_appeared_at: str,
+    ):
+        # self.id = id
+        self.screen_name = screen_name
+        self.day = day
+        self.tweet_count = tweet_count
+        self.tweet_length_sum = tweet_length_sum
+        self.communication_count = communication_count
+        self.min_appeared_at = min_appeared_at
+        self.max_appeared_at = max_appeared_at
+
+    @classmethod
+    def create(self, args_dict: dict) -> Self:
+        match args_dict:
+            case {
+                "screen_name": screen_name,
+                "day": day,
+                "tweet_count": tweet_count,
+                "tweet_length_sum": tweet_length_sum,
+                "communication_count": communication_count,
+                "min_appeared_at": min_appeared_at,
+                "max_appeared_at": max_appeared_at,
+            }:
+                return DailyActivity(
+                    screen_name,
+                    day,
+                    tweet_count,
+                    tweet_length_sum,
+                    communication_count,
+                    min_appeared_at,
+                    max_appeared_at,
+                )
+            case _:
+                raise ValueError("Unmatch args_dict.")
+
+    def __repr__(self) -> str:
+        return f"<DailyActivity(screen_name='{self.screen_name}', day='{self.day}')>"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, DailyActivity) and other.screen_name == self.screen_name and other.day == self.day
+
+    def to_dict(self) -> dict:
+        return {
+            "screen_name": self.screen_name,
+            "day": self.day,
+            "tweet_count": self.tweet_count,
+            "tweet_length_sum": self.tweet_length_sum,
+            "communication_count": self.communication_count,
+            "min_appeared_at": self.min_appeared_at,
+            "max_appeared_at": self.max_appeared_at,
+        }
+
+
 if __name__ == "__main__":
     test_db = Path("./test_DB.db")
     test_db.unlink(missing_ok=True)
@@ -1,82 +1,149 @@
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.orm.exc import NoResultFound
+from datetime import date, timedelta
+from logging import INFO, getLogger
+
+from sqlalchemy import Connection, select, text
+from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
 
-from personal_twilog.db.base import Base
-from personal_twilog.db.model import Tweet
+from personal_twilog.db.base import Base, UpsertCount
+from personal_twilog.db.model import DailyActivity, Tweet
 from personal_twilog.util import Result
 
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
 
 class TweetDB(Base):
     def __init__(self, db_path: str = "timeline.db") -> None:
         super().__init__(db_path)
 
     def select(self) -> list[dict]:
-        Session = sessionmaker(bind=self.engine, autoflush=False)
-        session = Session()
+        session = self.Session()
         result = session.query(Tweet).all()
         session.close()
         return result
 
     def select_for_max_id(self, screen_name: str) -> int:
-        Session = sessionmaker(bind=self.engine, autoflush=False)
-        session = Session()
-        r = session.query(func.max(Tweet.tweet_id).filter(Tweet.screen_name == screen_name).label("max_id_str")).one()
+        session = self.Session()
+        r = session.query(func.max(Tweet.tweet_id_num).label("max_id")).filter(Tweet.screen_name == screen_name).one()
         session.close()
-        result = r.max_id_str or 0
+        result = r.max_id or 0
         return int(result)
 
-    def upsert(self, record: list[dict]) -> Result:
-        """upsert
+    def select_for_range(self, screen_name: str, min_id: int | None = None, max_id: int | None = None) -> list[Tweet]:
+        """tweet_id の範囲を指定して取得する
 
         Args:
-            record (list[dict]): レコード辞書のリスト
+            screen_name (str): 対象の screen_name
+            min_id (int | None): tweet_id の下限（この値を含む）, None なら下限なし
+            max_id (int | None): tweet_id の上限（この値を含む）, None なら上限なし
 
         Returns:
-            Result: upsert に成功したなら Result.success, そうでないなら Result.failed
+            list[Tweet]: tweet_id の昇順に並んだレコードのリスト
         """
-        if not isinstance(record, list):
-            return Result.failed
-        if record == []:
-            # 空リストは0レコードupsert完了とみなして正常終了扱い
-            return Result.success
+        session = self.Session()
+        q = session.query(Tweet).filter(Tweet.screen_name == screen_name)
+        if min_id is not None:
+            q = q.filter(Tweet.tweet_id_num >= min_id)
+        if max_id is not None:
+            q = q.filter(Tweet.tweet_id_num <= max_id)
+        result = q.order_by(Tweet.tweet_id_num).all()
+        session.close()
+        return result
 
-        all_dict_flag = all([isinstance(r, dict) for r in record])
-        if not all_dict_flag:
-            return Result.failed
+    def refresh_daily_activity(self, tweet_id_list: list[str], session: Session | None = None) -> None:
+        """tweet_id_list のツイートが含まれる screen_name, 日の DailyActivity を再集計する
+
+        対象の日は upsert 後の Tweet から引くため、既存レコードの appeared_at が保持された場合もその日を再集計する
+        再集計は screen_name, appeared_at のインデックスでその日のツイートのみを読む
 
-        record_list: list[Tweet] = [Tweet.create(r) for r in record]
+        Args:
+            tweet_id_list (list[str]): upsert した tweet_id のリスト
+            session (Session | None): 指定時はその session 上で実行し、commit しない
+        """
+        day_column = func.date(Tweet.appeared_at)
+        with self._session_scope(session) as session:
+            key_set: set[tuple[str, str]] = set()
+            for i in range(0, len(tweet_id_list), self.UPSERT_BATCH_SIZE):
+                batch = tweet_id_list[i : i + self.UPSERT_BATCH_SIZE]
+                q = select(Tweet.screen_name, day_column).where(Tweet.tweet_id.in_(batch)).distinct()
+                key_set.update((screen_name, day) for screen_name, day in session.execute(q) if day is not None)
+            self.refresh_daily_activity_for_days(key_set, session)
+
+    @staticmethod
+    def refresh_daily_activity_for_days(key_set: set[tuple[str, str]], connection: Session | Connection) -> None:
+        """key_set の (screen_name, 日) ごとに DailyActivity を再集計する
+
+        Args:
+            key_set (set[tuple[str, str]]): 再集計する (screen_name, %Y-%m-%d) の組の集合
+            connection (Session | Connection): 実行に使う session または connection, commit はしない
+        """
+        if not key_set:
+            return
+
+        params = [
+            {
+                "screen_name": screen_name,
+                "day": day,
+                "next_day": (date.fromisoformat(day) + timedelta(days=1)).isoformat(),
+            }
+            for screen_name, day in sorted(key_set)
+        ]
+        where = "WHERE screen_name = :screen_name AND appeared_at >= :day AND appeared_at < :next_day"
+        connection.execute(text("DELETE FROM DailyActivity WHERE screen_name = :screen_name AND day = :day;"), params)
+        connection.execute(text(DailyActivity.AGGREGATE_INSERT_SQL.format(where=where)), params)
 
-        Session = sessionmaker(bind=self.engine, autoflush=False)
-        session = Session()
+    def rebuild_daily_activity(self, screen_name: str | None = None, session: Session | None = None) -> None:
+        """DailyActivity を Tweet から作り直す
 
-        for r in record_list:
-            try:
-                q = session.query(Tweet).filter(Tweet.tweet_id == r.tweet_id).with_for_update()
-                p = q.one()
-            except NoResultFound:
-                # INSERT
-                session.add(r)
+        Args:
+            screen_name (str | None): 対象の screen_name, None ならすべて
+            session (Session | None): 指定時はその session 上で実行し、commit しない
+        """
+        with self._session_scope(session) as session:
+            if screen_name is None:
+                session.execute(text("DELETE FROM DailyActivity;"))
+                session.execute(text(DailyActivity.AGGREGATE_INSERT_SQL.format(where="")))
             else:
-                # UPDATE
-                # idと日付関係以外を更新する
-                p.tweet_id = r.tweet_id
-                p.tweet_text = r.tweet_text
-                p.tweet_via = r.tweet_via
-                p.tweet_url = r.tweet_url
-                p.user_id = r.user_id
-                p.user_name = r.user_name
-                p.screen_name = r.screen_name
-                p.is_retweet = r.is_retweet
-                p.retweet_tweet_id = r.retweet_tweet_id
-                p.is_quote = r.is_quote
-                p.quote_tweet_id = r.quote_tweet_id
-                p.has_media = r.has_media
-                p.has_external_link = r.has_external_link
-                # p.created_at = r.created_at
-                # p.appeared_at = r.appeared_at
-                # p.registered_at = r.registered_at
-
-        session.commit()
-        session.close()
+                params = {"screen_name": screen_name}
+                where = "WHERE screen_name = :screen_name"
+                session.execute(text("DELETE FROM DailyActivity WHERE screen_name = :screen_name;"), params)
+                session.execute(text(DailyActivity.AGGREGATE_INSERT_SQL.format(where=where)), params)
+
+    def bulk_upsert(self, record: list[dict], session: Session | None = None) -> UpsertCount:
+        """INSERT ... ON CONFLICT(tweet_id) DO UPDATE でまとめて upsert する
+
+        既存レコードはidと日付関係以外を更新する
+        同じトランザクション内で、upsert したツイートが含まれる日の DailyActivity も再集計する
+
+        Args:
+            record (list[dict]): レコード辞書のリスト
+            session (Session | None): 指定時はその session のトランザクションに参加し、commit しない
+
+        Raises:
+            ValueError: record が list[dict] でない, またはレコードとして解釈できない場合
+
+        Returns:
+            UpsertCount: INSERT, UPDATE それぞれの件数
+        """
+        with self._session_scope(session) as session:
+            upsert_count = self._bulk_upsert(Tweet, record, "tweet_id", session)
+            self.refresh_daily_activity([r["tweet_id"] for r in record], session)
+        return upsert_count
+
+    def upsert(self, record: list[dict], session: Session | None = None) -> Result:
+        """upsert
+
+        Args:
+            record (list[dict]): レコード辞書のリスト
+            session (Session | None): 指定時はその session のトランザクションに参加し、commit しない
+
+        Returns:
+            Result: upsert に成功したなら Result.success, そうでないなら Result.failed
+        """
+        try:
+            upsert_count = self.bulk_upsert(record, session)
+        except ValueError:
+            return Result.failed
+        logger.info(f"Tweet upsert: inserted {upsert_count.inserted}, updated {upsert_count.updated}.")
         return Result.success
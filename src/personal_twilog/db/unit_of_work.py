@@ -0,0 +1,57 @@
+from logging import INFO, getLogger
+from types import TracebackType
+
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+class UnitOfWork:
+    """複数テーブルへの書き込みを1トランザクションにまとめる
+
+    with ブロック内で返される session を各DBクラスの upsert に渡すと、
+    ブロックを正常に抜けたときに1回だけ commit する
+    ブロック内で例外が送出された場合はすべて rollback する
+
+    Examples:
+        with UnitOfWork(tweet_db.engine) as session:
+            tweet_db.upsert(tweet_dict_list, session)
+            media_db.upsert(media_dict_list, session)
+    """
+
+    def __init__(self, engine: Engine) -> None:
+        self.engine = engine
+        self.Session = sessionmaker(bind=self.engine, autoflush=False)
+        self.session: Session | None = None
+
+    def __enter__(self) -> Session:
+        if self.session is not None:
+            raise ValueError("UnitOfWork is already started.")
+        self.session = self.Session()
+        return self.session
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        session, self.session = self.session, None
+        try:
+            if exc_type is None:
+                session.commit()
+            else:
+                logger.info("UnitOfWork rollback.")
+                session.rollback()
+        finally:
+            session.close()
+
+
+if __name__ == "__main__":
+    from personal_twilog.db.tweet_db import TweetDB
+
+    tweet_db = TweetDB()
+    with UnitOfWork(tweet_db.engine) as session:
+        print(tweet_db.upsert([], session))
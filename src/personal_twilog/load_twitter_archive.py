@@ -1,19 +1,125 @@
+import json
+import multiprocessing
+import os
 import re
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from itertools import islice
 from pathlib import Path
-from typing import Self
+from typing import Any, Self
 
 import orjson
-from sqlalchemy import Column, Integer, String, create_engine, text
+from sqlalchemy import Column, Engine, Index, Integer, MetaData, String, create_engine, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import declarative_base, sessionmaker
 from tqdm import tqdm
 
-from personal_twilog.util import Result, find_values
+from personal_twilog.db.model import Base as ModelBase
+from personal_twilog.db.model import DailyActivity, Tweet
+from personal_twilog.db.tweet_db import TweetDB
+from personal_twilog.util import Result
 
 Base = declarative_base()
 date_str = datetime.now().strftime("%Y%m%d")
 table_name = f"TweetArchive_{date_str}"
 
+VIA_PATTERN = re.compile(r"<[^>]+>(.*?)<\/[^<]+>")
+RETWEET_PATTERN = re.compile(r"^RT @(.*)")
+TWEET_URL_PATTERN = re.compile(r"^https://twitter.com/(.*)/status/(\d*)$")
+
+# アーカイブの所有者
+ARCHIVE_USER_ID = "175674367"
+ARCHIVE_USER_NAME = "shift@ヽ(・ω・)ノ"
+ARCHIVE_SCREEN_NAME = "_shift4869"
+
+# ストリーミングモードでアーカイブを読み込む単位（文字数）
+ARCHIVE_CHUNK_SIZE = 1024 * 1024
+# ストリーミングモードで1回の executemany に渡すレコード数
+INSERT_BATCH_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class ArchivedTweetFields:
+    """アーカイブのエントリから ArchivedTweet の作成に必要な値を取り出したもの
+
+    extract でエントリを1回だけ走査して、すべての値をまとめて収集する
+    各値は find_values で個別に探索した場合と同じ順序, 同じ条件で収集する
+    """
+
+    tweet_id: str
+    tweet_text: str
+    source: str
+    created_at_str: str
+    source_status_ids: tuple  # 出現順の source_status_id_str
+    expanded_urls: tuple  # 出現順の expanded_url
+    has_media: bool  # media キーがどこかに存在するか
+    has_external_link: bool  # entities 配下に expanded_url キーが存在するか
+
+    @staticmethod
+    def _get_top_level_value(target_dict: dict, key: str) -> Any:
+        if not isinstance(target_dict, dict) or key not in target_dict:
+            raise ValueError(f"Value of key='{key}' is not found.")
+        return target_dict[key]
+
+    @classmethod
+    def extract(cls, entry: dict) -> Self:
+        """アーカイブのエントリから値を取り出す
+
+        Args:
+            entry (dict): アーカイブのエントリ
+
+        Raises:
+            ValueError: entry 直下に tweet が無い, または tweet 直下に必須のキーが無い
+
+        Returns:
+            Self: 取り出した値
+        """
+        tweet_dict = cls._get_top_level_value(entry, "tweet")
+        tweet_id = cls._get_top_level_value(tweet_dict, "id_str")
+        tweet_text = cls._get_top_level_value(tweet_dict, "full_text")
+        source = cls._get_top_level_value(tweet_dict, "source")
+        created_at_str = cls._get_top_level_value(tweet_dict, "created_at")
+
+        source_status_ids = []
+        expanded_urls = []
+        has_media = False
+        has_external_link = False
+
+        # (子要素の (キー, 値) のイテレータ, entities 配下か) のスタックで深さ優先に走査する
+        stack: list[tuple[Iterator[tuple[Any, Any]], bool]] = [(iter(tweet_dict.items()), False)]
+        while stack:
+            pair_iter, is_in_entities = stack[-1]
+            pair = next(pair_iter, None)
+            if pair is None:
+                stack.pop()
+                continue
+            k, v = pair
+            if k == "source_status_id_str":
+                source_status_ids.append(v)
+            elif k == "expanded_url":
+                expanded_urls.append(v)
+                has_external_link = has_external_link or is_in_entities
+            elif k == "media":
+                has_media = True
+            if isinstance(v, dict):
+                stack.append((iter(v.items()), is_in_entities or k == "entities"))
+            elif isinstance(v, list):
+                stack.append((((None, e) for e in v), is_in_entities or k == "entities"))
+
+        return cls(
+            tweet_id,
+            tweet_text,
+            source,
+            created_at_str,
+            tuple(source_status_ids),
+            tuple(expanded_urls),
+            has_media,
+            has_external_link,
+        )
+
 
 class ArchivedTweet(Base):
     __tablename__ = table_name
@@ -72,53 +178,60 @@ class ArchivedTweet(Base):
         self.appeared_at = appeared_at
         self.registered_at = registered_at
 
+    @classmethod
+    def column_names(cls) -> tuple[str, ...]:
+        """id を除いたカラム名, to_row の返り値の順序と対応する"""
+        return tuple(column.name for column in cls.__table__.columns if column.name != "id")
+
     @classmethod
     def create(cls, entry: dict) -> Self:
-        tweet_dict = find_values(entry, "tweet", True, [""], [])
-        tweet_id = find_values(tweet_dict, "id_str", True, [""], [])
-        tweet_text = find_values(tweet_dict, "full_text", True, [""], [])
+        return cls(*cls.to_row(entry))
+
+    @classmethod
+    def to_row(cls, entry: dict) -> tuple:
+        """アーカイブのエントリをレコードの値のタプルに変換する
+
+        Args:
+            entry (dict): アーカイブのエントリ
 
-        source = find_values(tweet_dict, "source", True, [""], [])
-        tweet_via = re.findall(r"<[^>]+>(.*?)<\/[^<]+>", source)[0]
+        Returns:
+            tuple: column_names() の順に並んだ値のタプル
+        """
+        fields = ArchivedTweetFields.extract(entry)
+        tweet_id = fields.tweet_id
+        tweet_text = fields.tweet_text
+        tweet_via = VIA_PATTERN.findall(fields.source)[0]
 
-        user_id = "175674367"
-        user_name = "shift@ヽ(・ω・)ノ"
-        screen_name = "_shift4869"
+        user_id = ARCHIVE_USER_ID
+        user_name = ARCHIVE_USER_NAME
+        screen_name = ARCHIVE_SCREEN_NAME
 
         tweet_url = f"https://twitter.com/{screen_name}/status/{tweet_id}"
 
         src_format = "%a %b %d %H:%M:%S %z %Y"
-        created_at_str = find_values(tweet_dict, "created_at", True, [""], [])
-        gmt = datetime.strptime(created_at_str, src_format)
+        gmt = datetime.strptime(fields.created_at_str, src_format)
         jst = gmt + timedelta(hours=9)
         created_at = jst.isoformat().replace("+00:00", "")
         appeared_at = created_at
         registered_at = datetime.now().isoformat()[:-7]
 
         # RT の構造解析は厳密には行わない
-        is_retweet = re.findall(r"^RT @(.*)", tweet_text) != []
-        source_status_ids = find_values(tweet_dict, "source_status_id_str", False, [], [])
+        is_retweet = RETWEET_PATTERN.match(tweet_text) is not None
+        source_status_ids = fields.source_status_ids
         retweet_tweet_id = source_status_ids[0] if len(source_status_ids) > 0 and is_retweet else ""
 
-        expanded_urls = find_values(tweet_dict, "expanded_url", False, [], [])
-        contain_twitter_url_flag = [
-            (re.findall(r"^https://twitter.com/(.*)/status/(\d*)$", url) != []) for url in expanded_urls
-        ]
-        is_quote = any(contain_twitter_url_flag)
+        # 最後に現れたツイートURLを引用先とする
+        is_quote = False
         quote_tweet_id = ""
-        if is_quote:
-            for url in expanded_urls:
-                if m := re.findall(r"^https://twitter.com/(.*)/status/(\d*)$", url):
-                    quote_tweet_id = m[0][1]
+        for url in fields.expanded_urls:
+            if m := TWEET_URL_PATTERN.match(url):
+                is_quote = True
+                quote_tweet_id = m.group(2)
 
-        media = find_values(tweet_dict, "media", False, [], [])
-        has_media = media != []
+        has_media = fields.has_media
+        has_external_link = fields.has_external_link
 
-        entities = find_values(tweet_dict, "entities", False, [], [])
-        external_link = find_values(entities, "expanded_url", False, [], [])
-        has_external_link = external_link != []
-
-        return ArchivedTweet(
+        return (
             tweet_id,
             tweet_text,
             tweet_via,
@@ -138,12 +251,335 @@ class ArchivedTweet(Base):
         )
 
 
-def main(input_base_path: Path, output_db_path: Path) -> Result:
+# インクリメンタルモードの取り込み先テーブル, 日付によらず同じテーブルに追記する
+incremental_table_name = "TweetArchive"
+incremental_table = ArchivedTweet.__table__.to_metadata(MetaData(), name=incremental_table_name)
+Index(f"ix_{incremental_table_name}_tweet_id", incremental_table.c.tweet_id, unique=True)
+
+
+class ArchiveImportState(Base):
+    """インクリメンタルモードの取り込み状態
+    [screen_name] TEXT NOT NULL, アーカイブの所有者
+    [target_table_name] TEXT NOT NULL, 取り込み先テーブル名
+    [max_tweet_id] INTEGER, 取り込み済の最大の tweet_id
+    [max_created_at] TEXT, 取り込み済の最大の created_at
+    [updated_at] TEXT NOT NULL,
+    PRIMARY KEY([screen_name], [target_table_name])
+    """
+
+    __tablename__ = "ArchiveImportState"
+
+    screen_name = Column(String, primary_key=True)
+    target_table_name = Column(String, primary_key=True)
+    max_tweet_id = Column(Integer)
+    max_created_at = Column(String)
+    updated_at = Column(String, nullable=False)
+
+
+def iter_archive_entries(json_path: Path, chunk_size: int = ARCHIVE_CHUNK_SIZE) -> Iterator[dict]:
+    """アーカイブの .js ファイルからエントリを1件ずつ読み出す
+
+    ファイル全体を読み込まずに chunk_size 文字ずつ読み込み、
+    先頭の "window.YTD.tweets.partN = [" を読み飛ばした後、配列の要素を1件ずつデコードする
+    バッファに保持するのは読み込み済で未デコードの部分のみのため、
+    使用メモリはファイルサイズによらず chunk_size とエントリ1件分程度に収まる
+
+    Args:
+        json_path (Path): アーカイブの .js ファイルパス
+        chunk_size (int): 1回に読み込む文字数
+
+    Raises:
+        ValueError: ファイルの内容が配列として解釈できない
+
+    Returns:
+        Iterator[dict]: エントリのイテレータ
+    """
+    decoder = json.JSONDecoder()
+    with json_path.open("r", encoding="utf8") as fin:
+        buffer = ""
+        while (pos := buffer.find("[")) == -1:
+            if not (chunk := fin.read(chunk_size)):
+                raise ValueError(f"'{json_path.name}' is not archive js file.")
+            buffer += chunk
+        pos += 1
+
+        is_eof = False
+        while True:
+            # 要素間の空白と区切りの "," を読み飛ばす
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer):
+                if buffer[pos] == "]":
+                    return
+                try:
+                    entry, pos = decoder.raw_decode(buffer, pos)
+                    yield entry
+                    continue
+                except json.JSONDecodeError:
+                    # 要素が読み込み済の範囲に収まっていない場合は追加で読み込む
+                    if is_eof:
+                        raise
+            if is_eof:
+                raise ValueError(f"'{json_path.name}' is truncated.")
+            chunk = fin.read(chunk_size)
+            is_eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+
+def _make_insert_query(
+    target_table_name: str = table_name,
+    column_names: tuple[str, ...] | None = None,
+    conflict_clause: str = "",
+) -> str:
+    """ArchivedTweet.to_row のタプルを executemany するための INSERT 文
+
+    Args:
+        target_table_name (str): INSERT 先のテーブル名
+        column_names (tuple[str, ...] | None): カラム名, None なら ArchivedTweet.column_names()
+        conflict_clause (str): 末尾に付与する ON CONFLICT 句
+
+    Returns:
+        str: INSERT 文
+    """
+    column_names = column_names or ArchivedTweet.column_names()
+    columns_str = ", ".join(column_names)
+    placeholders_str = ", ".join(["?"] * len(column_names))
+    return f"INSERT INTO {target_table_name} ({columns_str}) VALUES ({placeholders_str}) {conflict_clause}".rstrip()
+
+
+def convert_archive_file(json_path: Path) -> list[tuple]:
+    """アーカイブの .js ファイル1つをレコードのタプルのリストに変換する
+
+    insert_parallel のワーカープロセスで実行するため、モジュールのトップレベルに定義する
+
+    Args:
+        json_path (Path): アーカイブの .js ファイルパス
+
+    Returns:
+        list[tuple]: ArchivedTweet.to_row のタプルのリスト
+    """
+    return [ArchivedTweet.to_row(entry) for entry in iter_archive_entries(json_path)]
+
+
+def insert_streaming(engine: Engine, json_path_list: list[Path], batch_size: int = INSERT_BATCH_SIZE) -> int:
+    """アーカイブをストリーミングで読み込み、バッチ単位で executemany する
+
+    ORM オブジェクトは作らず、エントリを1件ずつレコードのタプルに変換して
+    batch_size 件たまるごとに INSERT する
+    アーカイブ全体を保持しないため、作成順でのソートは行わない（ファイル中の順に INSERT する）
+
+    Args:
+        engine (Engine): 出力先DBのエンジン
+        json_path_list (list[Path]): アーカイブの .js ファイルパスのリスト
+        batch_size (int): 1回の executemany に渡すレコード数
+
+    Returns:
+        int: INSERT したレコード数
+    """
+    insert_query = _make_insert_query()
+    count = 0
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {table_name}"))
+        row_list: list[tuple] = []
+        for json_path in json_path_list:
+            for entry in tqdm(iter_archive_entries(json_path), desc=f"{json_path.name}"):
+                row_list.append(ArchivedTweet.to_row(entry))
+                if len(row_list) >= batch_size:
+                    conn.exec_driver_sql(insert_query, row_list)
+                    count += len(row_list)
+                    row_list = []
+        if row_list:
+            conn.exec_driver_sql(insert_query, row_list)
+            count += len(row_list)
+    return count
+
+
+def _iter_converted_rows(executor: Executor, json_path_list: list[Path], max_in_flight: int) -> Iterator[list[tuple]]:
+    """json_path_list の順に、executor で convert_archive_file した結果を返す
+
+    executor.map はすべてのファイルを一度に投入し、変換結果が呼び出し元の消費を待たずにたまっていくため、
+    投入済で未取得のファイルが max_in_flight 個を超えないように、1個取得するごとに次の1個を投入する
+
+    Args:
+        executor (Executor): 変換を実行する Executor
+        json_path_list (list[Path]): アーカイブの .js ファイルパスのリスト
+        max_in_flight (int): 同時に投入しておくファイル数の上限
+
+    Yields:
+        list[tuple]: .js ファイル1つ分の ArchivedTweet.to_row のタプルのリスト
+    """
+    json_path_iter = iter(json_path_list)
+    pending: deque[Future[list[tuple]]] = deque(
+        executor.submit(convert_archive_file, json_path) for json_path in islice(json_path_iter, max_in_flight)
+    )
+    while pending:
+        row_list = pending.popleft().result()
+        next_json_path = next(json_path_iter, None)
+        if next_json_path is not None:
+            pending.append(executor.submit(convert_archive_file, next_json_path))
+        yield row_list
+
+
+def insert_parallel(
+    engine: Engine,
+    json_path_list: list[Path],
+    max_workers: int | None = None,
+    batch_size: int = INSERT_BATCH_SIZE,
+) -> int:
+    """アーカイブの .js ファイルごとにワーカープロセスで変換し、メインプロセスで INSERT する
+
+    デコードと ArchivedTweet.to_row への変換は .js ファイル単位でワーカープロセスに分散する
+    SQLite への書き込みはメインプロセスのみが行い、変換が終わったファイルから
+    json_path_list の順に batch_size 件ずつ executemany する
+    同時にメモリに載るのは、INSERT 中のファイル1個と、変換中または INSERT 待ちのファイル最大 max_workers 個分の
+    レコードとなる
+
+    Args:
+        engine (Engine): 出力先DBのエンジン
+        json_path_list (list[Path]): アーカイブの .js ファイルパスのリスト
+        max_workers (int | None): ワーカープロセス数, None ならCPUのコア数
+        batch_size (int): 1回の executemany に渡すレコード数
+
+    Returns:
+        int: INSERT したレコード数
+    """
+    insert_query = _make_insert_query()
+    count = 0
+    max_workers = max_workers or os.cpu_count() or 1
+    # 呼び出し元がマルチスレッドでも安全なように、OSによらず spawn でワーカーを起動する
+    mp_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers, mp_context) as executor, engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {table_name}"))
+        for row_list in tqdm(_iter_converted_rows(executor, json_path_list, max_workers), desc="DB Insert"):
+            for i in range(0, len(row_list), batch_size):
+                conn.exec_driver_sql(insert_query, row_list[i : i + batch_size])
+            count += len(row_list)
+    return count
+
+
+def _get_entry_tweet_id_num(entry: dict) -> int | None:
+    """エントリを変換せずに tweet_id を数値で取り出す, 取り出せない場合は None"""
+    tweet_dict = entry.get("tweet") if isinstance(entry, dict) else None
+    if not isinstance(tweet_dict, dict):
+        return None
+    return Tweet.to_tweet_id_num(tweet_dict.get("id_str", ""))
+
+
+def insert_incremental(
+    engine: Engine,
+    json_path_list: list[Path],
+    is_merge: bool = False,
+    batch_size: int = INSERT_BATCH_SIZE,
+) -> int:
+    """前回までに取り込んだ分を除いて、アーカイブを追記する
+
+    取り込み先ごとに取り込み済の最大の tweet_id と created_at を ArchiveImportState に記録し、
+    次回以降は tweet_id がそれ以下のエントリを変換せずに読み飛ばす
+    既に同じ tweet_id のレコードがある場合は上書きしない（ON CONFLICT DO NOTHING）
+    アーカイブはストリーミングで読み込むため、読み込み自体はアーカイブ全体が対象となるが、
+    変換と書き込みは前回からの差分のみとなる
+
+    Args:
+        engine (Engine): 出力先DBのエンジン
+        json_path_list (list[Path]): アーカイブの .js ファイルパスのリスト
+        is_merge (bool): True なら incremental_table ではなく Tweet テーブルに直接取り込む
+                         取り込んだツイートが含まれる日の DailyActivity も再集計する
+        batch_size (int): 1回の executemany に渡すレコード数
+
+    Returns:
+        int: INSERT したレコード数
+    """
+    if is_merge:
+        target_table = Tweet.__table__
+        ModelBase.metadata.create_all(engine, tables=[target_table, DailyActivity.__table__])
+        column_names = ArchivedTweet.column_names() + ("tweet_id_num",)
+    else:
+        target_table = incremental_table
+        target_table.create(engine, checkfirst=True)
+        column_names = ArchivedTweet.column_names()
+    Base.metadata.create_all(engine, tables=[ArchiveImportState.__table__])
+    insert_query = _make_insert_query(target_table.name, column_names, "ON CONFLICT(tweet_id) DO NOTHING")
+    created_at_index = column_names.index("created_at")
+    appeared_at_index = column_names.index("appeared_at")
+
+    state_table = ArchiveImportState.__table__
+    state_key = {"screen_name": ARCHIVE_SCREEN_NAME, "target_table_name": target_table.name}
+    count = 0
+    with engine.begin() as conn:
+        state = conn.execute(
+            select(state_table).where(
+                state_table.c.screen_name == state_key["screen_name"],
+                state_table.c.target_table_name == state_key["target_table_name"],
+            )
+        ).one_or_none()
+        prev_max_tweet_id = state.max_tweet_id if state and state.max_tweet_id is not None else -1
+        max_tweet_id = prev_max_tweet_id
+        max_created_at = state.max_created_at if state and state.max_created_at is not None else ""
+
+        day_key_set: set[tuple[str, str]] = set()
+
+        def flush(row_list: list[tuple]) -> int:
+            if not row_list:
+                return 0
+            inserted = conn.exec_driver_sql(insert_query, row_list).rowcount
+            if is_merge and inserted > 0:
+                day_key_set.update((ARCHIVE_SCREEN_NAME, row[appeared_at_index][:10]) for row in row_list)
+            return inserted
+
+        row_list: list[tuple] = []
+        for json_path in json_path_list:
+            for entry in tqdm(iter_archive_entries(json_path), desc=f"{json_path.name}"):
+                tweet_id_num = _get_entry_tweet_id_num(entry)
+                if tweet_id_num is not None and tweet_id_num <= prev_max_tweet_id:
+                    continue
+                row = ArchivedTweet.to_row(entry)
+                if is_merge:
+                    row = row + (tweet_id_num,)
+                row_list.append(row)
+                if tweet_id_num is not None:
+                    max_tweet_id = max(max_tweet_id, tweet_id_num)
+                max_created_at = max(max_created_at, row[created_at_index])
+                if len(row_list) >= batch_size:
+                    count += flush(row_list)
+                    row_list = []
+        count += flush(row_list)
+
+        if is_merge and count > 0:
+            # Tweet に追加した分を、追加したツイートが含まれる日の集計にのみ反映する
+            TweetDB.refresh_daily_activity_for_days(day_key_set, conn)
+
+        if max_tweet_id != prev_max_tweet_id or state is None:
+            values = {
+                "max_tweet_id": max_tweet_id if max_tweet_id >= 0 else None,
+                "max_created_at": max_created_at or None,
+                "updated_at": datetime.now().isoformat()[:-7],
+            }
+            stmt = sqlite_insert(state_table).values(**state_key, **values)
+            conn.execute(stmt.on_conflict_do_update(index_elements=list(state_key.keys()), set_=values))
+    return count
+
+
+def main(
+    input_base_path: Path,
+    output_db_path: Path,
+    is_streaming: bool = False,
+    is_parallel: bool = False,
+    is_incremental: bool = False,
+    is_merge: bool = False,
+) -> Result:
     """PersonalTwilog 用にアーカイブからロードする
 
     Args:
         input_base_path (Path): 入力アーカイブのベースパス
         output_db_path (Path): 結果反映先のDBパス
+        is_streaming (bool): True ならアーカイブ全体をメモリに展開せずに、
+                             ストリーミングで読み込んでバッチ単位で INSERT する
+        is_parallel (bool): True なら .js ファイルごとにワーカープロセスで変換して INSERT する
+                            is_streaming より優先する
+        is_incremental (bool): True なら日付ごとのテーブルを作り直さずに、前回までに取り込んだ分を除いて追記する
+                               is_streaming, is_parallel より優先する
+        is_merge (bool): is_incremental が True のとき、TweetArchive ではなく Tweet テーブルに直接取り込む
     """
     # 入力チェック
     if not isinstance(input_base_path, Path) or not isinstance(output_db_path, Path):
@@ -153,9 +589,36 @@ def main(input_base_path: Path, output_db_path: Path) -> Result:
     if not output_db_path.is_file():
         return Result.failed
 
+    # 対象jsonファイルパス収集
+    json_dir = input_base_path / "data"
+    if not json_dir.is_dir():
+        json_dir = input_base_path / input_base_path.name / "data"
+        if not json_dir.is_dir():
+            return Result.failed
+    json_path_list = [json_dir / "tweets.js"]
+    json_path_list.extend(json_dir.glob("tweets-part*"))
+    if not all([path.is_file() for path in json_path_list]):
+        return Result.failed
+
     # DB生成
     engine = create_engine(f"sqlite:///{output_db_path}")
-    Base.metadata.create_all(engine)
+
+    if is_incremental:
+        count = insert_incremental(engine, json_path_list, is_merge)
+        print(f"DB insert done: {count} records.")
+        return Result.success
+
+    Base.metadata.create_all(engine, tables=[ArchivedTweet.__table__])
+
+    if is_parallel:
+        count = insert_parallel(engine, json_path_list)
+        print(f"DB insert done: {count} records.")
+        return Result.success
+
+    if is_streaming:
+        count = insert_streaming(engine, json_path_list)
+        print(f"DB insert done: {count} records.")
+        return Result.success
 
     # セッション生成
     Session = sessionmaker(bind=engine)
@@ -166,17 +629,6 @@ def main(input_base_path: Path, output_db_path: Path) -> Result:
     session.execute(text(truncate_query))
     session.commit()
 
-    # 対象jsonファイルパス収集
-    json_dir = input_base_path / "data"
-    if not json_dir.is_dir():
-        json_dir = input_base_path / input_base_path.name / "data"
-        if not json_dir.is_dir():
-            return Result.failed
-    json_path_list = [json_dir / "tweets.js"]
-    json_path_list.extend(json_dir.glob("tweets-part*"))
-    if not all([path.is_file() for path in json_path_list]):
-        return Result.failed
-
     # 対象jsonファイル読み込み
     tweet_list: list[ArchivedTweet] = []
     for i, json_path in enumerate(json_path_list):
@@ -4,13 +4,19 @@ from pathlib import Path
 
 import orjson
 
+from personal_twilog.parser.media_size_fetcher import MediaSizeFetcher
 from personal_twilog.parser.parser_base import ParserBase
 from personal_twilog.util import find_values
 
 
 class MediaParser(ParserBase):
-    def __init__(self, tweet_dict_list: list[dict], registered_at: str) -> None:
+    def __init__(
+        self, tweet_dict_list: list[dict], registered_at: str, media_size_fetcher: MediaSizeFetcher | None = None
+    ) -> None:
         super().__init__(tweet_dict_list, registered_at)
+        if media_size_fetcher is not None and not isinstance(media_size_fetcher, MediaSizeFetcher):
+            raise TypeError("Argument media_size_fetcher is not MediaSizeFetcher.")
+        self.media_size_fetcher = media_size_fetcher or MediaSizeFetcher()
 
     def parse(self) -> list[dict]:
         """flattened_tweet_list を解釈して DB の Media テーブルに投入するための list[dict] を返す"""
@@ -55,7 +61,8 @@ class MediaParser(ParserBase):
                 media_url = media_info["media_url"]
                 media_thumbnail_url = media_info["media_thumbnail_url"]
                 media_type = media_info["media_type"]
-                media_size = self._get_media_size(media_url)
+                # ファイルサイズは全メディア分をまとめて並列取得する
+                media_size = -1
 
                 media_dict = {
                     "tweet_id": tweet_id,
@@ -74,6 +81,9 @@ class MediaParser(ParserBase):
                 media_dict_list.append(media_dict)
 
         media_dict_list = self._remove_duplicates(media_dict_list)
+        media_size_dict = self.media_size_fetcher.fetch([d["media_url"] for d in media_dict_list])
+        for media_dict in media_dict_list:
+            media_dict["media_size"] = media_size_dict[media_dict["media_url"]]
         media_dict_list.reverse()
         return media_dict_list
 
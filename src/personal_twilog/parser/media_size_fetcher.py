@@ -0,0 +1,143 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from logging import INFO, getLogger
+from pathlib import Path
+
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+class MediaSizeFetcher:
+    """メディアのファイルサイズを HEAD リクエストで取得する
+
+    接続はスレッド間で共有するセッションのコネクションプールを使い、
+    max_workers 件まで並列にリクエストする
+    取得に成功したサイズは media_url をキーとしてキャッシュファイルに保存し、
+    一度取得した media_url には二度とリクエストしない
+    取得に失敗した場合は -1 とし、キャッシュには保存しない（次回再取得する）
+    キャッシュの更新と保存はロックで直列化し、複数スレッドから fetch を呼び出せる
+
+    Attributes:
+        DEFAULT_CACHE_FILE_PATH (str): キャッシュファイルパスの既定値
+    """
+
+    DEFAULT_CACHE_FILE_PATH = "./cache/media_size.json"
+
+    def __init__(
+        self,
+        cache_file_path: str | Path = DEFAULT_CACHE_FILE_PATH,
+        max_workers: int = 8,
+        timeout: float = 10.0,
+    ) -> None:
+        if max_workers < 1:
+            raise ValueError("Argument max_workers must be positive.")
+        self.cache_file_path = Path(cache_file_path)
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+        self.session: requests.Session | None = self._create_session()
+
+        self.cache: dict[str, int] = self._load_cache()
+        self._cache_lock = threading.Lock()
+
+    def _create_session(self) -> requests.Session | None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _load_cache(self) -> dict[str, int]:
+        if not self.cache_file_path.is_file():
+            return {}
+        try:
+            return orjson.loads(self.cache_file_path.read_bytes())
+        except orjson.JSONDecodeError:
+            logger.warning(f"Media size cache '{self.cache_file_path}' is broken -> ignore")
+            return {}
+
+    def _save_cache(self) -> None:
+        self.cache_file_path.parent.mkdir(parents=True, exist_ok=True)
+        self.cache_file_path.write_bytes(orjson.dumps(self.cache))
+
+    def _fetch(self, media_url: str) -> int:
+        file_size = -1
+        try:
+            # HEADリクエストを送信してレスポンスヘッダーを取得
+            response = self.session.head(media_url, timeout=self.timeout)
+            response.raise_for_status()
+            # Content-Lengthフィールドからファイルサイズを取得
+            file_size = int(response.headers.get("Content-Length", 0))
+        except Exception:
+            file_size = -1
+        return file_size
+
+    def fetch(self, media_url_list: list[str]) -> dict[str, int]:
+        """media_url_list の各メディアのファイルサイズを取得する
+
+        Args:
+            media_url_list (list[str]): メディアURLのリスト, 重複可
+
+        Returns:
+            dict[str, int]: media_url をキー, ファイルサイズを値とする辞書, 取得失敗時の値は -1
+        """
+        if not isinstance(media_url_list, list):
+            raise TypeError("Argument media_url_list is not list.")
+
+        unique_url_list = list(dict.fromkeys(media_url_list))
+        target_url_list = [url for url in unique_url_list if url not in self.cache]
+        fetched_dict: dict[str, int] = {}
+        if target_url_list:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(target_url_list))) as executor:
+                fetched_dict = dict(zip(target_url_list, executor.map(self._fetch, target_url_list)))
+
+            success_dict = {url: size for url, size in fetched_dict.items() if size >= 0}
+            if success_dict:
+                with self._cache_lock:
+                    self.cache.update(success_dict)
+                    self._save_cache()
+            logger.info(
+                f"Media size fetched: {len(success_dict)} success, "
+                f"{len(fetched_dict) - len(success_dict)} failed, "
+                f"{len(unique_url_list) - len(target_url_list)} cached."
+            )
+        return {url: self.cache.get(url, fetched_dict.get(url, -1)) for url in media_url_list}
+
+    def get(self, media_url: str) -> int:
+        """media_url のメディアのファイルサイズを取得する, 取得失敗時は -1"""
+        return self.fetch([media_url])[media_url]
+
+
+class CacheOnlyMediaSizeFetcher(MediaSizeFetcher):
+    """キャッシュファイルのみを参照し、HEAD リクエストを行わない MediaSizeFetcher
+
+    キャッシュに無い media_url のファイルサイズは取得失敗と同じく -1 とする
+    キャッシュファイルは読み込むのみで書き込まない
+    記録済のレスポンスを再生する replay バックエンドで、ネットワークに接続せずにパースするために使う
+    """
+
+    def _create_session(self) -> None:
+        return None
+
+    def fetch(self, media_url_list: list[str]) -> dict[str, int]:
+        """media_url_list の各メディアのファイルサイズをキャッシュから取得する
+
+        Args:
+            media_url_list (list[str]): メディアURLのリスト, 重複可
+
+        Returns:
+            dict[str, int]: media_url をキー, ファイルサイズを値とする辞書, キャッシュに無い場合の値は -1
+        """
+        if not isinstance(media_url_list, list):
+            raise TypeError("Argument media_url_list is not list.")
+        return {url: self.cache.get(url, -1) for url in media_url_list}
+
+
+if __name__ == "__main__":
+    fetcher = MediaSizeFetcher()
+    url = "https://pbs.twimg.com/media/example.jpg:orig"
+    print(fetcher.fetch([url]))
@@ -1,4 +1,3 @@
-from copy import deepcopy
 from datetime import datetime
 from pathlib import Path
 
@@ -17,9 +16,9 @@ class MetricParser(ParserBase):
         flattened_tweet_list = self._flatten(self.tweet_dict_list)
 
         metric_dict = {}
-        flattened_tweet_list_r = deepcopy(flattened_tweet_list)
-        flattened_tweet_list_r.reverse()
-        for tweet in flattened_tweet_list_r:
+        # 最新の値を得るため末尾から探す
+        # flattened_tweet_list は他のパーサと共有している場合があるため、コピーも並べ替えもせずに逆順に読む
+        for tweet in reversed(flattened_tweet_list):
             user_dict: dict = tweet.get("core", {}).get("user_results", {}).get("result", {})
             if not user_dict:
                 continue
@@ -3,17 +3,26 @@ import sys
 import urllib.parse
 from abc import abstractmethod
 from datetime import datetime, timedelta
+from functools import lru_cache
 from logging import INFO, getLogger
 from pathlib import Path
 
-import requests
-
-from personal_twilog.util import find_values
+from personal_twilog.util import find_values, remove_duplicates
 
 logger = getLogger(__name__)
 logger.setLevel(INFO)
 
 
+class FlattenedTweetList(list):
+    """ParserBase._flatten 済の tweet 辞書のリスト
+
+    各パーサはこれを tweet_dict_list として受け取った場合、_flatten で再度の平滑化を行わずにそのまま使う
+    1回のクロールで複数のパーサを使う場合に、flatten を1回で済ませるための中間表現
+    """
+
+    pass
+
+
 class ParserBase:
     tweet_dict_list: list[dict]
     registered_at: str
@@ -33,24 +42,37 @@ class ParserBase:
     def result(self) -> list[dict]:
         return self.tweet_dict_list
 
-    def _remove_duplicates(self, dict_list: list[dict]) -> list[dict]:
+    @staticmethod
+    def flatten(tweet_dict_list: list[dict]) -> FlattenedTweetList:
+        """tweet_dict_list を平滑化して、各パーサで共有できる FlattenedTweetList を返す
+
+        Args:
+            tweet_dict_list (list[dict]): 各パーサの tweet_dict_list に渡すものと同じリスト
+
+        Returns:
+            FlattenedTweetList: 平滑化済の tweet 辞書のリスト
+        """
+        return ParserBase(tweet_dict_list, "")._flatten(tweet_dict_list)
+
+    def _remove_duplicates(self, dict_list: list[dict], key_tuple: tuple[str, ...] = ("tweet_id",)) -> list[dict]:
+        """dict_list から key_tuple の値の組が重複している要素を排除する（順序は保つ）
+
+        Args:
+            dict_list (list[dict]): 対象辞書リスト
+            key_tuple (tuple[str, ...]): 重複判定に使うキーの組, 既定は ("tweet_id",)
+
+        Raises:
+            TypeError: dict_list が list[dict] でない場合
+            ValueError: key_tuple の各キーを持たない要素がある場合
+
+        Returns:
+            list[dict]: 重複を排除した辞書リスト
+        """
         if not isinstance(dict_list, list):
             raise TypeError("Argument dict_list is not list.")
-        if not all([isinstance(d, dict) for d in dict_list]):
+        if not all(isinstance(d, dict) for d in dict_list):
             raise TypeError("Argument dict_list is not list[dict].")
-
-        dup_target_key = "tweet_id"
-        key_check = [d.get(dup_target_key, "") != "" for d in dict_list]
-        if not all(key_check):
-            raise ValueError(f"Argument dict_list include element that not has '{dup_target_key}' key.")
-
-        seen = []
-        dict_list = [
-            d
-            for d in dict_list
-            if (tweet_id := d.get(dup_target_key, "")) != "" and (tweet_id not in seen) and (not seen.append(tweet_id))
-        ]
-        return dict_list
+        return remove_duplicates(dict_list, key_tuple)
 
     def _get_external_link_type(self, external_link_url: str) -> str:
         if not isinstance(external_link_url, str):
@@ -147,18 +169,6 @@ class ParserBase:
                 return result
         return {}
 
-    def _get_media_size(self, media_url: str) -> int:
-        file_size = -1
-        try:
-            # HEADリクエストを送信してレスポンスヘッダーを取得
-            response = requests.head(media_url)
-            response.raise_for_status()
-            # Content-Lengthフィールドからファイルサイズを取得
-            file_size = int(response.headers.get("Content-Length", 0))
-        except Exception as e:
-            file_size = -1
-        return file_size
-
     def _match_rt_quote(self, tweet: dict) -> tuple[dict, dict]:
         """tweet に含まれる RT と QT の tweet 辞書を探索する
 
@@ -232,13 +242,22 @@ class ParserBase:
             case _:
                 raise ValueError("Argument tweet.legacy.created_at is not exist.")
 
+        return self._convert_created_at(created_at_str)
+
+    @staticmethod
+    @lru_cache(maxsize=8192)
+    def _convert_created_at(created_at_str: str) -> str:
+        """API の created_at 文字列を JST の isoformat 文字列に変換する
+
+        同じツイートの created_at は flatten と各パーサで何度も変換されるため、結果をキャッシュする
+        """
         td_format = "%a %b %d %H:%M:%S +0000 %Y"
         created_at_gmt = datetime.strptime(created_at_str, td_format)
         created_at_jst = created_at_gmt + timedelta(hours=9)
         created_at = created_at_jst.isoformat()
         return created_at
 
-    def _flatten(self, tweet_list: list[dict]) -> list[dict]:
+    def _flatten(self, tweet_list: list[dict]) -> FlattenedTweetList:
         """tweet_list を平滑化する
 
             ここでの"平滑化"とは tweet_list に含まれる
@@ -255,9 +274,13 @@ class ParserBase:
                 それぞれの要素のルートは、"result" キーを含む
 
         Returns:
-            list[dict]: 元のツイート, RT先ツイート, QT先ツイート が1階層に格納された tweet 辞書
+            FlattenedTweetList: 元のツイート, RT先ツイート, QT先ツイート が1階層に格納された tweet 辞書
         """
-        edited_tweet_list: list[dict] = []
+        if isinstance(tweet_list, FlattenedTweetList):
+            # 平滑化済
+            return tweet_list
+
+        edited_tweet_list = FlattenedTweetList()
         flattened_tweet_list: list[dict] = []
         for tweet in tweet_list:
             tweet: dict = tweet.get("result", {})
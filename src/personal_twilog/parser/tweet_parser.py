@@ -3,9 +3,8 @@ from datetime import datetime
 from logging import INFO, getLogger
 from pathlib import Path
 
-import orjson
-
 from personal_twilog.parser.parser_base import ParserBase
+from personal_twilog.response_cache import ResponseCache
 from personal_twilog.util import find_value, find_values
 
 logger = getLogger(__name__)
@@ -101,8 +100,9 @@ class TweetParser(ParserBase):
 
 if __name__ == "__main__":
     data_cache_path = Path("./data/")
-    cache_path = data_cache_path / "get_user_tweets.json"
-    tweet_results = orjson.loads(cache_path.read_bytes())
+    # 最後に保存した TwitterAPI.get_user_timeline のレスポンス（1行に1ページ）
+    cache_path = max(data_cache_path.glob(f"get_user_tweets_*{ResponseCache.SUFFIX}"), key=lambda p: p.stat().st_mtime)
+    tweet_results = [r for page in ResponseCache.iter_path(cache_path) for r in find_values(page, "tweet_results")]
 
     tweet_list = []
     for data_dict in tweet_results:
@@ -0,0 +1,162 @@
+import gzip
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from logging import INFO, getLogger
+from pathlib import Path
+from typing import IO, Any
+
+import orjson
+from dateutil.relativedelta import relativedelta
+
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+class ResponseCacheWriter:
+    """ResponseCache.open_writer が返す、レコードを1行ずつ書き込むライタ"""
+
+    def __init__(self, fp: IO[bytes]) -> None:
+        self._fp = fp
+        self.record_num = 0
+
+    def write(self, record: Any) -> None:
+        """record を改行を含まない1行の JSON として書き込む"""
+        self._fp.write(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE))
+        self.record_num += 1
+
+    def write_all(self, record_list: Iterable[Any]) -> None:
+        """record_list の各レコードを順に書き込む"""
+        for record in record_list:
+            self.write(record)
+
+
+class ResponseCache:
+    """取得したレスポンスを gzip 圧縮した JSON Lines で保存, 読み込みするキャッシュ
+
+    ファイルは {base_path}/{name}_{screen_name}_{YYYYmmddHHMMSS}.jsonl.gz の形式で、
+    アカウントと保存日時ごとに分けるため、複数アカウントのクロールで互いに上書きしない
+    1行に1レコードの JSON を書き込みながら圧縮し、読み込み時も1行ずつ展開して返すため、
+    ファイル全体をメモリに載せない
+
+    Attributes:
+        SUFFIX (str): キャッシュファイルの拡張子
+        TIMESTAMP_FORMAT (str): ファイル名に含める保存日時の書式
+        COMPRESS_LEVEL (int): gzip の圧縮レベル, 書き込み速度を優先して最も速い1とする
+    """
+
+    SUFFIX = ".jsonl.gz"
+    TIMESTAMP_FORMAT = "%Y%m%d%H%M%S"
+    COMPRESS_LEVEL = 1
+
+    def __init__(self, name: str, base_path: str | Path = "./cache") -> None:
+        """キャッシュの初期化
+
+        Args:
+            name (str): キャッシュの種類を表すファイル名の接頭辞, "timeline_response" など
+            base_path (str | Path): キャッシュファイルを置くフォルダパス
+        """
+        if not isinstance(name, str) or name == "":
+            raise ValueError("name must be non-empty str.")
+        self.name = name
+        self.base_path = Path(base_path)
+
+    def make_path(self, screen_name: str, saved_at: datetime) -> Path:
+        """screen_name, saved_at のキャッシュファイルパスを作成する"""
+        return self.base_path / f"{self.name}_{screen_name}_{saved_at.strftime(self.TIMESTAMP_FORMAT)}{self.SUFFIX}"
+
+    def _glob(self, screen_name: str) -> list[Path]:
+        """screen_name のキャッシュファイルを保存日時の昇順で返す"""
+        # 前方一致だと screen_name が他のアカウントの接頭辞である場合に混ざるため、日時部分を数字14桁に限定する
+        pattern = f"{self.name}_{screen_name}_{'[0-9]' * 14}{self.SUFFIX}"
+        return sorted(self.base_path.glob(pattern))
+
+    @contextmanager
+    def open_writer(self, screen_name: str, saved_at: datetime | None = None) -> Iterator[ResponseCacheWriter]:
+        """screen_name のキャッシュファイルを作成し、レコードを1行ずつ書き込むライタを返す
+
+        一時ファイルに書き込み、with を抜けた時点で正式なファイル名に置き換える
+        途中で例外が発生した場合は一時ファイルを削除し、書きかけのキャッシュを残さない
+
+        Args:
+            screen_name (str): 対象の screen_name
+            saved_at (datetime | None): ファイル名に含める保存日時, None なら現在日時
+
+        Yields:
+            ResponseCacheWriter: レコードを書き込むライタ
+        """
+        saved_at = saved_at or datetime.now()
+        path = self.make_path(screen_name, saved_at)
+        temp_path = path.with_name(path.name + ".tmp")
+        self.base_path.mkdir(parents=True, exist_ok=True)
+        try:
+            with gzip.open(temp_path, "wb", compresslevel=self.COMPRESS_LEVEL) as fp:
+                yield ResponseCacheWriter(fp)
+            temp_path.replace(path)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+
+    def write(self, screen_name: str, record_list: Iterable[Any], saved_at: datetime | None = None) -> Path:
+        """record_list を screen_name のキャッシュファイルに書き込む
+
+        Args:
+            screen_name (str): 対象の screen_name
+            record_list (Iterable[Any]): 書き込むレコード
+            saved_at (datetime | None): ファイル名に含める保存日時, None なら現在日時
+
+        Returns:
+            Path: 書き込んだキャッシュファイルパス
+        """
+        saved_at = saved_at or datetime.now()
+        with self.open_writer(screen_name, saved_at) as writer:
+            writer.write_all(record_list)
+        return self.make_path(screen_name, saved_at)
+
+    def find_latest(self, screen_name: str) -> Path | None:
+        """screen_name の最新のキャッシュファイルパスを返す, 無ければ None"""
+        path_list = self._glob(screen_name)
+        return path_list[-1] if path_list else None
+
+    @classmethod
+    def iter_path(cls, path: Path) -> Iterator[Any]:
+        """キャッシュファイルを1行ずつ展開してレコードを返す"""
+        with gzip.open(path, "rb") as fp:
+            for line in fp:
+                if line.strip():
+                    yield orjson.loads(line)
+
+    def iter_records(self, screen_name: str) -> Iterator[Any]:
+        """screen_name の最新のキャッシュファイルのレコードを1件ずつ返す, ファイルが無ければ何も返さない"""
+        path = self.find_latest(screen_name)
+        if path is None:
+            logger.info(f"Cache of '{screen_name}' is not found in '{self.base_path}'.")
+            return
+        yield from self.iter_path(path)
+
+    def cutoff(self, cutoff_days: int = 7) -> int:
+        """保存日時が cutoff_days より古いキャッシュファイルを削除する
+
+        Args:
+            cutoff_days (int, optional): 削除対象となる期限
+
+        Returns:
+            int: 削除したファイル数
+        """
+        if not self.base_path.is_dir():
+            return 0
+        cutoff_str = (datetime.now() - relativedelta(days=cutoff_days)).strftime(self.TIMESTAMP_FORMAT)
+        delete_num = 0
+        for path in self.base_path.glob(f"{self.name}_*{self.SUFFIX}"):
+            # ファイル名末尾の保存日時で判定する
+            timestamp = path.name.removesuffix(self.SUFFIX).rsplit("_", 1)[-1]
+            if timestamp.isdigit() and timestamp < cutoff_str:
+                path.unlink(missing_ok=True)
+                delete_num += 1
+        return delete_num
+
+
+if __name__ == "__main__":
+    for path in sorted(Path("./cache").glob(f"*{ResponseCache.SUFFIX}")):
+        record_num = sum(1 for _ in ResponseCache.iter_path(path))
+        print(f"{path.name}: {record_num} records")
@@ -0,0 +1,198 @@
+from bisect import bisect_right
+from collections.abc import Iterator
+from datetime import date, datetime, time, timedelta
+from logging import INFO, getLogger
+
+from sqlalchemy import text
+
+from personal_twilog.db.metric_db import MetricDB
+from personal_twilog.db.tweet_db import TweetDB
+from personal_twilog.stats.timeline_stats import TimelineStats
+from personal_twilog.util import Result
+
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+class MetricBackfill:
+    """Tweet テーブルから過去の日ごとの Metric を作成する
+
+    Tweet を appeared_at の昇順に1回だけ読み、件数, 文字数, 最多ツイート日などを累積しながら
+    各日の終わり時点の統計情報を Metric に記録する（日ごとに集計クエリを発行しない）
+    スナップショットの registered_at はその日の 23:59:59 とするため、再実行すると同じレコードを上書きする
+
+    フォロー数などアカウント側の数値は Tweet からは求められないため、
+    既存の Metric のうち registered_at がスナップショット以前で最も新しいもの（無ければ最も古いもの）の値を使う
+
+    Attributes:
+        STREAM_SQL (str): 集計に必要な列のみを appeared_at の昇順に読む SQL
+        ACCOUNT_SQL (str): 既存の Metric からアカウント側の数値を読む SQL
+        FETCH_SIZE (int): Tweet を読み込む際に1度に取得するレコード数
+    """
+
+    STREAM_SQL = """
+        SELECT
+            date(appeared_at), appeared_at, coalesce(length(tweet_text), 0), instr(tweet_text, '@') > 0
+        FROM Tweet
+        WHERE screen_name = :screen_name AND appeared_at < :until
+        ORDER BY appeared_at;
+    """
+    ACCOUNT_SQL = """
+        SELECT
+            registered_at, status_count, favorite_count, media_count, following_count, followers_count
+        FROM Metric WHERE screen_name = :screen_name
+        ORDER BY registered_at;
+    """
+    FETCH_SIZE = 10000
+
+    def __init__(self, screen_name: str, tweet_db: TweetDB, metric_db: MetricDB) -> None:
+        if not isinstance(screen_name, str):
+            raise ValueError("screen_name must be str.")
+        if not isinstance(tweet_db, TweetDB):
+            raise ValueError("tweet_db must be TweetDB.")
+        if not isinstance(metric_db, MetricDB):
+            raise ValueError("metric_db must be MetricDB.")
+        self.screen_name = screen_name
+        self.tweet_db = tweet_db
+        self.metric_db = metric_db
+
+    def _get_account_list(self) -> tuple[list[str], list[dict]]:
+        """既存の Metric からアカウント側の数値を registered_at の昇順で取得する"""
+        with self.metric_db.engine.connect() as conn:
+            rows = conn.execute(text(self.ACCOUNT_SQL), {"screen_name": self.screen_name}).all()
+        registered_at_list = [row[0] for row in rows]
+        account_list = [
+            {
+                "screen_name": self.screen_name,
+                "status_count": row[1],
+                "favorite_count": row[2],
+                "media_count": row[3],
+                "following_count": row[4],
+                "followers_count": row[5],
+            }
+            for row in rows
+        ]
+        return registered_at_list, account_list
+
+    def _iter_tweet_rows(self, until: str) -> Iterator[tuple[str, str, int, bool]]:
+        """(日付, appeared_at, 文字数, '@' を含むか) を appeared_at の昇順に返す
+
+        日付として解釈できない appeared_at のツイートは DailyActivity と同様に集計しない
+        """
+        params = {"screen_name": self.screen_name, "until": until}
+        with self.tweet_db.engine.connect() as conn:
+            result = conn.execution_options(yield_per=self.FETCH_SIZE).execute(text(self.STREAM_SQL), params)
+            for day, appeared_at, tweet_length, is_communication in result:
+                if day is None:
+                    continue
+                yield day, appeared_at, tweet_length, bool(is_communication)
+
+    def make_snapshots(self, start_day: date | None = None, end_day: date | None = None) -> list[dict]:
+        """start_day から end_day までの各日の終わり時点の Metric レコード辞書を作成する
+
+        統計情報が定義されない日（最初のツイートより前の日, 最初と最後のツイートが1日以内に収まる日）は含まない
+
+        Args:
+            start_day (date | None): 最初の日, None なら最初のツイートの日
+            end_day (date | None): 最後の日, None なら最後のツイートの日
+
+        Returns:
+            list[dict]: Metric のレコード辞書のリスト, registered_at の昇順
+        """
+        registered_at_list, account_list = self._get_account_list()
+        if not account_list:
+            raise ValueError(f"Metric record of '{self.screen_name}' is not found.")
+
+        # 累積値
+        count_all = 0
+        appeared_days = 0
+        tweet_length_sum = 0
+        communication_tweet_num = 0
+        min_appeared_at = ""
+        max_appeared_at = ""
+        max_tweet_num_by_day = 0
+        max_tweet_day_by_day = ""
+        # 集計中の日とその日のツイート数
+        current_day: date | None = None
+        current_day_count = 0
+
+        snapshot_list = []
+
+        def close_day(last_day: date) -> None:
+            """集計中の日を確定し、その日から last_day までのスナップショットを作成する"""
+            nonlocal max_tweet_num_by_day, max_tweet_day_by_day
+            if current_day_count > max_tweet_num_by_day:
+                max_tweet_num_by_day = current_day_count
+                max_tweet_day_by_day = current_day.isoformat()
+            if (datetime.fromisoformat(max_appeared_at) - datetime.fromisoformat(min_appeared_at)).days == 0:
+                return
+
+            day = max(current_day, start_day) if start_day else current_day
+            while day <= last_day:
+                registered_at = datetime.combine(day, time(23, 59, 59)).isoformat()
+                index = max(bisect_right(registered_at_list, registered_at) - 1, 0)
+                metric_parsed_dict = account_list[index] | {"registered_at": registered_at}
+                snapshot_list.append(
+                    TimelineStats.make_stats(
+                        metric_parsed_dict,
+                        min_appeared_at,
+                        max_appeared_at,
+                        count_all,
+                        appeared_days,
+                        count_all / appeared_days,
+                        tweet_length_sum,
+                        communication_tweet_num,
+                        max_tweet_num_by_day,
+                        max_tweet_day_by_day,
+                    )
+                )
+                day += timedelta(days=1)
+
+        until = (end_day + timedelta(days=1)).isoformat() if end_day else "9999-12-31"
+        for day_str, appeared_at, tweet_length, is_communication in self._iter_tweet_rows(until):
+            day = date.fromisoformat(day_str)
+            if day != current_day:
+                if current_day is not None:
+                    close_day(min(day - timedelta(days=1), end_day) if end_day else day - timedelta(days=1))
+                current_day = day
+                current_day_count = 0
+                appeared_days += 1
+            count_all += 1
+            current_day_count += 1
+            tweet_length_sum += tweet_length
+            communication_tweet_num += is_communication
+            if not min_appeared_at:
+                min_appeared_at = appeared_at
+            max_appeared_at = appeared_at
+        if current_day is not None:
+            close_day(end_day or current_day)
+        return snapshot_list
+
+    def run(self, start_day: date | None = None, end_day: date | None = None) -> Result:
+        """start_day から end_day までの各日の Metric を作成して記録する
+
+        Args:
+            start_day (date | None): 最初の日, None なら最初のツイートの日
+            end_day (date | None): 最後の日, None なら最後のツイートの日
+
+        Returns:
+            Result: 記録に成功したなら Result.success, そうでないなら Result.failed
+        """
+        try:
+            snapshot_list = self.make_snapshots(start_day, end_day)
+        except ValueError as e:
+            logger.warning(f"Metric backfill: {e}")
+            return Result.failed
+        result = self.metric_db.upsert(snapshot_list)
+        logger.info(f"Metric backfill: {len(snapshot_list)} records of '{self.screen_name}'.")
+        return result
+
+
+if __name__ == "__main__":
+    target_screen_name = "_shift4869"
+    tweet_db = TweetDB()
+    metric_db = MetricDB()
+
+    metric_backfill = MetricBackfill(target_screen_name, tweet_db, metric_db)
+    result = metric_backfill.run(date(2025, 1, 1), None)
+    print("Done." if result == Result.success else "Abort.")
@@ -1,13 +1,57 @@
 from datetime import datetime, timedelta
 
 from sqlalchemy import text
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 from personal_twilog.db.tweet_db import TweetDB
 
 
 class TimelineStats:
-    def __init__(self, metric_parsed_dict: dict, tweet_db: TweetDB) -> None:
+    """タイムラインの統計情報
+
+    Attributes:
+        DAILY_ACTIVITY_SQL (str): 日ごとの集計を DailyActivity から取得する SQL
+        TWEET_DAILY_SQL (str): 日ごとの集計を Tweet から求める SQL
+        STATS_SQL (str): 日ごとの集計 {daily_sql} から統計情報を求める SQL
+    """
+
+    DAILY_ACTIVITY_SQL = """
+        SELECT
+            day, tweet_count, tweet_length_sum, communication_count, min_appeared_at, max_appeared_at
+        FROM DailyActivity WHERE screen_name = :screen_name
+    """
+    TWEET_DAILY_SQL = """
+        SELECT
+            date(appeared_at) AS day,
+            count(*) AS tweet_count,
+            coalesce(sum(length(tweet_text)), 0) AS tweet_length_sum,
+            count(CASE WHEN instr(tweet_text, '@') > 0 THEN 1 END) AS communication_count,
+            min(appeared_at) AS min_appeared_at,
+            max(appeared_at) AS max_appeared_at
+        FROM Tweet WHERE screen_name = :screen_name
+        GROUP BY day
+        HAVING day IS NOT NULL
+    """
+    # 最多ツイート日は件数の降順, 日付の昇順で順位付けした1位（同数の日が複数ある場合は最も古い日）
+    STATS_SQL = """
+        WITH daily AS ({daily_sql}),
+        ranked AS (
+            SELECT *, row_number() OVER (ORDER BY tweet_count DESC, day) AS day_rank FROM daily
+        )
+        SELECT
+            min(min_appeared_at),
+            max(max_appeared_at),
+            sum(tweet_count),
+            count(*),
+            avg(tweet_count),
+            sum(tweet_length_sum),
+            sum(communication_count),
+            max(CASE WHEN day_rank = 1 THEN tweet_count END),
+            max(CASE WHEN day_rank = 1 THEN day END)
+        FROM ranked;
+    """
+
+    def __init__(self, metric_parsed_dict: dict, tweet_db: TweetDB, session: Session | None = None) -> None:
         match metric_parsed_dict:
             case {
                 "screen_name": screen_name,
@@ -26,75 +70,85 @@ class TimelineStats:
 
         self.metric_parsed_dict = metric_parsed_dict
         self.tweet_db = tweet_db
+        # 指定時は呼び出し元のトランザクション内で集計する（未 commit の upsert 結果も集計対象になる）
+        self.session = session
         self.registered_at = metric_parsed_dict["registered_at"]
         self.screen_name = metric_parsed_dict["screen_name"]
         self.stats = self.get_stats()
 
-    def get_stats(self) -> dict:
-        Session = sessionmaker(bind=self.tweet_db.engine, autoflush=False)
-        session = Session()
+    def get_stats(self, is_from_tweet: bool = False) -> dict:
+        """統計情報を集計する
 
-        min_appeared_at_str: str = session.execute(
-            text(f"SELECT min(appeared_at) FROM Tweet WHERE screen_name = '{self.screen_name}';")
-        ).one()[0]
+        1つのSQL文で日ごとの集計から全体の集計, 最多ツイート日を求める
+        通常は日ごとの集計テーブル DailyActivity を使い、Tweet 全件は走査しない
+
+        Args:
+            is_from_tweet (bool): True なら DailyActivity を使わず Tweet から1回の走査で集計する（検証用）
+
+        Returns:
+            dict: metric_parsed_dict に統計情報を加えた辞書
+        """
+        session = self.session
+        if session is None:
+            Session = sessionmaker(bind=self.tweet_db.engine, autoflush=False)
+            session = Session()
+
+        daily_sql = self.TWEET_DAILY_SQL if is_from_tweet else self.DAILY_ACTIVITY_SQL
+        stats_sql = self.STATS_SQL.format(daily_sql=daily_sql)
+        stats_result = session.execute(text(stats_sql), {"screen_name": self.screen_name}).one()
+
+        if self.session is None:
+            session.close()
+
+        return self.make_stats(self.metric_parsed_dict, *stats_result)
+
+    @classmethod
+    def make_stats(
+        cls,
+        metric_parsed_dict: dict,
+        min_appeared_at_str: str,
+        max_appeared_at_str: str,
+        count_all: int,
+        appeared_days: int,
+        average_tweet_by_day: float,
+        tweet_length_sum: int,
+        communication_tweet_num: int,
+        max_tweet_num_by_day: int,
+        max_tweet_day_by_day: str,
+    ) -> dict:
+        """集計値から統計情報を作成する
+
+        引数の順は STATS_SQL の結果の列順と同じ
+
+        Args:
+            metric_parsed_dict (dict): MetricParser の結果
+            min_appeared_at_str (str): 最初のツイートの appeared_at
+            max_appeared_at_str (str): 最後のツイートの appeared_at
+            count_all (int): ツイート数
+            appeared_days (int): ツイートした日数
+            average_tweet_by_day (float): ツイートした日の1日あたりのツイート数
+            tweet_length_sum (int): ツイートの文字数の合計
+            communication_tweet_num (int): '@' を含むツイート数
+            max_tweet_num_by_day (int): 1日の最多ツイート数
+            max_tweet_day_by_day (str): 最多ツイート日
+
+        Returns:
+            dict: metric_parsed_dict に統計情報を加えた辞書
+        """
         min_appeared_at = datetime.fromisoformat(min_appeared_at_str)
-        max_appeared_at_str: str = session.execute(
-            text(f"SELECT max(appeared_at) FROM Tweet WHERE screen_name = '{self.screen_name}';")
-        ).one()[0]
         max_appeared_at = datetime.fromisoformat(max_appeared_at_str)
         duration_timedelta: timedelta = max_appeared_at - min_appeared_at
         duration_days: int = duration_timedelta.days
 
-        count_all: int = session.execute(
-            text(f"SELECT count(*) FROM Tweet WHERE screen_name = '{self.screen_name}';")
-        ).one()[0]
-
-        days_sql = f"""
-            SELECT 
-                count(appeared_days), avg(appeared_count), max(appeared_count), appeared_days
-            FROM (
-                SELECT
-                    strftime('%Y-%m-%d', appeared_at) AS appeared_days,
-                    count(appeared_at) AS appeared_count
-                FROM Tweet WHERE screen_name = '{self.screen_name}'
-                GROUP BY strftime('%Y-%m-%d', appeared_at)
-            );
-        """
-        select_days_result = session.execute(text(days_sql)).one()
-        appeared_days: int = select_days_result[0]
         non_appeared_days: int = duration_days - appeared_days
-        average_tweet_by_day: float = select_days_result[1]
-        max_tweet_num_by_day: int = select_days_result[2]
-        max_tweet_day_by_day: str = select_days_result[3]
-
-        tweet_length_sum_sql = f"""
-            SELECT 
-                sum(string_length)
-            FROM (
-                SELECT
-                    length(tweet_text) AS string_length
-                FROM Tweet WHERE screen_name = '{self.screen_name}'
-            );
-        """
-        tweet_length_sum: int = session.execute(text(tweet_length_sum_sql)).one()[0]
+
         tweet_length_by_count: float = tweet_length_sum / count_all
         tweet_length_by_day: float = tweet_length_sum / appeared_days
 
-        communication_tweet_num_sql = f"""
-            SELECT
-                count(tweet_text) AS tweet_num
-            FROM Tweet
-            WHERE
-                screen_name = '{self.screen_name}'
-                AND tweet_text LIKE '%@%'
-        """
-        communication_tweet_num: int = session.execute(text(communication_tweet_num_sql)).one()[0]
         communication_ratio: float = round(communication_tweet_num / count_all * 100.0, 2)
 
-        session.close()
-
-        following_count: int = int(self.metric_parsed_dict["following_count"])
-        followers_count: int = int(self.metric_parsed_dict["followers_count"])
+        following_count: int = int(metric_parsed_dict["following_count"])
+        followers_count: int = int(metric_parsed_dict["followers_count"])
         increase_following_by_day: float = following_count / duration_days
         increase_followers_by_day: float = followers_count / duration_days
         ff_ratio: float = followers_count / following_count
@@ -123,7 +177,7 @@ class TimelineStats:
             "available_following": available_following,
             "rest_available_following": rest_available_following,
         }
-        return self.metric_parsed_dict | stats_dict
+        return metric_parsed_dict | stats_dict
 
     def to_dict(self) -> dict:
         return self.stats
@@ -1,6 +1,11 @@
 import logging.config
 import shutil
+import time
 import zipfile
+from collections.abc import Callable, Generator, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import ExitStack, closing
+from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum, auto
 from logging import INFO, getLogger
@@ -8,25 +13,33 @@ from pathlib import Path
 
 import orjson
 from dateutil.relativedelta import relativedelta
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session
 
+from personal_twilog.crawl_pipeline import CrawlPipeline, StageTimings
+from personal_twilog.db.engine_registry import EngineRegistry
 from personal_twilog.db.external_link_db import ExternalLinkDB
 from personal_twilog.db.likes_db import LikesDB
 from personal_twilog.db.media_db import MediaDB
 from personal_twilog.db.metric_db import MetricDB
 from personal_twilog.db.tweet_db import TweetDB
+from personal_twilog.db.unit_of_work import UnitOfWork
 from personal_twilog.memo_writer import MemoWriter
 from personal_twilog.parser.external_link_parser import ExternalLinkParser
 from personal_twilog.parser.likes_parser import LikesParser
 from personal_twilog.parser.media_parser import MediaParser
+from personal_twilog.parser.media_size_fetcher import CacheOnlyMediaSizeFetcher, MediaSizeFetcher
 from personal_twilog.parser.metric_parser import MetricParser
+from personal_twilog.parser.parser_base import FlattenedTweetList, ParserBase
 from personal_twilog.parser.tweet_parser import TweetParser
+from personal_twilog.response_cache import ResponseCache, ResponseCacheWriter
 from personal_twilog.stats.timeline_stats import TimelineStats
 from personal_twilog.util import log_suppress
+from personal_twilog.webapi.replay_twitter_api import ReplayTwitterAPI
 from personal_twilog.webapi.twitter_api import TwitterAPI
 
 logger = getLogger(__name__)
 logger.setLevel(INFO)
-DEBUG = False
 
 
 class CrawlResultStatus(Enum):
@@ -34,9 +47,49 @@ class CrawlResultStatus(Enum):
     DONE = auto()
 
 
+class CrawlKind(Enum):
+    TIMELINE = auto()
+    LIKES = auto()
+
+
+@dataclass
+class ParsedCrawl:
+    """取得, パース済で DB への書き込みを待つクロール結果
+
+    Args:
+        screen_name (str): 対象の screen_name
+        tweet_list (list[dict]): 平滑化済のツイートのリスト
+        record_dict_list (list[dict]): Tweet または Likes のレコード辞書のリスト
+        media_dict_list (list[dict]): Media のレコード辞書のリスト
+        external_link_dict_list (list[dict]): ExternalLink のレコード辞書のリスト
+    """
+
+    screen_name: str
+    tweet_list: list[dict]
+    record_dict_list: list[dict]
+    media_dict_list: list[dict]
+    external_link_dict_list: list[dict]
+
+    def extend(self, other: "ParsedCrawl") -> None:
+        """other の各リストを末尾に追加する"""
+        self.tweet_list.extend(other.tweet_list)
+        self.record_dict_list.extend(other.record_dict_list)
+        self.media_dict_list.extend(other.media_dict_list)
+        self.external_link_dict_list.extend(other.external_link_dict_list)
+
+
 class TimelineCrawler:
-    TIMELINE_CACHE_FILE_PATH = "./cache/timeline_response.json"
-    LIKES_CACHE_FILE_PATH = "./cache/likes_response.json"
+    # 取得したレスポンスのキャッシュ, replay バックエンドは既定でここから読み込む
+    CACHE_DIR_PATH = "./cache"
+    CACHE_CUTOFF_DAYS = 7
+    TIMELINE_CACHE_NAME = "timeline_response"
+    LIKES_CACHE_NAME = "likes_response"
+    # config の crawl.backend に指定できる値, "api" は TwitterAPI, "replay" は記録済のレスポンスを返す ReplayTwitterAPI
+    CRAWL_BACKEND_LIST = ["api", "replay"]
+    # replay バックエンドの書き込み先DBのファイル名, crawl.replay_db_path 未指定時は replay_dir_path 配下に作る
+    REPLAY_DB_FILE_NAME = "replay_timeline.db"
+    # timeline_crawl, likes_crawl のパイプラインの段の間のキューの長さ（ページ数）
+    PIPELINE_QUEUE_SIZE = 2
 
     def __init__(self) -> None:
         logger.info("TimelineCrawler init -> start")
@@ -45,11 +98,45 @@ class TimelineCrawler:
 
         self.config = config["twitter_api_client_list"]
 
-        self.tweet_db = TweetDB()
-        self.likes_db = LikesDB()
-        self.media_db = MediaDB()
-        self.metric_db = MetricDB()
-        self.external_link_db = ExternalLinkDB()
+        # 並列クロールはオプトイン（config の "crawl": {"max_workers": 2以上} 指定時のみ）
+        crawl_config = config.get("crawl", {})
+        self.max_workers = int(crawl_config.get("max_workers", 1))
+        if self.max_workers < 1:
+            raise ValueError("crawl.max_workers must be positive.")
+        # 取得元は既定で TwitterAPI（config の "crawl": {"backend": "replay"} 指定時は記録済のレスポンス）
+        self.backend = crawl_config.get("backend", "api")
+        if self.backend not in self.CRAWL_BACKEND_LIST:
+            raise ValueError(f"crawl.backend must be one of {self.CRAWL_BACKEND_LIST}.")
+        self.replay_dir_path = Path(crawl_config.get("replay_dir_path", self.CACHE_DIR_PATH))
+
+        if self.backend == "replay":
+            # 本番のDBを書き換えないように、replay の書き込み先は別のDB（既定は replay_dir_path 配下）とする
+            replay_db_path = Path(crawl_config.get("replay_db_path", self.replay_dir_path / self.REPLAY_DB_FILE_NAME))
+            replay_db_path.parent.mkdir(parents=True, exist_ok=True)
+            db_kwargs = {"db_path": str(replay_db_path)}
+            # ネットワークに接続しないように、メディアのファイルサイズはキャッシュのみから引く
+            self.media_size_fetcher = CacheOnlyMediaSizeFetcher()
+        else:
+            db_kwargs = {}
+            # メディアのファイルサイズ取得はセッションとキャッシュを全クロールで共有する
+            self.media_size_fetcher = MediaSizeFetcher()
+
+        self.tweet_db = TweetDB(**db_kwargs)
+        self.likes_db = LikesDB(**db_kwargs)
+        self.media_db = MediaDB(**db_kwargs)
+        self.metric_db = MetricDB(**db_kwargs)
+        self.external_link_db = ExternalLinkDB(**db_kwargs)
+
+        # キャッシュファイルはアカウントごとに分かれるため、並列実行時も同じファイルへは書き込まない
+        self.timeline_cache = ResponseCache(self.TIMELINE_CACHE_NAME, self.CACHE_DIR_PATH)
+        self.likes_cache = ResponseCache(self.LIKES_CACHE_NAME, self.CACHE_DIR_PATH)
+        # (クロールの種類, screen_name) ごとの直近のパイプラインの各段の処理時間
+        self.stage_timings: dict[tuple[CrawlKind, str], StageTimings] = {}
+
+        # WAL モードはオプトイン（config の "db": {"wal_mode": "enable"} 指定時のみ）
+        db_config = config.get("db", {})
+        if "enable" == db_config.get("wal_mode", "disable"):
+            EngineRegistry.enable_wal(self.tweet_db.db_path)
 
         # sqlalchemy 系のログ抑止
         log_suppress()
@@ -58,57 +145,77 @@ class TimelineCrawler:
         self.registered_at = datetime.now().replace(microsecond=0).isoformat()
         logger.info("TimelineCrawler init -> done")
 
-    def timeline_crawl(self, screen_name: str) -> CrawlResultStatus:
-        logger.info("TimelineCrawler timeline_crawl -> start")
-        logger.info("TimelineCrawler timeline_crawl init -> start")
-        # 探索する id_str の下限値を設定
-        min_id = self.tweet_db.select_for_max_id(screen_name)
-        logger.info(f"Target timeline's screen_name is '{screen_name}'.")
-        logger.info(f"Last registered tweet_id is '{min_id}'.")
-        logger.info("TimelineCrawler timeline_crawl init -> done")
+    def _iter_recorded(
+        self, response_cache: ResponseCache, screen_name: str, twitter: TwitterAPI, pages: Iterable[list[dict]]
+    ) -> Iterator[list[dict]]:
+        """pages をそのまま1ページずつ返しながら、各ページを replay 用のキャッシュに記録する
 
-        # TL取得
+        キャッシュファイルは最初のページを受け取った時点で作成し、最後のページを返した時点で確定する
+        ページが無い場合と、ReplayTwitterAPI から再生している場合は記録しない
+        """
+        if isinstance(twitter, ReplayTwitterAPI):
+            yield from pages
+            return
+        with ExitStack() as stack:
+            writer: ResponseCacheWriter | None = None
+            for page in pages:
+                if writer is None:
+                    writer = stack.enter_context(response_cache.open_writer(screen_name))
+                writer.write_all(page)
+                yield page
+
+    def _iter_timeline(self, screen_name: str, twitter: TwitterAPI, min_id: int) -> Iterator[list[dict]]:
+        """TL を1ページずつ取得する
+
+        取得した TL はそのまま replay 用のキャッシュに記録する（ReplayTwitterAPI から再生している場合は記録しない）
+        TL 全体の末尾の1件は取得済の min_id のツイート（または limit 件目）となるため返さない
+        """
         logger.info(f"Getting timeline of '{screen_name}' -> start")
         limit = 300
-        tweet_list = []
-        if self.twitter:
-            tweet_list = self.twitter.get_user_timeline(screen_name, limit, min_id)
-            tweet_list = tweet_list[:-1]
+        pages = twitter.iter_user_timeline(screen_name, limit, min_id)
+        # 各ページの末尾の1件は、続きのページがあればその先頭に回す
+        last_tweet_list: list[dict] = []
+        for page in self._iter_recorded(self.timeline_cache, screen_name, twitter, pages):
+            tweet_list = last_tweet_list + page[:-1]
+            last_tweet_list = page[-1:]
             if tweet_list:
-                Path(TimelineCrawler.TIMELINE_CACHE_FILE_PATH).write_bytes(
-                    orjson.dumps(tweet_list, option=orjson.OPT_INDENT_2)
-                )
-        else:
-            tweet_list = orjson.loads(Path(TimelineCrawler.TIMELINE_CACHE_FILE_PATH).read_bytes())
-
-        if not tweet_list:
-            logger.info(f"Getting timeline of '{screen_name}' -> done")
-            logger.info(f"No new tweet of '{screen_name}'.")
-            logger.info("TimelineCrawler timeline_crawl -> done")
-            return CrawlResultStatus.NO_UPDATE
-        logger.info(f"Number of new tweet of '{screen_name}' is {len(tweet_list)}.")
-        logger.info(f"Getting timeline of '{screen_name}' -> done")
-
+                yield tweet_list
+
+    def _fetch_timeline(self, screen_name: str, twitter: TwitterAPI, min_id: int) -> list[dict]:
+        """TL を取得する, _iter_timeline の全ページをまとめたリストを返す"""
+        return [tweet for tweet_list in self._iter_timeline(screen_name, twitter, min_id) for tweet in tweet_list]
+
+    def _parse_timeline(self, screen_name: str, tweet_list: list[dict]) -> ParsedCrawl:
+        """TL を Tweet, Media, ExternalLink のレコードに変換する（DB には触れない）"""
+        # flatten は1回だけ行い、各パーサで共有する
+        tweet_list = ParserBase.flatten(tweet_list)
+        return ParsedCrawl(
+            screen_name,
+            tweet_list,
+            TweetParser(tweet_list, self.registered_at).parse(),
+            MediaParser(tweet_list, self.registered_at, self.media_size_fetcher).parse(),
+            ExternalLinkParser(tweet_list, self.registered_at).parse(),
+        )
+
+    def _write_timeline_records(self, parsed: ParsedCrawl, session: Session) -> None:
+        """Tweet, Media, ExternalLink を session 上で書き込む"""
         # Tweet
         logger.info("Tweet table update -> start")
-        tweet_dict_list = TweetParser(tweet_list, self.registered_at).parse()
-        self.tweet_db.upsert(tweet_dict_list)
-        MemoWriter().search_and_write(tweet_dict_list)
+        self.tweet_db.upsert(parsed.record_dict_list, session)
         logger.info("Tweet table update -> done")
 
         # Media
         logger.info("Media table update -> start")
-        media_dict_list = MediaParser(tweet_list, self.registered_at).parse()
-        self.media_db.upsert(media_dict_list)
+        self.media_db.upsert(parsed.media_dict_list, session)
         logger.info("Media table update -> done")
 
         # ExternalLink
         logger.info("ExternalLink table update -> start")
-        external_link_dict_list = ExternalLinkParser(tweet_list, self.registered_at).parse()
-        self.external_link_db.upsert(external_link_dict_list)
+        self.external_link_db.upsert(parsed.external_link_dict_list, session)
         logger.info("ExternalLink table update -> done")
 
-        # Metric
+    def _write_timeline_metric(self, screen_name: str, tweet_list: list[dict], session: Session) -> None:
+        """書き込み済の Tweet から Metric を集計して session 上で書き込む"""
         logger.info("Metric table update -> start")
         metric_parsed_dict = MetricParser(tweet_list, self.registered_at, screen_name).parse()
         if not metric_parsed_dict:
@@ -116,67 +223,221 @@ class TimelineCrawler:
             # 自分が投稿したレコードが無く、Metricが取得出来なかった場合スキップ
             logger.info("Valid Metric record is nothing, maybe no own record -> skip")
         else:
-            metric_dict = TimelineStats(metric_parsed_dict[0], self.tweet_db).to_dict()
-            self.metric_db.upsert([metric_dict])
+            metric_dict = TimelineStats(metric_parsed_dict[0], self.tweet_db, session).to_dict()
+            self.metric_db.upsert([metric_dict], session)
         logger.info("Metric table update -> done")
 
-        logger.info("TimelineCrawler timeline_crawl -> done")
-        return CrawlResultStatus.DONE
+    def _finish_timeline(self, parsed: ParsedCrawl, session: Session) -> None:
+        """TL 全体の書き込み後に、メモの書き出しと Metric の書き込みを行う, replay ではメモは書き出さない"""
+        if self.backend != "replay":
+            MemoWriter().search_and_write(parsed.record_dict_list)
+        self._write_timeline_metric(parsed.screen_name, parsed.tweet_list, session)
+
+    def _write_timeline(self, parsed: ParsedCrawl) -> None:
+        """Tweet, Media, ExternalLink, Metric を1トランザクションで書き込む"""
+        with UnitOfWork(self.tweet_db.engine) as session:
+            self._write_timeline_records(parsed, session)
+            self._finish_timeline(parsed, session)
+
+    def _run_pipeline(
+        self,
+        kind: CrawlKind,
+        screen_name: str,
+        engine: Engine,
+        pages: Iterable[list[dict]],
+        parse: Callable[[list[dict]], ParsedCrawl],
+        write: Callable[[ParsedCrawl, Session], None],
+        finish: Callable[[ParsedCrawl, Session], None] | None = None,
+        is_write_reversed: bool = False,
+    ) -> ParsedCrawl | None:
+        """取得 → パース → 書き込みを CrawlPipeline でページ単位に重ねて実行する
+
+        pages は API から1ページずつ取得するイテラブルとし、ページ N をパース, 書き込みしている間に次のページを取得する
+        全ページの書き込みと finish は1つの UnitOfWork で行い、最初のページを書き込む時点で開始する
+        新しいツイートが無い場合は UnitOfWork を開始せず None を返す
+
+        Args:
+            kind (CrawlKind): クロールの種類
+            screen_name (str): 対象の screen_name
+            engine (Engine): UnitOfWork に使う engine
+            pages (Iterable[list[dict]]): ツイートのページを取得順に返すイテラブル, 空のページは飛ばす
+            parse (Callable[[list[dict]], ParsedCrawl]): 1ページ分のツイートをパースする関数
+            write (Callable[[ParsedCrawl, Session], None]): 1ページ分のパース結果を session 上で書き込む関数
+            finish (Callable[[ParsedCrawl, Session], None] | None): 全ページの書き込み後に、
+                全ページ分をまとめたパース結果を受け取って session 上で実行する関数
+            is_write_reversed (bool): True なら全ページのパースを待ってから、取得と逆の順（古いページから）に書き込む
+                取得と同時に書き込むと、新しいページのレコードほど先に登録されるため、
+                登録順を新しさの順として扱うテーブル（Likes）で使う
+
+        Returns:
+            ParsedCrawl | None: 全ページ分をまとめたパース結果, 新しいツイートが無ければ None
+        """
+        merged: ParsedCrawl | None = None
+        tweet_num = 0
 
-    def likes_crawl(self, screen_name: str) -> CrawlResultStatus:
-        logger.info("TimelineCrawler likes_crawl -> start")
-        logger.info("TimelineCrawler likes_crawl init -> start")
+        def fetch_pages() -> Iterator[list[dict]]:
+            nonlocal tweet_num
+            for page in pages:
+                if not page:
+                    continue
+                tweet_num += len(page)
+                yield page
+
+        with ExitStack() as stack:
+            session_list: list[Session] = []
+
+            def write_page(parsed: ParsedCrawl) -> None:
+                nonlocal merged
+                if not session_list:
+                    session_list.append(stack.enter_context(UnitOfWork(engine)))
+                write(parsed, session_list[0])
+                if merged is None:
+                    # 各パーサが再度平滑化しないよう、まとめた tweet_list も平滑化済として扱う
+                    merged = ParsedCrawl(screen_name, FlattenedTweetList(), [], [], [])
+                merged.extend(parsed)
+
+            # 途中で例外が発生した場合も、取得中のページのジェネレータを閉じる（書きかけのキャッシュを残さない）
+            if isinstance(pages, Generator):
+                stack.enter_context(closing(pages))
+            parsed_list: list[ParsedCrawl] = []
+            pipeline_write = parsed_list.append if is_write_reversed else write_page
+            timings = CrawlPipeline(fetch_pages(), parse, pipeline_write, self.PIPELINE_QUEUE_SIZE).run()
+            if parsed_list:
+                write_start = time.perf_counter()
+                for parsed in reversed(parsed_list):
+                    write_page(parsed)
+                write_time = time.perf_counter() - write_start
+                timings.write += write_time
+                timings.total += write_time
+            self.stage_timings[(kind, screen_name)] = timings
+            logger.info(f"Pipeline timings of {kind.name.lower()} '{screen_name}': {timings}.")
+            if merged is not None:
+                logger.info(f"Number of new tweet of '{screen_name}' is {tweet_num}.")
+                if finish:
+                    finish(merged, session_list[0])
+        return merged
+
+    def timeline_crawl(self, screen_name: str) -> CrawlResultStatus:
+        logger.info("TimelineCrawler timeline_crawl -> start")
+        logger.info("TimelineCrawler timeline_crawl init -> start")
         # 探索する id_str の下限値を設定
-        min_id = self.likes_db.select_for_max_id(screen_name)
-        logger.info(f"Target Likes's screen_name is '{screen_name}'.")
+        min_id = self.tweet_db.select_for_max_id(screen_name)
+        logger.info(f"Target timeline's screen_name is '{screen_name}'.")
         logger.info(f"Last registered tweet_id is '{min_id}'.")
-        logger.info("TimelineCrawler likes_crawl init -> done")
-
-        # Likes 取得
-        logger.info(f"Getting Likes of '{screen_name}' -> start")
-        limit = 300
-        tweet_list = []
-        if self.twitter:
-            tweet_list = self.twitter.get_likes(screen_name, limit, min_id)
-            tweet_list = tweet_list[:-1]
-            if tweet_list:
-                Path(TimelineCrawler.LIKES_CACHE_FILE_PATH).write_bytes(
-                    orjson.dumps(tweet_list, option=orjson.OPT_INDENT_2)
-                )
-        else:
-            tweet_list = orjson.loads(Path(TimelineCrawler.LIKES_CACHE_FILE_PATH).read_bytes())
+        logger.info("TimelineCrawler timeline_crawl init -> done")
 
-        if not tweet_list:
-            logger.info(f"Getting Likes of '{screen_name}' -> done")
+        # TL取得, パース, 書き込み（Tweet, Media, ExternalLink, Metric を1トランザクションで書き込む）
+        merged = self._run_pipeline(
+            CrawlKind.TIMELINE,
+            screen_name,
+            self.tweet_db.engine,
+            self._iter_timeline(screen_name, self.twitter, min_id),
+            lambda tweet_list: self._parse_timeline(screen_name, tweet_list),
+            self._write_timeline_records,
+            self._finish_timeline,
+        )
+        logger.info(f"Getting timeline of '{screen_name}' -> done")
+        if merged is None:
             logger.info(f"No new tweet of '{screen_name}'.")
-            logger.info("TimelineCrawler likes_crawl -> done")
+            logger.info("TimelineCrawler timeline_crawl -> done")
             return CrawlResultStatus.NO_UPDATE
-        logger.info(f"Number of new tweet of '{screen_name}' is {len(tweet_list)}.")
-        logger.info(f"Getting Likes of '{screen_name}' -> done")
 
+        logger.info("TimelineCrawler timeline_crawl -> done")
+        return CrawlResultStatus.DONE
+
+    def _iter_likes(self, screen_name: str, twitter: TwitterAPI, known_id_set: set[str]) -> Iterator[list[dict]]:
+        """Likes を1ページずつ取得する
+
+        known_id_set に含まれる保存済の Likes に到達した時点で取得を打ち切る
+        取得した Likes は replay 用のキャッシュに記録する（ReplayTwitterAPI から再生している場合は記録しない）
+        """
+        logger.info(f"Getting Likes of '{screen_name}' -> start")
+        limit = 300
+        pages = twitter.iter_likes(screen_name, limit, known_id_set)
+        yield from self._iter_recorded(self.likes_cache, screen_name, twitter, pages)
+
+    def _fetch_likes(self, screen_name: str, twitter: TwitterAPI, known_id_set: set[str]) -> list[dict]:
+        """Likes を取得する, _iter_likes の全ページをまとめたリストを返す"""
+        return [tweet for tweet_list in self._iter_likes(screen_name, twitter, known_id_set) for tweet in tweet_list]
+
+    def _get_user_info(self, screen_name: str, twitter: TwitterAPI) -> tuple[str, str]:
+        """Likes のレコードに記録する (user_id, user_name) を取得する"""
+        user_id = twitter.get_user_id(screen_name).id_str
+        user_name = twitter.get_user_name(screen_name).name
+        return user_id, user_name
+
+    def _parse_likes(self, screen_name: str, tweet_list: list[dict], user_id: str, user_name: str) -> ParsedCrawl:
+        """Likes を Likes, Media, ExternalLink のレコードに変換する（DB には触れない）"""
+        # flatten は1回だけ行い、各パーサで共有する
+        tweet_list = ParserBase.flatten(tweet_list)
+        return ParsedCrawl(
+            screen_name,
+            tweet_list,
+            LikesParser(tweet_list, self.registered_at, user_id, user_name, screen_name).parse(),
+            MediaParser(tweet_list, self.registered_at, self.media_size_fetcher).parse(),
+            ExternalLinkParser(tweet_list, self.registered_at).parse(),
+        )
+
+    def _write_likes_records(self, parsed: ParsedCrawl, session: Session) -> None:
+        """Likes, Media, ExternalLink を session 上で書き込む"""
         # Likes
         logger.info("Likes table update -> start")
-        tweet_dict_list = []
-        user_id = self.twitter.get_user_id(screen_name).id_str if self.twitter else ""
-        user_name = self.twitter.get_user_name(screen_name).name if self.twitter else ""
-        tweet_dict_list = LikesParser(tweet_list, self.registered_at, user_id, user_name, screen_name).parse()
-        self.likes_db.upsert(tweet_dict_list)
+        self.likes_db.upsert(parsed.record_dict_list, session)
         logger.info("Likes table update -> done")
 
         # Media
         logger.info("Media table update -> start")
-        media_dict_list = MediaParser(tweet_list, self.registered_at).parse()
-        self.media_db.upsert(media_dict_list)
+        self.media_db.upsert(parsed.media_dict_list, session)
         logger.info("Media table update -> done")
 
         # ExternalLink
         logger.info("ExternalLink table update -> start")
-        external_link_dict_list = ExternalLinkParser(tweet_list, self.registered_at).parse()
-        self.external_link_db.upsert(external_link_dict_list)
+        self.external_link_db.upsert(parsed.external_link_dict_list, session)
         logger.info("ExternalLink table update -> done")
 
         # Metric は投入しない
 
+    def _write_likes(self, parsed: ParsedCrawl) -> None:
+        """Likes, Media, ExternalLink を1トランザクションで書き込む"""
+        with UnitOfWork(self.likes_db.engine) as session:
+            self._write_likes_records(parsed, session)
+
+    def likes_crawl(self, screen_name: str) -> CrawlResultStatus:
+        logger.info("TimelineCrawler likes_crawl -> start")
+        logger.info("TimelineCrawler likes_crawl init -> start")
+        # 取得を打ち切る目印として、直近に登録した Likes の tweet_id の集合を取得
+        known_id_set = self.likes_db.select_recent_tweet_ids(screen_name)
+        logger.info(f"Target Likes's screen_name is '{screen_name}'.")
+        logger.info(f"Number of recently registered tweet_id is {len(known_id_set)}.")
+        logger.info("TimelineCrawler likes_crawl init -> done")
+
+        # user_id, user_name は最初のページのパース時に1回だけ取得する
+        user_info_list: list[str] = []
+
+        def parse(tweet_list: list[dict]) -> ParsedCrawl:
+            if not user_info_list:
+                user_info_list.extend(self._get_user_info(screen_name, self.twitter))
+            return self._parse_likes(screen_name, tweet_list, *user_info_list)
+
+        # Likes 取得, パース, 書き込み（Likes, Media, ExternalLink を1トランザクションで書き込む）
+        # Likes は登録順を新しさの順として扱うため、新しいものから取得したページを古いものから書き込む
+        merged = self._run_pipeline(
+            CrawlKind.LIKES,
+            screen_name,
+            self.likes_db.engine,
+            self._iter_likes(screen_name, self.twitter, known_id_set),
+            parse,
+            self._write_likes_records,
+            is_write_reversed=True,
+        )
+        # 書き込みが完了してから、続きのページのカーソルを保存する
+        self.twitter.save_likes_cursor()
+        logger.info(f"Getting Likes of '{screen_name}' -> done")
+        if merged is None:
+            logger.info(f"No new tweet of '{screen_name}'.")
+            logger.info("TimelineCrawler likes_crawl -> done")
+            return CrawlResultStatus.NO_UPDATE
+
         logger.info("TimelineCrawler likes_crawl -> done")
         return CrawlResultStatus.DONE
 
@@ -190,6 +451,11 @@ class TimelineCrawler:
         cutoff_days (int, optional): 削除対象となる期限
         """
         logger.info("TimelineCrawler clean_cache -> start")
+        if not base_path.is_dir():
+            # 再生時など、取得したレスポンスを1件も保存していない場合
+            logger.info(f"'{base_path}' is not found -> skip")
+            logger.info("TimelineCrawler clean_cache -> done")
+            return
         logger.info("Cutoff cache -> start")
         delete_num = 0
         now_date = datetime.now()
@@ -226,9 +492,101 @@ class TimelineCrawler:
 
         logger.info("TimelineCrawler clean_cache -> done")
 
+    def _create_twitter(self, target_dict: dict) -> TwitterAPI:
+        """target_dict のアカウントの TwitterAPI を作成する, replay バックエンドなら ReplayTwitterAPI
+
+        API バックエンドでは、セッションと me をここで解決しておく
+        （TL と Likes の取得タスクが、未初期化の TwitterAPI の遅延生成を同時に行わないようにするため）
+        """
+        screen_name, ct0, auth_token = target_dict["screen_name"], target_dict["ct0"], target_dict["auth_token"]
+        if self.backend == "replay":
+            timeline_cache = ResponseCache(self.TIMELINE_CACHE_NAME, self.replay_dir_path)
+            likes_cache = ResponseCache(self.LIKES_CACHE_NAME, self.replay_dir_path)
+            return ReplayTwitterAPI(screen_name, ct0, auth_token, timeline_cache, likes_cache)
+        twitter = TwitterAPI(screen_name, ct0, auth_token)
+        _ = twitter.twitter, twitter.me
+        return twitter
+
+    def _select_stop_marker(self, kind: CrawlKind, screen_name: str) -> int | set[str]:
+        """取得を打ち切る目印を取得する, TL なら登録済の最大の tweet_id, Likes なら直近に登録した tweet_id の集合"""
+        if kind == CrawlKind.TIMELINE:
+            return self.tweet_db.select_for_max_id(screen_name)
+        return self.likes_db.select_recent_tweet_ids(screen_name)
+
+    def _fetch_and_parse(
+        self, kind: CrawlKind, screen_name: str, twitter: TwitterAPI, stop_marker: int | set[str]
+    ) -> ParsedCrawl | None:
+        """ワーカースレッドで TL または Likes を取得してパースする, 新しいツイートが無ければ None
+
+        DB には触れない（stop_marker の検索と書き込みは run_concurrent を実行するスレッドで行う）
+        """
+        is_timeline = kind == CrawlKind.TIMELINE
+        if is_timeline:
+            tweet_list = self._fetch_timeline(screen_name, twitter, stop_marker)
+        else:
+            tweet_list = self._fetch_likes(screen_name, twitter, stop_marker)
+        if not tweet_list:
+            logger.info(f"No new {kind.name.lower()} tweet of '{screen_name}'.")
+            return None
+        logger.info(f"Number of new {kind.name.lower()} tweet of '{screen_name}' is {len(tweet_list)}.")
+        if is_timeline:
+            return self._parse_timeline(screen_name, tweet_list)
+        return self._parse_likes(screen_name, tweet_list, *self._get_user_info(screen_name, twitter))
+
+    def _write_parsed(self, kind: CrawlKind, parsed: ParsedCrawl) -> None:
+        """パース済のクロール結果を書き込む"""
+        logger.info(f"Write {kind.name.lower()} of '{parsed.screen_name}' -> start")
+        if kind == CrawlKind.TIMELINE:
+            self._write_timeline(parsed)
+        else:
+            self._write_likes(parsed)
+        logger.info(f"Write {kind.name.lower()} of '{parsed.screen_name}' -> done")
+
+    def run_concurrent(self, target_dict_list: list[dict]) -> None:
+        """複数アカウントの TL と Likes を並列にクロールする
+
+        ネットワーク待ちとなる TwitterAPI の作成, 取得, パースは max_workers 個のワーカースレッドで並列に行い、
+        DB への書き込みはこのメソッドを実行するスレッドが完了した順に1件ずつ行う（書き込みは直列化される）
+        あるアカウントの処理で例外が発生した場合はログに記録し、他のアカウントの処理は続ける
+
+        Args:
+            target_dict_list (list[dict]): クロール対象のアカウント設定のリスト
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            future_dict: dict[Future, tuple[CrawlKind | None, str]] = {}
+            twitter_dict: dict[str, TwitterAPI] = {}
+            for target_dict in target_dict_list:
+                future = executor.submit(self._create_twitter, target_dict)
+                future_dict[future] = (None, target_dict["screen_name"])
+
+            while future_dict:
+                done_set, _ = wait(future_dict, return_when=FIRST_COMPLETED)
+                for future in done_set:
+                    kind, screen_name = future_dict.pop(future)
+                    try:
+                        result = future.result()
+                        if kind is None:
+                            # TwitterAPI の作成後、TL と Likes の取得をそれぞれ投入する
+                            # 打ち切りの目印の検索は書き込みと同じくこのスレッドで行う
+                            twitter_dict[screen_name] = result
+                            for next_kind in [CrawlKind.TIMELINE, CrawlKind.LIKES]:
+                                stop_marker = self._select_stop_marker(next_kind, screen_name)
+                                args = (next_kind, screen_name, result, stop_marker)
+                                future_dict[executor.submit(self._fetch_and_parse, *args)] = (next_kind, screen_name)
+                            continue
+                        if result is not None:
+                            self._write_parsed(kind, result)
+                        # Likes は書き込みが完了してから、続きのページのカーソルを保存する
+                        if kind == CrawlKind.LIKES and (twitter := twitter_dict.get(screen_name)):
+                            twitter.save_likes_cursor()
+                    except Exception as e:
+                        task_name = kind.name.lower() if kind else "init"
+                        logger.exception(f"Crawl {task_name} of '{screen_name}' failed: {e}")
+
     def run(self) -> None:
         logger.info("TimelineCrawler run -> start")
         target_dicts = self.config
+        enable_target_dicts = []
         for target_dict in target_dicts:
             is_enable = "enable" == target_dict["status"]
             screen_name = target_dict["screen_name"]
@@ -236,23 +594,31 @@ class TimelineCrawler:
             if not is_enable:
                 logger.info(f"Status is not enable , target screen_name = '{screen_name}' -> skip")
                 continue
+            enable_target_dicts.append(target_dict)
 
-            ct0 = target_dict["ct0"]
-            auth_token = target_dict["auth_token"]
-
-            if not DEBUG:
-                self.twitter = TwitterAPI(screen_name, ct0, auth_token)
-            else:
-                self.twitter = None
+        if self.backend == "replay":
+            logger.info(f"Replay recorded responses in '{self.replay_dir_path}'.")
+        if self.max_workers > 1:
+            logger.info(f"Concurrent crawl with {self.max_workers} workers.")
+            self.run_concurrent(enable_target_dicts)
+        else:
+            for target_dict in enable_target_dicts:
+                screen_name = target_dict["screen_name"]
+                self.twitter = self._create_twitter(target_dict)
 
-            logger.info("----------")
-            self.timeline_crawl(screen_name)
-            logger.info("-----")
-            self.likes_crawl(screen_name)
-            logger.info("----------")
+                logger.info("----------")
+                self.timeline_crawl(screen_name)
+                logger.info("-----")
+                self.likes_crawl(screen_name)
+                logger.info("----------")
 
         # キャッシュファイルをアーカイブして古いものを削除する
         self.clean_cache(Path("./data"))
+        # 再生中は再生元の記録を消さないよう、レスポンスキャッシュは削除しない
+        if self.backend != "replay":
+            for response_cache in [self.timeline_cache, self.likes_cache]:
+                delete_num = response_cache.cutoff(self.CACHE_CUTOFF_DAYS)
+                logger.info(f"Deleted {delete_num} {response_cache.name} cache files.")
         logger.info("TimelineCrawler run -> done")
 
 
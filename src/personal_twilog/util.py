@@ -1,9 +1,12 @@
 import logging
+from collections.abc import Iterator
 from enum import Enum, auto
 from functools import reduce
 from logging import getLogger
 from typing import Any
 
+from personal_twilog.db.model import Tweet
+
 
 class Result(Enum):
     success = auto()
@@ -37,6 +40,31 @@ def find_value(target_dict: dict, key_path: tuple[str], default: Any = "") -> An
     return reduce(lambda v, k: v.get(k, default) if isinstance(v, dict) else default, key_path, target_dict)
 
 
+def _iter_values(obj: Any, key: str, key_white_list: list[str], key_black_list: list[str]) -> Iterator[Any]:
+    """obj を深さ優先で探索し、key に対応する値を見つけた順に返す
+
+    再帰呼び出しと途中結果のリスト生成を避けるため、走査中のイテレータをスタックで管理する
+    """
+    stack: list[Iterator[tuple[Any, Any]]] = [iter(((None, obj),))]
+    while stack:
+        pair = next(stack[-1], None)
+        if pair is None:
+            stack.pop()
+            continue
+        k, v = pair
+        if k is not None:
+            if k == key:
+                yield v
+            if key_white_list and (k not in key_white_list):
+                continue
+            if k in key_black_list:
+                continue
+        if isinstance(v, dict):
+            stack.append(iter(v.items()))
+        elif isinstance(v, list):
+            stack.append(((None, element) for element in v))
+
+
 def find_values(
     obj: Any,
     key: str,
@@ -49,22 +77,7 @@ def find_values(
     if not key_black_list:
         key_black_list = []
 
-    def _inner_helper(inner_obj: Any, inner_key: str, inner_result: list) -> list:
-        if isinstance(inner_obj, dict) and (inner_dict := inner_obj):
-            for k, v in inner_dict.items():
-                if k == inner_key:
-                    inner_result.append(v)
-                if key_white_list and (k not in key_white_list):
-                    continue
-                if k in key_black_list:
-                    continue
-                inner_result.extend(_inner_helper(v, inner_key, []))
-        if isinstance(inner_obj, list) and (inner_list := inner_obj):
-            for element in inner_list:
-                inner_result.extend(_inner_helper(element, inner_key, []))
-        return inner_result
-
-    result = _inner_helper(obj, key, [])
+    result = list(_iter_values(obj, key, key_white_list, key_black_list))
     if not is_predict_one:
         return result
 
@@ -75,34 +88,121 @@ def find_values(
     return result[0]
 
 
-def remove_duplicates(dict_list: list[dict]) -> list[dict]:
+class KeyPath:
+    """構造が既知の辞書から値を取り出すためのコンパイル済キーパス
+
+    "a.b[].c" のように "." 区切りでキーを、"[]" でリストの各要素への展開を表す
+    パスは生成時に1回だけ分解し、探索時は途中結果のリストを作らずに値を順に返す
+    パスの途中でキーが存在しない, または型が異なる場合、その枝は何も返さない
+
+    Examples:
+        >>> path = KeyPath("entries[].content.tweet_results")
+        >>> list(path.iter_values({"entries": [{"content": {"tweet_results": 1}}, {"content": {}}]}))
+        [1]
+    """
+
+    ITERATE = None
+
+    def __init__(self, path: str) -> None:
+        if not isinstance(path, str) or not path:
+            raise ValueError("Argument path is not non-empty str.")
+        self.path = path
+        self.step_tuple: tuple[str | None, ...] = self._compile(path)
+
+    @classmethod
+    def _compile(cls, path: str) -> tuple[str | None, ...]:
+        step_list = []
+        for token in path.split("."):
+            key = token.rstrip("[]")
+            iterate_num = token[len(key) :].count("[]")
+            if token[len(key) :] != "[]" * iterate_num:
+                raise ValueError(f"Argument path '{path}' is invalid.")
+            if "[" in key or "]" in key or (not key and not iterate_num):
+                raise ValueError(f"Argument path '{path}' is invalid.")
+            if key:
+                step_list.append(key)
+            step_list.extend([cls.ITERATE] * iterate_num)
+        return tuple(step_list)
+
+    def iter_values(self, obj: Any) -> Iterator[Any]:
+        """obj からパスに一致する値を順に返す"""
+        step_num = len(self.step_tuple)
+        stack: list[tuple[Any, int]] = [(obj, 0)]
+        while stack:
+            value, index = stack.pop()
+            while index < step_num:
+                step = self.step_tuple[index]
+                if step is self.ITERATE:
+                    if isinstance(value, list):
+                        # 元の順序で返すため逆順に積む
+                        stack.extend((element, index + 1) for element in reversed(value))
+                    break
+                if not isinstance(value, dict) or step not in value:
+                    break
+                value = value[step]
+                index += 1
+            else:
+                yield value
+
+    def get(self, obj: Any, default: Any = None) -> Any:
+        """obj からパスに一致する最初の値を返す, 見つからなかった場合 default を返す"""
+        return next(self.iter_values(obj), default)
+
+    def __repr__(self) -> str:
+        return f"KeyPath({self.path!r})"
+
+
+def remove_duplicates(dict_list: list[dict], key_tuple: tuple[str, ...] = ("tweet_id",)) -> list[dict]:
     """辞書リストから重複を削除する
 
-    リストの要素について、 DUP_TARGET_KEY をキーとして、その値が重複している要素を排除する
+    リストの要素について、 key_tuple の各キーの値の組が重複している要素を排除する
+    重複した要素は最初に現れたものを残し、元の順序を保つ
+    既出の値の組は set で管理するため、要素数に対して線形時間で動作する
+    tweet_id は文字列ではなく数値（Tweet.tweet_id_num と同じ値）に変換して比較する
 
     Args:
         dict_list (list[dict]): 対象辞書リスト
+        key_tuple (tuple[str, ...]): 重複判定に使うキーの組, 既定は ("tweet_id",)
 
     Raises:
-        ValueError: 引数の型が不正、または DUP_TARGET_KEY をキーとする要素の辞書のリストではなかった
+        ValueError: 引数の型が不正、または key_tuple の各キーを持つ要素の辞書のリストではなかった
 
     Returns:
         list[dict]: 重複を排除した辞書リスト
     """
     if not isinstance(dict_list, list):
         raise ValueError("Argument dict_list is not list.")
-    if not all([isinstance(d, dict) for d in dict_list]):
+    if not all(isinstance(d, dict) for d in dict_list):
         raise ValueError("Argument dict_list is not list[dict].")
+    if not isinstance(key_tuple, tuple) or not key_tuple:
+        raise ValueError("Argument key_tuple is not non-empty tuple.")
+
+    for key in key_tuple:
+        if not all(d.get(key, "") != "" for d in dict_list):
+            raise ValueError(f"Argument dict_list include element that not has '{key}' key.")
+
+    def to_key(key: str, value: Any) -> Any:
+        # tweet_id は文字列より軽い int でハッシュする, 数値でない場合は元の値を使う
+        if key != "tweet_id":
+            return value
+        tweet_id_num = Tweet.to_tweet_id_num(value)
+        return value if tweet_id_num is None else tweet_id_num
+
+    seen = set()
+    result = []
+    if len(key_tuple) == 1:
+        # キーが1つの場合は tuple を作らずに値そのものを使う
+        (key,) = key_tuple
+        for d in dict_list:
+            value = to_key(key, d[key])
+            if value not in seen:
+                seen.add(value)
+                result.append(d)
+        return result
 
-    DUP_TARGET_KEY = "tweet_id"
-    key_check = [d.get(DUP_TARGET_KEY, "") != "" for d in dict_list]
-    if not all(key_check):
-        raise ValueError(f"Argument dict_list include element that not has '{DUP_TARGET_KEY}' key.")
-
-    seen = []
-    dict_list = [
-        d
-        for d in dict_list
-        if (tweet_id := d.get(DUP_TARGET_KEY, "")) != "" and (tweet_id not in seen) and (not seen.append(tweet_id))
-    ]
-    return dict_list
+    for d in dict_list:
+        value = tuple(to_key(key, d[key]) for key in key_tuple)
+        if value not in seen:
+            seen.add(value)
+            result.append(d)
+    return result
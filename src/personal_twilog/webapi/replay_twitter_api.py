@@ -0,0 +1,154 @@
+from collections.abc import Iterator
+from logging import INFO, getLogger
+
+from personal_twilog.response_cache import ResponseCache
+from personal_twilog.webapi.tweet_results_extractor import TweetResultsExtractor
+from personal_twilog.webapi.twitter_api import TwitterAPI
+from personal_twilog.webapi.valueobject.screen_name import ScreenName
+from personal_twilog.webapi.valueobject.user_id import UserId
+from personal_twilog.webapi.valueobject.user_name import UserName
+
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+class ReplayTwitterAPI(TwitterAPI):
+    """記録済のレスポンスを返す TwitterAPI
+
+    TimelineCrawler が取得時に保存した TL, Likes のレスポンスキャッシュ（ResponseCache）から、
+    ネットワークに接続せずに TwitterAPI と同じ形式の結果を返す
+    同じキャッシュからは毎回同じ結果を返すため、パースから DB への書き込みまでの処理を再現可能な入力で計測できる
+
+    min_id, known_id_set による打ち切りと limit は TwitterAPI と同様に適用する
+    TL, Likes とも TwitterAPI と同じくページ単位で返す
+    Likes のカーソルは保存しない
+
+    Attributes:
+        REPLAY_PAGE_SIZE (int): 記録済のレスポンスを返す際の1ページあたりの件数
+    """
+
+    REPLAY_PAGE_SIZE = 20
+
+    def __init__(
+        self,
+        authorize_screen_name: str,
+        ct0: str,
+        auth_token: str,
+        timeline_cache: ResponseCache,
+        likes_cache: ResponseCache,
+    ) -> None:
+        super().__init__(authorize_screen_name, ct0, auth_token)
+        if not isinstance(timeline_cache, ResponseCache):
+            raise ValueError("timeline_cache must be ResponseCache.")
+        if not isinstance(likes_cache, ResponseCache):
+            raise ValueError("likes_cache must be ResponseCache.")
+        self.timeline_cache = timeline_cache
+        self.likes_cache = likes_cache
+
+    def _get_user(self, screen_name: ScreenName | str) -> dict:
+        """記録済の TL から screen_name のユーザ情報を探す, 見つからなければ空辞書"""
+        if isinstance(screen_name, ScreenName):
+            screen_name = screen_name.name
+
+        # 見つからなかった場合も記録して、同じ screen_name では探し直さない
+        if hasattr(self, "_user_dict"):
+            if screen_name in self._user_dict:
+                return self._user_dict[screen_name]
+        else:
+            self._user_dict = {}
+
+        user_dict = {}
+        for data_dict in self.timeline_cache.iter_records(screen_name):
+            tweet_user: dict = data_dict.get("result", {}).get("core", {}).get("user_results", {}).get("result", {})
+            if tweet_user.get("core", {}).get("screen_name", "") == screen_name:
+                user_dict = tweet_user
+                break
+        if not user_dict:
+            logger.warning(f"User of '{screen_name}' is not found in the recorded timeline.")
+        self._user_dict[screen_name] = user_dict
+        return user_dict
+
+    def get_user_id(self, screen_name: ScreenName | str) -> UserId:
+        user_dict: dict = self._get_user(screen_name)
+        return UserId(int(user_dict.get("rest_id", 0)))
+
+    def get_user_name(self, screen_name: ScreenName | str) -> UserName:
+        user_dict: dict = self._get_user(screen_name)
+        return UserName(user_dict.get("core", {}).get("name", ""))
+
+    def save_likes_cursor(self) -> None:
+        """記録済のレスポンスには続きのページが無いため、カーソルは保存しない"""
+        return
+
+    def iter_likes(
+        self, screen_name: str, limit: int = 300, known_id_set: set[str] | None = None
+    ) -> Iterator[list[dict]]:
+        """記録済の Likes のうち、known_id_set に含まれるものより新しいものを REPLAY_PAGE_SIZE 件ずつ返す
+
+        Args:
+            screen_name (str): 対象の screen_name
+            limit (int): 返す件数の上限
+            known_id_set (set[str] | None): 保存済の Likes の tweet_id の集合
+
+        Returns:
+            Iterator[list[dict]]: 1ページ分の、保存済のものを含まない Likes のリスト
+        """
+        logger.info(f"Replay like, target user is '{screen_name}' -> start")
+        known_id_set = known_id_set or set()
+        tweet_list = []
+        for num, data_dict in enumerate(self.likes_cache.iter_records(screen_name), start=1):
+            if TweetResultsExtractor.REST_ID_PATH.get(data_dict) in known_id_set:
+                break
+            tweet_list.append(data_dict)
+            if num >= limit:
+                break
+            if len(tweet_list) >= self.REPLAY_PAGE_SIZE:
+                yield tweet_list
+                tweet_list = []
+        if tweet_list:
+            yield tweet_list
+        logger.info(f"Replay like, target user is '{screen_name}' -> done")
+
+    def iter_user_timeline(self, screen_name: str, limit: int = 300, min_id: int = -1) -> Iterator[list[dict]]:
+        """記録済の TL を、min_id のツイートまで、または limit 件まで REPLAY_PAGE_SIZE 件ずつ返す
+
+        Args:
+            screen_name (str): 対象の screen_name
+            limit (int): 返す件数の上限
+            min_id (int): 取得済のツイートのうち最大の ID, このツイートを含めて打ち切る
+
+        Returns:
+            Iterator[list[dict]]: 1ページ分の TL のツイートのリスト
+        """
+        logger.info(f"Replay user timeline, target user is '{screen_name}' -> start")
+        min_id_str = str(min_id)
+        tweet_list = []
+        for num, data_dict in enumerate(self.timeline_cache.iter_records(screen_name), start=1):
+            tweet_list.append(data_dict)
+            if TweetResultsExtractor.has_rest_id(data_dict, min_id_str) or num >= limit:
+                break
+            if len(tweet_list) >= self.REPLAY_PAGE_SIZE:
+                yield tweet_list
+                tweet_list = []
+        if tweet_list:
+            yield tweet_list
+        logger.info(f"Replay user timeline, target user is '{screen_name}' -> done")
+
+
+if __name__ == "__main__":
+    import logging.config
+    from pathlib import Path
+
+    import orjson
+
+    logging.config.fileConfig("./log/logging.ini", disable_existing_loggers=False)
+
+    CONFIG_FILE_NAME = "./config/config.json"
+    config_dict = orjson.loads(Path(CONFIG_FILE_NAME).read_bytes())
+    config = config_dict["twitter_api_client_list"][0]
+    screen_name, ct0, auth_token = config["screen_name"], config["ct0"], config["auth_token"]
+    twitter = ReplayTwitterAPI(
+        screen_name, ct0, auth_token, ResponseCache("timeline_response"), ResponseCache("likes_response")
+    )
+    print(twitter.get_user_id(screen_name), twitter.get_user_name(screen_name))
+    print(len(twitter.get_user_timeline(screen_name)), len(twitter.get_likes(screen_name)))
@@ -0,0 +1,134 @@
+from collections.abc import Iterator
+from typing import Any
+
+from personal_twilog.util import KeyPath, find_values
+
+
+class TweetResultsExtractor:
+    """GraphQL のレスポンスから tweet_results と rest_id を取り出す
+
+    既知のレイアウト（TweeterPy が返す entry のリスト, twitter-api-client が返すレスポンスのリスト）は
+    コンパイル済のキーパスで必要な階層だけをたどる
+    未知のレイアウトの場合のみ、レスポンス全体を再帰的に探索する find_values にフォールバックする
+
+    Attributes:
+        INSTRUCTIONS_PATH_LIST (list[KeyPath]): レスポンスから instructions へのパス
+        TWEET_RESULTS_PATH_LIST (list[KeyPath]): entry から tweet_results へのパス
+        REST_ID_PATH (KeyPath): tweet_results から rest_id へのパス
+        TWEET_REST_ID_PATH (KeyPath): 階層が異なる tweet_results から rest_id へのパス
+    """
+
+    INSTRUCTIONS_PATH_LIST = [
+        KeyPath("data.user.result.timeline_v2.timeline.instructions"),
+        KeyPath("data.user.result.timeline.timeline.instructions"),
+    ]
+    TWEET_RESULTS_PATH_LIST = [
+        # 通常のツイート
+        KeyPath("content.itemContent.tweet_results"),
+        # 会話（リプライのスレッド）としてまとめられたツイート
+        KeyPath("content.items[].item.itemContent.tweet_results"),
+    ]
+    REST_ID_PATH = KeyPath("result.rest_id")
+    # 返信できるアカウントを制限しているときなど階層が異なる場合がある
+    TWEET_REST_ID_PATH = KeyPath("result.tweet.rest_id")
+
+    @classmethod
+    def _get_instructions(cls, page: dict) -> list | None:
+        for path in cls.INSTRUCTIONS_PATH_LIST:
+            instructions = path.get(page)
+            if isinstance(instructions, list):
+                return instructions
+        return None
+
+    @classmethod
+    def _is_known_layout(cls, obj: Any) -> bool:
+        page_list = obj if isinstance(obj, list) else [obj]
+        for page in page_list:
+            if not isinstance(page, dict):
+                return False
+            if "entryId" in page:
+                continue
+            if cls._get_instructions(page) is None:
+                return False
+        return True
+
+    @classmethod
+    def _iter_entries(cls, obj: Any) -> Iterator[dict]:
+        page_list = obj if isinstance(obj, list) else [obj]
+        for page in page_list:
+            if "entryId" in page:
+                yield page
+                continue
+            for instruction in cls._get_instructions(page):
+                if not isinstance(instruction, dict):
+                    continue
+                # TimelineAddEntries は entries, TimelinePinEntry は entry を持つ
+                if isinstance(entries := instruction.get("entries"), list):
+                    yield from entries
+                if isinstance(entry := instruction.get("entry"), dict):
+                    yield entry
+
+    @classmethod
+    def iter_tweet_results(cls, obj: Any) -> Iterator[dict]:
+        """レスポンスに含まれる tweet_results を出現順に返す
+
+        Args:
+            obj (Any): レスポンス, entry のリスト, またはそれらのリスト
+
+        Returns:
+            Iterator[dict]: tweet_results のイテレータ
+        """
+        if not cls._is_known_layout(obj):
+            yield from find_values(obj, "tweet_results")
+            return
+        for entry in cls._iter_entries(obj):
+            for path in cls.TWEET_RESULTS_PATH_LIST:
+                yield from path.iter_values(entry)
+
+    @classmethod
+    def has_rest_id(cls, tweet_results: dict, rest_id: str) -> bool:
+        """tweet_results が rest_id のツイートかどうか
+
+        tweet_results 直下の result.rest_id があればそれのみで判定する
+        無い場合は未知のレイアウトとして、tweet_results 内のすべての rest_id から探す
+
+        Args:
+            tweet_results (dict): tweet_results
+            rest_id (str): 判定対象の rest_id
+
+        Returns:
+            bool: rest_id のツイートならば True
+        """
+        if (tweet_rest_id := cls.REST_ID_PATH.get(tweet_results)) is not None:
+            return tweet_rest_id == rest_id
+        return rest_id in find_values(tweet_results, "rest_id")
+
+    @classmethod
+    def get_max_rest_id(cls, obj: Any) -> int:
+        """レスポンスに含まれる tweet_results の rest_id のうち最大のもの
+
+        ツイートの ID は時系列順に増加するため、最も新しいツイートの ID となる
+
+        Args:
+            obj (Any): レスポンス, entry のリスト, またはそれらのリスト
+
+        Returns:
+            int: 最大の rest_id, tweet_results が含まれない場合は -1
+        """
+        max_rest_id = -1
+        for tweet_results in cls.iter_tweet_results(obj):
+            rest_id = cls.REST_ID_PATH.get(tweet_results) or cls.TWEET_REST_ID_PATH.get(tweet_results)
+            if isinstance(rest_id, str) and rest_id.isdecimal():
+                max_rest_id = max(max_rest_id, int(rest_id))
+        return max_rest_id
+
+
+if __name__ == "__main__":
+    from pathlib import Path
+
+    import orjson
+
+    cache_path = Path("./tests/cache/timeline_sample.json")
+    tweet_dict = orjson.loads(cache_path.read_bytes())
+    tweet_results_list = list(TweetResultsExtractor.iter_tweet_results(tweet_dict))
+    print(len(tweet_results_list))
@@ -1,13 +1,21 @@
+import pickle
 import pprint
-from copy import deepcopy
+import threading
+from collections.abc import Generator, Iterator
+from datetime import datetime, timedelta
 from logging import INFO, getLogger
 from pathlib import Path
 from typing import Any
 
 import orjson
 from tweeterpy import TweeterPy
+from twitter.constants import Operation
 from twitter.scraper import Scraper
+from twitter.util import build_params, get_cursor, get_headers
 
+from personal_twilog.response_cache import ResponseCache
+from personal_twilog.util import find_values
+from personal_twilog.webapi.tweet_results_extractor import TweetResultsExtractor
 from personal_twilog.webapi.valueobject.screen_name import ScreenName
 from personal_twilog.webapi.valueobject.token import Token
 from personal_twilog.webapi.valueobject.user_id import UserId
@@ -18,6 +26,33 @@ logger.setLevel(INFO)
 
 
 class TwitterAPI:
+    """Twitter の非公式 API を扱うクラス
+
+    認証済セッション（ヘッダ, cookie）とログインユーザの情報 me を session_path にキャッシュし、
+    次回以降の実行で再利用する
+    キャッシュは auth_token が一致し、保存から SESSION_CACHE_TTL 以内の場合のみ有効とする
+    復元したセッションはログインユーザの取得で確認し、認証できなければセッションを生成し直してキャッシュも更新する
+    ゲストトークンなど、TweeterPy の生成ごとに作り直されるヘッダと cookie はキャッシュしない
+    TweeterPy の生成とセッションの生成は、TL 取得などで初めて必要になった時点で行う
+    複数スレッドから同時に参照されても生成が1回で済むように、生成はロックを取って行う
+
+    Likes は1ページずつ取得し、取得を limit 件で打ち切った場合は続きのページのカーソルを likes_cursor_path に保存して、
+    次回以降の実行で続きから取得する（打ち切りが続いた場合もカーソルは上書きせずにすべて保持する）
+
+    Attributes:
+        SESSION_CACHE_TTL (timedelta): セッションキャッシュの有効期間
+        VOLATILE_HEADER_NAMES (tuple[str, ...]): キャッシュしないヘッダ名（小文字）
+        VOLATILE_COOKIE_NAMES (tuple[str, ...]): キャッシュしない cookie 名
+        LIKES_URL (str): Likes を取得する GraphQL のエンドポイント
+        LIKES_PAGE_SIZE (int): Likes の1ページあたりの件数
+    """
+
+    SESSION_CACHE_TTL = timedelta(days=3)
+    VOLATILE_HEADER_NAMES = ("x-guest-token", "x-client-transaction-id")
+    VOLATILE_COOKIE_NAMES = ("gt",)
+    LIKES_URL = "https://twitter.com/i/api/graphql/{qid}/{name}"
+    LIKES_PAGE_SIZE = 20
+
     authorize_screen_name: ScreenName
     token: Token
 
@@ -29,16 +64,138 @@ class TwitterAPI:
         self.auth_token = auth_token
         self.target_screen_name = authorize_screen_name
 
-        self.twitter = TweeterPy()
-        self.session_path.parent.mkdir(parents=True, exist_ok=True)
-        self.twitter.generate_session(auth_token=self.auth_token)
-        # self.twitter.save_session(path=Path(self.session_path).parent)
+        self._twitter: TweeterPy | None = None
+        self._me: dict = {}
+        self._session_cache: dict | None = None
+        # twitter, me の遅延生成と refresh_session を直列化するロック（refresh_session は生成中にも呼ばれる）
+        self._session_lock = threading.RLock()
+        # iter_likes で更新し、save_likes_cursor で保存する Likes のカーソル
+        self._likes_cursor_dict: dict | None = None
 
     @property
     def session_path(self) -> Path:
         """セッションファイルパス"""
         return Path(__file__).parent / f"cache/session/{self.target_screen_name}.pkl"
 
+    @property
+    def likes_cursor_path(self) -> Path:
+        """Likes のカーソルファイルパス"""
+        return Path(__file__).parent / f"cache/likes_cursor/{self.target_screen_name}.json"
+
+    def _load_session_cache(self) -> dict:
+        """有効なセッションキャッシュを読み込む
+
+        Returns:
+            dict: {"headers", "cookies", "me", "saved_at"} の辞書, キャッシュが無いか無効な場合は空辞書
+        """
+        if self._session_cache is not None:
+            return self._session_cache
+        self._session_cache = {}
+        if not self.session_path.is_file():
+            return self._session_cache
+
+        try:
+            cache = pickle.loads(self.session_path.read_bytes())
+            saved_at = datetime.fromisoformat(cache["saved_at"])
+            is_valid = (
+                cache["cookies"].get("auth_token") == self.auth_token
+                and datetime.now() - saved_at <= self.SESSION_CACHE_TTL
+                and bool(cache["me"])
+            )
+        except Exception as e:
+            logger.warning(f"Session cache of '{self.target_screen_name}' is broken: {e}")
+            return self._session_cache
+        if is_valid:
+            self._session_cache = cache
+        return self._session_cache
+
+    def _filter_volatile(self, headers: dict, cookies: dict) -> tuple[dict, dict]:
+        """headers, cookies からゲストトークンなどの揮発する値を除く
+
+        Returns:
+            tuple[dict, dict]: (揮発する値を除いた headers, 揮発する値を除いた cookies)
+        """
+        headers = {k: v for k, v in headers.items() if k.lower() not in self.VOLATILE_HEADER_NAMES}
+        cookies = {k: v for k, v in cookies.items() if k not in self.VOLATILE_COOKIE_NAMES}
+        return headers, cookies
+
+    def _save_session_cache(self) -> None:
+        """現在のセッションと me をセッションキャッシュに保存する"""
+        session = self._twitter.session
+        headers, cookies = self._filter_volatile(dict(session.headers), dict(session.cookies))
+        cache = {
+            "headers": headers,
+            "cookies": cookies,
+            "me": self._me,
+            "saved_at": datetime.now().replace(microsecond=0).isoformat(),
+        }
+        self.session_path.parent.mkdir(parents=True, exist_ok=True)
+        self.session_path.write_bytes(pickle.dumps(cache))
+        self._session_cache = cache
+
+    def refresh_session(self) -> None:
+        """認証済セッションを生成し直し、me を取得してセッションキャッシュに保存する"""
+        with self._session_lock:
+            logger.info(f"Generate session of '{self.target_screen_name}'.")
+            if self._twitter is None:
+                self._twitter = TweeterPy(log_level="WARNING")
+            self._twitter.generate_session(auth_token=self.auth_token)
+            me = self._twitter.me
+            if not me:
+                raise ValueError(f"Failed to authenticate session of '{self.target_screen_name}'.")
+            self._me = me
+            self._save_session_cache()
+
+    @property
+    def twitter(self) -> TweeterPy:
+        """認証済の TweeterPy
+
+        初回アクセス時に生成し、有効なセッションキャッシュがあればそのヘッダと cookie を復元する
+        無い場合と、復元したセッションでログインユーザを取得できなかった場合はセッションを生成し直す
+        """
+        if self._twitter is not None:
+            return self._twitter
+        with self._session_lock:
+            if self._twitter is not None:
+                return self._twitter
+            cache = self._load_session_cache()
+            if not cache:
+                self.refresh_session()
+                return self._twitter
+
+            # TweeterPy の生成時に作られたゲストセッションに、揮発しないヘッダと cookie のみを重ねる
+            twitter = TweeterPy(log_level="WARNING")
+            headers, cookies = self._filter_volatile(cache["headers"], cache["cookies"])
+            twitter.session.headers.update(headers)
+            twitter.session.cookies.update(cookies)
+            self._twitter = twitter
+
+            # TweeterPy は TL 取得の失敗を空の結果として返すため、期限切れのセッションはここで検出する
+            if me := twitter.me:
+                self._me = me
+            else:
+                logger.warning(f"Session cache of '{self.target_screen_name}' is not authenticated.")
+                self.refresh_session()
+            return self._twitter
+
+    @twitter.setter
+    def twitter(self, twitter: TweeterPy) -> None:
+        self._twitter = twitter
+
+    @property
+    def me(self) -> dict:
+        """ログインユーザの情報, セッションキャッシュにあればそれを使う"""
+        if self._me:
+            return self._me
+        with self._session_lock:
+            if self._me:
+                return self._me
+            if cache := self._load_session_cache():
+                self._me = cache["me"]
+            else:
+                self.refresh_session()
+            return self._me
+
     @property
     def scraper(self) -> Scraper:
         if hasattr(self, "_scraper"):
@@ -49,18 +206,7 @@ class TwitterAPI:
         return self._scraper
 
     def _find_values(self, obj: Any, key: str) -> list:
-        def _inner_helper(inner_obj: Any, inner_key: str, inner_result: list) -> list:
-            if isinstance(inner_obj, dict) and (inner_dict := inner_obj):
-                for k, v in inner_dict.items():
-                    if k == inner_key:
-                        inner_result.append(v)
-                    inner_result.extend(_inner_helper(v, inner_key, []))
-            if isinstance(inner_obj, list) and (inner_list := inner_obj):
-                for element in inner_list:
-                    inner_result.extend(_inner_helper(element, inner_key, []))
-            return inner_result
-
-        return _inner_helper(obj, key, [])
+        return find_values(obj, key)
 
     def _get_user(self, screen_name: ScreenName | str) -> dict:
         if isinstance(screen_name, ScreenName):
@@ -78,72 +224,270 @@ class TwitterAPI:
         return user_dict
 
     def get_user_id(self, screen_name: ScreenName | str) -> UserId:
-        user_dict: dict = self.twitter.me
+        user_dict: dict = self.me
         user_id: int = int(self._find_values(user_dict, "rest_id")[0])
         return UserId(user_id)
 
     def get_user_name(self, screen_name: ScreenName | str) -> UserName:
-        user_dict: dict = self.twitter.me
+        user_dict: dict = self.me
         user_name: str = self._find_values(user_dict, "name")[0]
         return UserName(user_name)
 
-    def get_likes(self, screen_name: str, limit: int = 300, min_id: int = -1) -> list[dict]:
+    def _load_likes_cursor(self, screen_name: str) -> dict:
+        """保存済の Likes のカーソルを読み込む
+
+        Returns:
+            dict: {"screen_name", "gap_list"} の辞書, 保存されていない場合は空辞書
+                  gap_list は {"cursor", "stop_id_list"} の辞書のリストで、新しい Likes の抜けから順に並ぶ
+        """
+        if not self.likes_cursor_path.is_file():
+            return {}
+        try:
+            cursor_dict = orjson.loads(self.likes_cursor_path.read_bytes())
+        except orjson.JSONDecodeError as e:
+            logger.warning(f"Likes cursor of '{self.target_screen_name}' is broken: {e}")
+            return {}
+        if cursor_dict.get("screen_name") != screen_name or not cursor_dict.get("gap_list"):
+            return {}
+        return cursor_dict
+
+    def save_likes_cursor(self) -> None:
+        """直前の iter_likes, get_likes で更新した Likes のカーソルを保存する
+
+        取得した Likes を DB に書き込んだ後に呼び出す（書き込み前に中断した場合は、次回も同じカーソルから取得する）
+        続きのページが無い場合はカーソルファイルを削除する
+        """
+        if self._likes_cursor_dict is None:
+            return
+        if self._likes_cursor_dict:
+            self.likes_cursor_path.parent.mkdir(parents=True, exist_ok=True)
+            self.likes_cursor_path.write_bytes(orjson.dumps(self._likes_cursor_dict))
+        else:
+            self.likes_cursor_path.unlink(missing_ok=True)
+        self._likes_cursor_dict = None
+
+    def iter_likes_pages(self, user_id: int, cursor: str | None = None) -> Iterator[tuple[dict, str | None]]:
+        """Likes を1ページずつ取得して、各ページのレスポンスと次のページのカーソルを返す
+
+        Scraper の認証済セッションで、Scraper.likes と同じ GraphQL のリクエストを1ページ分ずつ行う
+        ページは要求されたときに初めて取得するため、呼び出し側が途中で読むのをやめればそれ以降のリクエストは行わない
+
+        Args:
+            user_id (int): 対象ユーザの ID
+            cursor (str | None): 最初に取得するページのカーソル, None なら先頭から取得する
+
+        Returns:
+            Iterator[tuple[dict, str | None]]: (ページのレスポンス, 次のページのカーソル)
+        """
+        keys, qid, name = Operation.Likes
+        session = self.scraper.session
+        while True:
+            variables = Operation.default_variables | {"userId": user_id, "count": self.LIKES_PAGE_SIZE}
+            if cursor:
+                variables["cursor"] = cursor
+            params = build_params({"variables": variables, "features": Operation.default_features})
+            response = session.get(
+                self.LIKES_URL.format(qid=qid, name=name), params=params, headers=get_headers(session)
+            )
+            response.raise_for_status()
+            page: dict = response.json()
+            cursor = get_cursor(page)
+            yield page, cursor
+
+            # 最後のページ以降もカーソルは返るため、ツイートを含まないページで終了する
+            if not cursor or TweetResultsExtractor.get_max_rest_id(page) == -1:
+                return
+
+    def _iter_likes_from(
+        self, user_id: int, cursor: str | None, stop_id_set: set[str], limit: int
+    ) -> Generator[list[dict], None, tuple[int, str | None]]:
+        """cursor のページから Likes を1ページずつ返す
+
+        stop_id_set に含まれるツイートに到達するか、limit 件以上返すか、最後のページまで取得したら打ち切る
+        limit による打ち切りはページ単位で行う（ページの途中で打ち切ると、続きから取得する際にページの残りが抜ける）
+
+        Yields:
+            list[dict]: 1ページ分の Likes のリスト, Likes を含まないページは返さない
+
+        Returns:
+            tuple[int, str | None]: (返した Likes の件数, limit 件で打ち切った場合は続きのページのカーソル)
+        """
+        num = 0
+        for page, next_cursor in self.iter_likes_pages(user_id, cursor):
+            tweet_list = []
+            is_reached = False
+            for data_dict in TweetResultsExtractor.iter_tweet_results(page):
+                # 返信できるアカウントを制限しているときなど階層が異なる場合がある
+                if t := data_dict.get("result", {}).get("tweet", {}):
+                    data_dict: dict = {"result": t}
+                # 保存済の Likes に到達したら取得を打ち切る
+                if TweetResultsExtractor.REST_ID_PATH.get(data_dict) in stop_id_set:
+                    is_reached = True
+                    break
+                if data_dict:
+                    tweet_list.append(data_dict)
+            num += len(tweet_list)
+            if tweet_list:
+                yield tweet_list
+            if is_reached:
+                return num, None
+            if num >= limit:
+                return num, next_cursor
+        return num, None
+
+    def iter_likes(
+        self, screen_name: str, limit: int = 300, known_id_set: set[str] | None = None
+    ) -> Iterator[list[dict]]:
+        """Likes のうち、保存済のものより新しいものを1ページずつ返す
+
+        先頭のページから、known_id_set に含まれるツイートに到達するまで1ページずつ取得する
+        limit 件を超えたページで打ち切った場合は、そこから保存済の Likes までが抜けとなるため、
+        続きのページのカーソルを抜けとして保持し、次回以降の実行で先頭側の取得の後に残りの件数分だけ続きから取得する
+        抜けは複数保持し、新しい Likes の抜けから順に取得する
+        （1回の実行で返す Likes 全体が、いいねした順の新しいものから古いものへ並ぶようにするため）
+        保持した抜けは、最後まで読み終えた時点で確定する（保存は save_likes_cursor で行う）
+
+        Args:
+            screen_name (str): 対象の screen_name
+            limit (int): 取得する件数の目安, この件数を超えたページで打ち切る
+            known_id_set (set[str] | None): 保存済の Likes の tweet_id の集合
+
+        Returns:
+            Iterator[list[dict]]: 1ページ分の、保存済のものを含まない Likes のリスト
+        """
         logger.info(f"GET like, target user is '{screen_name}' -> start")
-        result = []
-
+        known_id_set = known_id_set or set()
         target_id = self.get_user_id(screen_name)
-        likes = self.scraper.likes([target_id.id], limit=limit)
-
-        # entries のみ対象とする
-        entry_list: list[dict] = self._find_values(likes, "entries")
-        tweet_results: list[dict] = self._find_values(entry_list, "tweet_results")
-
-        tweet_list = []
-        for data_dict in tweet_results:
-            # 返信できるアカウントを制限しているときなど階層が異なる場合がある
-            if t := data_dict.get("result", {}).get("tweet", {}):
-                data_dict: dict = {"result": t}
-            if data_dict:
-                tweet_list.append(data_dict)
-            # 現在の id_str を取得して min_id と一致していたら取得を打ち切る
-            tweet_ids = self._find_values(data_dict, "rest_id")
-            if str(min_id) in tweet_ids:
-                break
-        result.extend(tweet_list)
-
-        result = tweet_list[:limit]
+        gap_list: list[dict] = self._load_likes_cursor(screen_name).get("gap_list", [])
+        # 抜けを作った時点で保存済だった Likes でも止める
+        stop_id_set = known_id_set.union(*(gap["stop_id_list"] for gap in gap_list))
+
+        num, head_cursor = yield from self._iter_likes_from(target_id.id, None, stop_id_set, limit)
+        next_gap_list = []
+        if head_cursor:
+            next_gap_list.append({"cursor": head_cursor, "stop_id_list": sorted(known_id_set)})
+        for gap in gap_list:
+            if num >= limit:
+                next_gap_list.append(gap)
+                continue
+            logger.info(f"Resume getting like of '{screen_name}' from the saved cursor.")
+            gap_num, gap_cursor = yield from self._iter_likes_from(
+                target_id.id, gap["cursor"], stop_id_set, limit - num
+            )
+            num += gap_num
+            if gap_cursor:
+                next_gap_list.append(gap | {"cursor": gap_cursor})
+
+        self._likes_cursor_dict = {}
+        if next_gap_list:
+            self._likes_cursor_dict = {"screen_name": screen_name, "gap_list": next_gap_list}
         logger.info(f"GET like, target user is '{screen_name}' -> done")
-        return result
 
-    def get_user_timeline(self, screen_name: str, limit: int = 300, min_id: int = -1) -> list[dict]:
+    def get_likes(self, screen_name: str, limit: int = 300, known_id_set: set[str] | None = None) -> list[dict]:
+        """Likes のうち、保存済のものより新しいものを取得する
+
+        iter_likes が返すページをまとめたリストを返す
+
+        Args:
+            screen_name (str): 対象の screen_name
+            limit (int): 取得する件数の目安, この件数を超えたページで打ち切る
+            known_id_set (set[str] | None): 保存済の Likes の tweet_id の集合
+
+        Returns:
+            list[dict]: 保存済のものを含まない Likes のリスト
+        """
+        return [
+            data_dict for tweet_list in self.iter_likes(screen_name, limit, known_id_set) for data_dict in tweet_list
+        ]
+
+    def iter_user_timeline_pages(self, user_id: int, min_id: int = -1) -> Iterator[list[dict]]:
+        """TL を1ページずつ取得して、各ページの entry のリストを返す
+
+        ページは要求されたときに初めて取得するため、呼び出し側が途中で読むのをやめればそれ以降のリクエストは行わない
+        また、min_id 以下の ID のツイートのみからなる entry を含むページを返した時点で、次のページを要求せずに終了する
+        （それより後のページは取得済のツイートのみとなるため）
+
+        Args:
+            user_id (int): 対象ユーザの ID
+            min_id (int): 取得済のツイートのうち最大の ID, -1 なら最後のページまで取得する
+
+        Returns:
+            Iterator[list[dict]]: 各ページの entry のリスト
+        """
+        end_cursor = None
+        while True:
+            page = self.twitter.get_user_tweets(
+                user_id=user_id, with_replies=True, end_cursor=end_cursor, pagination=False
+            )
+            entry_list: list[dict] = page.get("data", [])
+            yield entry_list
+
+            end_cursor = page.get("cursor_endpoint")
+            if not entry_list or not end_cursor or not page.get("has_next_page"):
+                return
+            if any(-1 < TweetResultsExtractor.get_max_rest_id(entry) <= min_id for entry in entry_list):
+                return
+
+    def iter_user_timeline(self, screen_name: str, limit: int = 300, min_id: int = -1) -> Iterator[list[dict]]:
+        """TL のうち、min_id のツイートまでを1ページずつ返す
+
+        iter_user_timeline_pages で1ページずつ取得し、min_id のツイート（このツイートを含む）までか、limit 件まで返す
+        取得したページはそのまま1行ずつ ./data のキャッシュに書き込み、全ページ分をメモリに溜めない
+
+        Args:
+            screen_name (str): 対象の screen_name
+            limit (int): 返す件数の上限
+            min_id (int): 取得済のツイートのうち最大の ID, このツイートを含めて打ち切る
+
+        Returns:
+            Iterator[list[dict]]: 1ページ分のツイートのリスト, ツイートを含まないページは返さない
+        """
         logger.info(f"GET user timeline, target user is '{screen_name}' -> start")
-        result = []
-
         target_id = self.get_user_id(screen_name)
-        timeline_tweets = self.twitter.get_user_tweets(user_id=target_id.id, with_replies=True, total=limit)["data"]
-        data_cache_path = Path("./data/get_user_tweets.json")
-        data_cache_path.write_bytes(orjson.dumps(timeline_tweets, option=orjson.OPT_INDENT_2))
-
-        # entry_list: list[dict] = self._find_values(timeline_tweets, "entries")
-        entry_list = deepcopy(timeline_tweets)
-        tweet_results: list[dict] = self._find_values(entry_list, "tweet_results")
-
-        tweet_list = []
-        for data_dict in tweet_results:
-            # 返信できるアカウントを制限しているときなど階層が異なる場合がある
-            if t := data_dict.get("result", {}).get("tweet", {}):
-                data_dict: dict = {"result": t}
-            if data_dict:
-                tweet_list.append(data_dict)
-            # 現在の id_str を取得して min_id と一致していたら取得を打ち切る
-            tweet_ids = self._find_values(data_dict, "rest_id")
-            if str(min_id) in tweet_ids:
-                break
-        result.extend(tweet_list)
-
-        result = tweet_list[:limit]
+        min_id_str = str(min_id)
+        num = 0
+        data_cache = ResponseCache("get_user_tweets", "./data")
+        with data_cache.open_writer(screen_name) as data_cache_writer:
+            for page_entry_list in self.iter_user_timeline_pages(target_id.id, min_id):
+                data_cache_writer.write(page_entry_list)
+                tweet_list = []
+                is_reached = False
+                # レスポンスは読むだけなのでコピーせずに走査する
+                for data_dict in TweetResultsExtractor.iter_tweet_results(page_entry_list):
+                    # 返信できるアカウントを制限しているときなど階層が異なる場合がある
+                    if t := data_dict.get("result", {}).get("tweet", {}):
+                        data_dict: dict = {"result": t}
+                    if data_dict:
+                        tweet_list.append(data_dict)
+                    # 現在の id_str を取得して min_id と一致していたら取得を打ち切る
+                    if TweetResultsExtractor.has_rest_id(data_dict, min_id_str):
+                        is_reached = True
+                        break
+                tweet_list = tweet_list[: limit - num]
+                num += len(tweet_list)
+                if tweet_list:
+                    yield tweet_list
+                # min_id のツイートまで、または limit 件まで取得したら次のページは要求しない
+                if is_reached or num >= limit:
+                    break
         logger.info(f"GET user timeline, target user is '{screen_name}' -> done")
-        return result
+
+    def get_user_timeline(self, screen_name: str, limit: int = 300, min_id: int = -1) -> list[dict]:
+        """TL のうち、min_id のツイートまでを取得する
+
+        iter_user_timeline が返すページをまとめたリストを返す
+
+        Args:
+            screen_name (str): 対象の screen_name
+            limit (int): 返す件数の上限
+            min_id (int): 取得済のツイートのうち最大の ID, このツイートを含めて打ち切る
+
+        Returns:
+            list[dict]: TL のツイートのリスト
+        """
+        return [
+            data_dict for tweet_list in self.iter_user_timeline(screen_name, limit, min_id) for data_dict in tweet_list
+        ]
 
 
 if __name__ == "__main__":
@@ -86,11 +86,12 @@ class FetchedTweetList:
 if __name__ == "__main__":
     from pathlib import Path
 
-    import orjson
+    from personal_twilog.response_cache import ResponseCache
 
     data_cache_path = Path("./data/")
-    cache_path = data_cache_path / "get_user_tweets.json"
-    tweet_dict = orjson.loads(cache_path.read_bytes())
+    # 最後に保存した TwitterAPI.get_user_timeline のレスポンス（1行に1ページ）
+    cache_path = max(data_cache_path.glob(f"get_user_tweets_*{ResponseCache.SUFFIX}"), key=lambda p: p.stat().st_mtime)
+    tweet_dict = list(ResponseCache.iter_path(cache_path))
     tweet_results: list[dict] = find_values(tweet_dict, "tweet_results")
     for tweet in tweet_results:
         key_path = ("result", "rest_id")
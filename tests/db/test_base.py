@@ -1,11 +1,11 @@
 import sys
 import unittest
+from dataclasses import FrozenInstanceError
 from typing import Any
 
-from mock import patch
-from sqlalchemy.pool import StaticPool
+from mock import MagicMock, patch
 
-from personal_twilog.db.base import Base
+from personal_twilog.db.base import Base, UpsertCount
 from personal_twilog.util import Result
 
 
@@ -22,9 +22,10 @@ class ConcreteBase(Base):
 
 class TestBase(unittest.TestCase):
     def test_init(self):
-        mock_create_engine = self.enterContext(patch("personal_twilog.db.base.create_engine"))
-        mock_create_all = self.enterContext(patch("personal_twilog.db.base.ModelBase.metadata.create_all"))
-        mock_create_engine.return_value = "create_engine()"
+        mock_engine_registry = self.enterContext(patch("personal_twilog.db.base.EngineRegistry"))
+        mock_sessionmaker = self.enterContext(patch("personal_twilog.db.base.sessionmaker"))
+        mock_engine_registry.get_engine.return_value = "engine"
+        mock_sessionmaker.return_value = "sessionmaker()"
 
         db_path = "timeline.db"
         db_url = f"sqlite:///{db_path}"
@@ -32,20 +33,61 @@ class TestBase(unittest.TestCase):
 
         self.assertEqual(db_path, instance.db_path)
         self.assertEqual(db_url, instance.db_url)
-        mock_create_engine.assert_called_once_with(
-            db_url,
-            echo=False,
-            poolclass=StaticPool,
-            connect_args={
-                "timeout": 30,
-                "check_same_thread": False,
-            },
-        )
-        mock_create_all.assert_called_once_with("create_engine()")
+        mock_engine_registry.get_engine.assert_called_once_with(db_path)
+        self.assertEqual("engine", instance.engine)
+        mock_sessionmaker.assert_called_once_with(bind="engine", autoflush=False)
+        self.assertEqual("sessionmaker()", instance.Session)
 
         self.assertEqual(["select()"], instance.select())
         self.assertEqual([Result.success], instance.upsert([]))
 
+    def test_session_scope(self):
+        self.enterContext(patch("personal_twilog.db.base.EngineRegistry"))
+        mock_sessionmaker = self.enterContext(patch("personal_twilog.db.base.sessionmaker"))
+        mock_session = MagicMock()
+        mock_sessionmaker.return_value.return_value = mock_session
+        instance = ConcreteBase()
+
+        # session 未指定なら新規作成して commit, close する
+        with instance._session_scope() as session:
+            self.assertIs(mock_session, session)
+        mock_session.commit.assert_called_once_with()
+        mock_session.rollback.assert_not_called()
+        mock_session.close.assert_called_once_with()
+
+        # 例外発生時は rollback して再送出する
+        mock_session.reset_mock()
+        with self.assertRaises(ValueError):
+            with instance._session_scope() as session:
+                raise ValueError
+        mock_session.commit.assert_not_called()
+        mock_session.rollback.assert_called_once_with()
+        mock_session.close.assert_called_once_with()
+
+        # session 指定時はそのまま使い、commit/rollback/close は呼び出し元に任せる
+        mock_session.reset_mock()
+        mock_sessionmaker.return_value.reset_mock()
+        outer_session = MagicMock()
+        with instance._session_scope(outer_session) as session:
+            self.assertIs(outer_session, session)
+        with self.assertRaises(ValueError):
+            with instance._session_scope(outer_session) as session:
+                raise ValueError
+        outer_session.commit.assert_not_called()
+        outer_session.rollback.assert_not_called()
+        outer_session.close.assert_not_called()
+        mock_sessionmaker.return_value.assert_not_called()
+
+    def test_upsert_count(self):
+        actual = UpsertCount()
+        self.assertEqual(0, actual.inserted)
+        self.assertEqual(0, actual.updated)
+        actual = UpsertCount(1, 2)
+        self.assertEqual(1, actual.inserted)
+        self.assertEqual(2, actual.updated)
+        with self.assertRaises(FrozenInstanceError):
+            actual.inserted = 3
+
 
 if __name__ == "__main__":
     if sys.argv:
@@ -0,0 +1,109 @@
+import sys
+import unittest
+from pathlib import Path
+
+from mock import patch
+from sqlalchemy import inspect, text
+from sqlalchemy.pool import StaticPool
+
+from personal_twilog.db.engine_registry import EngineRegistry
+
+
+class TestEngineRegistry(unittest.TestCase):
+    def setUp(self):
+        self.enterContext(patch("personal_twilog.db.engine_registry.logger"))
+        self.db_path = Path("./tests/engine_registry_test.db")
+        self.db_path.unlink(missing_ok=True)
+
+    def tearDown(self):
+        EngineRegistry.dispose()
+        EngineRegistry._wal_key_set.clear()
+        for path in [self.db_path, Path(f"{self.db_path}-wal"), Path(f"{self.db_path}-shm")]:
+            path.unlink(missing_ok=True)
+
+    def _get_pragma(self, engine, name: str) -> str | int:
+        with engine.connect() as conn:
+            return conn.execute(text(f"PRAGMA {name}")).one()[0]
+
+    def test_create_engine(self):
+        mock_create_engine = self.enterContext(patch("personal_twilog.db.engine_registry.create_engine"))
+        mock_create_all = self.enterContext(patch("personal_twilog.db.engine_registry.ModelBase.metadata.create_all"))
+        mock_migration = self.enterContext(patch("personal_twilog.db.engine_registry.Migration"))
+        mock_create_engine.return_value = "create_engine()"
+
+        actual = EngineRegistry._create_engine("timeline.db")
+        self.assertEqual("create_engine()", actual)
+        mock_create_engine.assert_called_once_with(
+            "sqlite:///timeline.db",
+            echo=False,
+            poolclass=StaticPool,
+            connect_args={
+                "timeout": 30,
+                "check_same_thread": False,
+            },
+        )
+        mock_create_all.assert_called_once_with("create_engine()")
+        mock_migration.assert_called_once_with("create_engine()")
+        mock_migration.return_value.run.assert_called_once_with()
+
+    def test_get_engine(self):
+        engine = EngineRegistry.get_engine(str(self.db_path))
+        table_names = inspect(engine).get_table_names()
+        self.assertIn("Tweet", table_names)
+        self.assertIn("Likes", table_names)
+
+        # インメモリDBは共有しない
+        memory_engine = EngineRegistry.get_engine(":memory:")
+        self.assertIsNot(memory_engine, EngineRegistry.get_engine(":memory:"))
+        self.assertIn("Tweet", inspect(memory_engine).get_table_names())
+
+        # 同じファイルを指すならば同じ engine を返し、スキーマ作成は行わない
+        mock_create_all = self.enterContext(patch("personal_twilog.db.engine_registry.ModelBase.metadata.create_all"))
+        self.assertIs(engine, EngineRegistry.get_engine(str(self.db_path)))
+        self.assertIs(engine, EngineRegistry.get_engine(str(self.db_path.resolve())))
+        mock_create_all.assert_not_called()
+
+    def test_enable_wal(self):
+        # 既定では WAL は無効
+        engine = EngineRegistry.get_engine(str(self.db_path))
+        self.assertEqual("delete", self._get_pragma(engine, "journal_mode"))
+
+        # engine 生成済の場合は既存の接続に直ちに設定する
+        EngineRegistry.enable_wal(str(self.db_path))
+        self.assertEqual("wal", self._get_pragma(engine, "journal_mode"))
+        self.assertEqual(1, self._get_pragma(engine, "synchronous"))  # NORMAL
+
+        # engine 生成前の場合は接続時に設定する
+        EngineRegistry.dispose()
+        engine = EngineRegistry.get_engine(str(self.db_path))
+        self.assertEqual("wal", self._get_pragma(engine, "journal_mode"))
+        self.assertEqual(1, self._get_pragma(engine, "synchronous"))
+
+        # 2回目以降の呼び出しは何もしない
+        EngineRegistry.enable_wal(str(self.db_path.resolve()))
+        self.assertEqual({str(self.db_path.resolve())}, EngineRegistry._wal_key_set)
+
+        # インメモリDBは対象外
+        EngineRegistry.enable_wal(":memory:")
+        self.assertEqual({str(self.db_path.resolve())}, EngineRegistry._wal_key_set)
+        memory_engine = EngineRegistry.get_engine(":memory:")
+        self.assertEqual("memory", self._get_pragma(memory_engine, "journal_mode"))
+
+    def test_dispose(self):
+        engine = EngineRegistry.get_engine(str(self.db_path))
+        EngineRegistry.dispose(str(self.db_path))
+        self.assertIsNot(engine, EngineRegistry.get_engine(str(self.db_path)))
+
+        engine = EngineRegistry.get_engine(str(self.db_path))
+        EngineRegistry.dispose()
+        self.assertEqual({}, EngineRegistry._engine_dict)
+        self.assertIsNot(engine, EngineRegistry.get_engine(str(self.db_path)))
+
+        # 未登録のパスを指定してもエラーにならない
+        EngineRegistry.dispose("not_registered.db")
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -3,6 +3,7 @@ import unittest
 
 from sqlalchemy.orm import sessionmaker
 
+from personal_twilog.db.base import UpsertCount
 from personal_twilog.db.likes_db import LikesDB
 from personal_twilog.db.model import Likes
 from personal_twilog.util import Result
@@ -87,6 +88,33 @@ class TestLikesDB(unittest.TestCase):
         actual = instance.select_for_max_id("not_found")
         self.assertEqual(expect, actual)
 
+    def test_select_recent_tweet_ids(self):
+        instance = self._get_instance()
+        Session = sessionmaker(bind=instance.engine, autoflush=False)
+        session = Session()
+        for i in range(5):
+            r = Likes.create(self._make_record_dict(i))
+            r.screen_name = "screen_name"
+            session.add(r)
+        r = Likes.create(self._make_record_dict(5))
+        r.screen_name = "other_screen_name"
+        session.add(r)
+        session.commit()
+        session.close()
+
+        record_list = instance.select()
+        tweet_id_list = [r.tweet_id for r in record_list if r.screen_name == "screen_name"]
+
+        actual = instance.select_recent_tweet_ids("screen_name")
+        self.assertEqual(set(tweet_id_list), actual)
+
+        # 直近に登録したものから limit 件
+        actual = instance.select_recent_tweet_ids("screen_name", 2)
+        self.assertEqual(set(tweet_id_list[-2:]), actual)
+
+        actual = instance.select_recent_tweet_ids("not_found")
+        self.assertEqual(set(), actual)
+
     def test_upsert(self):
         instance = self._get_instance()
         Session = sessionmaker(bind=instance.engine, autoflush=False)
@@ -128,6 +156,62 @@ class TestLikesDB(unittest.TestCase):
         actual = instance.upsert("invalid")
         self.assertEqual(Result.failed, actual)
 
+    def test_bulk_upsert(self):
+        instance = self._get_instance()
+
+        # insert
+        record_list = [self._make_record_dict(i) for i in range(5)]
+        actual = instance.bulk_upsert(record_list)
+        self.assertEqual(UpsertCount(5, 0), actual)
+        actual = [r.to_dict() for r in instance.select()]
+        self.assertEqual(record_list, actual)
+
+        # update と insert の混在, バッチ境界を跨ぐ
+        # update 時はidと日付関係を更新しない
+        instance.UPSERT_BATCH_SIZE = 2
+        record_list = [self._make_record_dict(i) for i in range(3, 8)]
+        for r in record_list:
+            r["tweet_text"] = "new_tweet_text"
+            r["created_at"] = "new_created_at"
+            r["appeared_at"] = "new_appeared_at"
+            r["registered_at"] = "new_registered_at"
+        actual = instance.bulk_upsert(record_list)
+        self.assertEqual(UpsertCount(3, 2), actual)
+
+        expect = [self._make_record_dict(i) for i in range(8)]
+        for i, r in enumerate(expect):
+            if i < 3:
+                continue
+            r["tweet_text"] = "new_tweet_text"
+            if i < 5:
+                continue
+            r["created_at"] = "new_created_at"
+            r["appeared_at"] = "new_appeared_at"
+            r["registered_at"] = "new_registered_at"
+        actual = instance.select()
+        self.assertEqual(list(range(1, 9)), [r.id for r in actual])
+        self.assertEqual(expect, [r.to_dict() for r in actual])
+
+        # 同一呼び出し内での重複は後勝ちで UPDATE 扱い
+        record = self._make_record_dict(8)
+        dup_record = self._make_record_dict(8)
+        dup_record["tweet_text"] = "dup_tweet_text"
+        actual = instance.bulk_upsert([record, dup_record])
+        self.assertEqual(UpsertCount(1, 1), actual)
+        self.assertEqual(dup_record, instance.select()[8].to_dict())
+
+        # 空リスト指定
+        actual = instance.bulk_upsert([])
+        self.assertEqual(UpsertCount(0, 0), actual)
+
+        # 引数が不正
+        with self.assertRaises(ValueError):
+            actual = instance.bulk_upsert([self._make_record_dict(0), "invalid"])
+        with self.assertRaises(ValueError):
+            actual = instance.bulk_upsert([{"invalid_key": "invalid_value"}])
+        with self.assertRaises(ValueError):
+            actual = instance.bulk_upsert("invalid")
+
 
 if __name__ == "__main__":
     if sys.argv:
@@ -3,6 +3,7 @@ import unittest
 
 from sqlalchemy.orm import sessionmaker
 
+from personal_twilog.db.base import UpsertCount
 from personal_twilog.db.media_db import MediaDB
 from personal_twilog.db.model import Media
 from personal_twilog.util import Result
@@ -95,6 +96,62 @@ class TestMediaDB(unittest.TestCase):
         actual = instance.upsert("invalid")
         self.assertEqual(Result.failed, actual)
 
+    def test_bulk_upsert(self):
+        instance = self._get_instance()
+
+        # insert
+        record_list = [self._make_record_dict(i) for i in range(5)]
+        actual = instance.bulk_upsert(record_list)
+        self.assertEqual(UpsertCount(5, 0), actual)
+        actual = [r.to_dict() for r in instance.select()]
+        self.assertEqual(record_list, actual)
+
+        # update と insert の混在, バッチ境界を跨ぐ
+        # update 時はidと日付関係を更新しない
+        instance.UPSERT_BATCH_SIZE = 2
+        record_list = [self._make_record_dict(i) for i in range(3, 8)]
+        for r in record_list:
+            r["tweet_text"] = "new_tweet_text"
+            r["created_at"] = "new_created_at"
+            r["appeared_at"] = "new_appeared_at"
+            r["registered_at"] = "new_registered_at"
+        actual = instance.bulk_upsert(record_list)
+        self.assertEqual(UpsertCount(3, 2), actual)
+
+        expect = [self._make_record_dict(i) for i in range(8)]
+        for i, r in enumerate(expect):
+            if i < 3:
+                continue
+            r["tweet_text"] = "new_tweet_text"
+            if i < 5:
+                continue
+            r["created_at"] = "new_created_at"
+            r["appeared_at"] = "new_appeared_at"
+            r["registered_at"] = "new_registered_at"
+        actual = instance.select()
+        self.assertEqual(list(range(1, 9)), [r.id for r in actual])
+        self.assertEqual(expect, [r.to_dict() for r in actual])
+
+        # 同一呼び出し内での重複は後勝ちで UPDATE 扱い
+        record = self._make_record_dict(8)
+        dup_record = self._make_record_dict(8)
+        dup_record["tweet_text"] = "dup_tweet_text"
+        actual = instance.bulk_upsert([record, dup_record])
+        self.assertEqual(UpsertCount(1, 1), actual)
+        self.assertEqual(dup_record, instance.select()[8].to_dict())
+
+        # 空リスト指定
+        actual = instance.bulk_upsert([])
+        self.assertEqual(UpsertCount(0, 0), actual)
+
+        # 引数が不正
+        with self.assertRaises(ValueError):
+            actual = instance.bulk_upsert([self._make_record_dict(0), "invalid"])
+        with self.assertRaises(ValueError):
+            actual = instance.bulk_upsert([{"invalid_key": "invalid_value"}])
+        with self.assertRaises(ValueError):
+            actual = instance.bulk_upsert("invalid")
+
 
 if __name__ == "__main__":
     if sys.argv:
@@ -109,6 +109,22 @@ class TestMetricDB(unittest.TestCase):
         actual = instance.upsert("invalid")
         self.assertEqual(Result.failed, actual)
 
+        # session 指定時は commit せず、呼び出し元の commit で確定する
+        record = self._make_record_dict(6)
+        session = Session()
+        actual = instance.upsert([record], session)
+        self.assertEqual(Result.success, actual)
+        session.rollback()
+        session.close()
+        self.assertEqual(6, len(instance.select()))
+
+        session = Session()
+        actual = instance.upsert([record], session)
+        self.assertEqual(Result.success, actual)
+        session.commit()
+        session.close()
+        self.assertEqual(7, len(instance.select()))
+
 
 if __name__ == "__main__":
     if sys.argv:
@@ -0,0 +1,152 @@
+import sys
+import unittest
+
+from mock import call, patch
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.pool import StaticPool
+
+from personal_twilog.db.migration import Migration
+from personal_twilog.db.model import Base as ModelBase
+
+
+class TestMigration(unittest.TestCase):
+    def setUp(self):
+        self.mock_logger = self.enterContext(patch("personal_twilog.db.migration.logger"))
+
+    def _get_engine(self, drop_index_names: list[str], is_old_tweet: bool = False):
+        """インデックス, カラム追加前のスキーマを持つインメモリDBを作成する"""
+        engine = create_engine("sqlite:///:memory:", poolclass=StaticPool)
+        ModelBase.metadata.create_all(engine)
+        with engine.begin() as conn:
+            for index_name in drop_index_names:
+                conn.execute(text(f"DROP INDEX {index_name}"))
+            if is_old_tweet:
+                # tweet_id_num 追加前の Tweet テーブル
+                conn.execute(text("DROP INDEX ix_Tweet_screen_name_tweet_id_num"))
+                conn.execute(text("ALTER TABLE Tweet DROP COLUMN tweet_id_num"))
+                conn.execute(text("CREATE INDEX ix_Tweet_screen_name_tweet_id ON Tweet (screen_name, tweet_id)"))
+        return engine
+
+    def _get_index_names(self, engine, table_name: str) -> set[str]:
+        return {index["name"] for index in inspect(engine).get_indexes(table_name)}
+
+    def test_init(self):
+        instance = Migration("engine")
+        self.assertEqual("engine", instance.engine)
+
+    def test_run(self):
+        drop_index_names = [
+            "ix_Tweet_screen_name_appeared_at",
+            "ix_Likes_screen_name_id",
+            "ix_Metric_screen_name_registered_at",
+        ]
+        engine = self._get_engine(drop_index_names, is_old_tweet=True)
+        with engine.begin() as conn:
+            for tweet_id in ["9", "10", "1x"]:
+                conn.execute(
+                    text(
+                        "INSERT INTO Tweet (tweet_id, tweet_url, user_id, user_name, screen_name, is_retweet, "
+                        "is_quote, has_media, has_external_link, created_at, appeared_at, registered_at) "
+                        "VALUES (:tweet_id, 'url', 'user_id', 'user_name', 'screen_name', 0, 0, 0, 0, "
+                        "'created_at', 'appeared_at', 'registered_at')"
+                    ),
+                    {"tweet_id": tweet_id},
+                )
+        self.assertNotIn("ix_Tweet_screen_name_appeared_at", self._get_index_names(engine, "Tweet"))
+
+        instance = Migration(engine)
+        instance.run()
+        tweet_index_names = self._get_index_names(engine, "Tweet")
+        self.assertIn("ix_Tweet_screen_name_appeared_at", tweet_index_names)
+        self.assertIn("ix_Tweet_screen_name_tweet_id_num", tweet_index_names)
+        self.assertNotIn("ix_Tweet_screen_name_tweet_id", tweet_index_names)
+        self.assertIn("ix_Likes_screen_name_id", self._get_index_names(engine, "Likes"))
+        self.assertIn("ix_Metric_screen_name_registered_at", self._get_index_names(engine, "Metric"))
+
+        # 既存レコードの tweet_id_num が埋められる
+        with engine.connect() as conn:
+            actual = conn.execute(text("SELECT tweet_id, tweet_id_num FROM Tweet ORDER BY id")).all()
+            self.assertEqual([("9", 9), ("10", 10), ("1x", None)], [tuple(r) for r in actual])
+            # 文字列の max は辞書順になるが、数値の max は正しい
+            self.assertEqual("9", conn.execute(text("SELECT max(tweet_id) FROM Tweet")).scalar())
+            self.assertEqual(10, conn.execute(text("SELECT max(tweet_id_num) FROM Tweet")).scalar())
+
+        expect_calls = [call("Migration: add column 'Tweet.tweet_id_num'.")]
+        expect_calls.append(call("Migration: drop index 'ix_Tweet_screen_name_tweet_id'."))
+        expect_calls.extend([call(f"Migration: create index '{name}'.") for name in drop_index_names])
+        expect_calls.append(call("Migration: create index 'ix_Tweet_screen_name_tweet_id_num'."))
+        self.mock_logger.info.assert_has_calls(expect_calls, any_order=True)
+        self.assertEqual(len(expect_calls), self.mock_logger.info.call_count)
+
+        # 適用済のDBに対しては何もしない
+        self.mock_logger.reset_mock()
+        instance.run()
+        self.mock_logger.info.assert_not_called()
+
+    def test_fill_tables(self):
+        engine = self._get_engine([])
+        with engine.begin() as conn:
+            for i, tweet_text in enumerate(["text", "@user", "text @user"]):
+                conn.execute(
+                    text(
+                        "INSERT INTO Tweet (tweet_id, tweet_text, tweet_url, user_id, user_name, screen_name, "
+                        "is_retweet, is_quote, has_media, has_external_link, created_at, appeared_at, registered_at) "
+                        "VALUES (:tweet_id, :tweet_text, 'url', 'user_id', 'user_name', 'screen_name', 0, 0, 0, 0, "
+                        "'created_at', :appeared_at, 'registered_at')"
+                    ),
+                    {"tweet_id": str(i), "tweet_text": tweet_text, "appeared_at": f"2025-01-0{1 + i // 2}T0{i}:00:00"},
+                )
+
+        # 集計テーブル追加前のDBは既存レコードから埋められる
+        instance = Migration(engine)
+        instance.run()
+        with engine.connect() as conn:
+            actual = conn.execute(
+                text(
+                    "SELECT screen_name, day, tweet_count, tweet_length_sum, communication_count, "
+                    "min_appeared_at, max_appeared_at FROM DailyActivity ORDER BY day"
+                )
+            ).all()
+        expect = [
+            ("screen_name", "2025-01-01", 2, 9, 1, "2025-01-01T00:00:00", "2025-01-01T01:00:00"),
+            ("screen_name", "2025-01-02", 1, 10, 1, "2025-01-02T02:00:00", "2025-01-02T02:00:00"),
+        ]
+        self.assertEqual(expect, [tuple(r) for r in actual])
+        self.mock_logger.info.assert_called_once_with("Migration: fill table 'DailyActivity'.")
+
+        # レコードがある場合は何もしない
+        self.mock_logger.reset_mock()
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM DailyActivity WHERE day = '2025-01-02'"))
+        instance.run()
+        with engine.connect() as conn:
+            self.assertEqual(1, conn.execute(text("SELECT count(*) FROM DailyActivity")).scalar())
+        self.mock_logger.info.assert_not_called()
+
+    def test_query_plan(self):
+        engine = self._get_engine([])
+        Migration(engine).run()
+
+        def query_plan(sql: str) -> str:
+            with engine.connect() as conn:
+                return " ".join(str(r[-1]) for r in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+        # 集計, max_id 検索がインデックスを使い、全件走査しない
+        actual = query_plan("SELECT min(appeared_at) FROM Tweet WHERE screen_name = 'dummy'")
+        self.assertIn("ix_Tweet_screen_name_appeared_at", actual)
+        actual = query_plan("SELECT max(tweet_id_num) FROM Tweet WHERE screen_name = 'dummy'")
+        self.assertIn("ix_Tweet_screen_name_tweet_id_num", actual)
+        actual = query_plan(
+            "SELECT * FROM Tweet WHERE screen_name = 'dummy' AND tweet_id_num >= 1 ORDER BY tweet_id_num"
+        )
+        self.assertIn("ix_Tweet_screen_name_tweet_id_num", actual)
+        self.assertNotIn("TEMP B-TREE", actual)
+        actual = query_plan("SELECT * FROM Likes WHERE screen_name = 'dummy' ORDER BY id DESC LIMIT 1")
+        self.assertIn("ix_Likes_screen_name_id", actual)
+        self.assertNotIn("TEMP B-TREE", actual)
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
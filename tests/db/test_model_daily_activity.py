@@ -0,0 +1,65 @@
+import sys
+import unittest
+
+from personal_twilog.db.model import DailyActivity
+
+
+class TestDailyActivity(unittest.TestCase):
+    def _make_record_dict(self, index: int = 0) -> dict:
+        args_dict = {
+            "screen_name": f"screen_name_{index}",
+            "day": f"2025-01-{index + 1:02}",
+            "tweet_count": index,
+            "tweet_length_sum": index * 10,
+            "communication_count": index,
+            "min_appeared_at": f"2025-01-{index + 1:02}T00:00:00",
+            "max_appeared_at": f"2025-01-{index + 1:02}T23:59:59",
+        }
+        return args_dict
+
+    def test_init(self):
+        record_dict = self._make_record_dict()
+        instance = DailyActivity(**record_dict)
+        self.assertEqual(record_dict["screen_name"], instance.screen_name)
+        self.assertEqual(record_dict["day"], instance.day)
+        self.assertEqual(record_dict["tweet_count"], instance.tweet_count)
+        self.assertEqual(record_dict["tweet_length_sum"], instance.tweet_length_sum)
+        self.assertEqual(record_dict["communication_count"], instance.communication_count)
+        self.assertEqual(record_dict["min_appeared_at"], instance.min_appeared_at)
+        self.assertEqual(record_dict["max_appeared_at"], instance.max_appeared_at)
+
+    def test_create(self):
+        record_dict = self._make_record_dict()
+        instance = DailyActivity.create(record_dict)
+        self.assertEqual(record_dict, instance.to_dict())
+
+        with self.assertRaises(ValueError):
+            instance = DailyActivity.create("invalid")
+
+    def test_repr(self):
+        record_dict = self._make_record_dict()
+        instance = DailyActivity.create(record_dict)
+        actual = repr(instance)
+        expect = f"<DailyActivity(screen_name='{record_dict['screen_name']}', day='{record_dict['day']}')>"
+        self.assertEqual(expect, actual)
+
+    def test_eq(self):
+        record_dict = self._make_record_dict(0)
+        instance_1 = DailyActivity.create(record_dict)
+        instance_2 = DailyActivity.create(record_dict)
+        self.assertTrue(instance_1 == instance_2)
+
+        record_dict = self._make_record_dict(1)
+        instance_1 = DailyActivity.create(record_dict)
+        self.assertFalse(instance_1 == instance_2)
+
+    def test_to_dict(self):
+        record_dict = self._make_record_dict()
+        instance = DailyActivity.create(record_dict)
+        self.assertEqual(record_dict, instance.to_dict())
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -37,6 +37,7 @@ class TestTweet(unittest.TestCase):
         record_dict = self._make_record_dict()
         instance = Tweet(**record_dict)
         self.assertEqual(record_dict["tweet_id"], instance.tweet_id)
+        self.assertEqual(int(record_dict["tweet_id"]), instance.tweet_id_num)
         self.assertEqual(record_dict["tweet_text"], instance.tweet_text)
         self.assertEqual(record_dict["tweet_via"], instance.tweet_via)
         self.assertEqual(record_dict["tweet_url"], instance.tweet_url)
@@ -53,6 +54,14 @@ class TestTweet(unittest.TestCase):
         self.assertEqual(record_dict["appeared_at"], instance.appeared_at)
         self.assertEqual(record_dict["registered_at"], instance.registered_at)
 
+    def test_to_tweet_id_num(self):
+        self.assertEqual(1880000000000000000, Tweet.to_tweet_id_num("1880000000000000000"))
+        self.assertEqual(0, Tweet.to_tweet_id_num("0"))
+        self.assertEqual(12, Tweet.to_tweet_id_num(12))
+        self.assertIsNone(Tweet.to_tweet_id_num("tweet_id"))
+        self.assertIsNone(Tweet.to_tweet_id_num("-1"))
+        self.assertIsNone(Tweet.to_tweet_id_num(""))
+
     def test_create(self):
         record_dict = self._make_record_dict()
         instance = Tweet.create(record_dict)
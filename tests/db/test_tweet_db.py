@@ -1,9 +1,12 @@
 import sys
 import unittest
 
+from mock import patch
+from sqlalchemy import text
 from sqlalchemy.orm import sessionmaker
 
-from personal_twilog.db.model import Tweet
+from personal_twilog.db.base import UpsertCount
+from personal_twilog.db.model import DailyActivity, Tweet
 from personal_twilog.db.tweet_db import TweetDB
 from personal_twilog.util import Result
 
@@ -84,6 +87,129 @@ class TestTweetDB(unittest.TestCase):
         actual = instance.select_for_max_id("not_found")
         self.assertEqual(expect, actual)
 
+        # 桁数が異なる tweet_id でも数値として最大のものを返す
+        session = Session()
+        r = Tweet.create(self._make_record_dict(10))
+        r.screen_name = "screen_name"
+        session.add(r)
+        session.commit()
+        session.close()
+        expect = 10
+        actual = instance.select_for_max_id("screen_name")
+        self.assertEqual(expect, actual)
+
+    def test_select_for_range(self):
+        instance = self._get_instance()
+        Session = sessionmaker(bind=instance.engine, autoflush=False)
+        session = Session()
+        for i in [10, 3, 9, 100, 1]:
+            r = Tweet.create(self._make_record_dict(i))
+            r.screen_name = "screen_name"
+            session.add(r)
+        session.commit()
+        session.close()
+
+        def to_id_list(result: list[Tweet]) -> list[str]:
+            return [r.tweet_id for r in result]
+
+        actual = instance.select_for_range("screen_name")
+        self.assertEqual(["1", "3", "9", "10", "100"], to_id_list(actual))
+        actual = instance.select_for_range("screen_name", min_id=3, max_id=10)
+        self.assertEqual(["3", "9", "10"], to_id_list(actual))
+        actual = instance.select_for_range("screen_name", min_id=9)
+        self.assertEqual(["9", "10", "100"], to_id_list(actual))
+        actual = instance.select_for_range("screen_name", max_id=9)
+        self.assertEqual(["1", "3", "9"], to_id_list(actual))
+        actual = instance.select_for_range("not_found")
+        self.assertEqual([], actual)
+
+    def _select_daily_activity(self, instance: TweetDB) -> list[dict]:
+        session = instance.Session()
+        result = [
+            r.to_dict() for r in session.query(DailyActivity).order_by(DailyActivity.screen_name, DailyActivity.day)
+        ]
+        session.close()
+        return result
+
+    def _make_daily_record_dict_list(self) -> list[dict]:
+        text_list = ["text", "@user", "text @user"]
+        record_list = []
+        for i in range(6):
+            record = self._make_record_dict(i)
+            record["screen_name"] = "screen_name" if i < 5 else "other_screen_name"
+            record["tweet_text"] = text_list[i % 3]
+            record["appeared_at"] = f"2025-01-0{1 + i // 2}T0{i}:00:00"
+            record_list.append(record)
+        return record_list
+
+    def test_refresh_daily_activity(self):
+        instance = self._get_instance()
+        record_list = self._make_daily_record_dict_list()
+
+        # upsert で影響のある日のみ集計される
+        instance.upsert(record_list[:3])
+        expect = [
+            DailyActivity("screen_name", "2025-01-01", 2, 9, 1, "2025-01-01T00:00:00", "2025-01-01T01:00:00"),
+            DailyActivity("screen_name", "2025-01-02", 1, 10, 1, "2025-01-02T02:00:00", "2025-01-02T02:00:00"),
+        ]
+        self.assertEqual([r.to_dict() for r in expect], self._select_daily_activity(instance))
+
+        # 既存のツイートの更新, 追加で再集計される
+        record_list[0]["tweet_text"] = "@" * 10
+        instance.upsert(record_list)
+        expect = [
+            DailyActivity("other_screen_name", "2025-01-03", 1, 10, 1, "2025-01-03T05:00:00", "2025-01-03T05:00:00"),
+            DailyActivity("screen_name", "2025-01-01", 2, 15, 2, "2025-01-01T00:00:00", "2025-01-01T01:00:00"),
+            DailyActivity("screen_name", "2025-01-02", 2, 14, 1, "2025-01-02T02:00:00", "2025-01-02T03:00:00"),
+            DailyActivity("screen_name", "2025-01-03", 1, 5, 1, "2025-01-03T04:00:00", "2025-01-03T04:00:00"),
+        ]
+        self.assertEqual([r.to_dict() for r in expect], self._select_daily_activity(instance))
+
+        # appeared_at は保持されるため、upsert の値ではなくDB上の日を再集計する
+        record = dict(record_list[0])
+        record["appeared_at"] = "2025-02-01T00:00:00"
+        record["tweet_text"] = "text"
+        instance.upsert([record])
+        self.assertEqual(
+            {"tweet_count": 2, "tweet_length_sum": 9, "communication_count": 1},
+            {
+                k: self._select_daily_activity(instance)[1][k]
+                for k in ["tweet_count", "tweet_length_sum", "communication_count"]
+            },
+        )
+        self.assertEqual(4, len(self._select_daily_activity(instance)))
+
+        # 日付として解釈できない appeared_at は集計しない
+        instance.refresh_daily_activity([])
+        instance.upsert([self._make_record_dict(10)])
+        self.assertEqual(4, len(self._select_daily_activity(instance)))
+
+        # upsert が失敗した場合は集計も反映されない
+        with patch.object(instance, "refresh_daily_activity", side_effect=ValueError):
+            record = dict(record_list[0])
+            record["tweet_text"] = "rollback"
+            self.assertEqual(Result.failed, instance.upsert([record]))
+        self.assertNotEqual("rollback", instance.select()[0].tweet_text)
+
+    def test_rebuild_daily_activity(self):
+        instance = self._get_instance()
+        record_list = self._make_daily_record_dict_list()
+        instance.upsert(record_list)
+        expect = self._select_daily_activity(instance)
+
+        session = instance.Session()
+        session.execute(text("DELETE FROM DailyActivity"))
+        session.commit()
+        session.close()
+
+        instance.rebuild_daily_activity("screen_name")
+        self.assertEqual(
+            [r for r in expect if r["screen_name"] == "screen_name"],
+            self._select_daily_activity(instance),
+        )
+        instance.rebuild_daily_activity()
+        self.assertEqual(expect, self._select_daily_activity(instance))
+
     def test_upsert(self):
         instance = self._get_instance()
         Session = sessionmaker(bind=instance.engine, autoflush=False)
@@ -125,6 +251,62 @@ class TestTweetDB(unittest.TestCase):
         actual = instance.upsert("invalid")
         self.assertEqual(Result.failed, actual)
 
+    def test_bulk_upsert(self):
+        instance = self._get_instance()
+
+        # insert
+        record_list = [self._make_record_dict(i) for i in range(5)]
+        actual = instance.bulk_upsert(record_list)
+        self.assertEqual(UpsertCount(5, 0), actual)
+        actual = [r.to_dict() for r in instance.select()]
+        self.assertEqual(record_list, actual)
+
+        # update と insert の混在, バッチ境界を跨ぐ
+        # update 時はidと日付関係を更新しない
+        instance.UPSERT_BATCH_SIZE = 2
+        record_list = [self._make_record_dict(i) for i in range(3, 8)]
+        for r in record_list:
+            r["tweet_text"] = "new_tweet_text"
+            r["created_at"] = "new_created_at"
+            r["appeared_at"] = "new_appeared_at"
+            r["registered_at"] = "new_registered_at"
+        actual = instance.bulk_upsert(record_list)
+        self.assertEqual(UpsertCount(3, 2), actual)
+
+        expect = [self._make_record_dict(i) for i in range(8)]
+        for i, r in enumerate(expect):
+            if i < 3:
+                continue
+            r["tweet_text"] = "new_tweet_text"
+            if i < 5:
+                continue
+            r["created_at"] = "new_created_at"
+            r["appeared_at"] = "new_appeared_at"
+            r["registered_at"] = "new_registered_at"
+        actual = instance.select()
+        self.assertEqual(list(range(1, 9)), [r.id for r in actual])
+        self.assertEqual(expect, [r.to_dict() for r in actual])
+
+        # 同一呼び出し内での重複は後勝ちで UPDATE 扱い
+        record = self._make_record_dict(8)
+        dup_record = self._make_record_dict(8)
+        dup_record["tweet_text"] = "dup_tweet_text"
+        actual = instance.bulk_upsert([record, dup_record])
+        self.assertEqual(UpsertCount(1, 1), actual)
+        self.assertEqual(dup_record, instance.select()[8].to_dict())
+
+        # 空リスト指定
+        actual = instance.bulk_upsert([])
+        self.assertEqual(UpsertCount(0, 0), actual)
+
+        # 引数が不正
+        with self.assertRaises(ValueError):
+            actual = instance.bulk_upsert([self._make_record_dict(0), "invalid"])
+        with self.assertRaises(ValueError):
+            actual = instance.bulk_upsert([{"invalid_key": "invalid_value"}])
+        with self.assertRaises(ValueError):
+            actual = instance.bulk_upsert("invalid")
+
 
 if __name__ == "__main__":
     if sys.argv:
@@ -0,0 +1,121 @@
+import sys
+import unittest
+
+from mock import MagicMock, patch
+
+from personal_twilog.db.media_db import MediaDB
+from personal_twilog.db.tweet_db import TweetDB
+from personal_twilog.db.unit_of_work import UnitOfWork
+from personal_twilog.util import Result
+
+
+class TestUnitOfWork(unittest.TestCase):
+    def setUp(self):
+        self.enterContext(patch("personal_twilog.db.unit_of_work.logger"))
+        self.enterContext(patch("personal_twilog.db.tweet_db.logger"))
+        self.enterContext(patch("personal_twilog.db.media_db.logger"))
+
+    def _make_tweet_record_dict(self, index: int = 0) -> dict:
+        return {
+            "tweet_id": f"{index}",
+            "tweet_text": f"tweet_text_{index}",
+            "tweet_via": f"tweet_via_{index}",
+            "tweet_url": f"tweet_url_{index}",
+            "user_id": f"user_id_{index}",
+            "user_name": f"user_name_{index}",
+            "screen_name": f"screen_name_{index}",
+            "is_retweet": False,
+            "retweet_tweet_id": f"retweet_tweet_id_{index}",
+            "is_quote": False,
+            "quote_tweet_id": f"quote_tweet_id_{index}",
+            "has_media": True,
+            "has_external_link": False,
+            "created_at": f"created_at_{index}",
+            "appeared_at": f"appeared_at_{index}",
+            "registered_at": f"registered_at_{index}",
+        }
+
+    def _make_media_record_dict(self, index: int = 0) -> dict:
+        return {
+            "tweet_id": f"{index}",
+            "tweet_text": f"tweet_text_{index}",
+            "tweet_via": f"tweet_via_{index}",
+            "tweet_url": f"tweet_url_{index}",
+            "media_filename": f"media_filename_{index}",
+            "media_url": f"media_url_{index}",
+            "media_thumbnail_url": f"media_thumbnail_url_{index}",
+            "media_type": f"media_type_{index}",
+            "media_size": index,
+            "created_at": f"created_at_{index}",
+            "appeared_at": f"appeared_at_{index}",
+            "registered_at": f"registered_at_{index}",
+        }
+
+    def test_init(self):
+        mock_sessionmaker = self.enterContext(patch("personal_twilog.db.unit_of_work.sessionmaker"))
+        mock_sessionmaker.return_value = "sessionmaker()"
+        instance = UnitOfWork("engine")
+        self.assertEqual("engine", instance.engine)
+        mock_sessionmaker.assert_called_once_with(bind="engine", autoflush=False)
+        self.assertEqual("sessionmaker()", instance.Session)
+        self.assertIsNone(instance.session)
+
+    def test_enter_exit(self):
+        mock_sessionmaker = self.enterContext(patch("personal_twilog.db.unit_of_work.sessionmaker"))
+        mock_session = MagicMock()
+        mock_sessionmaker.return_value.return_value = mock_session
+
+        # 正常終了時は1回だけ commit する
+        instance = UnitOfWork("engine")
+        with instance as session:
+            self.assertIs(mock_session, session)
+            self.assertIs(mock_session, instance.session)
+            mock_session.commit.assert_not_called()
+        mock_session.commit.assert_called_once_with()
+        mock_session.rollback.assert_not_called()
+        mock_session.close.assert_called_once_with()
+        self.assertIsNone(instance.session)
+
+        # 例外発生時は rollback して例外をそのまま送出する
+        mock_session.reset_mock()
+        with self.assertRaises(ZeroDivisionError):
+            with instance as session:
+                1 / 0
+        mock_session.commit.assert_not_called()
+        mock_session.rollback.assert_called_once_with()
+        mock_session.close.assert_called_once_with()
+        self.assertIsNone(instance.session)
+
+        # 入れ子での開始はエラー
+        with self.assertRaises(ValueError):
+            with instance:
+                with instance:
+                    pass
+
+    def test_transaction(self):
+        tweet_db = TweetDB(":memory:")
+        media_db = MediaDB(":memory:")
+        media_db.engine = tweet_db.engine
+        media_db.Session = tweet_db.Session
+
+        # 複数テーブルへの書き込みがまとめて commit される
+        with UnitOfWork(tweet_db.engine) as session:
+            self.assertEqual(Result.success, tweet_db.upsert([self._make_tweet_record_dict(0)], session))
+            self.assertEqual(Result.success, media_db.upsert([self._make_media_record_dict(0)], session))
+        self.assertEqual(["0"], [r.tweet_id for r in tweet_db.select()])
+        self.assertEqual(["0"], [r.tweet_id for r in media_db.select()])
+
+        # 途中で例外が発生した場合はすべての書き込みが rollback される
+        with self.assertRaises(ValueError):
+            with UnitOfWork(tweet_db.engine) as session:
+                tweet_db.upsert([self._make_tweet_record_dict(1)], session)
+                media_db.upsert([self._make_media_record_dict(1)], session)
+                raise ValueError("crawl failed")
+        self.assertEqual(["0"], [r.tweet_id for r in tweet_db.select()])
+        self.assertEqual(["0"], [r.tweet_id for r in media_db.select()])
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
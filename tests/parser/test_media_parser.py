@@ -1,13 +1,13 @@
 import re
 import sys
 import unittest
-from contextlib import ExitStack
 from pathlib import Path
 
 import orjson
-from mock import patch
+from mock import MagicMock, patch
 
 from personal_twilog.parser.media_parser import MediaParser
+from personal_twilog.parser.media_size_fetcher import MediaSizeFetcher
 from personal_twilog.util import find_values
 
 
@@ -20,7 +20,11 @@ class TestMediaParser(unittest.TestCase):
         entry_list: list[dict] = find_values(timeline_dict, "entries")
         tweet_dict_list: list[dict] = find_values(entry_list, "tweet_results")
         registered_at = "2023-10-07T01:00:00"
-        parser = MediaParser(tweet_dict_list, registered_at)
+        self.mock_media_size_fetcher = MagicMock(spec=MediaSizeFetcher)
+        self.mock_media_size_fetcher.fetch.side_effect = lambda media_url_list: {
+            media_url: len(media_url) for media_url in media_url_list
+        }
+        parser = MediaParser(tweet_dict_list, registered_at, self.mock_media_size_fetcher)
         return parser
 
     def test_init(self):
@@ -32,6 +36,17 @@ class TestMediaParser(unittest.TestCase):
         self.assertEqual(expect, actual.tweet_dict_list)
         self.assertEqual(expect, actual.result)
         self.assertEqual("2023-10-07T01:00:00", actual.registered_at)
+        self.assertEqual(self.mock_media_size_fetcher, actual.media_size_fetcher)
+
+        # 未指定時は既定の MediaSizeFetcher を使う
+        mock_media_size_fetcher = self.enterContext(patch("personal_twilog.parser.media_parser.MediaSizeFetcher"))
+        mock_media_size_fetcher.return_value = "MediaSizeFetcher()"
+        actual = MediaParser(expect, "2023-10-07T01:00:00")
+        mock_media_size_fetcher.assert_called_once_with()
+        self.assertEqual("MediaSizeFetcher()", actual.media_size_fetcher)
+
+        with self.assertRaises(TypeError):
+            actual = MediaParser(expect, "2023-10-07T01:00:00", "invalid_fetcher")
 
     def test_parse(self):
         parser = self.get_instance()
@@ -74,7 +89,7 @@ class TestMediaParser(unittest.TestCase):
                     media_url = media_info["media_url"]
                     media_thumbnail_url = media_info["media_thumbnail_url"]
                     media_type = media_info["media_type"]
-                    media_size = -1
+                    media_size = len(media_url)
 
                     media_dict = {
                         "tweet_id": tweet_id,
@@ -96,21 +111,17 @@ class TestMediaParser(unittest.TestCase):
             media_dict_list.reverse()
             return media_dict_list
 
-        with ExitStack() as stack:
-            mock_get_media_size = stack.enter_context(
-                patch("personal_twilog.parser.media_parser.MediaParser._get_media_size")
-            )
-            mock_get_media_size.side_effect = lambda media_url: -1
-
-            actual = parser.parse()
-            expect = parse()
-            self.assertNotEqual([], actual)
-            self.assertEqual(expect, actual)
-
-            parser.tweet_dict_list = []
-            actual = parser.parse()
-            expect = []
-            self.assertEqual(expect, actual)
+        actual = parser.parse()
+        expect = parse()
+        self.assertNotEqual([], actual)
+        self.assertEqual(expect, actual)
+        # ファイルサイズは重複除去後のメディア分をまとめて1回で取得する
+        self.mock_media_size_fetcher.fetch.assert_called_once_with([d["media_url"] for d in reversed(expect)])
+
+        parser.tweet_dict_list = []
+        actual = parser.parse()
+        expect = []
+        self.assertEqual(expect, actual)
 
 
 if __name__ == "__main__":
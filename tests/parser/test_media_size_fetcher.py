@@ -0,0 +1,189 @@
+import sys
+import threading
+import time
+import unittest
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import orjson
+from mock import patch
+
+from personal_twilog.parser.media_size_fetcher import CacheOnlyMediaSizeFetcher, MediaSizeFetcher
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """HEAD リクエストに対してパスに応じたレスポンスを返すスタブ
+
+    /size/{n} : Content-Length: n
+    /no_length : Content-Length 無し
+    /slow : タイムアウトするまで応答しない
+    それ以外 : 404
+    """
+
+    request_path_list: list[str] = []
+
+    def do_HEAD(self):
+        StubHandler.request_path_list.append(self.path)
+        if self.path.startswith("/size/"):
+            self.send_response(200)
+            self.send_header("Content-Length", self.path.removeprefix("/size/"))
+            self.end_headers()
+        elif self.path == "/no_length":
+            self.send_response(200)
+            self.end_headers()
+        elif self.path == "/slow":
+            time.sleep(1.0)
+            self.send_response(200)
+            self.send_header("Content-Length", "1")
+            self.end_headers()
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestMediaSizeFetcher(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        cls.server.daemon_threads = True
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.enterContext(patch("personal_twilog.parser.media_size_fetcher.logger"))
+        self.cache_file_path = Path("./tests/cache/media_size_test.json")
+        self.cache_file_path.unlink(missing_ok=True)
+        StubHandler.request_path_list = []
+
+    def tearDown(self):
+        self.cache_file_path.unlink(missing_ok=True)
+
+    def _get_instance(self, timeout: float = 5.0) -> MediaSizeFetcher:
+        return MediaSizeFetcher(self.cache_file_path, max_workers=4, timeout=timeout)
+
+    def test_init(self):
+        instance = self._get_instance()
+        self.assertEqual(self.cache_file_path, instance.cache_file_path)
+        self.assertEqual(4, instance.max_workers)
+        self.assertEqual(5.0, instance.timeout)
+        self.assertEqual({}, instance.cache)
+        self.assertEqual(4, instance.session.get_adapter("https://pbs.twimg.com/")._pool_maxsize)
+
+        # キャッシュファイルがあれば読み込む
+        self.cache_file_path.write_bytes(orjson.dumps({"url": 100}))
+        instance = self._get_instance()
+        self.assertEqual({"url": 100}, instance.cache)
+
+        # 壊れたキャッシュファイルは無視する
+        self.cache_file_path.write_bytes(b"{invalid")
+        instance = self._get_instance()
+        self.assertEqual({}, instance.cache)
+
+        with self.assertRaises(ValueError):
+            instance = MediaSizeFetcher(self.cache_file_path, max_workers=0)
+
+    def test_fetch(self):
+        Params = namedtuple("Params", ["path", "expect", "is_cached"])
+        params_list = [
+            Params("/size/100", 100, True),
+            Params("/size/2048", 2048, True),
+            Params("/no_length", 0, True),
+            Params("/not_found", -1, False),
+        ]
+        url_list = [f"{self.base_url}{params.path}" for params in params_list]
+
+        instance = self._get_instance()
+        actual = instance.fetch(url_list + url_list[:1])
+        expect = {url: params.expect for url, params in zip(url_list, params_list)}
+        self.assertEqual(expect, actual)
+        # 重複したURLには1回だけリクエストする
+        self.assertEqual(sorted([params.path for params in params_list]), sorted(StubHandler.request_path_list))
+
+        # 成功したもののみキャッシュファイルに保存される
+        expect_cache = {url: params.expect for url, params in zip(url_list, params_list) if params.is_cached}
+        self.assertEqual(expect_cache, instance.cache)
+        self.assertEqual(expect_cache, orjson.loads(self.cache_file_path.read_bytes()))
+
+        # 取得済のURLにはリクエストしない, 失敗したURLは再取得する
+        StubHandler.request_path_list = []
+        instance = self._get_instance()
+        actual = instance.fetch(url_list)
+        self.assertEqual(expect, actual)
+        self.assertEqual(["/not_found"], StubHandler.request_path_list)
+
+        # すべてキャッシュ済ならリクエストしない
+        StubHandler.request_path_list = []
+        actual = instance.fetch(url_list[:2])
+        self.assertEqual({url_list[0]: 100, url_list[1]: 2048}, actual)
+        self.assertEqual([], StubHandler.request_path_list)
+
+        actual = instance.fetch([])
+        self.assertEqual({}, actual)
+
+        with self.assertRaises(TypeError):
+            actual = instance.fetch("invalid")
+
+    def test_fetch_timeout(self):
+        instance = self._get_instance(timeout=0.2)
+        slow_url = f"{self.base_url}/slow"
+        size_url = f"{self.base_url}/size/10"
+
+        start = time.time()
+        actual = instance.fetch([slow_url, size_url])
+        elapsed = time.time() - start
+        self.assertEqual({slow_url: -1, size_url: 10}, actual)
+        self.assertLess(elapsed, 1.0)
+        self.assertNotIn(slow_url, instance.cache)
+
+    def test_fetch_concurrent(self):
+        # /slow はタイムアウトまで応答しないため、直列なら timeout * 件数 かかる
+        instance = self._get_instance(timeout=0.3)
+        url_list = [f"{self.base_url}/slow?{i}" for i in range(4)]
+        start = time.time()
+        actual = instance.fetch(url_list)
+        elapsed = time.time() - start
+        self.assertEqual({url: -1 for url in url_list}, actual)
+        self.assertLess(elapsed, 0.3 * 4)
+
+    def test_get(self):
+        instance = self._get_instance()
+        url = f"{self.base_url}/size/123"
+        self.assertEqual(123, instance.get(url))
+        self.assertEqual(-1, instance.get(f"{self.base_url}/not_found"))
+
+    def test_cache_only_fetch(self):
+        cached_url = f"{self.base_url}/size/100"
+        uncached_url = f"{self.base_url}/size/200"
+        self.cache_file_path.write_bytes(orjson.dumps({cached_url: 100}))
+        mock_session = self.enterContext(patch("personal_twilog.parser.media_size_fetcher.requests.Session"))
+
+        instance = CacheOnlyMediaSizeFetcher(self.cache_file_path)
+        self.assertIsNone(instance.session)
+        mock_session.assert_not_called()
+
+        # キャッシュに無いものは -1 とし、リクエストもキャッシュファイルへの書き込みも行わない
+        actual = instance.fetch([cached_url, uncached_url, cached_url])
+        self.assertEqual({cached_url: 100, uncached_url: -1}, actual)
+        self.assertEqual(-1, instance.get(uncached_url))
+        self.assertEqual([], StubHandler.request_path_list)
+        self.assertEqual({cached_url: 100}, orjson.loads(self.cache_file_path.read_bytes()))
+
+        with self.assertRaises(TypeError):
+            actual = instance.fetch("invalid")
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
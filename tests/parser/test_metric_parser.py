@@ -1,5 +1,6 @@
 import re
 import sys
+import tracemalloc
 import unittest
 from pathlib import Path
 
@@ -7,6 +8,7 @@ import orjson
 from mock import patch
 
 from personal_twilog.parser.metric_parser import MetricParser
+from personal_twilog.parser.parser_base import FlattenedTweetList
 from personal_twilog.util import find_values
 
 
@@ -66,6 +68,49 @@ class TestMetricParser(unittest.TestCase):
         expect = []
         self.assertEqual(expect, actual)
 
+    def test_parse_memory(self):
+        def make_tweet(index: int) -> dict:
+            return {
+                "rest_id": str(index),
+                "full_text": "x" * 2000,
+                "core": {
+                    "user_results": {
+                        "result": {
+                            "core": {"screen_name": "screen_name_1"},
+                            "legacy": {
+                                "statuses_count": index,
+                                "favourites_count": index,
+                                "media_count": index,
+                                "friends_count": index,
+                                "followers_count": index,
+                            },
+                        }
+                    }
+                },
+            }
+
+        # 平滑化済のリストを他のパーサと共有する場合
+        tracemalloc.start()
+        try:
+            tweet_list = FlattenedTweetList(make_tweet(i) for i in range(1000))
+            expect_order = [tweet["rest_id"] for tweet in tweet_list]
+            tweet_list_size, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            base_size, _ = tracemalloc.get_traced_memory()
+
+            actual = MetricParser(tweet_list, "2026-02-08T01:00:00", "screen_name_1").parse()
+
+            _, peak_size = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        # 末尾のツイートから取得する
+        self.assertEqual(999, actual[0]["status_count"])
+        # 共有しているリストの順序を変えない
+        self.assertEqual(expect_order, [tweet["rest_id"] for tweet in tweet_list])
+        # リスト全体のコピーを作らない（コピーすると、リストと同程度のメモリを確保する）
+        self.assertLess(peak_size - base_size, tweet_list_size * 0.05)
+
 
 if __name__ == "__main__":
     if sys.argv:
@@ -1,14 +1,13 @@
 import sys
 import unittest
 import urllib.parse
-from contextlib import ExitStack
 from datetime import datetime, timedelta
 from pathlib import Path
 
 import orjson
-from mock import MagicMock, patch
+from mock import patch
 
-from personal_twilog.parser.parser_base import ParserBase
+from personal_twilog.parser.parser_base import FlattenedTweetList, ParserBase
 from personal_twilog.util import find_values
 
 
@@ -72,6 +71,12 @@ class TestParserBase(unittest.TestCase):
         expect = sample_list
         self.assertEqual(expect, actual)
 
+        # 複数キーの組で重複判定する
+        sample_list4 = [{"tweet_id": "1", "media_filename": f"{i % 2}.jpg"} for i in range(4)]
+        actual = parser._remove_duplicates(sample_list4, ("tweet_id", "media_filename"))
+        expect = sample_list4[:2]
+        self.assertEqual(expect, actual)
+
         with self.assertRaises(TypeError):
             actual = parser._remove_duplicates(-1)
         with self.assertRaises(TypeError):
@@ -193,42 +198,6 @@ class TestParserBase(unittest.TestCase):
         with self.assertRaises(TypeError):
             actual = parser._match_media(-1)
 
-    def test_get_media_size(self):
-        with ExitStack() as stack:
-            mock_requests = stack.enter_context(patch("personal_twilog.parser.parser_base.requests"))
-
-            def return_head(media_url):
-                mock_head_response = MagicMock()
-                mock_head_response.headers = {"Content-Length": len(media_url)}
-                return mock_head_response
-
-            mock_requests.head.side_effect = return_head
-
-            parser = self.get_instance()
-            url = "https://pbs.twimg.com/ext_tw_video_thumb/90000000/pu/img/90000000.jpg"
-            actual = parser._get_media_size(url)
-            expect = len(url)
-            self.assertEqual(expect, actual)
-            mock_requests.head.assert_called_once_with(url)
-
-            def return_head(media_url):
-                mock_head_response = MagicMock()
-                mock_head_response.headers = {}
-                return mock_head_response
-
-            mock_requests.head.side_effect = return_head
-            actual = parser._get_media_size(url)
-            self.assertEqual(0, actual)
-
-            def return_head(media_url):
-                mock_head_response = MagicMock()
-                mock_head_response.raise_for_status.side_effect = ValueError
-                return mock_head_response
-
-            mock_requests.head.side_effect = return_head
-            actual = parser._get_media_size(url)
-            self.assertEqual(-1, actual)
-
     def test_match_rt_quote(self):
         parser = self.get_instance()
         timeline_dict = self.get_json_dict()
@@ -298,6 +267,18 @@ class TestParserBase(unittest.TestCase):
             actual = parser._get_created_at(tweet)
             self.assertEqual(expect, actual)
 
+        # 同じ created_at の変換はキャッシュされる
+        ParserBase._convert_created_at.cache_clear()
+        for _ in range(3):
+            actual = parser._get_created_at(tweet_list[0])
+            self.assertEqual(created_at_list[0], actual)
+        cache_info = ParserBase._convert_created_at.cache_info()
+        self.assertEqual(1, cache_info.misses)
+        self.assertEqual(2, cache_info.hits)
+
+        with self.assertRaises(ValueError):
+            actual = parser._get_created_at({"legacy": {}})
+
     def test_flatten(self):
         parser = self.get_instance()
         timeline_dict = self.get_json_dict()
@@ -356,6 +337,28 @@ class TestParserBase(unittest.TestCase):
         actual = parser._flatten(tweet_results_list)
         expect = flatten(tweet_results_list)
         self.assertEqual(expect, actual)
+        self.assertIsInstance(actual, FlattenedTweetList)
+
+        # 平滑化済のリストはそのまま返す
+        self.assertIs(actual, parser._flatten(actual))
+
+    def test_flatten_static(self):
+        timeline_dict = self.get_json_dict()
+        tweet_results_list = find_values(timeline_dict, "tweet_results")
+        parser = self.get_instance()
+
+        actual = ParserBase.flatten(tweet_results_list)
+        self.assertIsInstance(actual, FlattenedTweetList)
+        self.assertEqual(parser._flatten(tweet_results_list), actual)
+
+        # 平滑化済のリストを渡したパーサは再度の平滑化を行わない
+        parser = ConcreteParser(actual, "2023-10-07T01:00:00")
+        mock_match_rt_quote = self.enterContext(patch("personal_twilog.parser.parser_base.ParserBase._match_rt_quote"))
+        self.assertIs(actual, parser._flatten(parser.tweet_dict_list))
+        mock_match_rt_quote.assert_not_called()
+
+        with self.assertRaises(TypeError):
+            actual = ParserBase.flatten("invalid")
 
 
 if __name__ == "__main__":
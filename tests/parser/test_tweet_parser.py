@@ -6,6 +6,7 @@ from pathlib import Path
 from mock import patch
 import orjson
 
+from personal_twilog.parser.parser_base import ParserBase
 from personal_twilog.parser.tweet_parser import TweetParser
 from personal_twilog.util import find_values
 
@@ -108,6 +109,11 @@ class TestTweetParser(unittest.TestCase):
         self.assertNotEqual([], actual)
         self.assertEqual(expect, actual)
 
+        # 平滑化済のリストを渡しても同じ結果になる
+        flattened_tweet_list = ParserBase.flatten(tweet_results)
+        actual = TweetParser(flattened_tweet_list, parser.registered_at).parse()
+        self.assertEqual(expect, actual)
+
         parser.tweet_dict_list = []
         actual = parser.parse()
         expect = []
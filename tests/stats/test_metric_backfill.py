@@ -0,0 +1,170 @@
+import sys
+import unittest
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from mock import patch
+from sqlalchemy import text
+
+from personal_twilog.db.engine_registry import EngineRegistry
+from personal_twilog.db.metric_db import MetricDB
+from personal_twilog.db.tweet_db import TweetDB
+from personal_twilog.stats.metric_backfill import MetricBackfill
+from personal_twilog.stats.timeline_stats import TimelineStats
+from personal_twilog.util import Result
+
+
+class TestMetricBackfill(unittest.TestCase):
+    def setUp(self):
+        self.mock_logger = self.enterContext(patch("personal_twilog.stats.metric_backfill.logger"))
+        self.db_path = Path("./tests/metric_backfill_test.db")
+        self.db_path.unlink(missing_ok=True)
+        self.screen_name = "screen_name_0"
+        self.tweet_db = TweetDB(str(self.db_path))
+        self.metric_db = MetricDB(str(self.db_path))
+
+    def tearDown(self):
+        EngineRegistry.dispose(str(self.db_path))
+        self.db_path.unlink(missing_ok=True)
+
+    def _make_tweet_record_list(self) -> list[dict]:
+        """2025-01-02 から 2025-01-19 までの間に、ツイートの無い日を含むレコードを作成する"""
+        text_list = ["text", "@user reply", "long text " * 5, "", "@user"]
+        hour_list = [0, 1, 5, 9, 26, 27, 28, 30, 75, 76, 100, 101, 102, 200, 201, 202, 330, 400]
+        record_list = []
+        for i, hour in enumerate(hour_list):
+            appeared_at = (datetime(2025, 1, 2, 10, 0, 0) + timedelta(hours=hour)).isoformat()
+            record_list.append({
+                "tweet_id": f"{i}",
+                "tweet_text": text_list[i % len(text_list)],
+                "tweet_via": "tweet_via",
+                "tweet_url": f"tweet_url_{i}",
+                "user_id": "user_id",
+                "user_name": "user_name",
+                "screen_name": self.screen_name,
+                "is_retweet": False,
+                "retweet_tweet_id": "",
+                "is_quote": False,
+                "quote_tweet_id": "",
+                "has_media": False,
+                "has_external_link": False,
+                "created_at": appeared_at,
+                "appeared_at": appeared_at,
+                "registered_at": appeared_at,
+            })
+        # 対象外の screen_name
+        record_list.append(record_list[0] | {"tweet_id": "other", "screen_name": "other_screen_name"})
+        return record_list
+
+    def _make_account_dict(self, index: int) -> dict:
+        return {
+            "screen_name": self.screen_name,
+            "status_count": 100 + index,
+            "favorite_count": 200 + index,
+            "media_count": 300 + index,
+            "following_count": 400 + index,
+            "followers_count": 500 + index,
+        }
+
+    def _prepare(self) -> None:
+        self.tweet_db.upsert(self._make_tweet_record_list())
+        # クロール時に記録された Metric
+        for index, registered_at in enumerate(["2025-01-06T12:00:00", "2025-01-12T12:00:00"]):
+            metric_parsed_dict = self._make_account_dict(index) | {"registered_at": registered_at}
+            self.metric_db.upsert([TimelineStats(metric_parsed_dict, self.tweet_db).to_dict()])
+
+    def _get_expect(self, day: date) -> dict:
+        """day までの DailyActivity を集計した、その日の終わり時点の統計情報"""
+        registered_at = f"{day.isoformat()}T23:59:59"
+        account_index = 0 if registered_at < "2025-01-12T12:00:00" else 1
+        metric_parsed_dict = self._make_account_dict(account_index) | {"registered_at": registered_at}
+        daily_sql = TimelineStats.DAILY_ACTIVITY_SQL + " AND day <= :day"
+        with self.tweet_db.engine.connect() as conn:
+            stats_result = conn.execute(
+                text(TimelineStats.STATS_SQL.format(daily_sql=daily_sql)),
+                {"screen_name": self.screen_name, "day": day.isoformat()},
+            ).one()
+        return TimelineStats.make_stats(metric_parsed_dict, *stats_result)
+
+    def test_init(self):
+        instance = MetricBackfill(self.screen_name, self.tweet_db, self.metric_db)
+        self.assertEqual(self.screen_name, instance.screen_name)
+        self.assertEqual(self.tweet_db, instance.tweet_db)
+        self.assertEqual(self.metric_db, instance.metric_db)
+
+        with self.assertRaises(ValueError):
+            instance = MetricBackfill(-1, self.tweet_db, self.metric_db)
+        with self.assertRaises(ValueError):
+            instance = MetricBackfill(self.screen_name, "invalid_tweet_db", self.metric_db)
+        with self.assertRaises(ValueError):
+            instance = MetricBackfill(self.screen_name, self.tweet_db, "invalid_metric_db")
+
+    def test_make_snapshots(self):
+        instance = MetricBackfill(self.screen_name, self.tweet_db, self.metric_db)
+        # 既存の Metric が無い場合はアカウント側の数値が定まらない
+        with self.assertRaises(ValueError):
+            instance.make_snapshots()
+
+        self._prepare()
+
+        # 各日の終わり時点で集計した統計情報と一致する
+        # 最初と最後のツイートが1日以内に収まる 2025-01-02 は含まない
+        actual = instance.make_snapshots()
+        expect_day_list = [date(2025, 1, 3) + timedelta(days=i) for i in range(17)]
+        self.assertEqual(
+            [f"{day.isoformat()}T23:59:59" for day in expect_day_list], [r["registered_at"] for r in actual]
+        )
+        self.assertEqual([self._get_expect(day) for day in expect_day_list], actual)
+
+        # 期間指定, ツイートの範囲外の日を含む
+        Params = namedtuple("Params", ["start_day", "end_day", "expect_day_list"])
+        params_list = [
+            Params(date(2025, 1, 8), date(2025, 1, 10), [date(2025, 1, 8), date(2025, 1, 9), date(2025, 1, 10)]),
+            Params(date(2024, 12, 30), date(2025, 1, 4), [date(2025, 1, 3), date(2025, 1, 4)]),
+            Params(date(2025, 1, 18), date(2025, 1, 22), [date(2025, 1, 18) + timedelta(days=i) for i in range(5)]),
+            Params(date(2025, 1, 10), date(2025, 1, 9), []),
+            Params(None, date(2025, 1, 2), []),
+        ]
+        for params in params_list:
+            actual = instance.make_snapshots(params.start_day, params.end_day)
+            self.assertEqual([self._get_expect(day) for day in params.expect_day_list], actual)
+
+    def test_run(self):
+        instance = MetricBackfill(self.screen_name, self.tweet_db, self.metric_db)
+        # 既存の Metric が無い場合は何も記録しない
+        actual = instance.run()
+        self.assertEqual(Result.failed, actual)
+        self.mock_logger.warning.assert_called_once_with(
+            f"Metric backfill: Metric record of '{self.screen_name}' is not found."
+        )
+        self.mock_logger.info.assert_not_called()
+        self.assertEqual([], self.metric_db.select())
+
+        self._prepare()
+        actual = instance.run(date(2025, 1, 8), date(2025, 1, 10))
+        self.assertEqual(Result.success, actual)
+        self.mock_logger.info.assert_called_once_with(f"Metric backfill: 3 records of '{self.screen_name}'.")
+
+        def select_metric() -> list[dict]:
+            return [r.to_dict() for r in self.metric_db.select()]
+
+        metric_list = select_metric()
+        self.assertEqual(5, len(metric_list))
+        for metric_dict, day in zip(metric_list[2:], [date(2025, 1, 8), date(2025, 1, 9), date(2025, 1, 10)]):
+            # NUMERIC の列は Decimal で返るため、整数, 文字列の列を比較する
+            expect = self._get_expect(day)
+            keys = [key for key, value in expect.items() if not isinstance(value, float)]
+            self.assertEqual({key: expect[key] for key in keys}, {key: metric_dict[key] for key in keys})
+
+        # 再実行すると同じ registered_at のレコードを上書きする
+        actual = instance.run(date(2025, 1, 9), date(2025, 1, 11))
+        self.assertEqual(Result.success, actual)
+        metric_list = select_metric()
+        self.assertEqual(6, len(metric_list))
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
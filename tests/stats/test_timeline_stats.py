@@ -4,6 +4,7 @@ import unittest
 from datetime import datetime, timedelta
 
 from mock import MagicMock, patch
+from sqlalchemy import text
 
 from personal_twilog.db.tweet_db import TweetDB
 from personal_twilog.stats.timeline_stats import TimelineStats
@@ -95,30 +96,25 @@ class TestTimelineStats(unittest.TestCase):
     def _make_execute(self, stats_record_dict: dict) -> MagicMock:
         r = MagicMock(name="make_execute")
 
-        def _dispatch(key: str) -> str | int | float:
+        def _dispatch(key: str) -> list:
             key = str(key)
-            if re.search(r"min\(appeared_at\)", key):
-                return [stats_record_dict["min_appeared_at"]]
-            if re.search(r"max\(appeared_at\)", key):
-                return [stats_record_dict["max_appeared_at"]]
-            if re.search(r"count\(\*\)", key):
-                return [stats_record_dict["count_all"]]
-            if re.search(r"count\(appeared_days\)", key):
+            if re.search(r"FROM ranked", key):
+                count_all = stats_record_dict["count_all"]
+                communication_ratio: float = float(stats_record_dict["communication_ratio"])
+                communication_tweet_num: int = int(count_all * (communication_ratio / 100.0))
                 return [
+                    stats_record_dict["min_appeared_at"],
+                    stats_record_dict["max_appeared_at"],
+                    count_all,
                     stats_record_dict["appeared_days"],
                     stats_record_dict["average_tweet_by_day"],
+                    stats_record_dict["tweet_length_sum"],
+                    communication_tweet_num,
                     stats_record_dict["max_tweet_num_by_day"],
                     stats_record_dict["max_tweet_day_by_day"],
                 ]
-            if re.search(r"sum\(string_length\)", key):
-                return [stats_record_dict["tweet_length_sum"]]
-            if re.search(r"count\(tweet_text\)", key):
-                count_all = stats_record_dict["count_all"]
-                communication_ratio: float = float(stats_record_dict["communication_ratio"])
-                communication_tweet_num: int = int(count_all * (communication_ratio / 100.0))
-                return [communication_tweet_num]
 
-        def _make_execute_text(text: str) -> MagicMock:
+        def _make_execute_text(text: str, params: dict) -> MagicMock:
             rt = MagicMock()
             rt.one.return_value = _dispatch(text)
             return rt
@@ -136,10 +132,14 @@ class TestTimelineStats(unittest.TestCase):
 
         self.assertEqual(metric_parsed_dict, instance.metric_parsed_dict)
         self.assertEqual(mock_tweet_db, instance.tweet_db)
+        self.assertIsNone(instance.session)
         self.assertEqual(metric_parsed_dict["registered_at"], instance.registered_at)
         self.assertEqual(metric_parsed_dict["screen_name"], instance.screen_name)
         self.assertEqual(mock_get_stats.return_value, instance.stats)
 
+        instance = TimelineStats(metric_parsed_dict, mock_tweet_db, "session")
+        self.assertEqual("session", instance.session)
+
         with self.assertRaises(ValueError):
             instance = TimelineStats(["invalid_args_dict"], mock_tweet_db)
         with self.assertRaises(ValueError):
@@ -157,6 +157,103 @@ class TestTimelineStats(unittest.TestCase):
 
         actual = TimelineStats(metric_parsed_dict, mock_tweet_db).stats
         self.assertEqual(stats_record_dict, actual)
+        mock_execute.close.assert_called_once_with()
+
+        # 1つのパラメータ化された SQL 文で集計する
+        mock_execute.execute.assert_called_once()
+        sql, params = mock_execute.execute.call_args.args
+        self.assertIn("FROM DailyActivity", str(sql))
+        self.assertEqual({"screen_name": metric_parsed_dict["screen_name"]}, params)
+
+        # Tweet から集計する
+        mock_execute.reset_mock()
+        instance = TimelineStats(metric_parsed_dict, mock_tweet_db)
+        mock_execute.reset_mock()
+        actual = instance.get_stats(is_from_tweet=True)
+        self.assertEqual(stats_record_dict, actual)
+        mock_execute.execute.assert_called_once()
+        sql, params = mock_execute.execute.call_args.args
+        self.assertIn("FROM Tweet", str(sql))
+        self.assertNotIn("FROM DailyActivity", str(sql))
+        self.assertEqual({"screen_name": metric_parsed_dict["screen_name"]}, params)
+
+        # session 指定時はその session で集計し、close しない
+        mock_session.reset_mock()
+        mock_outer_session = self._make_execute(stats_record_dict)
+        actual = TimelineStats(metric_parsed_dict, mock_tweet_db, mock_outer_session).stats
+        self.assertEqual(stats_record_dict, actual)
+        mock_session.assert_not_called()
+        mock_outer_session.execute.assert_called()
+        mock_outer_session.close.assert_not_called()
+
+    def test_get_stats_from_daily_activity(self):
+        # 実DBで、Tweet 全件を集計していた旧実装と同じ結果になる
+        tweet_db = TweetDB(":memory:")
+        screen_name = "screen_name_0"
+        text_list = ["text", "@user reply", "long text " * 5, "", "@user"]
+        record_list = []
+        for i in range(40):
+            appeared_at = (datetime(2025, 1, 1, 23, 0, 0) + timedelta(hours=i * 7 + i % 3)).isoformat()
+            record_list.append({
+                "tweet_id": f"{i}",
+                "tweet_text": text_list[i % len(text_list)],
+                "tweet_via": "tweet_via",
+                "tweet_url": f"tweet_url_{i}",
+                "user_id": "user_id",
+                "user_name": "user_name",
+                "screen_name": screen_name if i % 4 else "other_screen_name",
+                "is_retweet": False,
+                "retweet_tweet_id": "",
+                "is_quote": False,
+                "quote_tweet_id": "",
+                "has_media": False,
+                "has_external_link": False,
+                "created_at": appeared_at,
+                "appeared_at": appeared_at,
+                "registered_at": appeared_at,
+            })
+        # 複数回に分けて upsert しても同じ集計になる
+        tweet_db.upsert(record_list[20:])
+        tweet_db.upsert(record_list[:25])
+
+        metric_parsed_dict = self._make_metric_parsed_dict()
+        instance = TimelineStats(metric_parsed_dict, tweet_db)
+        actual = instance.stats
+
+        # Tweet から1回の走査で集計しても同じ結果になる
+        self.assertEqual(actual, instance.get_stats(is_from_tweet=True))
+
+        with tweet_db.engine.connect() as conn:
+            where = f"WHERE screen_name = '{screen_name}'"
+            min_appeared_at, max_appeared_at, count_all = conn.execute(
+                text(f"SELECT min(appeared_at), max(appeared_at), count(*) FROM Tweet {where}")
+            ).one()
+            days_result = conn.execute(
+                text(f"""
+                SELECT count(appeared_days), avg(appeared_count), max(appeared_count), appeared_days
+                FROM (
+                    SELECT strftime('%Y-%m-%d', appeared_at) AS appeared_days, count(appeared_at) AS appeared_count
+                    FROM Tweet {where} GROUP BY strftime('%Y-%m-%d', appeared_at)
+                );
+            """)
+            ).one()
+            tweet_length_sum = conn.execute(text(f"SELECT sum(length(tweet_text)) FROM Tweet {where}")).scalar()
+            communication_num = conn.execute(
+                text(f"SELECT count(tweet_text) FROM Tweet {where} AND tweet_text LIKE '%@%'")
+            ).scalar()
+        expect = {
+            "min_appeared_at": min_appeared_at,
+            "max_appeared_at": max_appeared_at,
+            "count_all": count_all,
+            "appeared_days": days_result[0],
+            "average_tweet_by_day": days_result[1],
+            "max_tweet_num_by_day": days_result[2],
+            "max_tweet_day_by_day": days_result[3],
+            "tweet_length_sum": tweet_length_sum,
+            "communication_ratio": round(communication_num / count_all * 100.0, 2),
+        }
+        self.assertEqual(expect, {key: actual[key] for key in expect.keys()})
+        self.assertEqual(30, actual["count_all"])
 
     def test_to_dict(self):
         stats_record_dict = self._make_stats_record_dict()
@@ -0,0 +1,110 @@
+import sys
+import threading
+import time
+import unittest
+from collections import namedtuple
+
+from personal_twilog.crawl_pipeline import CrawlPipeline, StageTimings
+
+
+class TestCrawlPipeline(unittest.TestCase):
+    def test_init(self):
+        def fetch():
+            yield from []
+
+        def parse(page):
+            return page
+
+        def write(parsed):
+            return None
+
+        instance = CrawlPipeline(fetch(), parse, write, 3)
+        self.assertEqual(parse, instance.parse)
+        self.assertEqual(write, instance.write)
+        self.assertEqual(3, instance.queue_size)
+
+        with self.assertRaises(ValueError):
+            instance = CrawlPipeline(fetch(), parse, write, 0)
+
+    def test_run(self):
+        main_thread_id = threading.get_ident()
+        write_list = []
+
+        def write(parsed: str) -> None:
+            # 書き込みは呼び出し元のスレッドで行う
+            self.assertEqual(main_thread_id, threading.get_ident())
+            write_list.append(parsed)
+
+        # ページの順序を保って全ページを書き込む
+        actual = CrawlPipeline(iter(range(10)), lambda page: f"parsed_{page}", write, 2).run()
+        self.assertEqual([f"parsed_{i}" for i in range(10)], write_list)
+        self.assertEqual(10, actual.page_num)
+
+        # ページが無い場合は何も書き込まない
+        write_list.clear()
+        actual = CrawlPipeline(iter([]), lambda page: page, write).run()
+        self.assertEqual([], write_list)
+        self.assertEqual(0, actual.page_num)
+
+    def test_run_overlap(self):
+        interval = 0.05
+        page_num = 5
+
+        def fetch():
+            for i in range(page_num):
+                time.sleep(interval)
+                yield i
+
+        def parse(page: int) -> int:
+            time.sleep(interval)
+            return page
+
+        def write(parsed: int) -> None:
+            time.sleep(interval)
+
+        # 各段の処理が重なるため、全体の時間は各段の時間の合計より短い
+        actual = CrawlPipeline(fetch(), parse, write).run()
+        self.assertEqual(page_num, actual.page_num)
+        self.assertGreaterEqual(actual.fetch, interval * page_num * 0.9)
+        self.assertGreaterEqual(actual.parse, interval * page_num * 0.9)
+        self.assertGreaterEqual(actual.write, interval * page_num * 0.9)
+        self.assertLess(actual.total, actual.fetch + actual.parse + actual.write)
+
+    def test_run_error(self):
+        def fetch():
+            for i in range(10):
+                if i == 3 and params.error_stage == "fetch":
+                    raise ValueError("fetch")
+                yield i
+
+        def parse(page: int) -> int:
+            if page == 3 and params.error_stage == "parse":
+                raise ValueError("parse")
+            return page
+
+        def write(parsed: int) -> None:
+            if parsed == 3 and params.error_stage == "write":
+                raise ValueError("write")
+            write_list.append(parsed)
+
+        # いずれの段で例外が発生しても呼び出し元に送出し、スレッドを残さない
+        Params = namedtuple("Params", ["error_stage"])
+        params_list = [Params("fetch"), Params("parse"), Params("write")]
+        for params in params_list:
+            write_list = []
+            thread_set = set(threading.enumerate())
+            with self.assertRaisesRegex(ValueError, params.error_stage):
+                CrawlPipeline(fetch(), parse, write, 1).run()
+            self.assertEqual([0, 1, 2], write_list)
+            self.assertEqual(set(), set(threading.enumerate()) - thread_set)
+
+    def test_stage_timings(self):
+        instance = StageTimings(1.0, 2.0, 3.0, 4.5, 6)
+        self.assertEqual("fetch 1.000s, parse 2.000s, write 3.000s, total 4.500s, 6 pages", str(instance))
+        self.assertEqual(StageTimings(0.0, 0.0, 0.0, 0.0, 0), StageTimings())
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
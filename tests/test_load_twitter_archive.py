@@ -1,14 +1,70 @@
+import re
 import shutil
 import sys
 import unittest
 from collections import namedtuple
+from concurrent.futures import Future
+from datetime import datetime, timedelta
 from pathlib import Path
 
 import orjson
 from mock import patch
+from sqlalchemy import create_engine, inspect, select, text
 
-from personal_twilog.load_twitter_archive import ArchivedTweet, main, table_name
-from personal_twilog.util import Result
+from personal_twilog.db.model import Base as ModelBase
+from personal_twilog.db.model import DailyActivity, Tweet
+from personal_twilog.load_twitter_archive import ARCHIVE_SCREEN_NAME, ArchivedTweet, ArchivedTweetFields
+from personal_twilog.load_twitter_archive import ArchiveImportState, _iter_converted_rows, convert_archive_file
+from personal_twilog.load_twitter_archive import incremental_table_name, insert_incremental, insert_parallel
+from personal_twilog.load_twitter_archive import insert_streaming, iter_archive_entries, main, table_name
+from personal_twilog.util import Result, find_values
+
+
+def legacy_to_row(entry: dict) -> tuple:
+    """find_values でフィールドごとに探索していた旧実装（registered_at を除く）"""
+    tweet_dict = find_values(entry, "tweet", True, [""], [])
+    tweet_id = find_values(tweet_dict, "id_str", True, [""], [])
+    tweet_text = find_values(tweet_dict, "full_text", True, [""], [])
+    source = find_values(tweet_dict, "source", True, [""], [])
+    tweet_via = re.findall(r"<[^>]+>(.*?)<\/[^<]+>", source)[0]
+    user_id = "175674367"
+    user_name = "shift@ヽ(・ω・)ノ"
+    screen_name = "_shift4869"
+    tweet_url = f"https://twitter.com/{screen_name}/status/{tweet_id}"
+    created_at_str = find_values(tweet_dict, "created_at", True, [""], [])
+    gmt = datetime.strptime(created_at_str, "%a %b %d %H:%M:%S %z %Y")
+    created_at = (gmt + timedelta(hours=9)).isoformat().replace("+00:00", "")
+    appeared_at = created_at
+    is_retweet = re.findall(r"^RT @(.*)", tweet_text) != []
+    source_status_ids = find_values(tweet_dict, "source_status_id_str", False, [], [])
+    retweet_tweet_id = source_status_ids[0] if len(source_status_ids) > 0 and is_retweet else ""
+    expanded_urls = find_values(tweet_dict, "expanded_url", False, [], [])
+    is_quote = any([(re.findall(r"^https://twitter.com/(.*)/status/(\d*)$", url) != []) for url in expanded_urls])
+    quote_tweet_id = ""
+    if is_quote:
+        for url in expanded_urls:
+            if m := re.findall(r"^https://twitter.com/(.*)/status/(\d*)$", url):
+                quote_tweet_id = m[0][1]
+    has_media = find_values(tweet_dict, "media", False, [], []) != []
+    entities = find_values(tweet_dict, "entities", False, [], [])
+    has_external_link = find_values(entities, "expanded_url", False, [], []) != []
+    return (
+        tweet_id,
+        tweet_text,
+        tweet_via,
+        tweet_url,
+        user_id,
+        user_name,
+        screen_name,
+        is_retweet,
+        retweet_tweet_id,
+        is_quote,
+        quote_tweet_id,
+        has_media,
+        has_external_link,
+        created_at,
+        appeared_at,
+    )
 
 
 class TestLoadTwitterArchive(unittest.TestCase):
@@ -65,6 +121,354 @@ class TestLoadTwitterArchive(unittest.TestCase):
             instance = ArchivedTweet.create(entry)
             self.assertIsInstance(instance, ArchivedTweet)
 
+    def _get_archive_entries(self) -> list[dict]:
+        all_str = Path("./tests/cache/archived_tweets_sample.json").read_text("utf8")
+        all_str = all_str.replace(f"window.YTD.tweets.part0 = ", "")
+        return orjson.loads(all_str.encode())
+
+    def test_to_row(self):
+        for entry in self._get_archive_entries():
+            row = ArchivedTweet.to_row(entry)
+            self.assertEqual(len(ArchivedTweet.column_names()), len(row))
+            instance = ArchivedTweet.create(entry)
+            expect = tuple(getattr(instance, name) for name in ArchivedTweet.column_names())
+            # registered_at は実行時刻のため比較しない
+            self.assertEqual(expect[:-1], row[:-1])
+        self.assertNotIn("id", ArchivedTweet.column_names())
+
+    def _make_entry(self, **kwargs) -> dict:
+        tweet_dict = {
+            "source": '<a href="http://example.com/" rel="nofollow">via</a>',
+            "entities": {"urls": []},
+            "id_str": "44444",
+            "created_at": "Sat Apr 28 12:00:21 +0000 2018",
+            "full_text": "text",
+        }
+        tweet_dict.update(kwargs)
+        return {"tweet": tweet_dict}
+
+    def test_ArchivedTweetFields(self):
+        # サンプルのエントリについて、旧実装と同じ結果になる
+        entry_list = self._get_archive_entries()
+        for entry in entry_list:
+            self.assertEqual(legacy_to_row(entry), ArchivedTweet.to_row(entry)[:-1])
+
+        tweet_url = "https://twitter.com/user/status/{}"
+        Params = namedtuple("Params", ["entry", "expect"])
+        params_list = [
+            Params(self._make_entry(), ("44444", "text", (), (), False, False)),
+            # RT でない場合も source_status_id_str は出現順に収集する
+            Params(
+                self._make_entry(
+                    extended_entities={"media": [{"source_status_id_str": "1"}, {"source_status_id_str": "2"}]}
+                ),
+                ("44444", "text", ("1", "2"), (), True, False),
+            ),
+            # entities 外の expanded_url は外部リンクとみなさない, 引用は最後に現れたURL
+            Params(
+                self._make_entry(
+                    full_text="RT @user: text",
+                    quoted={"expanded_url": tweet_url.format(1)},
+                    entities={"urls": [{"expanded_url": tweet_url.format(2)}], "media": []},
+                ),
+                ("44444", "RT @user: text", (), (tweet_url.format(2), tweet_url.format(1)), True, True),
+            ),
+            # 入れ子の entities
+            Params(
+                self._make_entry(entities={"entities": {"expanded_url": "https://example.com/"}}),
+                ("44444", "text", (), ("https://example.com/",), False, True),
+            ),
+        ]
+        for params in params_list:
+            actual = ArchivedTweetFields.extract(params.entry)
+            self.assertEqual(
+                params.expect,
+                (
+                    actual.tweet_id,
+                    actual.tweet_text,
+                    actual.source_status_ids,
+                    actual.expanded_urls,
+                    actual.has_media,
+                    actual.has_external_link,
+                ),
+            )
+            self.assertEqual(legacy_to_row(params.entry), ArchivedTweet.to_row(params.entry)[:-1])
+
+        # 必須のキーが無い
+        invalid_entry_list = [
+            {},
+            {"tweet": "invalid"},
+            {"invalid": self._make_entry()["tweet"]},
+            {"tweet": {k: v for k, v in self._make_entry()["tweet"].items() if k != "id_str"}},
+            {"tweet": {k: v for k, v in self._make_entry()["tweet"].items() if k != "created_at"}},
+            "invalid",
+        ]
+        for entry in invalid_entry_list:
+            with self.assertRaises(ValueError):
+                actual = ArchivedTweetFields.extract(entry)
+            with self.assertRaises(ValueError):
+                actual = legacy_to_row(entry)
+
+    def test_iter_archive_entries(self):
+        expect = self._get_archive_entries()
+        ref_archived_json_path = Path("./tests/cache/archived_tweets_sample.json")
+        json_path = Path("./tests/cache/archive_stream_test.js")
+        self.addCleanup(json_path.unlink, missing_ok=True)
+
+        # チャンクの境界がエントリの途中にあっても同じ結果になる
+        json_path.write_bytes(ref_archived_json_path.read_bytes())
+        for chunk_size in [1, 7, 64, 1024 * 1024]:
+            actual = list(iter_archive_entries(json_path, chunk_size))
+            self.assertEqual(expect, actual)
+
+        # 空の配列
+        json_path.write_text("window.YTD.tweets.part1 = [ ]", "utf8")
+        actual = list(iter_archive_entries(json_path, 4))
+        self.assertEqual([], actual)
+
+        # 配列でない
+        json_path.write_text("invalid", "utf8")
+        with self.assertRaises(ValueError):
+            actual = list(iter_archive_entries(json_path, 4))
+
+        # 途中で途切れている
+        json_path.write_text(ref_archived_json_path.read_text("utf8")[:-10], "utf8")
+        with self.assertRaises(ValueError):
+            actual = list(iter_archive_entries(json_path, 64))
+
+        # 要素が壊れている
+        json_path.write_text("window.YTD.tweets.part0 = [ {invalid} ]", "utf8")
+        with self.assertRaises(ValueError):
+            actual = list(iter_archive_entries(json_path, 4))
+
+    def test_insert_streaming(self):
+        mock_tqdm = self.enterContext(patch("personal_twilog.load_twitter_archive.tqdm"))
+        mock_tqdm.side_effect = lambda any_list, desc: any_list
+
+        ref_archived_json_path = Path("./tests/cache/archived_tweets_sample.json")
+        engine = create_engine("sqlite:///:memory:")
+        ArchivedTweet.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(text(f"INSERT INTO {table_name} (tweet_id) VALUES ('stale')"))
+
+        entry_list = self._get_archive_entries()
+        for batch_size in [1, 2, 1000]:
+            # 同じファイルを2つ渡すと2倍のレコードが INSERT される, 既存レコードは削除される
+            actual = insert_streaming(engine, [ref_archived_json_path, ref_archived_json_path], batch_size)
+            self.assertEqual(len(entry_list) * 2, actual)
+
+            columns_str = ", ".join(ArchivedTweet.column_names())
+            with engine.connect() as conn:
+                record_list = conn.execute(text(f"SELECT {columns_str} FROM {table_name} ORDER BY id")).all()
+            expect = [ArchivedTweet.to_row(entry) for entry in entry_list] * 2
+            self.assertEqual(len(expect), len(record_list))
+            for e, r in zip(expect, record_list):
+                # 真偽値はDB上では "1"/"0" の文字列になる, registered_at は比較しない
+                e = tuple(str(int(v)) if isinstance(v, bool) else v for v in e)
+                self.assertEqual(e[:-1], tuple(r)[:-1])
+
+    def test_convert_archive_file(self):
+        ref_archived_json_path = Path("./tests/cache/archived_tweets_sample.json")
+        actual = convert_archive_file(ref_archived_json_path)
+        expect = [ArchivedTweet.to_row(entry) for entry in self._get_archive_entries()]
+        self.assertEqual([e[:-1] for e in expect], [a[:-1] for a in actual])
+
+    def test_iter_converted_rows(self):
+        mock_convert = self.enterContext(patch("personal_twilog.load_twitter_archive.convert_archive_file"))
+        mock_convert.side_effect = lambda json_path: [(json_path.name,)]
+
+        class FakeExecutor:
+            """submit された数を記録し、すぐに完了した Future を返す"""
+
+            def __init__(self):
+                self.submitted_list = []
+
+            def submit(self, fn, json_path):
+                self.submitted_list.append(json_path)
+                future = Future()
+                future.set_result(fn(json_path))
+                return future
+
+        json_path_list = [Path(f"tweets-part{i}.js") for i in range(5)]
+        executor = FakeExecutor()
+        actual = []
+        for row_list in _iter_converted_rows(executor, json_path_list, 2):
+            actual.append(row_list)
+            # 取得済の分を除いて、投入済のファイルは上限の 2 個を超えない
+            self.assertLessEqual(len(executor.submitted_list) - len(actual), 2)
+        expect = [[(json_path.name,)] for json_path in json_path_list]
+        self.assertEqual(expect, actual)
+        self.assertEqual(json_path_list, executor.submitted_list)
+
+        # 最初の1個を取得するまでは上限の数だけ投入する
+        executor = FakeExecutor()
+        row_list_iter = _iter_converted_rows(executor, json_path_list, 2)
+        self.assertEqual([], executor.submitted_list)
+        next(row_list_iter)
+        self.assertEqual(json_path_list[:3], executor.submitted_list)
+
+        # 対象ファイルなし
+        executor = FakeExecutor()
+        self.assertEqual([], list(_iter_converted_rows(executor, [], 2)))
+        self.assertEqual([], executor.submitted_list)
+
+    def test_insert_parallel(self):
+        mock_tqdm = self.enterContext(patch("personal_twilog.load_twitter_archive.tqdm"))
+        mock_tqdm.side_effect = lambda any_list, desc: any_list
+
+        ref_archived_json_path = Path("./tests/cache/archived_tweets_sample.json")
+        engine = create_engine("sqlite:///:memory:")
+        ArchivedTweet.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(text(f"INSERT INTO {table_name} (tweet_id) VALUES ('stale')"))
+
+        # ストリーミングモードと同じ結果になる
+        json_path_list = [ref_archived_json_path] * 3
+        expect_count = insert_streaming(engine, json_path_list, 2)
+        columns_str = ", ".join(ArchivedTweet.column_names()[:-1])
+        select_query = text(f"SELECT {columns_str} FROM {table_name} ORDER BY id")
+        with engine.connect() as conn:
+            expect = conn.execute(select_query).all()
+
+        actual_count = insert_parallel(engine, json_path_list, max_workers=2, batch_size=2)
+        self.assertEqual(expect_count, actual_count)
+        with engine.connect() as conn:
+            actual = conn.execute(select_query).all()
+        self.assertEqual(expect, actual)
+
+        # 対象ファイルなし
+        actual_count = insert_parallel(engine, [], max_workers=2)
+        self.assertEqual(0, actual_count)
+        with engine.connect() as conn:
+            actual = conn.execute(select_query).all()
+        self.assertEqual([], actual)
+
+    def _write_archive(self, json_path: Path, entry_list: list[dict]) -> None:
+        json_path.write_bytes(b"window.YTD.tweets.part0 = " + orjson.dumps(entry_list))
+
+    def test_insert_incremental(self):
+        mock_tqdm = self.enterContext(patch("personal_twilog.load_twitter_archive.tqdm"))
+        mock_tqdm.side_effect = lambda any_list, desc: any_list
+
+        json_path = Path("./tests/cache/archive_incremental_test.js")
+        self.addCleanup(json_path.unlink, missing_ok=True)
+        entry_list = self._get_archive_entries()
+        tweet_id_list = [entry["tweet"]["id_str"] for entry in entry_list]
+        max_entry = max(entry_list, key=lambda entry: int(entry["tweet"]["id_str"]))
+        created_at_index = ArchivedTweet.column_names().index("created_at")
+        expect_max_created_at = max(ArchivedTweet.to_row(entry)[created_at_index] for entry in entry_list[1:])
+
+        def select_state(engine) -> list[tuple]:
+            state_table = ArchiveImportState.__table__
+            with engine.connect() as conn:
+                record_list = conn.execute(
+                    select(state_table.c.target_table_name, state_table.c.max_tweet_id, state_table.c.max_created_at)
+                ).all()
+            return [tuple(r) for r in record_list]
+
+        Params = namedtuple("Params", ["is_merge", "target_table_name"])
+        params_list = [
+            Params(False, incremental_table_name),
+            Params(True, "Tweet"),
+        ]
+        for params in params_list:
+            engine = create_engine("sqlite:///:memory:")
+            tweet_id_num_query = text(f"SELECT tweet_id FROM {params.target_table_name} ORDER BY id")
+
+            # 初回は全件取り込む
+            self._write_archive(json_path, entry_list[1:])
+            actual = insert_incremental(engine, [json_path], params.is_merge, batch_size=1)
+            self.assertEqual(len(entry_list) - 1, actual)
+            self.assertEqual(
+                [(params.target_table_name, int(max_entry["tweet"]["id_str"]), expect_max_created_at)],
+                select_state(engine),
+            )
+            self.assertFalse(inspect(engine).has_table(table_name))
+
+            # 取り込み済の分は変換せずに読み飛ばす
+            with patch("personal_twilog.load_twitter_archive.ArchivedTweet.to_row") as mock_to_row:
+                actual = insert_incremental(engine, [json_path], params.is_merge)
+                self.assertEqual(0, actual)
+                mock_to_row.assert_not_called()
+
+            # 新しいエクスポートに増えた分のみ取り込む
+            new_entry = orjson.loads(orjson.dumps(max_entry))
+            new_entry["tweet"]["id_str"] = str(int(max_entry["tweet"]["id_str"]) + 1)
+            new_entry["tweet"]["created_at"] = "Sun Apr 29 12:00:00 +0000 2018"
+            self._write_archive(json_path, [new_entry] + entry_list)
+            actual = insert_incremental(engine, [json_path], params.is_merge)
+            self.assertEqual(1, actual)
+            self.assertEqual(
+                [(params.target_table_name, int(new_entry["tweet"]["id_str"]), "2018-04-29T21:00:00")],
+                select_state(engine),
+            )
+            with engine.connect() as conn:
+                actual = [r.tweet_id for r in conn.execute(tweet_id_num_query).all()]
+            self.assertEqual(tweet_id_list[1:] + [new_entry["tweet"]["id_str"]], actual)
+
+        # Tweet テーブルに既存のツイートは上書きしない, tweet_id_num も設定される
+        engine = create_engine("sqlite:///:memory:")
+        ModelBase.metadata.create_all(engine)
+        row_dict = dict(zip(ArchivedTweet.column_names(), ArchivedTweet.to_row(entry_list[0])))
+        row_dict["tweet_text"] = "fetched by api"
+        untouched_activity = DailyActivity(ARCHIVE_SCREEN_NAME, "2000-01-01", 1, 1, 0, "2000-01-01", "2000-01-01")
+        with engine.begin() as conn:
+            conn.execute(Tweet.__table__.insert().values(**row_dict))
+            conn.execute(DailyActivity.__table__.insert().values(**untouched_activity.to_dict()))
+        self._write_archive(json_path, entry_list)
+        actual = insert_incremental(engine, [json_path], is_merge=True)
+        self.assertEqual(len(entry_list) - 1, actual)
+
+        # DailyActivity は取り込んだツイートが含まれる日のみ再集計する
+        appeared_at_index = ArchivedTweet.column_names().index("appeared_at")
+        expect_day_list = sorted({ArchivedTweet.to_row(entry)[appeared_at_index][:10] for entry in entry_list[1:]})
+        with engine.connect() as conn:
+            record_list = conn.execute(select(DailyActivity).order_by(DailyActivity.day)).all()
+            expect_tweet_count_list = [
+                conn.execute(
+                    text("SELECT count(*) FROM Tweet WHERE date(appeared_at) = :day"), {"day": day}
+                ).scalar_one()
+                for day in expect_day_list
+            ]
+        self.assertEqual(["2000-01-01"] + expect_day_list, [r.day for r in record_list])
+        self.assertEqual([1] + expect_tweet_count_list, [r.tweet_count for r in record_list])
+        with engine.connect() as conn:
+            record_list = conn.execute(select(Tweet.tweet_id, Tweet.tweet_id_num, Tweet.tweet_text)).all()
+        self.assertEqual("fetched by api", record_list[0].tweet_text)
+        self.assertEqual(
+            [int(tweet_id) if i > 0 else None for i, tweet_id in enumerate(tweet_id_list)],
+            [r.tweet_id_num for r in record_list],
+        )
+
+    def test_main_incremental(self):
+        mock_tqdm = self.enterContext(patch("personal_twilog.load_twitter_archive.tqdm"))
+        mock_print = self.enterContext(patch("personal_twilog.load_twitter_archive.print"))
+        mock_tqdm.side_effect = lambda any_list, desc: any_list
+
+        input_path = Path("./tests/cache/archive_incremental/data") / "tweets.js"
+        output_db_path = input_path.parent / "archived_tweets_test.db"
+        input_path.parent.mkdir(exist_ok=True, parents=True)
+        self.addCleanup(shutil.rmtree, input_path.parent.parent)
+        shutil.copy2(Path("./tests/cache/archived_tweets_sample.json"), input_path)
+        output_db_path.touch()
+
+        entry_num = len(self._get_archive_entries())
+        for is_merge in [False, True]:
+            actual = main(input_path.parent.parent, output_db_path, is_incremental=True, is_merge=is_merge)
+            self.assertEqual(Result.success, actual)
+            mock_print.assert_called_with(f"DB insert done: {entry_num} records.")
+
+            actual = main(input_path.parent.parent, output_db_path, is_incremental=True, is_merge=is_merge)
+            self.assertEqual(Result.success, actual)
+            mock_print.assert_called_with("DB insert done: 0 records.")
+
+        engine = create_engine(f"sqlite:///{output_db_path}")
+        for target_table_name in [incremental_table_name, "Tweet"]:
+            with engine.connect() as conn:
+                actual = conn.execute(text(f"SELECT COUNT(*) FROM {target_table_name}")).scalar()
+            self.assertEqual(entry_num, actual)
+        engine.dispose()
+
     def test_main(self):
         mock_create_engine = self.enterContext(patch("personal_twilog.load_twitter_archive.create_engine"))
         mock_base = self.enterContext(patch("personal_twilog.load_twitter_archive.Base"))
@@ -86,7 +490,7 @@ class TestLoadTwitterArchive(unittest.TestCase):
             shutil.rmtree(input_path.parent.parent)
             input_path.parent.mkdir(exist_ok=True, parents=True)
 
-            if params.kind == "normal":
+            if params.kind in ["normal", "normal_streaming", "normal_parallel"]:
                 # 正常系
                 output_db_path.touch()
                 shutil.copy2(ref_archived_json_path, input_path.parent)
@@ -140,6 +544,8 @@ class TestLoadTwitterArchive(unittest.TestCase):
 
         params_list = [
             Params("normal", Result.success),
+            Params("normal_streaming", Result.success),
+            Params("normal_parallel", Result.success),
             Params("predict_path", Result.success),
             Params("not_exist_js", Result.failed),
             Params("invalid_dir", Result.failed),
@@ -149,7 +555,9 @@ class TestLoadTwitterArchive(unittest.TestCase):
         ]
         for params in params_list:
             input_base_path, output_db_path = pre_run(params)
-            actual = main(input_base_path, output_db_path)
+            is_streaming = params.kind == "normal_streaming"
+            is_parallel = params.kind == "normal_parallel"
+            actual = main(input_base_path, output_db_path, is_streaming, is_parallel)
             post_run(actual, params)
 
         # 対象.jsファイルが存在しなかった
@@ -0,0 +1,151 @@
+import gzip
+import shutil
+import sys
+import unittest
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+
+import freezegun
+import orjson
+from mock import patch
+
+from personal_twilog.response_cache import ResponseCache, ResponseCacheWriter
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.mock_logger = self.enterContext(patch("personal_twilog.response_cache.logger"))
+        self.base_path = Path("./tests/response_cache_test")
+        shutil.rmtree(self.base_path, ignore_errors=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.base_path, ignore_errors=True)
+
+    def _get_record_list(self, record_num: int) -> list[dict]:
+        return [{"result": {"rest_id": str(i), "legacy": {"full_text": f"text_{i}"}}} for i in range(record_num)]
+
+    def test_init(self):
+        instance = ResponseCache("timeline_response", self.base_path)
+        self.assertEqual("timeline_response", instance.name)
+        self.assertEqual(self.base_path, instance.base_path)
+
+        instance = ResponseCache("likes_response")
+        self.assertEqual(Path("./cache"), instance.base_path)
+
+        with self.assertRaises(ValueError):
+            instance = ResponseCache("", self.base_path)
+        with self.assertRaises(ValueError):
+            instance = ResponseCache(-1, self.base_path)
+
+    def test_make_path(self):
+        instance = ResponseCache("timeline_response", self.base_path)
+        actual = instance.make_path("screen_name_1", datetime(2026, 2, 8, 1, 2, 3))
+        expect = self.base_path / "timeline_response_screen_name_1_20260208010203.jsonl.gz"
+        self.assertEqual(expect, actual)
+
+    def test_write(self):
+        instance = ResponseCache("timeline_response", self.base_path)
+        record_list = self._get_record_list(5)
+        saved_at = datetime(2026, 2, 8, 1, 2, 3)
+        actual = instance.write("screen_name_1", record_list, saved_at)
+        self.assertEqual(instance.make_path("screen_name_1", saved_at), actual)
+
+        # 1行に1レコードの、インデントの無い JSON を gzip 圧縮して書き込む
+        line_list = gzip.decompress(actual.read_bytes()).splitlines()
+        self.assertEqual([orjson.dumps(record) for record in record_list], line_list)
+        self.assertEqual([actual], list(self.base_path.iterdir()))
+
+        # saved_at を省略した場合は現在日時
+        with freezegun.freeze_time("2026-02-09T10:20:30"):
+            actual = instance.write("screen_name_1", iter(record_list))
+        self.assertEqual(self.base_path / "timeline_response_screen_name_1_20260209102030.jsonl.gz", actual)
+
+    def test_open_writer(self):
+        instance = ResponseCache("get_user_tweets", self.base_path)
+        saved_at = datetime(2026, 2, 8, 1, 2, 3)
+        path = instance.make_path("screen_name_1", saved_at)
+        page_list = [self._get_record_list(3), self._get_record_list(2)]
+        with instance.open_writer("screen_name_1", saved_at) as writer:
+            self.assertIsInstance(writer, ResponseCacheWriter)
+            for page in page_list:
+                writer.write(page)
+            # 書き込み中は一時ファイルに書き込む
+            self.assertFalse(path.exists())
+        self.assertEqual(2, writer.record_num)
+        self.assertEqual(page_list, list(ResponseCache.iter_path(path)))
+
+        # 途中で例外が発生した場合は書きかけのファイルを残さない
+        shutil.rmtree(self.base_path)
+        with self.assertRaises(ValueError):
+            with instance.open_writer("screen_name_1", saved_at) as writer:
+                writer.write(page_list[0])
+                raise ValueError
+        self.assertEqual([], list(self.base_path.iterdir()))
+
+    def test_find_latest(self):
+        instance = ResponseCache("timeline_response", self.base_path)
+        self.assertIsNone(instance.find_latest("screen_name_1"))
+
+        record_list = self._get_record_list(1)
+        instance.write("screen_name_1", record_list, datetime(2026, 2, 8, 1, 0, 0))
+        instance.write("screen_name_1", record_list, datetime(2026, 2, 10, 1, 0, 0))
+        instance.write("screen_name_1", record_list, datetime(2026, 2, 9, 1, 0, 0))
+        # screen_name の前方が一致する他のアカウントと、他の種類のキャッシュは対象外
+        instance.write("screen_name_1_other", record_list, datetime(2026, 2, 11, 1, 0, 0))
+        ResponseCache("likes_response", self.base_path).write("screen_name_1", record_list, datetime(2026, 2, 12))
+
+        actual = instance.find_latest("screen_name_1")
+        self.assertEqual(instance.make_path("screen_name_1", datetime(2026, 2, 10, 1, 0, 0)), actual)
+        self.assertIsNone(instance.find_latest("screen_name_2"))
+
+    def test_iter_records(self):
+        instance = ResponseCache("likes_response", self.base_path)
+        # キャッシュが無い場合は何も返さない
+        self.assertEqual([], list(instance.iter_records("screen_name_1")))
+        self.mock_logger.info.assert_called_once()
+
+        old_record_list = self._get_record_list(2)
+        record_list = self._get_record_list(10)
+        instance.write("screen_name_1", old_record_list, datetime(2026, 2, 8, 1, 0, 0))
+        instance.write("screen_name_1", record_list, datetime(2026, 2, 9, 1, 0, 0))
+        instance.write("screen_name_2", old_record_list, datetime(2026, 2, 10, 1, 0, 0))
+
+        # 最新のキャッシュを1件ずつ読み込む
+        iterator = instance.iter_records("screen_name_1")
+        self.assertEqual(record_list[0], next(iterator))
+        self.assertEqual(record_list[1:], list(iterator))
+        self.assertEqual(old_record_list, list(instance.iter_records("screen_name_2")))
+
+    def test_cutoff(self):
+        instance = ResponseCache("timeline_response", self.base_path)
+        self.assertEqual(0, instance.cutoff(7))
+
+        Params = namedtuple("Params", ["name", "screen_name", "saved_at", "is_delete"])
+        params_list = [
+            Params("timeline_response", "screen_name_1", datetime(2026, 2, 1, 0, 0, 0), True),
+            Params("timeline_response", "screen_name_1", datetime(2026, 2, 1, 1, 0, 1), False),
+            Params("timeline_response", "screen_name_2", datetime(2026, 1, 1, 0, 0, 0), True),
+            Params("timeline_response", "screen_name_2", datetime(2026, 2, 8, 0, 0, 0), False),
+            # 他の種類のキャッシュは対象外
+            Params("likes_response", "screen_name_1", datetime(2026, 1, 1, 0, 0, 0), False),
+        ]
+        for params in params_list:
+            ResponseCache(params.name, self.base_path).write(params.screen_name, [], params.saved_at)
+        # キャッシュ以外のファイルは対象外
+        other_path = self.base_path / "media_size.json"
+        other_path.write_bytes(b"{}")
+
+        with freezegun.freeze_time("2026-02-08T01:00:00"):
+            actual = instance.cutoff(7)
+        self.assertEqual(2, actual)
+        for params in params_list:
+            path = ResponseCache(params.name, self.base_path).make_path(params.screen_name, params.saved_at)
+            self.assertEqual(not params.is_delete, path.exists())
+        self.assertTrue(other_path.exists())
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
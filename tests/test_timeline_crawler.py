@@ -1,6 +1,7 @@
 import os
 import shutil
 import sys
+import threading
 import unittest
 from collections import namedtuple
 from datetime import datetime
@@ -8,10 +9,16 @@ from logging import getLogger
 from pathlib import Path
 
 import freezegun
+import orjson
 from dateutil.relativedelta import relativedelta
-from mock import MagicMock, call, patch
-
-from personal_twilog.timeline_crawler import CrawlResultStatus, TimelineCrawler
+from mock import MagicMock, PropertyMock, call, patch
+
+from personal_twilog.db.engine_registry import EngineRegistry
+from personal_twilog.parser.parser_base import FlattenedTweetList
+from personal_twilog.response_cache import ResponseCache
+from personal_twilog.timeline_crawler import CrawlKind, CrawlResultStatus, ParsedCrawl, TimelineCrawler
+from personal_twilog.webapi.replay_twitter_api import ReplayTwitterAPI
+from personal_twilog.webapi.tweet_results_extractor import TweetResultsExtractor
 from personal_twilog.webapi.valueobject.user_id import UserId
 from personal_twilog.webapi.valueobject.user_name import UserName
 
@@ -24,13 +31,43 @@ class TestTimelineCrawler(unittest.TestCase):
         enable = "enable" if is_enable else "disable"
         return {"status": enable, "screen_name": screen_name, "ct0": ct0, "auth_token": auth_token}
 
-    def _get_config_json(self, enable_num: int = 1, disable_num: int = 0) -> dict:
+    def _get_config_json(
+        self,
+        enable_num: int = 1,
+        disable_num: int = 0,
+        wal_mode: str = "",
+        max_workers: int | None = None,
+        backend: str = "",
+        replay_dir_path: str = "",
+        replay_db_path: str = "",
+    ) -> dict:
         enable_user_list = [self._make_user_dict(i, True) for i in range(enable_num)]
         disable_user_list = [self._make_user_dict(i, False) for i in range(disable_num)]
         user_list = enable_user_list + disable_user_list
-        return {"twitter_api_client_list": user_list}
-
-    def _get_instance(self) -> TimelineCrawler:
+        config = {"twitter_api_client_list": user_list}
+        if wal_mode:
+            config["db"] = {"wal_mode": wal_mode}
+        crawl_config = {}
+        if max_workers is not None:
+            crawl_config["max_workers"] = max_workers
+        if backend:
+            crawl_config["backend"] = backend
+        if replay_dir_path:
+            crawl_config["replay_dir_path"] = replay_dir_path
+        if replay_db_path:
+            crawl_config["replay_db_path"] = replay_db_path
+        if crawl_config:
+            config["crawl"] = crawl_config
+        return config
+
+    def _get_instance(
+        self,
+        wal_mode: str = "",
+        max_workers: int | None = None,
+        backend: str = "",
+        replay_dir_path: str = "",
+        replay_db_path: str = "",
+    ) -> TimelineCrawler:
         self.mock_logger = self.enterContext(patch("personal_twilog.timeline_crawler.logger"))
         self.mock_orjson = self.enterContext(patch("personal_twilog.timeline_crawler.orjson"))
         self.mock_tweet_db = self.enterContext(patch("personal_twilog.timeline_crawler.TweetDB"))
@@ -38,15 +75,30 @@ class TestTimelineCrawler(unittest.TestCase):
         self.mock_media_db = self.enterContext(patch("personal_twilog.timeline_crawler.MediaDB"))
         self.mock_metric_db = self.enterContext(patch("personal_twilog.timeline_crawler.MetricDB"))
         self.mock_external_link_db = self.enterContext(patch("personal_twilog.timeline_crawler.ExternalLinkDB"))
+        self.mock_engine_registry = self.enterContext(patch("personal_twilog.timeline_crawler.EngineRegistry"))
+        self.mock_media_size_fetcher = self.enterContext(patch("personal_twilog.timeline_crawler.MediaSizeFetcher"))
+        self.mock_cache_only_media_size_fetcher = self.enterContext(
+            patch("personal_twilog.timeline_crawler.CacheOnlyMediaSizeFetcher")
+        )
+        self.mock_response_cache = self.enterContext(patch("personal_twilog.timeline_crawler.ResponseCache"))
+
+        def make_response_cache(name: str, base_path: str | Path) -> MagicMock:
+            response_cache = MagicMock()
+            response_cache.name, response_cache.base_path = name, base_path
+            return response_cache
+
+        self.mock_response_cache.side_effect = make_response_cache
         self.enterContext(freezegun.freeze_time("2026-02-08T01:00:00"))
 
-        sample_config_json = self._get_config_json()
+        sample_config_json = self._get_config_json(
+            wal_mode=wal_mode,
+            max_workers=max_workers,
+            backend=backend,
+            replay_dir_path=replay_dir_path,
+            replay_db_path=replay_db_path,
+        )
         self.mock_orjson.loads.side_effect = lambda byte_data: sample_config_json
         crawler = TimelineCrawler()
-
-        crawler.TIMELINE_CACHE_FILE_PATH = "./tests/cache/timeline_response.json"
-        crawler.LIKES_CACHE_FILE_PATH = "./tests/cache/likes_response.json"
-
         return crawler
 
     def test_init(self):
@@ -64,19 +116,148 @@ class TestTimelineCrawler(unittest.TestCase):
         self.assertEqual(self.mock_media_db(), instance.media_db)
         self.assertEqual(self.mock_metric_db(), instance.metric_db)
         self.assertEqual(self.mock_external_link_db(), instance.external_link_db)
+        self.mock_media_size_fetcher.assert_called_once_with()
+        self.mock_cache_only_media_size_fetcher.assert_not_called()
+        self.assertEqual(self.mock_media_size_fetcher(), instance.media_size_fetcher)
         self.assertEqual("2026-02-08T01:00:00", instance.registered_at)
+        self.mock_engine_registry.enable_wal.assert_not_called()
+        # 取得したレスポンスは TL と Likes で別のキャッシュに保存する
+        self.mock_response_cache.assert_has_calls([
+            call("timeline_response", "./cache"),
+            call("likes_response", "./cache"),
+        ])
+        self.assertNotEqual(instance.timeline_cache, instance.likes_cache)
+        # 取得元は既定で TwitterAPI
+        self.assertEqual("api", instance.backend)
+        self.assertEqual(Path("./cache"), instance.replay_dir_path)
+
+        # WAL モードは config で有効にした場合のみ設定する
+        for wal_mode, is_enable in [("enable", True), ("disable", False)]:
+            instance = self._get_instance(wal_mode)
+            if is_enable:
+                self.mock_engine_registry.enable_wal.assert_called_once_with(instance.tweet_db.db_path)
+            else:
+                self.mock_engine_registry.enable_wal.assert_not_called()
+
+        # 並列クロールのワーカー数は config で指定した場合のみ変わる
+        self.assertEqual(1, instance.max_workers)
+        instance = self._get_instance(max_workers=4)
+        self.assertEqual(4, instance.max_workers)
+        with self.assertRaises(ValueError):
+            instance = self._get_instance(max_workers=0)
+
+        # 記録済のレスポンスの再生は config で指定した場合のみ
+        # 再生時は replay_dir_path 配下のDBに書き込み、メディアのファイルサイズはキャッシュのみから引く
+        instance = self._get_instance(backend="replay", replay_dir_path="./tests/cache")
+        self.assertEqual("replay", instance.backend)
+        self.assertEqual(Path("./tests/cache"), instance.replay_dir_path)
+        replay_db_path = str(Path("./tests/cache") / "replay_timeline.db")
+        for mock_db in [
+            self.mock_tweet_db,
+            self.mock_likes_db,
+            self.mock_media_db,
+            self.mock_metric_db,
+            self.mock_external_link_db,
+        ]:
+            mock_db.assert_called_once_with(db_path=replay_db_path)
+        self.mock_media_size_fetcher.assert_not_called()
+        self.mock_cache_only_media_size_fetcher.assert_called_once_with()
+        self.assertEqual(self.mock_cache_only_media_size_fetcher(), instance.media_size_fetcher)
+
+        # 再生時の書き込み先DBは config で指定できる
+        instance = self._get_instance(backend="replay", replay_db_path="./tests/cache/replay_test.db")
+        self.mock_tweet_db.assert_called_once_with(db_path=str(Path("./tests/cache/replay_test.db")))
+        with self.assertRaises(ValueError):
+            instance = self._get_instance(backend="invalid")
+
+    def test_run_pipeline(self):
+        mock_unit_of_work = self.enterContext(patch("personal_twilog.timeline_crawler.UnitOfWork"))
+        mock_session = mock_unit_of_work.return_value.__enter__.return_value
+        instance = self._get_instance()
+        engine = MagicMock()
+        parse_started = threading.Event()
+        write_list = []
+
+        def iter_pages():
+            for i in range(3):
+                if i == 2:
+                    # 最後のページを取得する前に、取得済のページのパースが始まっている
+                    self.assertTrue(parse_started.wait(timeout=5))
+                yield [f"tweet_{i}"]
+
+        def parse(tweet_list: list[str]) -> ParsedCrawl:
+            parse_started.set()
+            return ParsedCrawl("screen_name_1", tweet_list, tweet_list, [], [])
+
+        def write(parsed: ParsedCrawl, session: MagicMock) -> None:
+            self.assertIs(mock_session, session)
+            write_list.append(parsed.record_dict_list)
+
+        # ページを取得しながら、取得した順にパース, 書き込みを行う
+        actual = instance._run_pipeline(CrawlKind.TIMELINE, "screen_name_1", engine, iter_pages(), parse, write)
+        self.assertEqual([["tweet_0"], ["tweet_1"], ["tweet_2"]], write_list)
+        self.assertEqual(["tweet_0", "tweet_1", "tweet_2"], actual.record_dict_list)
+        self.assertIsInstance(actual.tweet_list, FlattenedTweetList)
+        mock_unit_of_work.assert_called_once_with(engine)
+        self.assertEqual(3, instance.stage_timings[(CrawlKind.TIMELINE, "screen_name_1")].page_num)
+
+        # is_write_reversed なら全ページのパース後に、取得と逆の順に書き込み、最後に finish を実行する
+        parse_started.clear()
+        write_list.clear()
+        mock_unit_of_work.reset_mock()
+        finish = MagicMock()
+        actual = instance._run_pipeline(
+            CrawlKind.LIKES, "screen_name_1", engine, iter_pages(), parse, write, finish, is_write_reversed=True
+        )
+        self.assertEqual([["tweet_2"], ["tweet_1"], ["tweet_0"]], write_list)
+        self.assertEqual(["tweet_2", "tweet_1", "tweet_0"], actual.record_dict_list)
+        finish.assert_called_once_with(actual, mock_session)
+        mock_unit_of_work.assert_called_once_with(engine)
+        self.assertEqual(3, instance.stage_timings[(CrawlKind.LIKES, "screen_name_1")].page_num)
+
+        # 空のページは飛ばし、ツイートが無ければ UnitOfWork を開始しない
+        mock_unit_of_work.reset_mock()
+        finish.reset_mock()
+        actual = instance._run_pipeline(
+            CrawlKind.TIMELINE, "screen_name_1", engine, iter([[], []]), parse, write, finish
+        )
+        self.assertIsNone(actual)
+        mock_unit_of_work.assert_not_called()
+        finish.assert_not_called()
+        self.assertEqual(0, instance.stage_timings[(CrawlKind.TIMELINE, "screen_name_1")].page_num)
+
+        # 途中で例外が発生した場合は、取得中のページのイテレータを閉じる
+        closed_list = []
+
+        def iter_many_pages():
+            try:
+                for i in range(10):
+                    yield [f"tweet_{i}"]
+            finally:
+                closed_list.append(True)
+
+        def parse_failure(tweet_list: list[str]) -> ParsedCrawl:
+            raise ValueError("parse failed")
+
+        with self.assertRaises(ValueError):
+            instance._run_pipeline(
+                CrawlKind.TIMELINE, "screen_name_1", engine, iter_many_pages(), parse_failure, write
+            )
+        self.assertEqual([True], closed_list)
 
     def test_timeline_crawl(self):
-        mock_path = self.enterContext(patch("personal_twilog.timeline_crawler.Path"))
-        # mock_orjson = self.enterContext(patch("personal_twilog.timeline_crawler.orjson"))
         mock_tweet_parser = self.enterContext(patch("personal_twilog.timeline_crawler.TweetParser"))
         mock_memo_writer = self.enterContext(patch("personal_twilog.timeline_crawler.MemoWriter"))
         mock_media_parser = self.enterContext(patch("personal_twilog.timeline_crawler.MediaParser"))
         mock_external_link_parser = self.enterContext(patch("personal_twilog.timeline_crawler.ExternalLinkParser"))
         mock_metric_parser = self.enterContext(patch("personal_twilog.timeline_crawler.MetricParser"))
         mock_timeline_stats = self.enterContext(patch("personal_twilog.timeline_crawler.TimelineStats"))
+        mock_unit_of_work = self.enterContext(patch("personal_twilog.timeline_crawler.UnitOfWork"))
+        mock_session = mock_unit_of_work.return_value.__enter__.return_value
+        mock_flatten = self.enterContext(patch("personal_twilog.timeline_crawler.ParserBase.flatten"))
+        mock_flatten.side_effect = lambda tweet_list: ["flattened"] + tweet_list
 
-        Params = namedtuple("Params", ["is_twitter", "kind_tweet_list", "kind_metric_parsed_dict", "result"])
+        Params = namedtuple("Params", ["is_replay", "kind_tweet_list", "kind_metric_parsed_dict", "result"])
 
         def pre_run(params: Params) -> TimelineCrawler:
             instance = self._get_instance()
@@ -89,30 +270,23 @@ class TestTimelineCrawler(unittest.TestCase):
             min_id = 100
             instance.tweet_db.select_for_max_id.return_value = min_id
 
-            self.mock_orjson.reset_mock()
-            instance.twitter = MagicMock()
-            # mock_orjson.reset_mock()
-            mock_path.reset_mock()
             mock_tweet_parser.reset_mock()
             mock_memo_writer.reset_mock()
             mock_media_parser.reset_mock()
             mock_external_link_parser.reset_mock()
             mock_metric_parser.reset_mock()
             mock_timeline_stats.reset_mock()
-
-            if params.is_twitter:
-                if params.kind_tweet_list == "valid":
-                    tweet_list = ["tweet_list_1", ""]
-                    instance.twitter.get_user_timeline.return_value = tweet_list
-                else:  # "empty"
-                    instance.twitter.get_user_timeline.return_value = []
-            else:
-                instance.twitter = None
-                if params.kind_tweet_list == "valid":
-                    tweet_list = ["tweet_list_1", ""]
-                    self.mock_orjson.loads.side_effect = lambda byte_data: tweet_list
-                else:  # "empty"
-                    self.mock_orjson.loads.side_effect = lambda byte_data: []
+            mock_unit_of_work.reset_mock()
+            mock_flatten.reset_mock()
+
+            # replay バックエンドでは記録済のレスポンスを返す ReplayTwitterAPI を使う
+            instance.backend = "replay" if params.is_replay else "api"
+            instance.twitter = MagicMock(spec=ReplayTwitterAPI) if params.is_replay else MagicMock()
+            if params.kind_tweet_list == "valid":
+                tweet_list = ["tweet_list_1", ""]
+                instance.twitter.iter_user_timeline.return_value = iter([tweet_list])
+            else:  # "empty"
+                instance.twitter.iter_user_timeline.return_value = iter([])
 
             if params.kind_metric_parsed_dict == "valid":
                 metric_parsed_dict = ["metric_parsed_dict"]
@@ -124,14 +298,15 @@ class TestTimelineCrawler(unittest.TestCase):
         def post_run(actual: CrawlResultStatus, instance: TimelineCrawler, params: Params) -> None:
             self.assertEqual(params.result, actual)
 
-            if params.is_twitter:
-                instance.twitter.get_user_timeline.assert_called_once_with("screen_name_1", 300, 100)
-                if params.kind_tweet_list == "valid":
-                    mock_path.assert_called()
-                else:  # "empty"
-                    mock_path.assert_not_called()
+            instance.twitter.iter_user_timeline.assert_called_once_with("screen_name_1", 300, 100)
+            # 取得したレスポンスは末尾を除く前のまま記録する, 再生中は記録しない
+            if params.kind_tweet_list == "valid" and not params.is_replay:
+                instance.timeline_cache.open_writer.assert_called_once_with("screen_name_1")
+                mock_writer = instance.timeline_cache.open_writer.return_value.__enter__.return_value
+                mock_writer.write_all.assert_called_once_with(["tweet_list_1", ""])
             else:
-                mock_path.assert_called()
+                instance.timeline_cache.open_writer.assert_not_called()
+            instance.likes_cache.open_writer.assert_not_called()
 
             if params.kind_tweet_list != "valid":
                 mock_tweet_parser.assert_not_called()
@@ -140,42 +315,97 @@ class TestTimelineCrawler(unittest.TestCase):
                 mock_external_link_parser.assert_not_called()
                 mock_metric_parser.assert_not_called()
                 mock_timeline_stats.assert_not_called()
+                mock_unit_of_work.assert_not_called()
+                mock_flatten.assert_not_called()
                 return
 
-            mock_tweet_parser.assert_called()
-            instance.tweet_db.upsert.assert_called()
-            mock_memo_writer.assert_called()
-            mock_media_parser.assert_called()
-            instance.media_db.upsert.assert_called()
-            mock_external_link_parser.assert_called()
-            instance.external_link_db.upsert.assert_called()
+            # flatten は1回だけ行い、各パーサには平滑化済のリストを渡す
+            mock_flatten.assert_called_once()
+            flattened_tweet_list = ["flattened"] + mock_flatten.call_args.args[0]
+
+            # パイプラインの各段の処理時間を記録する
+            self.assertEqual(1, instance.stage_timings[(CrawlKind.TIMELINE, "screen_name_1")].page_num)
+
+            # 全テーブルを1つの UnitOfWork の session で書き込む
+            mock_unit_of_work.assert_called_once_with(instance.tweet_db.engine)
+            mock_unit_of_work.return_value.__exit__.assert_called_once()
+            mock_tweet_parser.assert_called_once_with(flattened_tweet_list, instance.registered_at)
+            instance.tweet_db.upsert.assert_called_once_with(
+                mock_tweet_parser.return_value.parse.return_value, mock_session
+            )
+            # 再生中はメモを書き出さない
+            if params.is_replay:
+                mock_memo_writer.assert_not_called()
+            else:
+                mock_memo_writer.assert_called()
+            mock_media_parser.assert_called_once_with(
+                flattened_tweet_list, instance.registered_at, instance.media_size_fetcher
+            )
+            instance.media_db.upsert.assert_called_once_with(
+                mock_media_parser.return_value.parse.return_value, mock_session
+            )
+            mock_external_link_parser.assert_called_once_with(flattened_tweet_list, instance.registered_at)
+            instance.external_link_db.upsert.assert_called_once_with(
+                mock_external_link_parser.return_value.parse.return_value, mock_session
+            )
 
             if params.kind_metric_parsed_dict != "valid":
                 mock_timeline_stats.assert_not_called()
                 instance.metric_db.upsert.assert_not_called()
             else:  # "empty"
-                mock_timeline_stats.assert_called()
-                instance.metric_db.upsert.assert_called()
+                mock_metric_parser.assert_called_once_with(
+                    flattened_tweet_list, instance.registered_at, "screen_name_1"
+                )
+                mock_timeline_stats.assert_called_once_with("metric_parsed_dict", instance.tweet_db, mock_session)
+                instance.metric_db.upsert.assert_called_once_with(
+                    [mock_timeline_stats.return_value.to_dict.return_value], mock_session
+                )
 
         params_list = [
-            Params(True, "valid", "valid", CrawlResultStatus.DONE),
-            Params(True, "valid", "empty", CrawlResultStatus.DONE),
             Params(False, "valid", "valid", CrawlResultStatus.DONE),
-            Params(True, "empty", "valid", CrawlResultStatus.NO_UPDATE),
+            Params(False, "valid", "empty", CrawlResultStatus.DONE),
+            Params(True, "valid", "valid", CrawlResultStatus.DONE),
             Params(False, "empty", "valid", CrawlResultStatus.NO_UPDATE),
+            Params(True, "empty", "valid", CrawlResultStatus.NO_UPDATE),
         ]
         for params in params_list:
             instance = pre_run(params)
             actual = instance.timeline_crawl("screen_name_1")
             post_run(actual, instance, params)
 
+        # 複数ページに分かれる場合も、全ページを1つの UnitOfWork で書き込み、Metric は1回だけ記録する
+        # 各ページの末尾の1件は次のページの先頭に回し、TL 全体の末尾の1件のみ除く
+        instance = pre_run(Params(False, "valid", "valid", CrawlResultStatus.DONE))
+        page_list = [["tweet_list_1", "tweet_list_2"], ["tweet_list_3"], ["tweet_list_4", ""]]
+        instance.twitter.iter_user_timeline.return_value = iter(page_list)
+        actual = instance.timeline_crawl("screen_name_1")
+        self.assertEqual(CrawlResultStatus.DONE, actual)
+        self.assertEqual(3, instance.stage_timings[(CrawlKind.TIMELINE, "screen_name_1")].page_num)
+        self.assertEqual(
+            [call(["tweet_list_1"]), call(["tweet_list_2"]), call(["tweet_list_3", "tweet_list_4"])],
+            mock_flatten.call_args_list,
+        )
+        mock_unit_of_work.assert_called_once_with(instance.tweet_db.engine)
+        self.assertEqual(3, instance.tweet_db.upsert.call_count)
+        mock_metric_parser.assert_called_once_with(
+            ["flattened", "tweet_list_1", "flattened", "tweet_list_2", "flattened", "tweet_list_3", "tweet_list_4"],
+            instance.registered_at,
+            "screen_name_1",
+        )
+        # 全ページ分をまとめた tweet_list も平滑化済として渡し、MetricParser で再度平滑化しない
+        self.assertIsInstance(mock_metric_parser.call_args.args[0], FlattenedTweetList)
+        instance.metric_db.upsert.assert_called_once()
+
     def test_likes_crawl(self):
-        mock_path = self.enterContext(patch("personal_twilog.timeline_crawler.Path"))
         mock_likes_parser = self.enterContext(patch("personal_twilog.timeline_crawler.LikesParser"))
         mock_media_parser = self.enterContext(patch("personal_twilog.timeline_crawler.MediaParser"))
         mock_external_link_parser = self.enterContext(patch("personal_twilog.timeline_crawler.ExternalLinkParser"))
+        mock_unit_of_work = self.enterContext(patch("personal_twilog.timeline_crawler.UnitOfWork"))
+        mock_session = mock_unit_of_work.return_value.__enter__.return_value
+        mock_flatten = self.enterContext(patch("personal_twilog.timeline_crawler.ParserBase.flatten"))
+        mock_flatten.side_effect = lambda tweet_list: ["flattened"] + tweet_list
 
-        Params = namedtuple("Params", ["is_twitter", "kind_tweet_list", "result"])
+        Params = namedtuple("Params", ["is_replay", "kind_tweet_list", "result"])
 
         def pre_run(params: Params) -> TimelineCrawler:
             instance = self._get_instance()
@@ -184,68 +414,100 @@ class TestTimelineCrawler(unittest.TestCase):
             instance.metric_db = MagicMock()
             instance.external_link_db = MagicMock()
 
-            min_id = 100
-            instance.likes_db.select_for_max_id.return_value = min_id
+            instance.likes_db.select_recent_tweet_ids.return_value = {"100", "99"}
 
-            self.mock_orjson.reset_mock()
-            instance.twitter = MagicMock()
-            # mock_orjson.reset_mock()
-            mock_path.reset_mock()
             mock_likes_parser.reset_mock()
             mock_media_parser.reset_mock()
             mock_external_link_parser.reset_mock()
-
-            if params.is_twitter:
-                if params.kind_tweet_list == "valid":
-                    tweet_list = ["tweet_list_1", ""]
-                    instance.twitter.get_likes.return_value = tweet_list
-                else:  # "empty"
-                    instance.twitter.get_likes.return_value = []
-            else:
-                instance.twitter = None
-                if params.kind_tweet_list == "valid":
-                    tweet_list = ["tweet_list_1", ""]
-                    self.mock_orjson.loads.side_effect = lambda byte_data: tweet_list
-                else:  # "empty"
-                    self.mock_orjson.loads.side_effect = lambda byte_data: []
+            mock_unit_of_work.reset_mock()
+            mock_flatten.reset_mock()
+
+            # replay バックエンドでは記録済のレスポンスを返す ReplayTwitterAPI を使う
+            instance.twitter = MagicMock(spec=ReplayTwitterAPI) if params.is_replay else MagicMock()
+            if params.kind_tweet_list == "valid":
+                tweet_list = ["tweet_list_1", ""]
+                instance.twitter.iter_likes.return_value = iter([tweet_list])
+            else:  # "empty"
+                instance.twitter.iter_likes.return_value = iter([])
             return instance
 
         def post_run(actual: CrawlResultStatus, instance: TimelineCrawler, params: Params) -> None:
             self.assertEqual(params.result, actual)
 
-            if params.is_twitter:
-                instance.twitter.get_likes.assert_called_once_with("screen_name_1", 300, 100)
-                if params.kind_tweet_list == "valid":
-                    mock_path.assert_called()
-                else:  # "empty"
-                    mock_path.assert_not_called()
+            instance.twitter.iter_likes.assert_called_once_with("screen_name_1", 300, {"100", "99"})
+            # 書き込みの後にカーソルを保存する
+            instance.twitter.save_likes_cursor.assert_called_once_with()
+            # 取得したレスポンスを記録する, 再生中は記録しない
+            if params.kind_tweet_list == "valid" and not params.is_replay:
+                instance.likes_cache.open_writer.assert_called_once_with("screen_name_1")
+                mock_writer = instance.likes_cache.open_writer.return_value.__enter__.return_value
+                mock_writer.write_all.assert_called_once_with(["tweet_list_1", ""])
             else:
-                mock_path.assert_called()
+                instance.likes_cache.open_writer.assert_not_called()
+            instance.timeline_cache.open_writer.assert_not_called()
 
             if params.kind_tweet_list != "valid":
                 mock_likes_parser.assert_not_called()
                 mock_media_parser.assert_not_called()
                 mock_external_link_parser.assert_not_called()
+                mock_unit_of_work.assert_not_called()
+                mock_flatten.assert_not_called()
                 return
 
-            mock_likes_parser.assert_called()
-            instance.likes_db.upsert.assert_called()
-            mock_media_parser.assert_called()
-            instance.media_db.upsert.assert_called()
-            mock_external_link_parser.assert_called()
-            instance.external_link_db.upsert.assert_called()
+            # flatten は1回だけ行い、各パーサには平滑化済のリストを渡す
+            mock_flatten.assert_called_once()
+            flattened_tweet_list = ["flattened"] + mock_flatten.call_args.args[0]
+
+            # パイプラインの各段の処理時間を記録する
+            self.assertEqual(1, instance.stage_timings[(CrawlKind.LIKES, "screen_name_1")].page_num)
+            instance.twitter.get_user_id.assert_called_once_with("screen_name_1")
+
+            # 全テーブルを1つの UnitOfWork の session で書き込む
+            mock_unit_of_work.assert_called_once_with(instance.likes_db.engine)
+            mock_unit_of_work.return_value.__exit__.assert_called_once()
+            self.assertEqual(flattened_tweet_list, mock_likes_parser.call_args.args[0])
+            instance.likes_db.upsert.assert_called_once_with(
+                mock_likes_parser.return_value.parse.return_value, mock_session
+            )
+            mock_media_parser.assert_called_once_with(
+                flattened_tweet_list, instance.registered_at, instance.media_size_fetcher
+            )
+            instance.media_db.upsert.assert_called_once_with(
+                mock_media_parser.return_value.parse.return_value, mock_session
+            )
+            mock_external_link_parser.assert_called_once_with(flattened_tweet_list, instance.registered_at)
+            instance.external_link_db.upsert.assert_called_once_with(
+                mock_external_link_parser.return_value.parse.return_value, mock_session
+            )
+            instance.metric_db.upsert.assert_not_called()
 
         params_list = [
-            Params(True, "valid", CrawlResultStatus.DONE),
             Params(False, "valid", CrawlResultStatus.DONE),
-            Params(True, "empty", CrawlResultStatus.NO_UPDATE),
+            Params(True, "valid", CrawlResultStatus.DONE),
             Params(False, "empty", CrawlResultStatus.NO_UPDATE),
+            Params(True, "empty", CrawlResultStatus.NO_UPDATE),
         ]
         for params in params_list:
             instance = pre_run(params)
             actual = instance.likes_crawl("screen_name_1")
             post_run(actual, instance, params)
 
+        # 複数ページに分かれる場合は、新しいものから取得したページを古いページから書き込む
+        # LikesParser はページ内を古いものから並べるため、全ページを通して古いものから登録される
+        instance = pre_run(Params(False, "valid", CrawlResultStatus.DONE))
+        page_list = [["like_6", "like_5", "like_4"], ["like_3", "like_2"], ["like_1"]]
+        instance.twitter.iter_likes.return_value = iter(page_list)
+        mock_flatten.side_effect = lambda tweet_list: list(tweet_list)
+        mock_likes_parser.side_effect = lambda tweet_list, *args: MagicMock(**{"parse.return_value": tweet_list[::-1]})
+        actual = instance.likes_crawl("screen_name_1")
+        self.assertEqual(CrawlResultStatus.DONE, actual)
+        self.assertEqual(3, instance.stage_timings[(CrawlKind.LIKES, "screen_name_1")].page_num)
+        mock_unit_of_work.assert_called_once_with(instance.likes_db.engine)
+        self.assertEqual(3, instance.likes_db.upsert.call_count)
+        actual_record_list = [record for c in instance.likes_db.upsert.call_args_list for record in c.args[0]]
+        self.assertEqual([f"like_{i}" for i in range(1, 7)], actual_record_list)
+        instance.twitter.save_likes_cursor.assert_called_once_with()
+
     def test_clean_cache(self):
         base_path: Path = Path("./tests/data")
         Params = namedtuple("Params", ["file_num", "dir_num", "file_num_in_dir", "is_cutoff", "cutoff_days"])
@@ -306,9 +568,14 @@ class TestTimelineCrawler(unittest.TestCase):
             self.assertIsNone(actual)
             post_run(params, instance)
 
+        # フォルダが無い場合は何もしない
+        actual = instance.clean_cache(base_path, 7)
+        self.assertIsNone(actual)
+        self.assertFalse(base_path.exists())
+
     def test_run(self):
-        mock_debug = self.enterContext(patch("personal_twilog.timeline_crawler.DEBUG"))
         mock_twitter_api = self.enterContext(patch("personal_twilog.timeline_crawler.TwitterAPI"))
+        mock_replay_twitter_api = self.enterContext(patch("personal_twilog.timeline_crawler.ReplayTwitterAPI"))
         mock_timeline_crawl = self.enterContext(
             patch("personal_twilog.timeline_crawler.TimelineCrawler.timeline_crawl")
         )
@@ -316,13 +583,15 @@ class TestTimelineCrawler(unittest.TestCase):
         mock_clean_cache = self.enterContext(patch("personal_twilog.timeline_crawler.TimelineCrawler.clean_cache"))
         crawler = self._get_instance()
 
-        Params = namedtuple("Params", ["is_debug", "enable_num", "disable_num"])
+        Params = namedtuple("Params", ["is_replay", "enable_num", "disable_num"])
 
         def pre_run(params: Params):
-            mock_debug.reset_mock()
-            mock_debug.__bool__.return_value = params.is_debug
+            crawler.backend = "replay" if params.is_replay else "api"
+            crawler.timeline_cache.reset_mock()
+            crawler.likes_cache.reset_mock()
 
             mock_twitter_api.reset_mock()
+            mock_replay_twitter_api.reset_mock()
             mock_timeline_crawl.reset_mock()
             mock_likes_crawl.reset_mock()
             mock_clean_cache.reset_mock()
@@ -333,6 +602,7 @@ class TestTimelineCrawler(unittest.TestCase):
         def post_run(params: Params, actual):
             self.assertIsNone(actual)
             twitter_api_calls = []
+            replay_twitter_api_calls = []
             timeline_crawl_calls = []
             likes_crawl_calls = []
             target_dicts = crawler.config
@@ -343,15 +613,31 @@ class TestTimelineCrawler(unittest.TestCase):
                     continue
                 ct0 = target_dict["ct0"]
                 auth_token = target_dict["auth_token"]
-                if not params.is_debug:
+                if params.is_replay:
+                    replay_twitter_api_calls.append((screen_name, ct0, auth_token))
+                else:
                     twitter_api_calls.append(call(screen_name, ct0, auth_token))
                 timeline_crawl_calls.append(call(screen_name))
                 likes_crawl_calls.append(call(screen_name))
 
             self.assertEqual(twitter_api_calls, mock_twitter_api.mock_calls)
+            # replay バックエンドでは replay_dir_path のキャッシュを再生する ReplayTwitterAPI を作成する
+            self.assertEqual(replay_twitter_api_calls, [c.args[:3] for c in mock_replay_twitter_api.call_args_list])
+            for c in mock_replay_twitter_api.call_args_list:
+                self.assertEqual(
+                    [("timeline_response", crawler.replay_dir_path), ("likes_response", crawler.replay_dir_path)],
+                    [(cache.name, cache.base_path) for cache in c.args[3:]],
+                )
             self.assertEqual(timeline_crawl_calls, mock_timeline_crawl.mock_calls)
             self.assertEqual(likes_crawl_calls, mock_likes_crawl.mock_calls)
             mock_clean_cache.assert_called_once()
+            # アカウントごとのキャッシュファイルのうち、古いものを削除する, 再生中は再生元を消さないよう削除しない
+            if params.is_replay:
+                crawler.timeline_cache.cutoff.assert_not_called()
+                crawler.likes_cache.cutoff.assert_not_called()
+            else:
+                crawler.timeline_cache.cutoff.assert_called_once_with(7)
+                crawler.likes_cache.cutoff.assert_called_once_with(7)
 
         params_list = [
             Params(False, 1, 0),
@@ -369,6 +655,139 @@ class TestTimelineCrawler(unittest.TestCase):
             actual = crawler.run()
             post_run(params, actual)
 
+        # max_workers が2以上なら有効なアカウントを並列にクロールする
+        mock_run_concurrent = self.enterContext(
+            patch("personal_twilog.timeline_crawler.TimelineCrawler.run_concurrent")
+        )
+        pre_run(Params(False, 2, 2))
+        crawler.max_workers = 4
+        actual = crawler.run()
+        self.assertIsNone(actual)
+        mock_run_concurrent.assert_called_once_with([self._make_user_dict(i, True) for i in range(2)])
+        mock_twitter_api.assert_not_called()
+        mock_timeline_crawl.assert_not_called()
+        mock_likes_crawl.assert_not_called()
+        mock_clean_cache.assert_called_once()
+
+    def test_run_concurrent(self):
+        mock_twitter_api = self.enterContext(patch("personal_twilog.timeline_crawler.TwitterAPI"))
+        account_num = 3
+        twitter_dict = {f"screen_name_{i}": MagicMock(name=f"twitter_screen_name_{i}") for i in range(account_num)}
+        mock_twitter_api.side_effect = lambda screen_name, ct0, auth_token: twitter_dict[screen_name]
+        instance = self._get_instance(max_workers=account_num * 2)
+        instance.tweet_db.select_for_max_id.side_effect = lambda screen_name: f"tweet_min_id_{screen_name}"
+        instance.likes_db.select_recent_tweet_ids.side_effect = lambda screen_name: f"likes_min_id_{screen_name}"
+        main_thread_id = threading.get_ident()
+        # TwitterAPI のセッションと me は、TL と Likes の取得を投入する前にワーカースレッドで解決する
+        session_thread_dict = {}
+
+        def record_session_thread(key: tuple[str, str]) -> int:
+            return session_thread_dict.setdefault(key, threading.get_ident())
+
+        for screen_name, twitter in twitter_dict.items():
+            for name in ["twitter", "me"]:
+                mock_property = PropertyMock(side_effect=lambda key=(screen_name, name): record_session_thread(key))
+                setattr(type(twitter), name, mock_property)
+        # 全アカウントの TL, Likes の取得が同時に実行されていないと待ち合わせがタイムアウトする
+        barrier = threading.Barrier(account_num * 2, timeout=10)
+        write_lock = threading.Lock()
+        write_list = []
+
+        def fetch(kind: str, screen_name: str, twitter: str, min_id: str) -> list[str]:
+            self.assertNotEqual(main_thread_id, threading.get_ident())
+            self.assertIs(twitter_dict[screen_name], twitter)
+            self.assertEqual(f"{kind}_min_id_{screen_name}", min_id)
+            self.assertIn((screen_name, "twitter"), session_thread_dict)
+            self.assertIn((screen_name, "me"), session_thread_dict)
+            barrier.wait()
+            if screen_name == "screen_name_1" and kind == "likes":
+                raise ValueError("fetch failed")
+            if screen_name == "screen_name_2" and kind == "tweet":
+                return []
+            return [f"{kind}_{screen_name}"]
+
+        def write(parsed: ParsedCrawl) -> None:
+            # 書き込みは呼び出し元のスレッドで1件ずつ行う
+            self.assertEqual(main_thread_id, threading.get_ident())
+            self.assertTrue(write_lock.acquire(blocking=False))
+            write_list.append(parsed.record_dict_list)
+            write_lock.release()
+
+        def parse(screen_name: str, tweet_list: list[str], *user_info: str) -> ParsedCrawl:
+            return ParsedCrawl(screen_name, tweet_list, tweet_list, [], [])
+
+        instance._fetch_timeline = lambda *args: fetch("tweet", *args)
+        instance._fetch_likes = lambda *args: fetch("likes", *args)
+        instance._parse_timeline = parse
+        instance._parse_likes = parse
+        instance._get_user_info = lambda screen_name, twitter: ("user_id", "user_name")
+        instance._write_timeline = write
+        instance._write_likes = write
+
+        target_dict_list = [self._make_user_dict(i, True) for i in range(account_num)]
+        actual = instance.run_concurrent(target_dict_list)
+        self.assertIsNone(actual)
+
+        expect = [["tweet_screen_name_0"], ["likes_screen_name_0"], ["tweet_screen_name_1"], ["likes_screen_name_2"]]
+        self.assertEqual(sorted(expect), sorted(write_list))
+        # 失敗したアカウントの処理はログに記録し、他のアカウントの処理は続ける
+        self.mock_logger.exception.assert_called_once()
+        self.assertIn("likes of 'screen_name_1'", self.mock_logger.exception.call_args.args[0])
+        mock_twitter_api.assert_has_calls(
+            [call(d["screen_name"], d["ct0"], d["auth_token"]) for d in target_dict_list], any_order=True
+        )
+        self.assertEqual(account_num * 2, len(session_thread_dict))
+        self.assertNotIn(main_thread_id, session_thread_dict.values())
+        # Likes の書き込みが完了したアカウントのみカーソルを保存する
+        twitter_dict["screen_name_0"].save_likes_cursor.assert_called_once_with()
+        twitter_dict["screen_name_1"].save_likes_cursor.assert_not_called()
+        twitter_dict["screen_name_2"].save_likes_cursor.assert_called_once_with()
+
+    def test_run_replay_offline(self):
+        # 記録済のレスポンスを、実際の ReplayTwitterAPI, パーサ, DB で再生する
+        replay_dir_path = Path("./tests/timeline_crawler_replay_test")
+        shutil.rmtree(replay_dir_path, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, replay_dir_path, ignore_errors=True)
+        replay_db_path = replay_dir_path / "replay_timeline.db"
+        self.addCleanup(EngineRegistry.dispose, str(replay_db_path))
+
+        saved_at = datetime(2026, 2, 8, 1, 0, 0)
+        for name, file_name in [
+            ("timeline_response", "timeline_sample.json"),
+            ("likes_response", "likes_sample.json"),
+        ]:
+            tweet_dict = orjson.loads((Path("./tests/cache") / file_name).read_bytes())
+            tweet_list = list(TweetResultsExtractor.iter_tweet_results(tweet_dict))
+            ResponseCache(name, replay_dir_path).write("screen_name_0", tweet_list, saved_at)
+
+        self.enterContext(patch("personal_twilog.timeline_crawler.logger"))
+        mock_orjson = self.enterContext(patch("personal_twilog.timeline_crawler.orjson"))
+        mock_orjson.loads.side_effect = lambda byte_data: self._get_config_json(
+            backend="replay", replay_dir_path=str(replay_dir_path)
+        )
+        self.enterContext(patch("personal_twilog.timeline_crawler.TimelineCrawler.clean_cache"))
+        mock_memo_writer = self.enterContext(patch("personal_twilog.timeline_crawler.MemoWriter"))
+        # ネットワークへの接続はすべてここで検出する
+        mock_send = self.enterContext(patch("requests.adapters.HTTPAdapter.send"))
+        mock_tweeterpy = self.enterContext(patch("personal_twilog.webapi.twitter_api.TweeterPy"))
+        mock_scraper = self.enterContext(patch("personal_twilog.webapi.twitter_api.Scraper"))
+
+        instance = TimelineCrawler()
+        instance.run()
+
+        mock_send.assert_not_called()
+        mock_tweeterpy.assert_not_called()
+        mock_scraper.assert_not_called()
+        mock_memo_writer.assert_not_called()
+        # 本番のDBではなく replay_dir_path 配下のDBに書き込む
+        self.assertEqual(str(replay_db_path), instance.tweet_db.db_path)
+        self.assertEqual(str(replay_db_path), instance.likes_db.db_path)
+        self.assertNotEqual([], instance.tweet_db.select())
+        self.assertNotEqual([], instance.likes_db.select())
+        media_list = instance.media_db.select()
+        self.assertNotEqual([], media_list)
+        self.assertTrue(all(media.media_size == -1 for media in media_list))
+
 
 if __name__ == "__main__":
     if sys.argv:
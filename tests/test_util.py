@@ -1,7 +1,8 @@
 import sys
 import unittest
+from collections import namedtuple
 
-from personal_twilog.util import Result, find_values, remove_duplicates
+from personal_twilog.util import KeyPath, Result, find_values, remove_duplicates
 
 
 class TestUtil(unittest.TestCase):
@@ -100,6 +101,48 @@ class TestUtil(unittest.TestCase):
         with self.assertRaises(ValueError):
             actual = find_values(sample_dict, "invalid_key", True)
 
+        # 再帰の深さ制限を超える階層でも探索できる
+        deep_dict = {"username": "deepest"}
+        for _ in range(sys.getrecursionlimit() * 2):
+            deep_dict = {"child": [deep_dict]}
+        actual = find_values(deep_dict, "username")
+        self.assertEqual(["deepest"], actual)
+
+    def test_KeyPath(self):
+        sample_dict = {"entries": [{"content": {"items": [{"rest_id": "1"}, {"rest_id": "2"}]}}, {"content": {}}]}
+
+        Params = namedtuple("Params", ["path", "step_tuple", "expect"])
+        params_list = [
+            Params("entries", ("entries",), [sample_dict["entries"]]),
+            Params(
+                "entries[].content",
+                ("entries", None, "content"),
+                [{"items": [{"rest_id": "1"}, {"rest_id": "2"}]}, {}],
+            ),
+            Params(
+                "entries[].content.items[].rest_id", ("entries", None, "content", "items", None, "rest_id"), ["1", "2"]
+            ),
+            Params("entries[].content.invalid_key", ("entries", None, "content", "invalid_key"), []),
+            Params("entries.content", ("entries", "content"), []),
+            Params("[].entries", (None, "entries"), []),
+            Params("entries[][]", ("entries", None, None), []),
+        ]
+        for params in params_list:
+            path = KeyPath(params.path)
+            self.assertEqual(params.step_tuple, path.step_tuple)
+            self.assertEqual(params.expect, list(path.iter_values(sample_dict)))
+            self.assertEqual(params.expect[0] if params.expect else None, path.get(sample_dict))
+        self.assertEqual("KeyPath('entries[].content')", repr(KeyPath("entries[].content")))
+
+        # リストから始まるパス, 多重リスト
+        self.assertEqual([1, 2, 3], list(KeyPath("[][].a").iter_values([[{"a": 1}, {"a": 2}], [{"b": 0}, {"a": 3}]])))
+        self.assertEqual("default", KeyPath("a.b").get({"a": "not_dict"}, "default"))
+        self.assertEqual([], list(KeyPath("a").iter_values("invalid_object")))
+
+        for invalid_path in ["", "a..b", "a[.b", "a[]]", "a]", None]:
+            with self.assertRaises(ValueError):
+                path = KeyPath(invalid_path)
+
     def test_remove_duplicates(self):
         DUP_TARGET_KEY = "tweet_id"
 
@@ -118,6 +161,48 @@ class TestUtil(unittest.TestCase):
         expect = get_dict_list()
         self.assertEqual(expect, actual)
 
+        # 最初に現れた要素を残し、順序を保つ
+        dict_list = [{DUP_TARGET_KEY: "3", "n": 0}, {DUP_TARGET_KEY: "1", "n": 1}, {DUP_TARGET_KEY: "3", "n": 2}]
+        actual = remove_duplicates(dict_list)
+        expect = [{DUP_TARGET_KEY: "3", "n": 0}, {DUP_TARGET_KEY: "1", "n": 1}]
+        self.assertEqual(expect, actual)
+
+        # 複数キーの組で重複判定する
+        dict_list = [
+            {DUP_TARGET_KEY: "1", "media_filename": "a.jpg"},
+            {DUP_TARGET_KEY: "1", "media_filename": "b.jpg"},
+            {DUP_TARGET_KEY: "2", "media_filename": "a.jpg"},
+            {DUP_TARGET_KEY: "1", "media_filename": "a.jpg"},
+        ]
+        actual = remove_duplicates(dict_list, (DUP_TARGET_KEY, "media_filename"))
+        expect = dict_list[:3]
+        self.assertEqual(expect, actual)
+        actual = remove_duplicates(dict_list, (DUP_TARGET_KEY,))
+        expect = [dict_list[0], dict_list[2]]
+        self.assertEqual(expect, actual)
+
+        # tweet_id は数値として比較する
+        dict_list = [{DUP_TARGET_KEY: "12", "n": 0}, {DUP_TARGET_KEY: 12, "n": 1}, {DUP_TARGET_KEY: "x12", "n": 2}]
+        actual = remove_duplicates(dict_list)
+        expect = [dict_list[0], dict_list[2]]
+        self.assertEqual(expect, actual)
+        actual = remove_duplicates(dict_list, (DUP_TARGET_KEY, "n"))
+        self.assertEqual(dict_list, actual)
+
+        # 空リスト
+        actual = remove_duplicates([])
+        self.assertEqual([], actual)
+
+        # 複数キーのうち1つでも持たない要素がある
+        with self.assertRaises(ValueError):
+            actual = remove_duplicates(dict_list, (DUP_TARGET_KEY, "invalid_key"))
+
+        # key_tuple が不正
+        with self.assertRaises(ValueError):
+            actual = remove_duplicates(dict_list, ())
+        with self.assertRaises(ValueError):
+            actual = remove_duplicates(dict_list, DUP_TARGET_KEY)
+
         # キーが不正
         dict_list = get_dup_dict_list()
         for d in dict_list:
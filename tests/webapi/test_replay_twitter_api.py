@@ -0,0 +1,149 @@
+import shutil
+import sys
+import unittest
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+
+import orjson
+from mock import MagicMock, patch
+
+from personal_twilog.response_cache import ResponseCache
+from personal_twilog.webapi.replay_twitter_api import ReplayTwitterAPI
+from personal_twilog.webapi.tweet_results_extractor import TweetResultsExtractor
+from personal_twilog.webapi.twitter_api import TwitterAPI
+from personal_twilog.webapi.valueobject.user_id import UserId
+from personal_twilog.webapi.valueobject.user_name import UserName
+
+
+class TestReplayTwitterAPI(unittest.TestCase):
+    def setUp(self):
+        self.mock_logger = self.enterContext(patch("personal_twilog.webapi.replay_twitter_api.logger"))
+        self.replay_dir_path = Path("./tests/replay_twitter_api_test")
+        shutil.rmtree(self.replay_dir_path, ignore_errors=True)
+        self.timeline_cache = ResponseCache("timeline_response", self.replay_dir_path)
+        self.likes_cache = ResponseCache("likes_response", self.replay_dir_path)
+
+        # TimelineCrawler が記録したものと同じく、tweet_results を1行ずつ記録する
+        def load_tweet_list(file_name: str) -> list[dict]:
+            tweet_dict = orjson.loads((Path("./tests/cache") / file_name).read_bytes())
+            return list(TweetResultsExtractor.iter_tweet_results(tweet_dict))
+
+        self.timeline_list = load_tweet_list("timeline_sample.json")
+        self.likes_list = load_tweet_list("likes_sample.json")
+        saved_at = datetime(2026, 2, 8, 1, 0, 0)
+        self.timeline_cache.write("screen_name_1", self.timeline_list, saved_at)
+        self.likes_cache.write("screen_name_1", self.likes_list, saved_at)
+
+    def tearDown(self):
+        shutil.rmtree(self.replay_dir_path, ignore_errors=True)
+
+    def _get_instance(self) -> ReplayTwitterAPI:
+        self.mock_twitter = self.enterContext(patch("personal_twilog.webapi.twitter_api.TweeterPy"))
+        return ReplayTwitterAPI("screen_name_1", "ct0", "auth_token", self.timeline_cache, self.likes_cache)
+
+    def _get_rest_id_list(self, tweet_list: list[dict]) -> list[str]:
+        return [TweetResultsExtractor.REST_ID_PATH.get(tweet) for tweet in tweet_list]
+
+    def test_init(self):
+        instance = self._get_instance()
+        self.assertIsInstance(instance, TwitterAPI)
+        self.assertEqual("screen_name_1", instance.target_screen_name)
+        self.assertEqual(self.timeline_cache, instance.timeline_cache)
+        self.assertEqual(self.likes_cache, instance.likes_cache)
+
+        with self.assertRaises(ValueError):
+            instance = ReplayTwitterAPI("screen_name_1", "ct0", "auth_token", "invalid", self.likes_cache)
+        with self.assertRaises(ValueError):
+            instance = ReplayTwitterAPI("screen_name_1", "ct0", "auth_token", self.timeline_cache, "invalid")
+
+    def test_get_user(self):
+        instance = self._get_instance()
+        self.assertEqual(UserId(10011), instance.get_user_id("screen_name_1"))
+        self.assertEqual(UserName("user_name_01"), instance.get_user_name("screen_name_1"))
+
+        # 記録済の TL に見つからない場合
+        self.assertEqual(UserId(0), instance.get_user_id("screen_name_2"))
+        self.assertEqual(UserName(""), instance.get_user_name("screen_name_2"))
+        self.mock_logger.warning.assert_called_once()
+
+        # 見つかったユーザ情報は再利用する
+        instance.timeline_cache = MagicMock()
+        self.assertEqual(UserId(10011), instance.get_user_id("screen_name_1"))
+        instance.timeline_cache.iter_records.assert_not_called()
+
+        # ネットワークには接続しない
+        self.mock_twitter.assert_not_called()
+
+    def test_get_user_timeline(self):
+        instance = self._get_instance()
+        rest_id_list = self._get_rest_id_list(self.timeline_list)
+
+        Params = namedtuple("Params", ["limit", "min_id", "result"])
+        params_list = [
+            Params(300, -1, rest_id_list),
+            # min_id のツイートを含めて打ち切る
+            Params(300, int(rest_id_list[3]), rest_id_list[:4]),
+            Params(300, 1, rest_id_list),
+            Params(2, -1, rest_id_list[:2]),
+        ]
+        for params in params_list:
+            actual = instance.get_user_timeline("screen_name_1", params.limit, params.min_id)
+            self.assertEqual(params.result, self._get_rest_id_list(actual))
+
+        # 記録が無い場合
+        self.assertEqual([], instance.get_user_timeline("screen_name_2"))
+        self.mock_twitter.assert_not_called()
+
+    def test_get_likes(self):
+        instance = self._get_instance()
+        rest_id_list = self._get_rest_id_list(self.likes_list)
+
+        Params = namedtuple("Params", ["limit", "known_id_set", "result"])
+        params_list = [
+            Params(300, None, rest_id_list),
+            # 保存済の Likes に到達したら打ち切る
+            Params(300, {rest_id_list[3], rest_id_list[5]}, rest_id_list[:3]),
+            Params(300, {"0"}, rest_id_list),
+            Params(2, None, rest_id_list[:2]),
+        ]
+        for params in params_list:
+            actual = instance.get_likes("screen_name_1", params.limit, params.known_id_set)
+            self.assertEqual(params.result, self._get_rest_id_list(actual))
+
+        # 記録済のレスポンスに続きは無いため、カーソルは保存しない
+        with patch("personal_twilog.webapi.twitter_api.TwitterAPI.likes_cursor_path") as mock_likes_cursor_path:
+            instance.save_likes_cursor()
+            mock_likes_cursor_path.assert_not_called()
+        self.assertEqual([], instance.get_likes("screen_name_2"))
+        self.mock_twitter.assert_not_called()
+
+    def test_iter_pages(self):
+        instance = self._get_instance()
+        instance.REPLAY_PAGE_SIZE = 3
+        rest_id_list = self._get_rest_id_list(self.timeline_list)
+        like_rest_id_list = self._get_rest_id_list(self.likes_list)
+
+        def get_page_list(page_iter) -> list[list[str]]:
+            return [self._get_rest_id_list(tweet_list) for tweet_list in page_iter]
+
+        # REPLAY_PAGE_SIZE 件ずつのページに分けて返す
+        actual = get_page_list(instance.iter_user_timeline("screen_name_1", 300, int(rest_id_list[6])))
+        self.assertEqual([rest_id_list[:3], rest_id_list[3:6], rest_id_list[6:7]], actual)
+        actual = get_page_list(instance.iter_user_timeline("screen_name_1", 3, -1))
+        self.assertEqual([rest_id_list[:3]], actual)
+        actual = get_page_list(instance.iter_likes("screen_name_1", 300, {like_rest_id_list[5]}))
+        self.assertEqual([like_rest_id_list[:3], like_rest_id_list[3:5]], actual)
+        actual = get_page_list(instance.iter_likes("screen_name_1", 4, None))
+        self.assertEqual([like_rest_id_list[:3], like_rest_id_list[3:4]], actual)
+
+        # 記録が無い場合はページを返さない
+        self.assertEqual([], list(instance.iter_user_timeline("screen_name_2")))
+        self.assertEqual([], list(instance.iter_likes("screen_name_2")))
+        self.mock_twitter.assert_not_called()
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
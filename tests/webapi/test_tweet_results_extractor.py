@@ -0,0 +1,135 @@
+import sys
+import unittest
+from collections import namedtuple
+from pathlib import Path
+
+import orjson
+
+from personal_twilog.util import find_values
+from personal_twilog.webapi.tweet_results_extractor import TweetResultsExtractor
+
+
+class TestTweetResultsExtractor(unittest.TestCase):
+    def _get_json_dict(self, kind: str) -> dict:
+        return orjson.loads(Path(f"./tests/cache/{kind}_sample.json").read_bytes())
+
+    def _make_entry(self, rest_id: str) -> dict:
+        return {
+            "entryId": f"tweet-{rest_id}",
+            "content": {"itemContent": {"tweet_results": {"result": {"rest_id": rest_id}}}},
+        }
+
+    def test_iter_tweet_results(self):
+        # 既知のレイアウトは再帰探索と同じ結果を返す
+        for kind in ["timeline", "likes"]:
+            json_dict = self._get_json_dict(kind)
+            self.assertTrue(TweetResultsExtractor._is_known_layout(json_dict))
+            expect = find_values(find_values(json_dict, "entries"), "tweet_results")
+            actual = list(TweetResultsExtractor.iter_tweet_results(json_dict))
+            self.assertEqual(expect, actual)
+            self.assertNotEqual([], actual)
+
+            # レスポンスのリスト
+            actual = list(TweetResultsExtractor.iter_tweet_results([json_dict, json_dict]))
+            self.assertEqual(expect + expect, actual)
+
+        # entry のリスト, 会話としてまとめられた entry, カーソルの entry
+        conversation_entry = {
+            "entryId": "profile-conversation-0",
+            "content": {
+                "items": [
+                    {"item": {"itemContent": {"tweet_results": {"result": {"rest_id": "2"}}}}},
+                    {"item": {"itemContent": {"tweet_results": {"result": {"rest_id": "3"}}}}},
+                ]
+            },
+        }
+        cursor_entry = {"entryId": "cursor-bottom-0", "content": {"value": "cursor"}}
+        entry_list = [self._make_entry("1"), conversation_entry, cursor_entry, self._make_entry("4")]
+        actual = list(TweetResultsExtractor.iter_tweet_results(entry_list))
+        expect = [{"result": {"rest_id": str(i)}} for i in range(1, 5)]
+        self.assertEqual(expect, actual)
+
+        # 固定ツイートの instruction
+        response = {
+            "data": {
+                "user": {
+                    "result": {
+                        "timeline": {
+                            "timeline": {
+                                "instructions": [
+                                    {"type": "TimelineClearCache"},
+                                    {"type": "TimelinePinEntry", "entry": self._make_entry("1")},
+                                    {"type": "TimelineAddEntries", "entries": [self._make_entry("2")]},
+                                ]
+                            }
+                        }
+                    }
+                }
+            }
+        }
+        actual = list(TweetResultsExtractor.iter_tweet_results(response))
+        expect = [{"result": {"rest_id": "1"}}, {"result": {"rest_id": "2"}}]
+        self.assertEqual(expect, actual)
+
+        # 未知のレイアウトは再帰探索にフォールバックする
+        Params = namedtuple("Params", ["obj", "expect"])
+        params_list = [
+            Params({"entries": {"tweet_results": {"result": {"rest_id": "1"}}}}, [{"result": {"rest_id": "1"}}]),
+            Params([self._make_entry("1"), {"other": {"tweet_results": {}}}], [{"result": {"rest_id": "1"}}, {}]),
+            Params({"entries": []}, []),
+            Params([], []),
+            Params("invalid_object", []),
+        ]
+        for params in params_list:
+            actual = list(TweetResultsExtractor.iter_tweet_results(params.obj))
+            self.assertEqual(params.expect, actual)
+
+    def test_has_rest_id(self):
+        Params = namedtuple("Params", ["tweet_results", "rest_id", "expect"])
+        params_list = [
+            Params({"result": {"rest_id": "1"}}, "1", True),
+            Params({"result": {"rest_id": "1"}}, "2", False),
+            # 引用先など内側の rest_id は対象外
+            Params({"result": {"rest_id": "1", "quoted_status_result": {"result": {"rest_id": "2"}}}}, "2", False),
+            # result.rest_id が無い場合は全体から探す
+            Params({"result": {"tweet": {"rest_id": "2"}}}, "2", True),
+            Params({}, "1", False),
+        ]
+        for params in params_list:
+            actual = TweetResultsExtractor.has_rest_id(params.tweet_results, params.rest_id)
+            self.assertEqual(params.expect, actual)
+
+    def test_get_max_rest_id(self):
+        conversation_entry = {
+            "entryId": "profile-conversation-0",
+            "content": {
+                "items": [
+                    {"item": {"itemContent": {"tweet_results": {"result": {"rest_id": "100"}}}}},
+                    {"item": {"itemContent": {"tweet_results": {"result": {"tweet": {"rest_id": "2000"}}}}}},
+                ]
+            },
+        }
+        Params = namedtuple("Params", ["obj", "expect"])
+        params_list = [
+            Params(self._make_entry("10"), 10),
+            Params([self._make_entry("10"), self._make_entry("9")], 10),
+            # 会話としてまとめられた entry は、その中で最も新しいツイート
+            Params(conversation_entry, 2000),
+            Params([self._make_entry("3000"), conversation_entry], 3000),
+            Params({"entryId": "cursor-bottom-0", "content": {"value": "cursor"}}, -1),
+            Params(self._make_entry("invalid"), -1),
+            Params([], -1),
+        ]
+        for params in params_list:
+            actual = TweetResultsExtractor.get_max_rest_id(params.obj)
+            self.assertEqual(params.expect, actual)
+
+        json_dict = self._get_json_dict("timeline")
+        rest_id_list = [int(t["result"]["rest_id"]) for t in TweetResultsExtractor.iter_tweet_results(json_dict)]
+        self.assertEqual(max(rest_id_list), TweetResultsExtractor.get_max_rest_id(json_dict))
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -1,11 +1,19 @@
+import pickle
 import sys
+import threading
+import time
+import tracemalloc
 import unittest
 from collections import namedtuple
+from datetime import datetime, timedelta
 from pathlib import Path
 
+import freezegun
 import orjson
-from mock import MagicMock, call, patch
+from mock import MagicMock, PropertyMock, patch
+from twitter.constants import Operation
 
+from personal_twilog.webapi.tweet_results_extractor import TweetResultsExtractor
 from personal_twilog.webapi.twitter_api import TwitterAPI
 from personal_twilog.webapi.valueobject.screen_name import ScreenName
 from personal_twilog.webapi.valueobject.token import Token
@@ -13,22 +21,165 @@ from personal_twilog.webapi.valueobject.user_id import UserId
 from personal_twilog.webapi.valueobject.user_name import UserName
 
 
+class FakeTimelinePager:
+    """TweeterPy.get_user_tweets(pagination=False) を模して、TL を1ページずつ返す
+
+    ツイートの ID は新しい順に tweet_num から 1 まで並び、page_size 件ずつのページに分かれる
+    conversation_id_list に含まれる ID のツイートは、古い ID のツイートへの返信として会話の entry にまとめる
+    受けたリクエストのカーソルと、返したページのバイト数（is_count_bytes が True の場合）を記録する
+    """
+
+    def __init__(
+        self,
+        tweet_num: int,
+        page_size: int = 20,
+        conversation_id_list: list[int] | None = None,
+        is_count_bytes: bool = True,
+    ) -> None:
+        self.page_size = page_size
+        self.is_count_bytes = is_count_bytes
+        self.entry_list = []
+        for rest_id in range(tweet_num, 0, -1):
+            tweet_results = {"result": {"rest_id": str(rest_id)}}
+            if rest_id in (conversation_id_list or []):
+                parent_results = {"result": {"rest_id": "0"}}
+                self.entry_list.append({
+                    "entryId": f"profile-conversation-{rest_id}",
+                    "content": {
+                        "items": [
+                            {"item": {"itemContent": {"tweet_results": parent_results}}},
+                            {"item": {"itemContent": {"tweet_results": tweet_results}}},
+                        ]
+                    },
+                })
+                continue
+            self.entry_list.append({
+                "entryId": f"tweet-{rest_id}",
+                "content": {"itemContent": {"tweet_results": tweet_results}},
+            })
+        self.cursor_list = []
+        self.byte_num = 0
+
+    @property
+    def request_num(self) -> int:
+        return len(self.cursor_list)
+
+    def get_user_tweets(self, user_id, with_replies=False, end_cursor=None, total=None, pagination=True) -> dict:
+        if pagination or total is not None:
+            raise ValueError("FakeTimelinePager only supports pagination=False.")
+        self.cursor_list.append(end_cursor)
+        start = int(end_cursor) if end_cursor else 0
+        end = start + self.page_size
+        has_next_page = end < len(self.entry_list)
+        page = {
+            "data": self.entry_list[start:end],
+            "cursor_endpoint": str(end) if has_next_page else None,
+            "has_next_page": has_next_page,
+            "api_rate_limit": None,
+        }
+        if self.is_count_bytes:
+            self.byte_num += len(orjson.dumps(page))
+        return page
+
+
+class FakeLikesPager:
+    """Likes の GraphQL リクエストを模して、Likes を1ページずつ返す
+
+    Likes はいいねした順に並ぶため、tweet_id の順には並ばない
+    カーソルは各ページの最後の Likes の tweet_id とし、先頭に Likes が追加されてもページの位置がずれないようにする
+    最後のページの後も、ツイートを含まずカーソルのみのページを返す
+    受けたリクエストのカーソルと、返したページのバイト数を記録する
+    """
+
+    def __init__(self, like_id_list: list[str], page_size: int = 20) -> None:
+        self.like_id_list = like_id_list
+        self.page_size = page_size
+        self.cursor_list = []
+        self.byte_num = 0
+
+    @property
+    def request_num(self) -> int:
+        return len(self.cursor_list)
+
+    def get(self, url: str, params: dict, headers: dict) -> MagicMock:
+        variables = orjson.loads(params["variables"])
+        cursor = variables.get("cursor")
+        self.cursor_list.append(cursor)
+        start = self.like_id_list.index(cursor) + 1 if cursor else 0
+        like_id_list = self.like_id_list[start : start + variables["count"]]
+        entry_list = [
+            {
+                "entryId": f"tweet-{like_id}",
+                "content": {"itemContent": {"tweet_results": {"result": {"rest_id": like_id}}}},
+            }
+            for like_id in like_id_list
+        ]
+        bottom_cursor = like_id_list[-1] if like_id_list else f"end-{start}"
+        entry_list.append({"entryId": f"cursor-bottom-{bottom_cursor}", "content": {"value": bottom_cursor}})
+        page = {
+            "data": {
+                "user": {
+                    "result": {
+                        "timeline_v2": {
+                            "timeline": {"instructions": [{"type": "TimelineAddEntries", "entries": entry_list}]}
+                        }
+                    }
+                }
+            }
+        }
+        self.byte_num += len(orjson.dumps(page))
+        response = MagicMock()
+        response.json.return_value = page
+        return response
+
+
 class TestTwitterAPI(unittest.TestCase):
     def setUp(self):
         self.enterContext(patch("personal_twilog.webapi.twitter_api.logger"))
+        self.session_path = Path("./tests/twitter_api_session_test.pkl")
+        self.session_path.unlink(missing_ok=True)
+        self.enterContext(
+            patch(
+                "personal_twilog.webapi.twitter_api.TwitterAPI.session_path",
+                new_callable=PropertyMock,
+                return_value=self.session_path,
+            )
+        )
+        self.likes_cursor_path = Path("./tests/twitter_api_likes_cursor_test.json")
+        self.likes_cursor_path.unlink(missing_ok=True)
+        self.enterContext(
+            patch(
+                "personal_twilog.webapi.twitter_api.TwitterAPI.likes_cursor_path",
+                new_callable=PropertyMock,
+                return_value=self.likes_cursor_path,
+            )
+        )
+
+    def tearDown(self):
+        self.session_path.unlink(missing_ok=True)
+        self.likes_cursor_path.unlink(missing_ok=True)
 
     def _get_instance(self) -> TwitterAPI:
-        mock_twitter = self.enterContext(patch("personal_twilog.webapi.twitter_api.TweeterPy"))
+        self.mock_twitter = self.enterContext(patch("personal_twilog.webapi.twitter_api.TweeterPy"))
         authorize_screen_name = "authorize_screen_name"
         ct0 = "ct0"
         auth_token = "auth_token"
         instance = TwitterAPI(authorize_screen_name, ct0, auth_token)
 
-        self.assertEqual(
-            [call(log_level="WARNING"), call().generate_session(auth_token=auth_token)], mock_twitter.mock_calls
-        )
+        # セッションは必要になるまで生成しない
+        self.mock_twitter.assert_not_called()
         return instance
 
+    def _write_session_cache(self, auth_token: str = "auth_token", saved_at: str = "2025-01-01T00:00:00") -> dict:
+        cache = {
+            "headers": {"header": "cached_header", "X-Guest-Token": "stale_guest_token"},
+            "cookies": {"auth_token": auth_token, "ct0": "cached_ct0", "gt": "stale_guest_token"},
+            "me": {"rest_id": "12345678", "name": "cached_user_name"},
+            "saved_at": saved_at,
+        }
+        self.session_path.write_bytes(pickle.dumps(cache))
+        return cache
+
     def get_json_dict(self) -> dict:
         return orjson.loads(Path("./tests/cache/users_sample.json").read_bytes())
 
@@ -42,6 +193,171 @@ class TestTwitterAPI(unittest.TestCase):
         self.assertEqual(auth_token, instance.auth_token)
         self.assertEqual(Token.create(authorize_screen_name, ct0, auth_token), instance.token)
 
+    def test_session_path(self):
+        instance = self._get_instance()
+        self.assertEqual(self.session_path, instance.session_path)
+
+    @freezegun.freeze_time("2025-01-02T00:00:00")
+    def test_load_session_cache(self):
+        Params = namedtuple("Params", ["kind_cache", "is_valid"])
+        now = datetime(2025, 1, 2)
+
+        def pre_run(params: Params) -> TwitterAPI:
+            self.session_path.unlink(missing_ok=True)
+            if params.kind_cache == "valid":
+                self._write_session_cache()
+            elif params.kind_cache == "other_auth_token":
+                self._write_session_cache(auth_token="other_auth_token")
+            elif params.kind_cache == "expired":
+                saved_at = (now - TwitterAPI.SESSION_CACHE_TTL - timedelta(seconds=1)).isoformat()
+                self._write_session_cache(saved_at=saved_at)
+            elif params.kind_cache == "broken":
+                self.session_path.write_bytes(b"broken")
+            return self._get_instance()
+
+        params_list = [
+            Params("valid", True),
+            Params("other_auth_token", False),
+            Params("expired", False),
+            Params("broken", False),
+            Params("nothing", False),
+        ]
+        for params in params_list:
+            instance = pre_run(params)
+            actual = instance._load_session_cache()
+            if params.is_valid:
+                self.assertEqual(pickle.loads(self.session_path.read_bytes()), actual)
+            else:
+                self.assertEqual({}, actual)
+
+            # 2回目以降はファイルを読まない
+            self.session_path.unlink(missing_ok=True)
+            self.assertEqual(actual, instance._load_session_cache())
+
+    @freezegun.freeze_time("2025-01-02T00:00:00")
+    def test_refresh_session(self):
+        instance = self._get_instance()
+        mock_tweeterpy = self.mock_twitter.return_value
+        mock_tweeterpy.me = {"rest_id": "12345678", "name": "user_name"}
+        mock_tweeterpy.session.headers = {"header": "header", "X-Guest-Token": "guest_token"}
+        mock_tweeterpy.session.cookies = {"auth_token": "auth_token", "gt": "guest_token"}
+
+        instance.refresh_session()
+        self.mock_twitter.assert_called_once_with(log_level="WARNING")
+        mock_tweeterpy.generate_session.assert_called_once_with(auth_token="auth_token")
+        self.assertEqual(mock_tweeterpy.me, instance._me)
+        # ゲストトークンはキャッシュしない
+        expect = {
+            "headers": {"header": "header"},
+            "cookies": {"auth_token": "auth_token"},
+            "me": {"rest_id": "12345678", "name": "user_name"},
+            "saved_at": "2025-01-02T00:00:00",
+        }
+        self.assertEqual(expect, pickle.loads(self.session_path.read_bytes()))
+        self.assertEqual(expect, instance._load_session_cache())
+
+        # 認証できなかった場合
+        mock_tweeterpy.me = None
+        with self.assertRaises(ValueError):
+            instance.refresh_session()
+
+    @freezegun.freeze_time("2025-01-02T00:00:00")
+    def test_twitter(self):
+        # 有効なキャッシュがある場合はセッションを生成せずに復元する
+        # ゲストトークンは復元せず、生成時のゲストセッションのものを使う
+        self._write_session_cache()
+        instance = self._get_instance()
+        mock_tweeterpy = self.mock_twitter.return_value
+        mock_tweeterpy.me = {"rest_id": "12345678", "name": "user_name"}
+        actual = instance.twitter
+        self.assertEqual(mock_tweeterpy, actual)
+        self.mock_twitter.assert_called_once_with(log_level="WARNING")
+        mock_tweeterpy.generate_session.assert_not_called()
+        mock_tweeterpy.session.headers.update.assert_called_once_with({"header": "cached_header"})
+        mock_tweeterpy.session.cookies.update.assert_called_once_with({
+            "auth_token": "auth_token",
+            "ct0": "cached_ct0",
+        })
+        # 復元したセッションでログインユーザを取得して確認する
+        self.assertEqual({"rest_id": "12345678", "name": "user_name"}, instance.me)
+
+        self.mock_twitter.reset_mock()
+        actual = instance.twitter
+        self.assertEqual(mock_tweeterpy, actual)
+        self.mock_twitter.assert_not_called()
+
+        # 復元したセッションが認証されていない場合は、セッションを生成し直してキャッシュも更新する
+        self._write_session_cache()
+        instance = self._get_instance()
+        mock_tweeterpy = self.mock_twitter.return_value
+        refreshed_me = {"rest_id": "12345678", "name": "refreshed_user_name"}
+        type(mock_tweeterpy).me = PropertyMock(side_effect=[None, refreshed_me])
+
+        def generate_session(auth_token: str) -> None:
+            mock_tweeterpy.session.headers = {"header": "refreshed_header", "X-Guest-Token": "guest_token"}
+            mock_tweeterpy.session.cookies = {"auth_token": auth_token, "ct0": "refreshed_ct0"}
+
+        mock_tweeterpy.generate_session.side_effect = generate_session
+        actual = instance.twitter
+        self.assertEqual(mock_tweeterpy, actual)
+        self.mock_twitter.assert_called_once_with(log_level="WARNING")
+        mock_tweeterpy.generate_session.assert_called_once_with(auth_token="auth_token")
+        self.assertEqual(refreshed_me, instance.me)
+        cache = pickle.loads(self.session_path.read_bytes())
+        self.assertEqual(refreshed_me, cache["me"])
+        self.assertEqual({"header": "refreshed_header"}, cache["headers"])
+        self.assertEqual({"auth_token": "auth_token", "ct0": "refreshed_ct0"}, cache["cookies"])
+
+        # キャッシュが無い場合はセッションを生成する
+        self.session_path.unlink(missing_ok=True)
+        mock_refresh_session = self.enterContext(
+            patch("personal_twilog.webapi.twitter_api.TwitterAPI.refresh_session")
+        )
+        instance = self._get_instance()
+        mock_refresh_session.side_effect = lambda: setattr(instance, "_twitter", "refreshed_twitter")
+        actual = instance.twitter
+        self.assertEqual("refreshed_twitter", actual)
+        mock_refresh_session.assert_called_once_with()
+
+        # 複数スレッドから同時に参照されてもセッションの生成は1回のみ
+        mock_refresh_session.reset_mock()
+        instance = self._get_instance()
+
+        def refresh_session() -> None:
+            time.sleep(0.05)
+            instance._twitter = "refreshed_twitter"
+
+        mock_refresh_session.side_effect = refresh_session
+        thread_list = [threading.Thread(target=lambda: instance.twitter) for _ in range(4)]
+        for thread in thread_list:
+            thread.start()
+        for thread in thread_list:
+            thread.join()
+        self.assertEqual("refreshed_twitter", instance.twitter)
+        mock_refresh_session.assert_called_once_with()
+
+        instance.twitter = "twitter_instance"
+        self.assertEqual("twitter_instance", instance.twitter)
+
+    @freezegun.freeze_time("2025-01-02T00:00:00")
+    def test_me(self):
+        # 有効なキャッシュがある場合はセッションを生成しない
+        cache = self._write_session_cache()
+        instance = self._get_instance()
+        self.assertEqual(cache["me"], instance.me)
+        self.mock_twitter.assert_not_called()
+
+        # キャッシュが無い場合はセッションを生成する
+        self.session_path.unlink(missing_ok=True)
+        mock_refresh_session = self.enterContext(
+            patch("personal_twilog.webapi.twitter_api.TwitterAPI.refresh_session")
+        )
+        instance = self._get_instance()
+        mock_refresh_session.side_effect = lambda: setattr(instance, "_me", {"name": "refreshed"})
+        self.assertEqual({"name": "refreshed"}, instance.me)
+        self.assertEqual({"name": "refreshed"}, instance.me)
+        mock_refresh_session.assert_called_once_with()
+
     def test_scraper(self):
         mock_scraper = self.enterContext(patch("personal_twilog.webapi.twitter_api.Scraper"))
         instance = self._get_instance()
@@ -113,8 +429,7 @@ class TestTwitterAPI(unittest.TestCase):
     def test_get_user_id(self):
         instance = self._get_instance()
         user_id = 12345678
-        instance.twitter = MagicMock()
-        instance.twitter.me = {"rest_id": user_id}
+        instance._me = {"rest_id": user_id}
 
         screen_name = "dummy_screen_name"
         actual = instance.get_user_id(screen_name)
@@ -124,59 +439,317 @@ class TestTwitterAPI(unittest.TestCase):
     def test_get_user_name(self):
         instance = self._get_instance()
         screen_name = "dummy_screen_name"
-        instance.twitter = MagicMock()
-        instance.twitter.me = {"name": screen_name}
+        instance._me = {"name": screen_name}
 
         actual = instance.get_user_name(screen_name)
         expect = UserName(screen_name)
         self.assertEqual(expect, actual)
 
-    def test_get_likes(self):
-        mock_get_user_id = self.enterContext(patch("personal_twilog.webapi.twitter_api.TwitterAPI.get_user_id"))
-        mock_scraper = self.enterContext(patch("personal_twilog.webapi.twitter_api.Scraper"))
+    def _set_likes_pager(self, instance: TwitterAPI, like_id_list: list[str]) -> FakeLikesPager:
+        pager = FakeLikesPager(like_id_list)
+        instance._scraper = MagicMock()
+        instance._scraper.session.get.side_effect = pager.get
+        instance._me = {"rest_id": "12345678"}
+        return pager
 
-        rest_id = 12345678
-        Params = namedtuple("Params", ["kind_tweet_results", "min_id", "result"])
+    def _make_like_id_list(self, start: int, num: int) -> list[str]:
+        """tweet_id の順に並ばない Likes の tweet_id のリスト"""
+        return [str((i * 7919) % 100003 + 1000) for i in range(start, start + num)]
 
-        def pre_run(params: Params) -> TwitterAPI:
-            instance = self._get_instance()
-            mock_get_user_id.reset_mock()
-            mock_scraper.reset_mock()
+    def test_iter_likes_pages(self):
+        mock_get_headers = self.enterContext(patch("personal_twilog.webapi.twitter_api.get_headers"))
+        instance = self._get_instance()
+        like_id_list = self._make_like_id_list(0, 50)
+        pager = self._set_likes_pager(instance, like_id_list)
+
+        actual = list(instance.iter_likes_pages(12345678))
+        # ツイートを含まないページまで取得する
+        self.assertEqual(4, pager.request_num)
+        self.assertEqual([None, like_id_list[19], like_id_list[39], like_id_list[49]], pager.cursor_list)
+        self.assertEqual([like_id_list[19], like_id_list[39], like_id_list[49], "end-50"], [c for _, c in actual])
+        actual_id_list = [
+            t["result"]["rest_id"] for page, _ in actual for t in TweetResultsExtractor.iter_tweet_results(page)
+        ]
+        self.assertEqual(like_id_list, actual_id_list)
+
+        # リクエストには Scraper.likes と同じエンドポイントと変数を使う
+        url = instance._scraper.session.get.call_args.args[0]
+        self.assertEqual(TwitterAPI.LIKES_URL.format(qid=Operation.Likes[1], name=Operation.Likes[2]), url)
+        variables = orjson.loads(instance._scraper.session.get.call_args.kwargs["params"]["variables"])
+        self.assertEqual(12345678, variables["userId"])
+        self.assertEqual(TwitterAPI.LIKES_PAGE_SIZE, variables["count"])
+        self.assertEqual(mock_get_headers.return_value, instance._scraper.session.get.call_args.kwargs["headers"])
+
+        # カーソルの位置から取得する, 読むのをやめれば次のページは要求しない
+        pager = self._set_likes_pager(instance, like_id_list)
+        iterator = instance.iter_likes_pages(12345678, like_id_list[19])
+        page, cursor = next(iterator)
+        self.assertEqual(like_id_list[39], cursor)
+        self.assertEqual([like_id_list[19]], pager.cursor_list)
+
+    def test_iter_likes(self):
+        self.enterContext(patch("personal_twilog.webapi.twitter_api.get_headers"))
+        like_id_list = self._make_like_id_list(0, 100)
+
+        # ページごとに返す, limit 件を超えたページで打ち切る
+        instance = self._get_instance()
+        self._set_likes_pager(instance, like_id_list)
+        actual = list(instance.iter_likes("screen_name_1", 30, set()))
+        expect = [like_id_list[:20], like_id_list[20:40]]
+        self.assertEqual(expect, [[t["result"]["rest_id"] for t in tweet_list] for tweet_list in actual])
 
-            if params.kind_tweet_results == "normal_tweet":
-                mock_scraper.return_value.likes.return_value = {
-                    "entries": {"tweet_results": {"result": {"rest_id": str(rest_id)}}}
-                }
-            elif params.kind_tweet_results == "add_result":
-                mock_scraper.return_value.likes.return_value = {
-                    "entries": {"tweet_results": {"result": {"tweet": {"rest_id": str(rest_id)}}}}
-                }
-            elif params.kind_tweet_results == "empty_tweet":
-                mock_scraper.return_value.likes.return_value = {"entries": {"tweet_results": {}}}
-            elif params.kind_tweet_results == "empty":
-                mock_scraper.return_value.likes.return_value = {"entries": []}
+        # 保存済の Likes を含むページは、その直前までを返す
+        instance = self._get_instance()
+        self._set_likes_pager(instance, like_id_list)
+        actual = list(instance.iter_likes("screen_name_1", 300, {like_id_list[25]}))
+        expect = [like_id_list[:20], like_id_list[20:25]]
+        self.assertEqual(expect, [[t["result"]["rest_id"] for t in tweet_list] for tweet_list in actual])
+        self.assertEqual({}, instance._likes_cursor_dict)
 
-            return instance
+        # ページは要求されたときに初めて取得し、最後まで読むまではカーソルを確定しない
+        instance = self._get_instance()
+        pager = self._set_likes_pager(instance, like_id_list)
+        page_iter = instance.iter_likes("screen_name_1", 300, set())
+        self.assertEqual(0, pager.request_num)
+        next(page_iter)
+        self.assertEqual(1, pager.request_num)
+        self.assertIsNone(instance._likes_cursor_dict)
 
-        def post_run(actual: list[dict], instance: TwitterAPI, params: Params) -> None:
-            self.assertEqual(params.result, actual)
+    def test_get_likes(self):
+        self.enterContext(patch("personal_twilog.webapi.twitter_api.get_headers"))
+        old_id_list = self._make_like_id_list(0, 400)
+
+        def get_likes(
+            like_id_list: list[str], known_id_set: set[str], limit: int = 300
+        ) -> tuple[list, FakeLikesPager]:
+            instance = self._get_instance()
+            pager = self._set_likes_pager(instance, like_id_list)
+            tweet_list = instance.get_likes("screen_name_1", limit, known_id_set)
+            instance.save_likes_cursor()
+            return [t["result"]["rest_id"] for t in tweet_list], pager
+
+        def load_cursor() -> dict:
+            if not self.likes_cursor_path.is_file():
+                return {}
+            return orjson.loads(self.likes_cursor_path.read_bytes())
+
+        def write_cursor(gap_list: list[tuple[str, list[str]]]) -> None:
+            gap_list = [{"cursor": cursor, "stop_id_list": stop_id_list} for cursor, stop_id_list in gap_list]
+            self.likes_cursor_path.write_bytes(orjson.dumps({"screen_name": "screen_name_1", "gap_list": gap_list}))
+
+        # 新しい Likes が数件の場合は1ページのみ要求し、保存済の Likes を含まずに返す
+        new_id_list = self._make_like_id_list(400, 5)
+        actual, pager = get_likes(new_id_list + old_id_list, set(old_id_list[:30]))
+        self.assertEqual(new_id_list, actual)
+        self.assertEqual(1, pager.request_num)
+        self.assertEqual({}, load_cursor())
+
+        # 保存済の Likes は tweet_id の順に関わらず、集合に含まれるかで判定する
+        actual, pager = get_likes(new_id_list + old_id_list, {old_id_list[0], "99999999"})
+        self.assertEqual(new_id_list, actual)
+
+        # limit 件を超えたページで打ち切り、続きのページのカーソルを保存する
+        actual, pager = get_likes(old_id_list, set(), limit=30)
+        self.assertEqual(old_id_list[:40], actual)
+        self.assertEqual(2, pager.request_num)
+        self.assertEqual(
+            {"screen_name": "screen_name_1", "gap_list": [{"cursor": old_id_list[39], "stop_id_list": []}]},
+            load_cursor(),
+        )
+
+        # 次の実行では、先頭側の新しい Likes の後に、保存したカーソルから続きを取得する
+        known_id_set = set(old_id_list[:40])
+        actual, pager = get_likes(new_id_list + old_id_list, known_id_set, limit=30)
+        self.assertEqual(new_id_list + old_id_list[40:80], actual)
+        self.assertEqual([None, old_id_list[39], old_id_list[59]], pager.cursor_list)
+        self.assertEqual([old_id_list[79]], [gap["cursor"] for gap in load_cursor()["gap_list"]])
+
+        # 最初に打ち切った時点で保存済だった Likes に到達したらカーソルを削除する
+        write_cursor([(old_id_list[79], old_id_list[90:])])
+        known_id_set = set(old_id_list[:80])
+        actual, pager = get_likes(old_id_list, known_id_set)
+        self.assertEqual(old_id_list[80:90], actual)
+        self.assertEqual({}, load_cursor())
+
+        # 書き込み前に中断した場合（save_likes_cursor を呼ばない場合）はカーソルを更新しない
+        write_cursor([(old_id_list[79], [])])
+        instance = self._get_instance()
+        self._set_likes_pager(instance, old_id_list)
+        instance.get_likes("screen_name_1", 30, set(old_id_list[:80]))
+        self.assertEqual([old_id_list[79]], [gap["cursor"] for gap in load_cursor()["gap_list"]])
 
+        # 途中で読むのをやめた場合もカーソルを更新しない
+        instance = self._get_instance()
+        self._set_likes_pager(instance, old_id_list)
+        next(instance.iter_likes("screen_name_1", 30, set(old_id_list[:80])))
+        instance.save_likes_cursor()
+        self.assertEqual([old_id_list[79]], [gap["cursor"] for gap in load_cursor()["gap_list"]])
+
+        # 他のアカウントのカーソル, 抜けの無いカーソル, 壊れたカーソルファイルは使わない
+        for content in [
+            orjson.dumps({"screen_name": "other", "gap_list": [{"cursor": old_id_list[79], "stop_id_list": []}]}),
+            orjson.dumps({"screen_name": "screen_name_1", "gap_list": []}),
+            b"broken",
+        ]:
+            self.likes_cursor_path.write_bytes(content)
+            actual, pager = get_likes(new_id_list + old_id_list, set(old_id_list[:30]))
+            self.assertEqual(new_id_list, actual)
+            self.assertEqual(1, pager.request_num)
+
+        # 返信を制限している場合など階層が異なる Likes
+        instance = self._get_instance()
+        pager = self._set_likes_pager(instance, [])
+        page = FakeLikesPager(["1"]).get("", {"variables": orjson.dumps({"count": 20}).decode()}, {}).json()
+        entry = page["data"]["user"]["result"]["timeline_v2"]["timeline"]["instructions"][0]["entries"][0]
+        entry["content"]["itemContent"]["tweet_results"] = {"result": {"tweet": {"rest_id": "1"}}}
+        instance.iter_likes_pages = MagicMock(return_value=iter([(page, None)]))
+        actual = instance.get_likes("screen_name_1", 300, set())
+        self.assertEqual([{"result": {"rest_id": "1"}}], actual)
+
+        # 差分取得では、全件取得と比べてリクエスト数と転送量が 1/10 以下になる
+        actual, full_pager = get_likes(old_id_list, set(), limit=300)
+        self.likes_cursor_path.unlink(missing_ok=True)
+        actual, incremental_pager = get_likes(new_id_list + old_id_list, set(old_id_list[:300]), limit=300)
+        self.assertLessEqual(incremental_pager.request_num * 10, full_pager.request_num)
+        self.assertLessEqual(incremental_pager.byte_num * 10, full_pager.byte_num)
+
+    def test_get_likes_gap(self):
+        self.enterContext(patch("personal_twilog.webapi.twitter_api.get_headers"))
+        old_id_list = self._make_like_id_list(0, 400)
+        new_id_list = self._make_like_id_list(400, 100)
+
+        fetched_id_list = []
+
+        def get_likes(like_id_list: list[str], known_id_set: set[str], limit: int) -> tuple[list, FakeLikesPager]:
+            instance = self._get_instance()
+            pager = self._set_likes_pager(instance, like_id_list)
+            tweet_list = instance.get_likes("screen_name_1", limit, known_id_set)
+            instance.save_likes_cursor()
+            id_list = [t["result"]["rest_id"] for t in tweet_list]
+            fetched_id_list.extend(id_list)
+            return id_list, pager
+
+        def load_gap_list() -> list[tuple[str, list[str]]]:
+            if not self.likes_cursor_path.is_file():
+                return []
+            cursor_dict = orjson.loads(self.likes_cursor_path.read_bytes())
+            return [(gap["cursor"], gap["stop_id_list"]) for gap in cursor_dict["gap_list"]]
+
+        # 1回目: limit 件で打ち切り、古い Likes の抜けができる
+        actual, pager = get_likes(old_id_list, set(), 30)
+        self.assertEqual(old_id_list[:40], actual)
+        self.assertEqual([(old_id_list[39], [])], load_gap_list())
+
+        # 2回目: 新しい Likes だけで limit 件を超えた場合、新しい抜けを追加し、古い抜けは上書きせずに残す
+        known_id_set = set(old_id_list[:40])
+        actual, pager = get_likes(new_id_list + old_id_list, known_id_set, 30)
+        self.assertEqual(new_id_list[:40], actual)
+        self.assertEqual([None, new_id_list[19]], pager.cursor_list)
+        expect_gap_list = [(new_id_list[39], sorted(known_id_set)), (old_id_list[39], [])]
+        self.assertEqual(expect_gap_list, load_gap_list())
+
+        # 3回目: 先頭側に新しい Likes が無い場合、新しい抜けから続きを取得する, 残りの件数が無い抜けはそのまま残す
+        known_id_set |= set(new_id_list[:40])
+        actual, pager = get_likes(new_id_list + old_id_list, known_id_set, 30)
+        self.assertEqual(new_id_list[40:80], actual)
+        self.assertEqual([None, new_id_list[39], new_id_list[59]], pager.cursor_list)
+        expect_gap_list = [(new_id_list[79], expect_gap_list[0][1]), (old_id_list[39], [])]
+        self.assertEqual(expect_gap_list, load_gap_list())
+
+        # 4回目: 新しい抜けを埋めた後、残りの件数で古い抜けの続きを取得する
+        # 1回の実行で返す Likes は、いいねした順の新しいものから古いものへ並ぶ
+        known_id_set |= set(new_id_list[40:80])
+        actual, pager = get_likes(new_id_list + old_id_list, known_id_set, 100)
+        self.assertEqual(new_id_list[80:] + old_id_list[40:120], actual)
+        self.assertEqual([(old_id_list[119], [])], load_gap_list())
+
+        # 5回目: すべての抜けを埋めたらカーソルを削除する
+        known_id_set |= set(new_id_list[80:] + old_id_list[40:120])
+        actual, pager = get_likes(new_id_list + old_id_list, known_id_set, 300)
+        self.assertEqual(old_id_list[120:], actual)
+        self.assertEqual([], load_gap_list())
+        self.assertFalse(self.likes_cursor_path.exists())
+
+        # 各回で取得した Likes を合わせると、抜けなく、重複なく、すべての Likes と一致する
+        self.assertEqual(len(new_id_list + old_id_list), len(fetched_id_list))
+        self.assertEqual(set(new_id_list + old_id_list), set(fetched_id_list))
+
+    def test_iter_user_timeline_pages(self):
+        Params = namedtuple("Params", ["tweet_num", "min_id", "conversation_id_list", "request_num"])
         params_list = [
-            Params("normal_tweet", -1, [{"result": {"rest_id": str(rest_id)}}]),
-            Params("add_result", -1, [{"result": {"rest_id": str(rest_id)}}]),
-            Params("empty_tweet", -1, []),
-            Params("empty", -1, []),
-            Params("normal_tweet", rest_id, [{"result": {"rest_id": str(rest_id)}}]),
+            # min_id 以下のツイートを含むページで打ち切る
+            Params(100, 97, [], 1),
+            Params(100, 80, [], 2),
+            Params(100, 81, [], 1),
+            # min_id のツイートが削除されていても、それより古いツイートを含むページで打ち切る
+            Params(100, 50, [], 3),
+            # 古いツイートへの返信を含む会話は、最も新しいツイートで判定する
+            Params(100, 97, [99], 1),
+            # min_id が無い場合は最後のページまで取得する
+            Params(100, -1, [], 5),
+            Params(0, -1, [], 1),
         ]
         for params in params_list:
-            instance = pre_run(params)
-            actual = instance.get_likes("screen_name_1", limit=300, min_id=params.min_id)
-            post_run(actual, instance, params)
+            instance = self._get_instance()
+            pager = FakeTimelinePager(params.tweet_num, conversation_id_list=params.conversation_id_list)
+            instance.twitter = MagicMock()
+            instance.twitter.get_user_tweets.side_effect = pager.get_user_tweets
+
+            actual = list(instance.iter_user_timeline_pages(12345678, params.min_id))
+            self.assertEqual(params.request_num, pager.request_num)
+            self.assertEqual(pager.entry_list[: params.request_num * pager.page_size], sum(actual, []))
+            self.assertEqual(
+                [None] + [str(i * pager.page_size) for i in range(1, params.request_num)], pager.cursor_list
+            )
+
+        # 読むのをやめれば次のページは要求しない
+        instance = self._get_instance()
+        pager = FakeTimelinePager(100)
+        instance.twitter = MagicMock()
+        instance.twitter.get_user_tweets.side_effect = pager.get_user_tweets
+        iterator = instance.iter_user_timeline_pages(12345678, -1)
+        self.assertEqual(pager.entry_list[:20], next(iterator))
+        self.assertEqual(1, pager.request_num)
+
+    def test_iter_user_timeline(self):
+        mock_get_user_id = self.enterContext(patch("personal_twilog.webapi.twitter_api.TwitterAPI.get_user_id"))
+        mock_get_user_id.return_value = UserId(12345678)
+        mock_response_cache = self.enterContext(patch("personal_twilog.webapi.twitter_api.ResponseCache"))
+        mock_writer = mock_response_cache.return_value.open_writer.return_value.__enter__.return_value
+
+        def get_id_list(page_list: list[list[dict]]) -> list[list[int]]:
+            return [[int(t["result"]["rest_id"]) for t in tweet_list] for tweet_list in page_list]
+
+        # ページごとに返す, limit 件目を含むページは limit 件までに切り詰める
+        instance = self._get_instance()
+        pager = FakeTimelinePager(100)
+        instance.twitter = MagicMock()
+        instance.twitter.get_user_tweets.side_effect = pager.get_user_tweets
+        actual = list(instance.iter_user_timeline("screen_name_1", limit=50, min_id=-1))
+        expect = [list(range(100, 80, -1)), list(range(80, 60, -1)), list(range(60, 50, -1))]
+        self.assertEqual(expect, get_id_list(actual))
+        self.assertEqual(3, mock_writer.write.call_count)
+
+        # min_id のツイートを含むページまで返す
+        pager = FakeTimelinePager(100)
+        instance.twitter.get_user_tweets.side_effect = pager.get_user_tweets
+        actual = list(instance.iter_user_timeline("screen_name_1", limit=300, min_id=75))
+        self.assertEqual([list(range(100, 80, -1)), list(range(80, 74, -1))], get_id_list(actual))
+
+        # ページは要求されたときに初めて取得する
+        pager = FakeTimelinePager(100)
+        instance.twitter.get_user_tweets.side_effect = pager.get_user_tweets
+        page_iter = instance.iter_user_timeline("screen_name_1", limit=300, min_id=-1)
+        self.assertEqual(0, pager.request_num)
+        next(page_iter)
+        self.assertEqual(1, pager.request_num)
+        next(page_iter)
+        self.assertEqual(2, pager.request_num)
 
     def test_get_user_timeline(self):
         mock_get_user_id = self.enterContext(patch("personal_twilog.webapi.twitter_api.TwitterAPI.get_user_id"))
-        mock_path = self.enterContext(patch("personal_twilog.webapi.twitter_api.Path"))
-        mock_orjson = self.enterContext(patch("personal_twilog.webapi.twitter_api.orjson"))
+        mock_response_cache = self.enterContext(patch("personal_twilog.webapi.twitter_api.ResponseCache"))
+        mock_writer = mock_response_cache.return_value.open_writer.return_value.__enter__.return_value
 
         rest_id = 12345678
         Params = namedtuple("Params", ["kind_tweet_results", "min_id", "result"])
@@ -185,6 +758,7 @@ class TestTwitterAPI(unittest.TestCase):
             instance = self._get_instance()
             instance.twitter = MagicMock()
             mock_get_user_id.reset_mock()
+            mock_response_cache.reset_mock()
 
             if params.kind_tweet_results == "normal_tweet":
                 instance.twitter.get_user_tweets.return_value = {
@@ -203,6 +777,11 @@ class TestTwitterAPI(unittest.TestCase):
 
         def post_run(actual: list[dict], instance: TwitterAPI, params: Params) -> None:
             self.assertEqual(params.result, actual)
+            # 取得したページはアカウントごとのキャッシュに1ページずつ書き込む
+            mock_response_cache.assert_called_once_with("get_user_tweets", "./data")
+            mock_response_cache.return_value.open_writer.assert_called_once_with("screen_name_1")
+            page = instance.twitter.get_user_tweets.return_value.get("data")
+            mock_writer.write.assert_called_once_with(page)
 
         params_list = [
             Params("normal_tweet", -1, [{"result": {"rest_id": str(rest_id)}}]),
@@ -216,6 +795,80 @@ class TestTwitterAPI(unittest.TestCase):
             actual = instance.get_user_timeline("screen_name_1", limit=300, min_id=params.min_id)
             post_run(actual, instance, params)
 
+    def test_get_user_timeline_memory(self):
+        mock_get_user_id = self.enterContext(patch("personal_twilog.webapi.twitter_api.TwitterAPI.get_user_id"))
+        mock_get_user_id.return_value = UserId(12345678)
+        self.enterContext(patch("personal_twilog.webapi.twitter_api.ResponseCache"))
+
+        tracemalloc.start()
+        try:
+            # 全件を1ページで返すレスポンス
+            pager = FakeTimelinePager(300, page_size=300, is_count_bytes=False)
+            for entry in pager.entry_list:
+                entry["content"]["itemContent"]["tweet_results"]["result"]["full_text"] = "x" * 5000
+            response_size, _ = tracemalloc.get_traced_memory()
+            instance = self._get_instance()
+            instance.twitter = MagicMock()
+            instance.twitter.get_user_tweets.side_effect = pager.get_user_tweets
+            tracemalloc.reset_peak()
+            base_size, _ = tracemalloc.get_traced_memory()
+
+            actual = instance.get_user_timeline("screen_name_1", limit=300, min_id=-1)
+
+            _, peak_size = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(300, len(actual))
+        # レスポンス全体のコピーを作らない（コピーすると、レスポンスと同程度のメモリを確保する）
+        self.assertLess(peak_size - base_size, response_size * 0.1)
+
+    def test_get_user_timeline_paginated(self):
+        mock_get_user_id = self.enterContext(patch("personal_twilog.webapi.twitter_api.TwitterAPI.get_user_id"))
+        mock_get_user_id.return_value = UserId(12345678)
+        self.enterContext(patch("personal_twilog.webapi.twitter_api.ResponseCache"))
+
+        def get_tweet_list(rest_id_list: list[int]) -> list[dict]:
+            return [{"result": {"rest_id": str(rest_id)}} for rest_id in rest_id_list]
+
+        Params = namedtuple("Params", ["tweet_num", "limit", "min_id", "request_num", "result"])
+        params_list = [
+            # 新しいツイートが数件の場合は1ページのみ要求し、min_id のツイートまでを返す
+            Params(400, 300, 397, 1, get_tweet_list([400, 399, 398, 397])),
+            Params(400, 300, 370, 2, get_tweet_list(range(400, 369, -1))),
+            # min_id のツイートが削除されている場合は、それより古いツイートを含むページまでを返す
+            Params(400, 300, 500, 1, get_tweet_list(range(400, 380, -1))),
+            # limit 件まで取得したら次のページは要求しない
+            Params(400, 300, -1, 15, get_tweet_list(range(400, 100, -1))),
+            Params(400, 30, -1, 2, get_tweet_list(range(400, 370, -1))),
+            Params(50, 300, -1, 3, get_tweet_list(range(50, 0, -1))),
+        ]
+        for params in params_list:
+            instance = self._get_instance()
+            pager = FakeTimelinePager(params.tweet_num)
+            instance.twitter = MagicMock()
+            instance.twitter.get_user_tweets.side_effect = pager.get_user_tweets
+
+            actual = instance.get_user_timeline("screen_name_1", limit=params.limit, min_id=params.min_id)
+            self.assertEqual(params.result, actual)
+            self.assertEqual(params.request_num, pager.request_num)
+
+        # 差分取得では、全件取得と比べてリクエスト数と転送量が 1/10 以下になる
+        full_pager = FakeTimelinePager(400)
+        instance = self._get_instance()
+        instance.twitter = MagicMock()
+        instance.twitter.get_user_tweets.side_effect = full_pager.get_user_tweets
+        instance.get_user_timeline("screen_name_1", limit=300, min_id=-1)
+
+        incremental_pager = FakeTimelinePager(400)
+        instance = self._get_instance()
+        instance.twitter = MagicMock()
+        instance.twitter.get_user_tweets.side_effect = incremental_pager.get_user_tweets
+        instance.get_user_timeline("screen_name_1", limit=300, min_id=395)
+
+        self.assertLessEqual(incremental_pager.request_num * 10, full_pager.request_num)
+        self.assertLessEqual(incremental_pager.byte_num * 10, full_pager.byte_num)
+
 
 if __name__ == "__main__":
     if sys.argv: